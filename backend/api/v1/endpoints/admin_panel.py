@@ -13,6 +13,7 @@ from database import get_db
 from models import User, CustomerProfile, ContractorProfile, RepairRequest, SecurityVerification, HRDocument, RequestStatus, UserRole
 from api.v1.schemas import RepairRequestResponse, UserResponse
 from api.v1.dependencies import get_current_user
+from services.request_status_history_service import RequestStatusHistoryService
 
 logger = logging.getLogger(__name__)
 
@@ -529,13 +530,19 @@ async def update_request_status(
         )
     
     # Обновляем статус
+    history = RequestStatusHistoryService(db)
+    status_event = None
     if "status" in status_data:
         if status_data["status"] not in [status.value for status in RequestStatus]:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Недопустимый статус"
             )
-        request.status = status_data["status"]
+        # Смена статуса - через журнал статусов (время в статусах и SLA)
+        if status_data["status"] != getattr(request.status, "value", request.status):
+            status_event = history.record_transition(
+                request, status_data["status"], changed_by=current_user.id, reason="Изменено администратором"
+            )
         
         # Устанавливаем время обработки для завершенных заявок
         if status_data["status"] == RequestStatus.COMPLETED:
@@ -551,6 +558,8 @@ async def update_request_status(
     
     db.commit()
     db.refresh(request)
+    if status_event is not None:
+        history.publish(status_event)
     
     logger.info(f"✅ Статус заявки {request_id} обновлен администратором {current_user.id}")
     
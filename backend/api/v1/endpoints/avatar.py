@@ -1,30 +1,71 @@
 """
 API endpoints для управления аватарами пользователей
+
+Обработка изображений выполняется в пуле процессов (services/avatar_images.py),
+описание файлов аватара хранится в users.avatar_variants. Оригинал хранится в
+хранилище по содержимому (services/blob_store.py): users.avatar_variants["blob"]
+- ссылка на него.
 """
 
-import os
+import asyncio
 import logging
 from pathlib import Path
-from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
-from PIL import Image
-import uuid
 
 from database import get_db
 from models import User
 from api.v1.dependencies import get_current_user
+from services.avatar_images import AVATAR_SIZES, FORMATS, avatar_config, avatar_processor
+from services.blob_store import discard_upload, release_blob, store_upload
+from services.upload_storage import UploadTooLargeError, UploadTypeError
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 # Настройки для аватаров
-AVATAR_UPLOAD_DIR = Path("uploads/avatars")
+AVATAR_UPLOAD_DIR = Path(avatar_config.upload_dir)
 AVATAR_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+ALLOWED_MIME_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp"}
 MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
-AVATAR_SIZES = [(32, 32), (64, 64), (128, 128), (256, 256)]
+
+
+def _avatar_variants(user: User) -> Optional[Dict[str, Any]]:
+    """Описание файлов аватара; для аватаров, загруженных до avatar_variants, - по схеме имен"""
+    if user.avatar_variants:
+        return user.avatar_variants
+    if not user.avatar_url:
+        return None
+    file_id = Path(user.avatar_url).stem.split('_')[0]
+    return {
+        "id": file_id,
+        "source": f"{file_id}_256x256.jpg",
+        "sizes": {
+            f"{width}x{height}": {"width": width, "height": height, "files": {"jpeg": f"{file_id}_{width}x{height}.jpg"}}
+            for width, height in AVATAR_SIZES
+        },
+    }
+
+
+def _release_avatar(db: Session, variants: Optional[Dict[str, Any]]) -> Optional[str]:
+    """
+    Снятие ссылки аватара на оригинал (без commit)
+
+    Returns:
+        Optional[str]: id файлов, которые нужно удалить после commit (аватары до хранилища по
+        содержимому); файлы аватаров из хранилища удаляет сборщик вместе с оригиналом
+    """
+    if not variants:
+        return None
+    if variants.get("blob"):
+        release_blob(db, variants["blob"])
+        return None
+    return variants["id"]
+
 
 @router.post("/upload")
 async def upload_avatar(
@@ -43,61 +84,50 @@ async def upload_avatar(
                 detail=f"Неподдерживаемый формат файла. Разрешены: {', '.join(ALLOWED_EXTENSIONS)}"
             )
         
-        # Проверяем размер файла
-        file_content = await file.read()
-        if len(file_content) > MAX_FILE_SIZE:
+        # Сохраняем оригинал по частям с проверкой размера и типа содержимого;
+        # то же изображение, загруженное ранее, не записывается повторно
+        try:
+            stored = await store_upload(db, file, MAX_FILE_SIZE, allowed_mime_types=ALLOWED_MIME_TYPES)
+        except UploadTooLargeError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Файл слишком большой. Максимальный размер: {MAX_FILE_SIZE // (1024*1024)}MB"
             )
+        except UploadTypeError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Файл не является изображением"
+            )
         
-        # Генерируем уникальное имя файла
-        file_id = str(uuid.uuid4())
-        original_filename = f"{file_id}{file_extension}"
-        
-        # Сохраняем оригинальный файл
-        original_path = AVATAR_UPLOAD_DIR / original_filename
-        with open(original_path, "wb") as f:
-            f.write(file_content)
-        
-        # Создаем миниатюры разных размеров
-        avatar_urls = {}
+        # Создаем миниатюры разных размеров в пуле процессов (готовые файлы того же изображения переиспользуются)
         try:
-            with Image.open(original_path) as img:
-                # Конвертируем в RGB если нужно
-                if img.mode in ("RGBA", "P"):
-                    img = img.convert("RGB")
-                
-                for size in AVATAR_SIZES:
-                    # Создаем миниатюру
-                    thumbnail = img.copy()
-                    thumbnail.thumbnail(size, Image.Resampling.LANCZOS)
-                    
-                    # Сохраняем миниатюру
-                    thumbnail_filename = f"{file_id}_{size[0]}x{size[1]}.jpg"
-                    thumbnail_path = AVATAR_UPLOAD_DIR / thumbnail_filename
-                    thumbnail.save(thumbnail_path, "JPEG", quality=85)
-                    
-                    avatar_urls[f"{size[0]}x{size[1]}"] = f"/uploads/avatars/{thumbnail_filename}"
-        
+            variants = await avatar_processor.create_variants(stored.path, stored.sha256)
         except Exception as e:
             logger.error(f"Ошибка создания миниатюр: {e}")
-            # Удаляем оригинальный файл если не удалось создать миниатюры
-            if original_path.exists():
-                original_path.unlink()
+            db.rollback()
+            discard_upload(stored)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Ошибка обработки изображения"
             )
-        
-        # Удаляем оригинальный файл (оставляем только миниатюры)
-        if original_path.exists():
-            original_path.unlink()
+        variants["blob"] = stored.sha256
         
         # Обновляем аватар пользователя в базе данных
-        avatar_url = avatar_urls.get("128x128", "")
-        current_user.avatar_url = avatar_url
-        db.commit()
+        try:
+            legacy_file_id = _release_avatar(db, _avatar_variants(current_user))
+            avatar_urls = avatar_processor.urls(variants)
+            avatar_url = avatar_urls.get("128x128", "")
+            current_user.avatar_url = avatar_url
+            current_user.avatar_variants = variants
+            db.commit()
+        except Exception:
+            db.rollback()
+            discard_upload(stored)
+            raise
+        
+        # Файлы прежнего аватара, загруженного до хранилища по содержимому, больше не нужны
+        if legacy_file_id:
+            await asyncio.to_thread(avatar_processor.remove, legacy_file_id)
         
         logger.info(f"✅ Аватар загружен для пользователя {current_user.username}: {avatar_url}")
         
@@ -130,23 +160,16 @@ async def remove_avatar(
                 detail="У пользователя нет аватара"
             )
         
-        # Удаляем файлы аватара
-        avatar_path = Path(current_user.avatar_url)
-        if avatar_path.exists():
-            avatar_path.unlink()
-        
-        # Удаляем все размеры аватара
-        file_id = avatar_path.stem.split('_')[0]
-        for size in AVATAR_SIZES:
-            size_filename = f"{file_id}_{size[0]}x{size[1]}.jpg"
-            size_path = AVATAR_UPLOAD_DIR / size_filename
-            if size_path.exists():
-                size_path.unlink()
-        
         # Обновляем пользователя в базе данных
+        legacy_file_id = _release_avatar(db, _avatar_variants(current_user))
         current_user.avatar_url = None
+        current_user.avatar_variants = None
         db.commit()
         
+        # Удаляем все файлы аватара, включая размеры по запросу
+        if legacy_file_id:
+            await asyncio.to_thread(avatar_processor.remove, legacy_file_id)
+        
         logger.info(f"✅ Аватар удален для пользователя {current_user.username}")
         
         return {"message": "Аватар успешно удален"}
@@ -165,23 +188,61 @@ async def get_avatar_info(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Получение информации об аватаре пользователя"""
+    """Получение информации об аватаре пользователя (без обращений к файловой системе)"""
     
+    variants = _avatar_variants(current_user)
     avatar_info = {
         "has_avatar": bool(current_user.avatar_url),
         "avatar_url": current_user.avatar_url,
-        "avatar_urls": {}
+        "avatar_urls": avatar_processor.urls(variants) if variants else {}
     }
-    
-    if current_user.avatar_url:
-        # Генерируем URL для всех размеров
-        avatar_path = Path(current_user.avatar_url)
-        file_id = avatar_path.stem.split('_')[0]
-        
-        for size in AVATAR_SIZES:
-            size_filename = f"{file_id}_{size[0]}x{size[1]}.jpg"
-            size_path = AVATAR_UPLOAD_DIR / size_filename
-            if size_path.exists():
-                avatar_info["avatar_urls"][f"{size[0]}x{size[1]}"] = f"/uploads/avatars/{size_filename}"
+    if variants and "webp" in avatar_processor.formats(variants):
+        avatar_info["avatar_urls_webp"] = avatar_processor.urls(variants, "webp")
     
     return avatar_info
+
+@router.get("/{user_id}/resize")
+async def get_resized_avatar(
+    user_id: int,
+    width: int = Query(..., description="Ширина, px"),
+    height: Optional[int] = Query(None, description="Высота, px (по умолчанию равна ширине)"),
+    format: str = Query("jpeg", description="Формат: jpeg или webp"),
+    db: Session = Depends(get_db)
+):
+    """Аватар произвольного размера: строится по запросу и хранится в дисковом кэше"""
+    
+    height = height or width
+    if not (avatar_config.min_side <= width <= avatar_config.max_side
+            and avatar_config.min_side <= height <= avatar_config.max_side):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Размер должен быть от {avatar_config.min_side} до {avatar_config.max_side} px"
+        )
+    if format not in FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Неподдерживаемый формат. Доступны: {', '.join(FORMATS)}"
+        )
+    
+    user = db.query(User).filter(User.id == user_id).first()
+    variants = _avatar_variants(user) if user else None
+    if not variants:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Аватар не найден"
+        )
+    
+    try:
+        path = await avatar_processor.variant(variants, width, height, format)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Аватар не найден"
+        )
+    
+    # Имя файла уникально для каждой загрузки: ответ можно кэшировать без срока
+    return FileResponse(
+        path,
+        media_type=f"image/{format}",
+        headers={"Cache-Control": "public, max-age=31536000, immutable"}
+    )
@@ -24,19 +24,27 @@ from ..schemas import (
     ContractorVerificationRequest, VerificationStatus, DocumentType
 )
 from ..dependencies import get_current_user, require_role
+from services.message_templates import message_templates
+from services.blob_store import acquire_path, blob_sha256, discard_upload, release_path, store_upload
+from services.upload_storage import UploadTooLargeError
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/contractor-verification", tags=["Contractor Verification"])
 
 # Константы
-UPLOAD_DIR = "/app/uploads/contractor_documents"
+UPLOAD_DIR = "/app/uploads/contractor_documents"  # Документы, загруженные до хранилища по содержимому
 ALLOWED_EXTENSIONS = {'.pdf', '.jpg', '.jpeg', '.png', '.doc', '.docx'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+FRONTEND_URL = os.getenv("FRONTEND_URL", "http://91.222.236.58:3000")
 
-def ensure_upload_dir():
-    """Создает директорию для загрузки файлов если её нет"""
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
+def acquire_document_path(db: Session, document_path: Optional[str]):
+    """Ссылка записи на файл из хранилища; путь хранилища без такого файла отклоняется"""
+    if blob_sha256(document_path) and not acquire_path(db, document_path):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Файл документа не найден"
+        )
 
 @router.get("/profile/{contractor_id}", response_model=ContractorProfileExtended)
 async def get_contractor_profile_extended(
@@ -330,6 +338,8 @@ async def add_education_record(
         **education_data.dict()
     )
     
+    # Скан диплома, загруженный как документ, - еще одна ссылка на тот же файл
+    acquire_document_path(db, education_record.document_path)
     db.add(education_record)
     db.commit()
     db.refresh(education_record)
@@ -367,6 +377,9 @@ async def update_education_record(
     
     # Обновляем поля
     update_data = education_data.dict(exclude_unset=True)
+    if "document_path" in update_data and update_data["document_path"] != education_record.document_path:
+        acquire_document_path(db, update_data["document_path"])
+        release_path(db, education_record.document_path)
     for field, value in update_data.items():
         setattr(education_record, field, value)
     
@@ -403,6 +416,7 @@ async def delete_education_record(
                 detail="Нет прав для удаления этой записи"
             )
     
+    release_path(db, education_record.document_path)
     db.delete(education_record)
     db.commit()
     
@@ -444,31 +458,18 @@ async def upload_document(
             detail=f"Неподдерживаемый формат файла. Разрешены: {', '.join(ALLOWED_EXTENSIONS)}"
         )
     
-    # Читаем содержимое файла для проверки размера
-    file_content = await file.read()
-    file_size = len(file_content)
-    
-    # Проверяем размер файла
-    if file_size > MAX_FILE_SIZE:
+    # Сохраняем файл по частям: загрузка прерывается, как только превышен размер.
+    # Файл с тем же содержимым (повторная загрузка скана) хранится один раз
+    try:
+        stored = await store_upload(db, file, MAX_FILE_SIZE)
+    except UploadTooLargeError:
         raise HTTPException(
             status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
             detail=f"Файл слишком большой. Максимальный размер: {MAX_FILE_SIZE // (1024*1024)}MB"
         )
-    
-    # Создаем директорию для файлов
-    ensure_upload_dir()
-    
-    # Генерируем уникальное имя файла
-    timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
-    filename = f"{contractor_id}_{document_type.value}_{timestamp}{file_extension}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    
-    # Сохраняем файл
-    try:
-        with open(file_path, "wb") as buffer:
-            buffer.write(file_content)
-    except Exception as e:
+    except OSError as e:
         logger.error(f"❌ Ошибка сохранения файла: {e}")
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Ошибка сохранения файла"
@@ -479,13 +480,18 @@ async def upload_document(
         contractor_id=contractor_id,
         document_type=document_type.value,
         document_name=document_name,
-        document_path=file_path,
-        file_size=file_size,
-        mime_type=file.content_type or "application/octet-stream"
+        document_path=str(stored.path),
+        file_size=stored.size,
+        mime_type=stored.mime_type or file.content_type or "application/octet-stream"
     )
     
     db.add(document)
-    db.commit()
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        discard_upload(stored)
+        raise
     db.refresh(document)
     
     logger.info(f"✅ Загружен документ {document_name} для исполнителя {contractor_id}")
@@ -518,17 +524,22 @@ async def delete_document(
                 detail="Нет прав для удаления этого документа"
             )
     
-    # Удаляем файл с диска
-    try:
-        if os.path.exists(document.document_path):
-            os.remove(document.document_path)
-    except Exception as e:
-        logger.warning(f"⚠️ Не удалось удалить файл {document.document_path}: {e}")
+    # Файл из хранилища удаляется сборщиком, когда на него не останется ссылок
+    document_path = document.document_path
+    stored_in_blobs = release_path(db, document_path)
     
     # Удаляем запись из базы данных
     db.delete(document)
     db.commit()
     
+    # Документ, загруженный до хранилища по содержимому, удаляем с диска
+    if not stored_in_blobs:
+        try:
+            if os.path.exists(document_path):
+                os.remove(document_path)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось удалить файл {document_path}: {e}")
+    
     logger.info(f"✅ Удален документ {document_id}")
     
     return {"message": "Документ удален"}
@@ -897,11 +908,37 @@ async def check_profile_completion(contractor_id: int, db: Session):
     # Обновляем общий статус
     await update_overall_verification_status(contractor_id, db)
 
+def _contractor_name(contractor: ContractorProfile, user: User) -> str:
+    return f"{contractor.first_name or ''} {contractor.last_name or ''}".strip() or user.username
+
+def _specialization_names(contractor: ContractorProfile) -> List[str]:
+    if not contractor.specializations or not isinstance(contractor.specializations, list):
+        return []
+    return [s.get('specialization', '') if isinstance(s, dict) else str(s) for s in contractor.specializations]
+
+async def _notify_staff(db: Session, roles: List[str], template: str, subject: str, context: Dict[str, Any]) -> List[str]:
+    """Письмо сотрудникам с ролями roles: шаблон рендерится один раз для всех получателей"""
+    from services.email_service import email_service
+
+    rows = db.query(User.email).filter(User.role.in_(roles), User.email.isnot(None)).all()
+    recipients = [email for (email,) in rows if email]
+    if not recipients:
+        return []
+
+    message_html = message_templates.render(f"{template}.html", **context)
+    message_text = message_templates.render(f"{template}.txt", **context)
+    for email in recipients:
+        await email_service.send_notification_email(
+            user_email=email,
+            subject=subject,
+            message=message_html,
+            plain_text=message_text
+        )
+    return recipients
+
 async def send_verification_notification_to_security(contractor_id: int, db: Session):
     """Отправка email уведомления сотрудникам службы безопасности"""
     try:
-        from services.email_service import email_service
-        
         # Получаем информацию об исполнителе
         contractor = db.query(ContractorProfile).filter(ContractorProfile.id == contractor_id).first()
         if not contractor:
@@ -911,73 +948,31 @@ async def send_verification_notification_to_security(contractor_id: int, db: Ses
         if not user:
             return
         
-        contractor_name = f"{contractor.first_name or ''} {contractor.last_name or ''}".strip() or user.username
-        
-        # Получаем всех сотрудников службы безопасности и админов
-        security_users = db.query(User).filter(
-            User.role.in_(["security", "admin"])
-        ).filter(User.email.isnot(None)).all()
+        contractor_name = _contractor_name(contractor, user)
         
-        if not security_users:
+        # Отправляем уведомление всем сотрудникам СБ и админам
+        recipients = await _notify_staff(
+            db,
+            ["security", "admin"],
+            "email/contractor_pending_security",
+            f"Новый исполнитель ожидает проверки СБ - {contractor_name}",
+            {
+                "contractor_name": contractor_name,
+                "contractor_email": user.email,
+                "contractor_phone": contractor.phone,
+                "verification_url": f"{FRONTEND_URL}/security-verification/{contractor_id}",
+            },
+        )
+        if not recipients:
             logger.warning(f"⚠️ Не найдено сотрудников СБ с email для уведомления о проверке исполнителя {contractor_id}")
             return
-        
-        # Формируем ссылку на страницу проверки
-        base_url = "http://91.222.236.58:3000"
-        verification_url = f"{base_url}/security-verification/{contractor_id}"
-        
-        # Отправляем уведомление каждому сотруднику СБ
-        for security_user in security_users:
-            if security_user.email:
-                subject = f"Новый исполнитель ожидает проверки СБ - {contractor_name}"
-                message_html = f"""
-                <html>
-                <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                    <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                        <h2 style="color: #1976d2;">Новый исполнитель ожидает проверки СБ</h2>
-                        <p>В системе появился новый исполнитель, который заполнил профиль и готов к проверке службой безопасности.</p>
-                        <div style="background: #f5f5f5; padding: 15px; border-radius: 5px; margin: 20px 0;">
-                            <p><strong>Исполнитель:</strong> {contractor_name}</p>
-                            <p><strong>Email:</strong> {user.email}</p>
-                            <p><strong>Телефон:</strong> {contractor.phone or 'не указан'}</p>
-                        </div>
-                        <p style="margin-top: 30px;">
-                            <a href="{verification_url}" style="background: #1976d2; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">
-                                Перейти к проверке
-                            </a>
-                        </p>
-                        <p style="color: #666; font-size: 12px; margin-top: 30px;">
-                            Если кнопка не работает, скопируйте ссылку: {verification_url}
-                        </p>
-                    </div>
-                </body>
-                </html>
-                """
-                
-                message_text = f"""
-Новый исполнитель ожидает проверки СБ
-
-Исполнитель: {contractor_name}
-Email: {user.email}
-Телефон: {contractor.phone or 'не указан'}
-
-Ссылка на проверку: {verification_url}
-                """
-                
-                await email_service.send_notification_email(
-                    user_email=security_user.email,
-                    subject=subject,
-                    message=message_html
-                )
-                logger.info(f"📧 Уведомление отправлено сотруднику СБ {security_user.email} о проверке исполнителя {contractor_id}")
+        logger.info(f"📧 Уведомление о проверке исполнителя {contractor_id} отправлено сотрудникам СБ: {', '.join(recipients)}")
     except Exception as e:
         logger.error(f"❌ Ошибка отправки уведомления сотрудникам СБ: {e}")
 
 async def send_verification_notification_to_managers(contractor_id: int, db: Session):
     """Отправка email уведомления менеджерам"""
     try:
-        from services.email_service import email_service
-        
         # Получаем информацию об исполнителе
         contractor = db.query(ContractorProfile).filter(ContractorProfile.id == contractor_id).first()
         if not contractor:
@@ -987,315 +982,112 @@ async def send_verification_notification_to_managers(contractor_id: int, db: Ses
         if not user:
             return
         
-        contractor_name = f"{contractor.first_name or ''} {contractor.last_name or ''}".strip() or user.username
+        contractor_name = _contractor_name(contractor, user)
         
-        # Получаем всех менеджеров и админов
-        manager_users = db.query(User).filter(
-            User.role.in_(["manager", "admin"])
-        ).filter(User.email.isnot(None)).all()
-        
-        if not manager_users:
+        # Отправляем уведомление всем менеджерам и админам
+        recipients = await _notify_staff(
+            db,
+            ["manager", "admin"],
+            "email/contractor_pending_manager",
+            f"Исполнитель прошел проверку СБ и ожидает одобрения - {contractor_name}",
+            {
+                "contractor_name": contractor_name,
+                "contractor_email": user.email,
+                "contractor_phone": contractor.phone,
+                "specializations": _specialization_names(contractor),
+                "verification_url": f"{FRONTEND_URL}/manager/verification/{contractor_id}",
+            },
+        )
+        if not recipients:
             logger.warning(f"⚠️ Не найдено менеджеров с email для уведомления о проверке исполнителя {contractor_id}")
             return
-        
-        # Формируем ссылку на страницу проверки
-        base_url = "http://91.222.236.58:3000"
-        verification_url = f"{base_url}/manager/verification/{contractor_id}"
-        
-        # Отправляем уведомление каждому менеджеру
-        for manager_user in manager_users:
-            if manager_user.email:
-                subject = f"Исполнитель прошел проверку СБ и ожидает одобрения - {contractor_name}"
-                message_html = f"""
-                <html>
-                <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                    <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                        <h2 style="color: #1976d2;">Исполнитель ожидает одобрения менеджера</h2>
-                        <p>Исполнитель прошел проверку службой безопасности и готов к одобрению менеджером.</p>
-                        <div style="background: #f5f5f5; padding: 15px; border-radius: 5px; margin: 20px 0;">
-                            <p><strong>Исполнитель:</strong> {contractor_name}</p>
-                            <p><strong>Email:</strong> {user.email}</p>
-                            <p><strong>Телефон:</strong> {contractor.phone or 'не указан'}</p>
-                            <p><strong>Специализации:</strong> {', '.join([s.get('specialization', '') if isinstance(s, dict) else str(s) for s in contractor.specializations]) if contractor.specializations and isinstance(contractor.specializations, list) else 'не указаны'}</p>
-                        </div>
-                        <p style="margin-top: 30px;">
-                            <a href="{verification_url}" style="background: #1976d2; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">
-                                Перейти к проверке
-                            </a>
-                        </p>
-                        <p style="color: #666; font-size: 12px; margin-top: 30px;">
-                            Если кнопка не работает, скопируйте ссылку: {verification_url}
-                        </p>
-                    </div>
-                </body>
-                </html>
-                """
-                
-                message_text = f"""
-Исполнитель ожидает одобрения менеджера
-
-Исполнитель: {contractor_name}
-Email: {user.email}
-Телефон: {contractor.phone or 'не указан'}
-
-Ссылка на проверку: {verification_url}
-                """
-                
-                await email_service.send_notification_email(
-                    user_email=manager_user.email,
-                    subject=subject,
-                    message=message_html
-                )
-                logger.info(f"📧 Уведомление отправлено менеджеру {manager_user.email} о проверке исполнителя {contractor_id}")
+        logger.info(f"📧 Уведомление о проверке исполнителя {contractor_id} отправлено менеджерам: {', '.join(recipients)}")
     except Exception as e:
         logger.error(f"❌ Ошибка отправки уведомления менеджерам: {e}")
 
+async def _send_contractor_email(contractor_id: int, db: Session, template: str, subject: str, **context) -> Optional[str]:
+    """Письмо исполнителю по шаблону; возвращает email получателя или None"""
+    from services.email_service import email_service
+
+    contractor = db.query(ContractorProfile).filter(ContractorProfile.id == contractor_id).first()
+    if not contractor:
+        return None
+    
+    user = db.query(User).filter(User.id == contractor.user_id).first()
+    if not user or not user.email:
+        return None
+    
+    message_html = message_templates.render(template, contractor_name=_contractor_name(contractor, user), **context)
+    await email_service.send_notification_email(
+        user_email=user.email,
+        subject=subject,
+        message=message_html
+    )
+    return user.email
+
 async def send_security_approval_email(contractor_id: int, db: Session, notes: Optional[str] = None):
     """Отправляет email уведомление об одобрении СБ"""
     try:
-        from services.email_service import email_service
-        
-        contractor = db.query(ContractorProfile).filter(ContractorProfile.id == contractor_id).first()
-        if not contractor:
-            return
-        
-        user = db.query(User).filter(User.id == contractor.user_id).first()
-        if not user or not user.email:
-            return
-        
-        contractor_name = f"{contractor.first_name or ''} {contractor.last_name or ''}".strip() or user.username
-        base_url = os.getenv("FRONTEND_URL", "http://91.222.236.58:3000")
-        dashboard_url = f"{base_url}/contractor/dashboard"
-        
-        subject = f"Ваш профиль активен - Добро пожаловать!"
-        message_html = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #2e7d32;">Ваш профиль успешно проверен и активирован!</h2>
-                <p>Здравствуйте, {contractor_name}!</p>
-                <p>Поздравляем! Ваш профиль прошел проверку службой безопасности и теперь активен.</p>
-                <div style="background: #e8f5e9; padding: 15px; border-radius: 5px; margin: 20px 0; border-left: 4px solid #2e7d32;">
-                    <p><strong>Что это означает:</strong></p>
-                    <ul>
-                        <li>Вы можете просматривать доступные заявки</li>
-                        <li>Вы можете откликаться на заявки</li>
-                        <li>Ваш профиль виден менеджерам и заказчикам</li>
-                    </ul>
-                </div>
-                <p style="margin-top: 30px;">
-                    <a href="{dashboard_url}" style="background: #2e7d32; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">
-                        Перейти к заявкам
-                    </a>
-                </p>
-                <p style="color: #666; font-size: 12px; margin-top: 30px;">
-                    Если кнопка не работает, скопируйте ссылку: {dashboard_url}
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        await email_service.send_notification_email(
-            user_email=user.email,
-            subject=subject,
-            message=message_html
+        email = await _send_contractor_email(
+            contractor_id, db, "email/security_approval.html",
+            "Ваш профиль активен - Добро пожаловать!",
+            dashboard_url=f"{FRONTEND_URL}/contractor/dashboard",
         )
-        logger.info(f"📧 Email об одобрении СБ отправлен исполнителю {contractor_id} ({user.email})")
+        if email:
+            logger.info(f"📧 Email об одобрении СБ отправлен исполнителю {contractor_id} ({email})")
     except Exception as e:
         logger.error(f"❌ Ошибка отправки email об одобрении СБ: {e}")
 
 async def send_security_rejection_email(contractor_id: int, db: Session, reason: Optional[str] = None):
     """Отправляет email уведомление об отклонении СБ"""
     try:
-        from services.email_service import email_service
-        
-        contractor = db.query(ContractorProfile).filter(ContractorProfile.id == contractor_id).first()
-        if not contractor:
-            return
-        
-        user = db.query(User).filter(User.id == contractor.user_id).first()
-        if not user or not user.email:
-            return
-        
-        contractor_name = f"{contractor.first_name or ''} {contractor.last_name or ''}".strip() or user.username
-        
-        subject = f"Результат проверки профиля"
-        message_html = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #d32f2f;">Результат проверки профиля</h2>
-                <p>Здравствуйте, {contractor_name}!</p>
-                <p>Спасибо за интерес, проявленный к нашей платформе.</p>
-                <p>К сожалению, после проверки службой безопасности мы не готовы продолжить работу с Вами на данный момент.</p>
-                {f'<div style="background: #ffebee; padding: 15px; border-radius: 5px; margin: 20px 0; border-left: 4px solid #d32f2f;"><p><strong>Причина:</strong> {reason}</p></div>' if reason else ''}
-                <p>Если у Вас возникнут вопросы, пожалуйста, свяжитесь с нашей службой поддержки.</p>
-                <p style="color: #666; font-size: 12px; margin-top: 30px;">
-                    С уважением,<br>
-                    Команда платформы
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        await email_service.send_notification_email(
-            user_email=user.email,
-            subject=subject,
-            message=message_html
+        email = await _send_contractor_email(
+            contractor_id, db, "email/security_rejection.html",
+            "Результат проверки профиля",
+            reason=reason,
         )
-        logger.info(f"📧 Email об отклонении СБ отправлен исполнителю {contractor_id} ({user.email})")
+        if email:
+            logger.info(f"📧 Email об отклонении СБ отправлен исполнителю {contractor_id} ({email})")
     except Exception as e:
         logger.error(f"❌ Ошибка отправки email об отклонении СБ: {e}")
 
 async def send_clarification_request_email(contractor_id: int, db: Session, notes: str):
     """Отправляет email с запросом на уточнение данных"""
     try:
-        from services.email_service import email_service
-        
-        contractor = db.query(ContractorProfile).filter(ContractorProfile.id == contractor_id).first()
-        if not contractor:
-            return
-        
-        user = db.query(User).filter(User.id == contractor.user_id).first()
-        if not user or not user.email:
-            return
-        
-        contractor_name = f"{contractor.first_name or ''} {contractor.last_name or ''}".strip() or user.username
-        base_url = os.getenv("FRONTEND_URL", "http://91.222.236.58:3000")
-        profile_url = f"{base_url}/contractor/profile"
-        
-        subject = f"Требуется уточнение данных профиля"
-        message_html = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #ed6c02;">Требуется уточнение данных</h2>
-                <p>Здравствуйте, {contractor_name}!</p>
-                <p>Для завершения проверки вашего профиля службой безопасности необходимо дополнить следующие данные:</p>
-                <div style="background: #fff3e0; padding: 15px; border-radius: 5px; margin: 20px 0; border-left: 4px solid #ed6c02;">
-                    <p>{notes}</p>
-                </div>
-                <p style="margin-top: 30px;">
-                    <a href="{profile_url}" style="background: #ed6c02; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">
-                        Перейти к профилю
-                    </a>
-                </p>
-                <p style="color: #666; font-size: 12px; margin-top: 30px;">
-                    Если кнопка не работает, скопируйте ссылку: {profile_url}
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        await email_service.send_notification_email(
-            user_email=user.email,
-            subject=subject,
-            message=message_html
+        email = await _send_contractor_email(
+            contractor_id, db, "email/clarification_request.html",
+            "Требуется уточнение данных профиля",
+            notes=notes,
+            profile_url=f"{FRONTEND_URL}/contractor/profile",
         )
-        logger.info(f"📧 Email с запросом уточнения данных отправлен исполнителю {contractor_id} ({user.email})")
+        if email:
+            logger.info(f"📧 Email с запросом уточнения данных отправлен исполнителю {contractor_id} ({email})")
     except Exception as e:
         logger.error(f"❌ Ошибка отправки email с запросом уточнения: {e}")
 
 async def send_manager_approval_email(contractor_id: int, db: Session, notes: Optional[str] = None):
     """Отправляет email уведомление об одобрении менеджером"""
     try:
-        from services.email_service import email_service
-        
-        contractor = db.query(ContractorProfile).filter(ContractorProfile.id == contractor_id).first()
-        if not contractor:
-            return
-        
-        user = db.query(User).filter(User.id == contractor.user_id).first()
-        if not user or not user.email:
-            return
-        
-        contractor_name = f"{contractor.first_name or ''} {contractor.last_name or ''}".strip() or user.username
-        base_url = os.getenv("FRONTEND_URL", "http://91.222.236.58:3000")
-        dashboard_url = f"{base_url}/contractor/dashboard"
-        
-        subject = f"Профиль полностью одобрен - Добро пожаловать в команду!"
-        message_html = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #2e7d32;">Ваш профиль полностью одобрен!</h2>
-                <p>Здравствуйте, {contractor_name}!</p>
-                <p>Поздравляем! Ваш профиль прошел все проверки и получил окончательное одобрение менеджера.</p>
-                <div style="background: #e8f5e9; padding: 15px; border-radius: 5px; margin: 20px 0; border-left: 4px solid #2e7d32;">
-                    <p><strong>Теперь вы можете:</strong></p>
-                    <ul>
-                        <li>Просматривать все доступные заявки</li>
-                        <li>Откликаться на заявки</li>
-                        <li>Получать уведомления о новых заявках</li>
-                        <li>Работать с заказчиками через платформу</li>
-                    </ul>
-                </div>
-                <p style="margin-top: 30px;">
-                    <a href="{dashboard_url}" style="background: #2e7d32; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">
-                        Перейти к заявкам
-                    </a>
-                </p>
-                <p style="color: #666; font-size: 12px; margin-top: 30px;">
-                    Если кнопка не работает, скопируйте ссылку: {dashboard_url}
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        await email_service.send_notification_email(
-            user_email=user.email,
-            subject=subject,
-            message=message_html
+        email = await _send_contractor_email(
+            contractor_id, db, "email/manager_approval.html",
+            "Профиль полностью одобрен - Добро пожаловать в команду!",
+            dashboard_url=f"{FRONTEND_URL}/contractor/dashboard",
         )
-        logger.info(f"📧 Email об одобрении менеджером отправлен исполнителю {contractor_id} ({user.email})")
+        if email:
+            logger.info(f"📧 Email об одобрении менеджером отправлен исполнителю {contractor_id} ({email})")
     except Exception as e:
         logger.error(f"❌ Ошибка отправки email об одобрении менеджером: {e}")
 
 async def send_manager_rejection_email(contractor_id: int, db: Session, reason: Optional[str] = None):
     """Отправляет email уведомление об отклонении менеджером"""
     try:
-        from services.email_service import email_service
-        
-        contractor = db.query(ContractorProfile).filter(ContractorProfile.id == contractor_id).first()
-        if not contractor:
-            return
-        
-        user = db.query(User).filter(User.id == contractor.user_id).first()
-        if not user or not user.email:
-            return
-        
-        contractor_name = f"{contractor.first_name or ''} {contractor.last_name or ''}".strip() or user.username
-        
-        subject = f"Результат проверки профиля"
-        message_html = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
-                <h2 style="color: #d32f2f;">Результат проверки профиля</h2>
-                <p>Здравствуйте, {contractor_name}!</p>
-                <p>Спасибо за интерес, проявленный к нашей платформе.</p>
-                <p>К сожалению, после проверки менеджером мы не готовы продолжить работу с Вами на данный момент.</p>
-                {f'<div style="background: #ffebee; padding: 15px; border-radius: 5px; margin: 20px 0; border-left: 4px solid #d32f2f;"><p><strong>Причина:</strong> {reason}</p></div>' if reason else ''}
-                <p>Если у Вас возникнут вопросы, пожалуйста, свяжитесь с нашей службой поддержки.</p>
-                <p style="color: #666; font-size: 12px; margin-top: 30px;">
-                    С уважением,<br>
-                    Команда платформы
-                </p>
-            </div>
-        </body>
-        </html>
-        """
-        
-        await email_service.send_notification_email(
-            user_email=user.email,
-            subject=subject,
-            message=message_html
+        email = await _send_contractor_email(
+            contractor_id, db, "email/manager_rejection.html",
+            "Результат проверки профиля",
+            reason=reason,
         )
-        logger.info(f"📧 Email об отклонении менеджером отправлен исполнителю {contractor_id} ({user.email})")
+        if email:
+            logger.info(f"📧 Email об отклонении менеджером отправлен исполнителю {contractor_id} ({email})")
     except Exception as e:
         logger.error(f"❌ Ошибка отправки email об отклонении менеджером: {e}")
 
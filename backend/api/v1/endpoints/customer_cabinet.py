@@ -12,6 +12,9 @@ from models import User, RepairRequest, CustomerProfile, RequestStatus
 from api.v1.schemas import RepairRequestCreate, RepairRequestUpdate, RepairRequestResponse
 from api.v1.dependencies import get_current_user
 from services.analytics_service import analytics_service
+from services.request_status_history_service import RequestStatusHistoryService
+from services.request_state_machine import Actor
+from services.request_workflow_service import get_request_workflow_service
 
 logger = logging.getLogger(__name__)
 
@@ -203,9 +206,14 @@ async def create_customer_request(
         status=RequestStatus.NEW
     )
     
+    # Заявка и первая запись журнала статусов - в одной транзакции
+    history = RequestStatusHistoryService(db)
     db.add(new_request)
+    db.flush()
+    status_event = history.record_creation(new_request, changed_by=current_user.id)
     db.commit()
     db.refresh(new_request)
+    history.publish(status_event)
     
     logger.info(f"✅ Новая заявка #{new_request.id} создана заказчиком {current_user.id}")
     
@@ -376,16 +384,19 @@ async def cancel_customer_request(
             detail="Заявка не найдена"
         )
     
-    # Заказчик может отменить только заявки со статусом NEW или MANAGER_REVIEW
-    if request.status not in [RequestStatus.NEW, RequestStatus.MANAGER_REVIEW]:
+    # Правила отмены (только NEW или MANAGER_REVIEW) - в request_state_machine;
+    # отмена через workflow попадает в журнал статусов
+    try:
+        get_request_workflow_service(db).cancel_request(
+            request_id, current_user.id, "по решению заказчика",
+            actor=Actor(current_user.id, current_user.role, customer_profile.id)
+        )
+    except ValueError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Заявка уже находится в работе и не может быть отменена"
         )
     
-    request.status = RequestStatus.CANCELLED
-    db.commit()
-    
     logger.info(f"✅ Заявка #{request_id} отменена заказчиком {current_user.id}")
     
     return {"message": "Заявка успешно отменена"}
@@ -438,23 +449,10 @@ async def get_customer_statistics(
         )
     ).count()
     
-    # Среднее время обработки заявок
-    completed_requests = db.query(RepairRequest).filter(
-        and_(
-            RepairRequest.customer_id == customer_profile.id,
-            RepairRequest.status == RequestStatus.COMPLETED,
-            RepairRequest.processed_at.isnot(None)
-        )
-    ).all()
-    
-    avg_processing_time = 0
-    if completed_requests:
-        total_time = sum([
-            (req.processed_at - req.created_at).total_seconds() / 3600  # в часах
-            for req in completed_requests
-            if req.processed_at and req.created_at
-        ])
-        avg_processing_time = total_time / len(completed_requests)
+    # Среднее время до взятия заявки в работу менеджером (проекция request_stage_durations)
+    avg_processing_time = RequestStatusHistoryService(db).average_hours_in_stages(
+        [RequestStatus.NEW.value], customer_id=customer_profile.id, completed_only=True
+    )
     
     return {
         "total_requests": total_requests,
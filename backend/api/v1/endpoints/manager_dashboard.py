@@ -196,19 +196,11 @@ async def get_performance_metrics(
     completed_requests = len([r for r in period_requests if r.status == RequestStatus.COMPLETED])
     cancelled_requests = len([r for r in period_requests if r.status == RequestStatus.CANCELLED])
     
-    # Среднее время обработки
-    completed_with_times = [
-        r for r in period_requests 
-        if r.status == RequestStatus.COMPLETED and r.processed_at and r.assigned_at
-    ]
-    
-    avg_processing_time = 0
-    if completed_with_times:
-        total_time = sum([
-            (req.assigned_at - req.processed_at).total_seconds() / 3600
-            for req in completed_with_times
-        ])
-        avg_processing_time = total_time / len(completed_with_times)
+    # Среднее время обработки (проекция request_stage_durations)
+    from services.request_status_history_service import PROCESSING_STAGES, RequestStatusHistoryService
+    avg_processing_time = RequestStatusHistoryService(db).average_hours_in_stages(
+        PROCESSING_STAGES, manager_id=current_user.id, since=period_start, completed_only=True
+    )
     
     # Тренды по дням
     daily_stats = {}
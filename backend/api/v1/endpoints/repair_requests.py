@@ -1,5 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 from sqlalchemy import text
 from typing import List, Optional
 from datetime import datetime
@@ -15,13 +16,17 @@ from ..schemas import (
     RequestStatus
 )
 from ..dependencies import get_current_user
+from services.job_queue import enqueue_job
+from services.request_status_history_service import RequestStatusHistoryService
+from services.request_state_machine import Actor, TransitionForbiddenError
+from services.request_workflow_service import RequestConflictError, get_request_workflow_service
+from services.workflow_jobs import NOTIFY_MANAGERS_NEW_REQUEST
 
 router = APIRouter()
 
 @router.post("/", response_model=RepairRequestResponse)
 def create_repair_request(
     request_data: RepairRequestCreate,
-    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -60,47 +65,17 @@ def create_repair_request(
         status=RequestStatus.NEW
     )
     
+    history = RequestStatusHistoryService(db)
     db.add(db_request)
-    db.commit()
-    db.refresh(db_request)
+    db.flush()
+    status_event = history.record_creation(db_request, changed_by=current_user.id)
     
-    # Уведомляем менеджеров по email (best-effort, фоновая задача)
-    def send_manager_notifications():
-        try:
-            from database import SessionLocal
-            from models import User
-            from services.email_service import email_service
-            import asyncio
-            
-            # Создаем новую сессию для фоновой задачи
-            db_bg = SessionLocal()
-            try:
-                managers = db_bg.query(User).filter(User.role == "manager").all()
-                subject = f"Новая заявка #{db_request.id}: {db_request.title}"
-                location_text = ", ".join(filter(None, [db_request.region, db_request.city, db_request.address]))
-                message = (
-                    f"Создана новая заявка #{db_request.id}.\n"
-                    f"Название: {db_request.title}\n"
-                    f"Срочность: {db_request.urgency or 'не указана'}\n"
-                    f"Локация: {location_text or 'не указана'}\n"
-                    f"Описание: {db_request.description}"
-                )
-                for m in managers:
-                    if m.email:
-                        try:
-                            # Запускаем асинхронную функцию в новом event loop
-                            loop = asyncio.new_event_loop()
-                            asyncio.set_event_loop(loop)
-                            loop.run_until_complete(email_service.send_notification_email(m.email, subject, message))
-                            loop.close()
-                        except Exception:
-                            pass
-            finally:
-                db_bg.close()
-        except Exception:
-            pass
+    # Уведомляем менеджеров по email (фоновая задача, выполняется воркером очереди)
+    enqueue_job(db, NOTIFY_MANAGERS_NEW_REQUEST, {"request_id": db_request.id})
     
-    background_tasks.add_task(send_manager_notifications)
+    db.commit()
+    db.refresh(db_request)
+    history.publish(status_event)
 
     # Безопасная сериализация без вложенного customer
     resp = {
@@ -259,10 +234,16 @@ def get_repair_request(
 def update_repair_request(
     request_id: int,
     request_data: RepairRequestUpdate,
+    expected_version: Optional[int] = Query(None, description="Версия заявки, которую видел пользователь"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Обновление заявки на ремонт"""
+    """
+    Обновление заявки на ремонт
+
+    Смена статуса - переход автомата статусов и требует expected_version;
+    если заявку успели изменить, возвращается 409.
+    """
     request = db.query(RepairRequest).filter(RepairRequest.id == request_id).first()
     
     if not request:
@@ -285,13 +266,48 @@ def update_repair_request(
             detail="Недостаточно прав для обновления заявки"
         )
     
-    # Обновляем поля
-    for field, value in request_data.dict(exclude_unset=True).items():
+    # Обновляем поля; статус меняется только переходом автомата статусов
+    update_data = request_data.dict(exclude_unset=True)
+    new_status = update_data.pop("status", None)
+    if new_status is not None and expected_version is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Для смены статуса укажите expected_version - версию заявки, которую видел пользователь"
+        )
+    if expected_version is not None and request.version != expected_version:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Заявка {request_id} была изменена другим пользователем "
+                   f"(версия {request.version}, ожидалась {expected_version}), обновите данные"
+        )
+    for field, value in update_data.items():
         setattr(request, field, value)
     
     request.updated_at = datetime.utcnow()
     
-    db.commit()
+    if new_status is not None and new_status.value != getattr(request.status, "value", request.status):
+        # Изменения полей сохраняются в той же транзакции, что и переход
+        try:
+            request = get_request_workflow_service(db).change_status(
+                request_id, current_user.id, new_status, update_data,
+                expected_version=expected_version, actor=Actor.from_user(current_user)
+            )
+        except RequestConflictError as e:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+        except TransitionForbiddenError as e:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return RepairRequestResponse.from_orm(request)
+    
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Заявка {request_id} была изменена другим пользователем, обновите данные"
+        )
     db.refresh(request)
     
     return RepairRequestResponse.from_orm(request)
@@ -4,16 +4,19 @@ API endpoints для управления workflow заявок
 
 import logging
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from database import get_db
 from models import RepairRequest, User
 from api.v1.schemas import (
     RepairRequestCreate, RepairRequestUpdate, RepairRequestResponse,
-    RequestStatus
+    RequestStatus, BulkTransitionRequest, BulkTransitionResponse
 )
 from api.v1.dependencies import get_current_user
-from services.request_workflow_service import get_request_workflow_service, RequestWorkflowService
+from services.request_state_machine import Actor, TransitionForbiddenError
+from services.request_workflow_service import (
+    get_request_workflow_service, RequestWorkflowService, RequestConflictError, MAX_CLAIM_BATCH
+)
 
 logger = logging.getLogger(__name__)
 
@@ -119,12 +122,14 @@ async def get_requests(
             "updated_at": getattr(req, "updated_at", None),
             "processed_at": getattr(req, "processed_at", None),
             "assigned_at": getattr(req, "assigned_at", None),
+            "version": getattr(req, "version", None),
         }
         safe_responses.append(RepairRequestResponse(**resp))
     return safe_responses
 
 @router.get("/available", response_model=List[RepairRequestResponse])
 async def get_available_requests(
+    limit: Optional[int] = Query(None, ge=1, le=500),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -136,7 +141,7 @@ async def get_available_requests(
         )
     
     workflow_service = get_request_workflow_service(db)
-    requests = workflow_service.get_available_requests()
+    requests = workflow_service.get_available_requests(limit)
     # Безопасная сериализация без вложенного customer (избегаем ValidationError на неполных профилях)
     safe_responses: List[RepairRequestResponse] = []
     for req in requests:
@@ -167,29 +172,89 @@ async def get_available_requests(
             "updated_at": getattr(req, "updated_at", None),
             "processed_at": getattr(req, "processed_at", None),
             "assigned_at": getattr(req, "assigned_at", None),
+            "version": getattr(req, "version", None),
         }
         safe_responses.append(RepairRequestResponse(**resp))
     return safe_responses
 
+@router.get("/allowed-actions")
+async def get_allowed_actions(
+    request_ids: List[int] = Query(..., max_items=200, description="Заявки, для которых нужны доступные действия"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Доступные текущему пользователю действия по списку заявок (для кнопок в интерфейсе)"""
+    workflow_service = get_request_workflow_service(db)
+    allowed = workflow_service.get_allowed_actions(request_ids, Actor.from_user(current_user))
+    return {"requests": [{"request_id": request_id, **info} for request_id, info in allowed.items()]}
+
+@router.post("/claim", response_model=List[RepairRequestResponse])
+async def claim_requests(
+    limit: int = Query(1, ge=1, le=MAX_CLAIM_BATCH, description="Сколько заявок взять из очереди"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Взять следующие заявки из общей очереди новых заявок
+
+    Параллельные менеджеры получают разные заявки; пустой список - очередь пуста.
+    """
+    if current_user.role != "manager":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Только менеджеры могут брать заявки из очереди"
+        )
+    
+    workflow_service = get_request_workflow_service(db)
+    
+    try:
+        requests = workflow_service.claim_requests(current_user.id, limit)
+    except RequestConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return [RepairRequestResponse.from_orm(request) for request in requests]
+
+@router.post("/bulk", response_model=BulkTransitionResponse)
+async def bulk_transition(
+    bulk_data: BulkTransitionRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Массовые переходы заявок одной транзакцией с результатом по каждой заявке"""
+    workflow_service = get_request_workflow_service(db)
+    
+    try:
+        results = workflow_service.bulk_transition(
+            current_user.id, [item.dict() for item in bulk_data.items], actor=Actor.from_user(current_user)
+        )
+    except RequestConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except TransitionForbiddenError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    succeeded = sum(1 for result in results if result["success"])
+    return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+
 @router.post("/{request_id}/assign-manager")
 async def assign_to_manager(
     request_id: int,
     manager_id: int,
+    expected_version: Optional[int] = Query(None, description="Версия заявки, которую видел пользователь"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Назначение заявки менеджеру"""
-    if current_user.role not in ["manager", "admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Только менеджеры и администраторы могут назначать заявки"
-        )
-    
     workflow_service = get_request_workflow_service(db)
     
     try:
-        request = workflow_service.assign_to_manager(request_id, manager_id)
+        request = workflow_service.assign_to_manager(
+            request_id, manager_id, expected_version=expected_version, actor=Actor.from_user(current_user)
+        )
         return {"message": f"Заявка #{request_id} назначена менеджеру", "request": RepairRequestResponse.from_orm(request)}
+    except RequestConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except TransitionForbiddenError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -197,46 +262,48 @@ async def assign_to_manager(
 async def add_clarification(
     request_id: int,
     clarification_data: dict,
+    expected_version: Optional[int] = Query(None, description="Версия заявки, которую видел пользователь"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Добавление уточнений к заявке"""
-    if current_user.role not in ["manager", "admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Только менеджеры могут добавлять уточнения"
-        )
-    
     workflow_service = get_request_workflow_service(db)
     
     try:
         request = workflow_service.add_clarification(
             request_id,
             current_user.id,
-            clarification_data.get("clarification_details", "")
+            clarification_data.get("clarification_details", ""),
+            expected_version=expected_version,
+            actor=Actor.from_user(current_user)
         )
         return {"message": "Уточнения добавлены", "request": RepairRequestResponse.from_orm(request)}
+    except RequestConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except TransitionForbiddenError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 @router.post("/{request_id}/send-to-contractors")
 async def send_to_contractors(
     request_id: int,
+    expected_version: Optional[int] = Query(None, description="Версия заявки, которую видел пользователь"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Отправка заявки исполнителям"""
-    if current_user.role not in ["manager", "admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Только менеджеры могут отправлять заявки исполнителям"
-        )
-    
     workflow_service = get_request_workflow_service(db)
     
     try:
-        request = workflow_service.send_to_contractors(request_id, current_user.id)
+        request = workflow_service.send_to_contractors(
+            request_id, current_user.id, expected_version=expected_version, actor=Actor.from_user(current_user)
+        )
         return {"message": f"Заявка #{request_id} отправлена исполнителям", "request": RepairRequestResponse.from_orm(request)}
+    except RequestConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except TransitionForbiddenError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -244,46 +311,48 @@ async def send_to_contractors(
 async def assign_contractor(
     request_id: int,
     contractor_data: dict,
+    expected_version: Optional[int] = Query(None, description="Версия заявки, которую видел пользователь"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Назначение исполнителя на заявку"""
-    if current_user.role not in ["manager", "admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Только менеджеры могут назначать исполнителей"
-        )
-    
     workflow_service = get_request_workflow_service(db)
     
     try:
         request = workflow_service.assign_contractor(
             request_id,
             contractor_data.get("contractor_id"),
-            current_user.id
+            current_user.id,
+            expected_version=expected_version,
+            actor=Actor.from_user(current_user)
         )
         return {"message": f"Исполнитель назначен на заявку #{request_id}", "request": RepairRequestResponse.from_orm(request)}
+    except RequestConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except TransitionForbiddenError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 @router.post("/{request_id}/start-work")
 async def start_work(
     request_id: int,
+    expected_version: Optional[int] = Query(None, description="Версия заявки, которую видел пользователь"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Начало выполнения работ исполнителем"""
-    if current_user.role not in ["contractor", "admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Только исполнители могут начинать работы"
-        )
-    
     workflow_service = get_request_workflow_service(db)
     
     try:
-        request = workflow_service.start_work(request_id, current_user.id)
+        request = workflow_service.start_work(
+            request_id, current_user.id, expected_version=expected_version, actor=Actor.from_user(current_user)
+        )
         return {"message": f"Работы по заявке #{request_id} начаты", "request": RepairRequestResponse.from_orm(request)}
+    except RequestConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except TransitionForbiddenError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -291,25 +360,26 @@ async def start_work(
 async def complete_work(
     request_id: int,
     completion_data: dict,
+    expected_version: Optional[int] = Query(None, description="Версия заявки, которую видел пользователь"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Завершение работ исполнителем"""
-    if current_user.role not in ["contractor", "admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Только исполнители могут завершать работы"
-        )
-    
     workflow_service = get_request_workflow_service(db)
     
     try:
         request = workflow_service.complete_work(
             request_id,
             current_user.id,
-            completion_data.get("final_price")
+            completion_data.get("final_price"),
+            expected_version=expected_version,
+            actor=Actor.from_user(current_user)
         )
         return {"message": f"Работы по заявке #{request_id} завершены", "request": RepairRequestResponse.from_orm(request)}
+    except RequestConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except TransitionForbiddenError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -317,6 +387,7 @@ async def complete_work(
 async def cancel_request(
     request_id: int,
     cancellation_data: dict,
+    expected_version: Optional[int] = Query(None, description="Версия заявки, которую видел пользователь"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -327,9 +398,15 @@ async def cancel_request(
         request = workflow_service.cancel_request(
             request_id,
             current_user.id,
-            cancellation_data.get("reason", "")
+            cancellation_data.get("reason", ""),
+            expected_version=expected_version,
+            actor=Actor.from_user(current_user)
         )
         return {"message": f"Заявка #{request_id} отменена", "request": RepairRequestResponse.from_orm(request)}
+    except RequestConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except TransitionForbiddenError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
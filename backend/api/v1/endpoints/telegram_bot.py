@@ -2,19 +2,41 @@
 API endpoints для работы с Telegram ботом
 """
 
+import hmac
 import logging
 from typing import List, Dict, Any, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from sqlalchemy.orm import Session
 from database import get_db
-from models import User
+from models import TelegramBroadcast, User
 from api.v1.dependencies import get_current_user
+from services.telegram_api import telegram_config
+from services.telegram_updates import ingest_updates
+from services.telegram_broadcast import broadcast_failures, broadcast_status, cancel_broadcast
 from services.telegram_bot_service import get_telegram_bot_service, TelegramBotService
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+@router.post("/webhook")
+def receive_webhook_update(
+    update: Dict[str, Any],
+    x_telegram_bot_api_secret_token: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Прием обновления от Telegram (регистрация: telegram_updates_main.py --set-webhook)"""
+    secret = telegram_config.webhook_secret
+    if not secret or not hmac.compare_digest(x_telegram_bot_api_secret_token or "", secret):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Неверный секрет webhook"
+        )
+    
+    # Ошибка сохранения возвращает 500: Telegram повторит доставку, дубли отсекает update_id
+    ingest_updates(db, [update], source="webhook")
+    return {"ok": True}
+
 @router.post("/send-request/{request_id}")
 async def send_request_to_contractors(
     request_id: int,
@@ -217,11 +239,12 @@ async def send_bulk_notification(
     try:
         results = await telegram_service.send_bulk_notification_to_contractors(
             message=message,
-            contractor_ids=contractor_ids
+            contractor_ids=contractor_ids,
+            created_by=current_user.id
         )
         
         return {
-            "message": "Массовая отправка завершена",
+            "message": "Рассылка запущена" if results.get("success") else "Не удалось запустить рассылку",
             "results": results
         }
         
@@ -232,6 +255,53 @@ async def send_bulk_notification(
             detail=f"Ошибка массовой отправки: {str(e)}"
         )
 
+@router.get("/broadcasts/{broadcast_id}")
+async def get_broadcast_status(
+    broadcast_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Прогресс массовой рассылки"""
+    if current_user.role not in ["manager", "admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Только менеджеры могут просматривать рассылки"
+        )
+    
+    broadcast = db.get(TelegramBroadcast, broadcast_id)
+    if not broadcast:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Рассылка не найдена"
+        )
+    
+    return {
+        **broadcast_status(broadcast),
+        "errors": broadcast_failures(db, broadcast_id)
+    }
+
+@router.post("/broadcasts/{broadcast_id}/cancel")
+async def cancel_broadcast_sending(
+    broadcast_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Остановка массовой рассылки"""
+    if current_user.role not in ["manager", "admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Только менеджеры могут останавливать рассылки"
+        )
+    
+    broadcast = cancel_broadcast(db, broadcast_id)
+    if not broadcast:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Рассылка не найдена"
+        )
+    
+    return broadcast_status(broadcast)
+
 @router.get("/verified-contractors")
 async def get_verified_contractors_for_notifications(
     current_user: User = Depends(get_current_user),
@@ -4,14 +4,15 @@ API endpoints для работы с историей сообщений Telegra
 
 import logging
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session, lazyload
 from pydantic import BaseModel
 from datetime import datetime
 
 from database import get_db
-from models import User, TelegramUser, TelegramMessage
+from models import User, TelegramUser
 from api.v1.dependencies import get_current_user
+from services.telegram_chat_service import MAX_CONVERSATIONS_PAGE, MAX_HISTORY_PAGE, get_telegram_chat_service
 
 logger = logging.getLogger(__name__)
 
@@ -30,10 +31,14 @@ class ChatHistoryResponse(BaseModel):
     telegram_user: dict
     messages: List[TelegramMessageResponse]
     unread_count: int
+    has_more: bool = False  # Есть еще сообщения в направлении чтения (before_id/after_id)
 
 @router.get("/chat-history/{telegram_user_id}")
 async def get_chat_history(
     telegram_user_id: int,
+    limit: int = Query(100, ge=1, le=MAX_HISTORY_PAGE),
+    before_id: Optional[int] = Query(None, description="Сообщения старше указанного"),
+    after_id: Optional[int] = Query(None, description="Сообщения новее указанного"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -47,25 +52,29 @@ async def get_chat_history(
                 detail="Недостаточно прав для просмотра истории переписки"
             )
         
-        # Получаем пользователя Telegram
-        telegram_user = db.query(TelegramUser).filter(TelegramUser.id == telegram_user_id).first()
+        # Получаем пользователя Telegram (без загрузки всей переписки через relationship)
+        telegram_user = db.query(TelegramUser).options(lazyload(TelegramUser.messages)).filter(
+            TelegramUser.id == telegram_user_id
+        ).first()
         if not telegram_user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Пользователь Telegram не найден"
             )
         
-        # Получаем все сообщения с этим пользователем
-        messages = db.query(TelegramMessage).filter(
-            TelegramMessage.telegram_user_id == telegram_user_id
-        ).order_by(TelegramMessage.created_at.desc()).limit(100).all()
+        # Страница сообщений от новых к старым (горячая таблица и архив)
+        try:
+            history = get_telegram_chat_service(db).get_history(
+                telegram_user_id, limit=limit, before_id=before_id, after_id=after_id
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
         
-        # Подсчитываем непрочитанные сообщения (от пользователя к боту)
-        unread_count = db.query(TelegramMessage).filter(
-            TelegramMessage.telegram_user_id == telegram_user_id,
-            TelegramMessage.is_from_bot == False,
-            TelegramMessage.is_read == False
-        ).count()
+        # Непрочитанные сообщения (от пользователя к боту) - счетчик в telegram_users
+        unread_count = telegram_user.unread_count
         
         # Формируем ответ
         telegram_user_data = {
@@ -79,14 +88,14 @@ async def get_chat_history(
         }
         
         messages_data = []
-        for message in messages:
+        for message in history["messages"]:
             messages_data.append(TelegramMessageResponse(
-                id=message.id,
-                telegram_user_id=message.telegram_user_id,
-                message_text=message.message_text,
-                message_type=message.message_type,
-                is_from_bot=message.is_from_bot,
-                created_at=message.created_at
+                id=message["id"],
+                telegram_user_id=message["telegram_user_id"],
+                message_text=message["message_text"],
+                message_type=message["message_type"],
+                is_from_bot=message["is_from_bot"],
+                created_at=message["created_at"]
             ))
         
         logger.info(f"✅ Получена история переписки с пользователем {telegram_user.username}")
@@ -94,7 +103,8 @@ async def get_chat_history(
         return ChatHistoryResponse(
             telegram_user=telegram_user_data,
             messages=messages_data,
-            unread_count=unread_count
+            unread_count=unread_count,
+            has_more=history["has_more"]
         )
         
     except HTTPException:
@@ -122,14 +132,8 @@ async def mark_messages_read(
                 detail="Недостаточно прав для изменения статуса сообщений"
             )
         
-        # Отмечаем все непрочитанные сообщения от пользователя как прочитанные
-        updated_count = db.query(TelegramMessage).filter(
-            TelegramMessage.telegram_user_id == telegram_user_id,
-            TelegramMessage.is_from_bot == False,
-            TelegramMessage.is_read == False
-        ).update({"is_read": True})
-        
-        db.commit()
+        # Отмечаем все непрочитанные сообщения от пользователя как прочитанные (вместе со счетчиком)
+        updated_count = get_telegram_chat_service(db).mark_read(telegram_user_id)
         
         logger.info(f"✅ Отмечено {updated_count} сообщений как прочитанные для пользователя {telegram_user_id}")
         
@@ -159,25 +163,22 @@ async def get_unread_counts(
                 detail="Недостаточно прав для просмотра статистики сообщений"
             )
         
-        # Получаем всех пользователей Telegram с количеством непрочитанных сообщений
-        telegram_users = db.query(TelegramUser).filter(TelegramUser.is_active == True).all()
-        
-        unread_counts = []
-        for user in telegram_users:
-            unread_count = db.query(TelegramMessage).filter(
-                TelegramMessage.telegram_user_id == user.id,
-                TelegramMessage.is_from_bot == False,
-                TelegramMessage.is_read == False
-            ).count()
-            
-            if unread_count > 0:
-                unread_counts.append({
-                    "telegram_user_id": user.id,
-                    "username": user.username,
-                    "first_name": user.first_name,
-                    "last_name": user.last_name,
-                    "unread_count": unread_count
-                })
+        # Пользователи Telegram с непрочитанными сообщениями - одним запросом по счетчикам
+        telegram_users = db.query(
+            TelegramUser.id, TelegramUser.username, TelegramUser.first_name,
+            TelegramUser.last_name, TelegramUser.unread_count
+        ).filter(TelegramUser.is_active == True, TelegramUser.unread_count > 0).all()
+        
+        unread_counts = [
+            {
+                "telegram_user_id": user.id,
+                "username": user.username,
+                "first_name": user.first_name,
+                "last_name": user.last_name,
+                "unread_count": user.unread_count
+            }
+            for user in telegram_users
+        ]
         
         return {"unread_counts": unread_counts}
         
@@ -189,3 +190,29 @@ async def get_unread_counts(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Ошибка получения статистики непрочитанных сообщений"
         )
+
+@router.get("/conversations")
+async def get_conversations(
+    limit: int = Query(50, ge=1, le=MAX_CONVERSATIONS_PAGE),
+    before_at: Optional[datetime] = Query(None, description="next_before_at предыдущей страницы"),
+    before_id: Optional[int] = Query(None, description="next_before_id предыдущей страницы"),
+    unread_only: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Переписки с пользователями Telegram по последней активности (постранично)"""
+    
+    if current_user.role not in ["admin", "manager", "hr"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Недостаточно прав для просмотра переписки"
+        )
+    if (before_at is None) != (before_id is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="before_at и before_id передаются вместе"
+        )
+    
+    return get_telegram_chat_service(db).list_conversations(
+        limit=limit, before_at=before_at, before_id=before_id, unread_only=unread_only
+    )
@@ -220,6 +220,7 @@ class RepairRequestResponse(RepairRequestBase):
     updated_at: Optional[datetime] = None
     processed_at: Optional[datetime] = None
     assigned_at: Optional[datetime] = None
+    version: Optional[int] = None  # Для оптимистичной проверки при смене статуса (expected_version)
     
     # Связанные объекты
     customer: Optional[CustomerProfileResponse] = None
@@ -227,6 +228,41 @@ class RepairRequestResponse(RepairRequestBase):
     assigned_contractor: Optional[UserResponse] = None
     # responses: Optional[List['ContractorResponseResponse']] = None  # Временно отключено из-за проблем с forward references
 
+# Массовые переходы workflow
+class WorkflowAction(str, Enum):
+    ASSIGN_MANAGER = "assign_manager"
+    CLARIFY = "clarify"
+    SEND_TO_CONTRACTORS = "send_to_contractors"
+    ASSIGN_CONTRACTOR = "assign_contractor"
+    CANCEL = "cancel"
+
+class BulkTransitionItem(BaseModel):
+    class Config:
+        use_enum_values = True
+
+    request_id: int
+    action: WorkflowAction
+    expected_version: Optional[int] = None
+    clarification_details: Optional[str] = None  # clarify
+    contractor_id: Optional[int] = None  # assign_contractor
+    reason: Optional[str] = Field(None, max_length=1000)  # cancel
+
+class BulkTransitionRequest(BaseModel):
+    items: List[BulkTransitionItem] = Field(..., min_items=1, max_items=200)
+
+class BulkTransitionResult(BaseModel):
+    request_id: int
+    action: str
+    success: bool
+    status: Optional[str] = None
+    version: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkTransitionResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkTransitionResult]
+
 # Отклики исполнителей
 class ContractorResponseBase(BaseModel):
     proposed_price: Optional[int] = Field(None, ge=0)
@@ -0,0 +1,49 @@
+"""
+Перенос старой переписки Telegram в архив (запускается по cron, например раз в сутки)
+
+    python archive_telegram_messages.py                  # старше TELEGRAM_HISTORY_HOT_DAYS
+    python archive_telegram_messages.py --days 30 --batch-size 5000
+    python archive_telegram_messages.py --recount        # пересчитать счетчики переписок
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__))))
+
+from database import SessionLocal
+from services.telegram_api import telegram_config
+from services.telegram_chat_service import TelegramChatService
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Перенос старой переписки Telegram в архив")
+    parser.add_argument("--days", type=int, default=telegram_config.history_hot_days,
+                        help="Переносить прочитанные сообщения старше указанного числа дней")
+    parser.add_argument("--batch-size", type=int, default=telegram_config.history_archive_batch_size)
+    parser.add_argument("--recount", action="store_true",
+                        help="Пересчитать unread_count и last_message_at после переноса")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        service = TelegramChatService(db)
+        moved = service.archive_messages(older_than_days=args.days, batch_size=args.batch_size)
+        print(f"✅ Перенесено в архив сообщений: {moved}")
+        if args.recount:
+            print(f"✅ Пересчитаны счетчики переписок: {service.recount_unread()}")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Ошибка переноса переписки в архив: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
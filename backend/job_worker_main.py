@@ -0,0 +1,92 @@
+"""
+Главный файл для запуска воркера фоновых задач (background_jobs)
+
+    python job_worker_main.py              # JOBS_WORKERS потоков
+    python job_worker_main.py --once       # выполнить готовые задачи и выйти
+    python job_worker_main.py --stats      # количество задач по типам и статусам, писем по статусам
+"""
+import argparse
+import logging
+import signal
+import threading
+from database import SessionLocal
+from kafka_events.metrics import serve_metrics
+from services.email_outbox import outbox_stats
+from services.job_queue import JobWorker, job_queue_config, queue_stats
+from services.python_email_service import python_email_service
+import services.workflow_jobs  # noqa: F401 - регистрация обработчиков задач
+import services.telegram_broadcast  # noqa: F401
+import services.blob_store  # noqa: F401
+import services.avatar_images  # noqa: F401 - удаление размеров аватара вместе с оригиналом
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(threadName)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+
+def print_stats():
+    """Вывод состояния очереди"""
+    with SessionLocal() as db:
+        stats = queue_stats(db)
+        emails = outbox_stats(db)
+    if emails:
+        print(f"{'email_outbox':<40} " + "  ".join(f"{status}={count}" for status, count in sorted(emails.items())))
+    if not stats:
+        print("📭 Очередь пуста")
+        return
+    for job_type, counts in sorted(stats.items()):
+        print(f"{job_type:<40} " + "  ".join(f"{status}={count}" for status, count in sorted(counts.items())))
+
+
+def main():
+    """Главная функция"""
+    parser = argparse.ArgumentParser(description="Воркер фоновых задач")
+    parser.add_argument("--workers", type=int, default=job_queue_config.workers,
+                        help="Количество потоков (JOBS_WORKERS)")
+    parser.add_argument("--once", action="store_true", help="Выполнить готовые задачи и завершиться")
+    parser.add_argument("--stats", action="store_true", help="Показать состояние очереди")
+    args = parser.parse_args()
+
+    if args.stats:
+        print_stats()
+        return
+
+    job_queue_config.workers = max(args.workers, 1)
+    worker = JobWorker()
+
+    if args.once:
+        worker.recover_stale()
+        total = 0
+        while True:
+            processed = worker.run_once()
+            total += processed
+            if not processed:
+                break
+        logger.info(f"✅ Выполнено задач: {total}")
+        python_email_service.close()
+        return
+
+    # Метрики задач для Prometheus
+    if job_queue_config.metrics_port:
+        serve_metrics(job_queue_config.metrics_port)
+
+    stop = threading.Event()
+
+    def handle_signal(signum, frame):
+        logger.info(f"🛑 Получен сигнал {signum}, завершение работы...")
+        stop.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    worker.start()
+    stop.wait()
+    worker.stop(timeout=job_queue_config.shutdown_timeout_seconds)
+    python_email_service.close()
+
+if __name__ == "__main__":
+    main()
@@ -7,19 +7,29 @@ from .kafka_events import (
     BaseEvent, EventType,
     RequestCreatedEvent, RequestUpdatedEvent, RequestCancelledEvent,
     WorkflowManagerAssignedEvent, WorkflowContractorAssignedEvent, WorkflowWorkCompletedEvent,
-    NotificationTelegramSentEvent, NotificationEmailSentEvent,
+    WorkflowStatusChangedEvent, NotificationTelegramSentEvent, TelegramMessageReceivedEvent,
+    NotificationEmailSentEvent,
     SecurityContractorVerifiedEvent, AuditUserActionEvent
 )
 from .kafka_producer import KafkaEventProducer, kafka_producer
 from .kafka_consumer import KafkaEventConsumer
+from .idempotency import EventDeduplicator
+from .transport import (
+    ProducerTransport, ConsumerTransport, TransportError, TransportTimeoutError,
+    create_producer_transport, create_consumer_transport, get_memory_log
+)
 
 __all__ = [
     'kafka_config', 'KafkaConfig',
     'BaseEvent', 'EventType',
     'RequestCreatedEvent', 'RequestUpdatedEvent', 'RequestCancelledEvent',
     'WorkflowManagerAssignedEvent', 'WorkflowContractorAssignedEvent', 'WorkflowWorkCompletedEvent',
-    'NotificationTelegramSentEvent', 'NotificationEmailSentEvent',
+    'WorkflowStatusChangedEvent',
+    'NotificationTelegramSentEvent', 'TelegramMessageReceivedEvent', 'NotificationEmailSentEvent',
     'SecurityContractorVerifiedEvent', 'AuditUserActionEvent',
     'KafkaEventProducer', 'kafka_producer',
-    'KafkaEventConsumer'
+    'KafkaEventConsumer',
+    'EventDeduplicator',
+    'ProducerTransport', 'ConsumerTransport', 'TransportError', 'TransportTimeoutError',
+    'create_producer_transport', 'create_consumer_transport', 'get_memory_log'
 ]
@@ -19,6 +19,7 @@ class AnalyticsEventType(str, Enum):
     CONTRACTOR_ASSIGNED = "contractor_assigned"
     PAGE_VIEW = "page_view"
     ACTION_PERFORMED = "action_performed"
+    AGGREGATED_COUNTS = "aggregated_counts"
 
 
 class UserLoginEvent(BaseEvent):
@@ -105,3 +106,15 @@ class ActionPerformedEvent(BaseEvent):
     target_entity_type: Optional[str] = None  # request, user, contractor, etc.
     target_entity_id: Optional[int] = None
     additional_data: Optional[Dict[str, Any]] = None
+
+
+class AggregatedCountsEvent(BaseEvent):
+    """Агрегированные счетчики высокочастотных событий за временное окно"""
+    event_type: AnalyticsEventType = AnalyticsEventType.AGGREGATED_COUNTS
+    source_event_type: AnalyticsEventType  # page_view, action_performed, user_login
+    user_role: str
+    dimension: str  # page_path, категория/имя действия или способ входа
+    window_start: datetime
+    window_seconds: int = 60
+    count: int
+    unique_users: int
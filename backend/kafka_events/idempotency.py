@@ -0,0 +1,164 @@
+"""
+Идемпотентная обработка событий Kafka
+
+Kafka гарантирует доставку "как минимум один раз": после ребалансировки или
+перезапуска consumer может повторно получить уже обработанное событие.
+EventDeduplicator хранит отметки об обработанных событиях по BaseEvent.event_id
+в таблице processed_events (с очисткой по TTL), а перед ней держит in-memory LRU,
+чтобы повторная проверка стоила поиска в словаре, а не запроса к БД.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import ProcessedEvent
+from .kafka_config import kafka_config
+
+logger = logging.getLogger(__name__)
+
+
+class _LRUCache:
+    """Потокобезопасный LRU с ограниченным временем жизни записей"""
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._items: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            expires_at = self._items.get(key)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._items[key]
+                return False
+            self._items.move_to_end(key)
+            return True
+
+    def add(self, key: str):
+        with self._lock:
+            self._items[key] = time.monotonic() + self.ttl_seconds
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class EventDeduplicator:
+    """Хранилище отметок об обработанных событиях для одной consumer group"""
+
+    def __init__(
+        self,
+        consumer_group: str,
+        session_factory: Optional[Callable[[], Session]] = None,
+        ttl_hours: Optional[int] = None,
+        cache_size: Optional[int] = None,
+    ):
+        if session_factory is None:
+            from database import SessionLocal
+            session_factory = SessionLocal
+
+        self.consumer_group = consumer_group
+        self.session_factory = session_factory
+        self.ttl = timedelta(hours=ttl_hours or kafka_config.dedup_ttl_hours)
+        self._cache = _LRUCache(
+            max_size=cache_size or kafka_config.dedup_cache_size,
+            ttl_seconds=self.ttl.total_seconds(),
+        )
+
+    def is_processed(self, event_id: str) -> bool:
+        """
+        Проверка, было ли событие уже обработано этой группой
+
+        Args:
+            event_id: ID события
+
+        Returns:
+            bool: True если событие уже обработано и его нужно пропустить
+        """
+        if not event_id:
+            return False
+        if event_id in self._cache:
+            return True
+
+        try:
+            with self.session_factory() as db:
+                found = db.query(ProcessedEvent.id).filter(
+                    ProcessedEvent.consumer_group == self.consumer_group,
+                    ProcessedEvent.event_id == event_id,
+                    ProcessedEvent.processed_at >= datetime.now(timezone.utc) - self.ttl,
+                ).first() is not None
+        except Exception as e:
+            # Недоступность журнала не должна останавливать обработку событий
+            logger.error(f"❌ Ошибка проверки события {event_id} в processed_events: {e}")
+            return False
+
+        if found:
+            self._cache.add(event_id)
+        return found
+
+    def mark_processed(self, event_id: str, event_type: Optional[str] = None) -> bool:
+        """
+        Отметка события как успешно обработанного
+
+        Args:
+            event_id: ID события
+            event_type: Тип события (для диагностики)
+
+        Returns:
+            bool: True если отметка сохранена (или уже существовала)
+        """
+        if not event_id:
+            return False
+        self._cache.add(event_id)
+
+        try:
+            with self.session_factory() as db:
+                db.add(ProcessedEvent(
+                    event_id=event_id,
+                    consumer_group=self.consumer_group,
+                    event_type=event_type,
+                    processed_at=datetime.now(timezone.utc),
+                ))
+                try:
+                    db.commit()
+                except IntegrityError:
+                    # Событие уже отмечено параллельным consumer'ом
+                    db.rollback()
+            return True
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения отметки о событии {event_id}: {e}")
+            return False
+
+    def cleanup_expired(self) -> int:
+        """
+        Удаление отметок старше TTL
+
+        Returns:
+            int: Количество удаленных записей
+        """
+        cutoff = datetime.now(timezone.utc) - self.ttl
+        try:
+            with self.session_factory() as db:
+                deleted = db.query(ProcessedEvent).filter(
+                    ProcessedEvent.consumer_group == self.consumer_group,
+                    ProcessedEvent.processed_at < cutoff,
+                ).delete(synchronize_session=False)
+                db.commit()
+        except Exception as e:
+            logger.error(f"❌ Ошибка очистки processed_events: {e}")
+            return 0
+
+        if deleted:
+            logger.info(f"🧹 Удалено {deleted} устаревших отметок processed_events для {self.consumer_group}")
+        return deleted
@@ -11,6 +11,13 @@ class KafkaConfig(BaseSettings):
     # Включение/отключение Kafka
     enabled: bool = False
     
+    # Транспорт событий: kafka, memory (in-process лог), sqlite (файловый лог)
+    transport: str = "kafka"
+    transport_sqlite_path: str = "kafka_events.sqlite3"
+
+    # Формат значений записей: json или msgpack (компактный бинарный со schema id)
+    serialization: str = "json"
+
     # Брокеры Kafka
     bootstrap_servers: str = "localhost:9092,localhost:9093,localhost:9094"
     
@@ -33,7 +40,23 @@ class KafkaConfig(BaseSettings):
     consumer_enable_auto_commit: bool = True
     consumer_auto_commit_interval_ms: int = 1000
     consumer_max_poll_records: int = 500
-    
+
+    # Порт HTTP-эндпоинта /metrics процесса consumer'ов (0 - отключен);
+    # при нескольких воркерах воркер N слушает metrics_port + N
+    metrics_port: int = 0
+
+    # Процессы-воркеры kafka_service_main (каждый - отдельный consumer группы)
+    workers: int = 1
+    worker_shutdown_timeout_seconds: int = 30  # Время на дообработку пакета при SIGTERM
+    worker_restart_backoff_seconds: float = 1.0  # Задержка перезапуска упавшего воркера
+    worker_max_restart_backoff_seconds: float = 60.0
+
+    # Идемпотентная обработка событий
+    dedup_enabled: bool = True
+    dedup_ttl_hours: int = 72  # Сколько хранить отметки об обработанных событиях
+    dedup_cache_size: int = 10000  # Размер in-memory LRU перед таблицей processed_events
+    dedup_cleanup_interval_seconds: int = 3600
+
     # Топики
     topics: Dict[str, Dict[str, Any]] = {
         "request-events": {
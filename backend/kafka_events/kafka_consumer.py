@@ -1,62 +1,63 @@
 """
 Kafka Consumer для обработки событий
 """
-import json
 import logging
 import signal
-import sys
-from typing import Dict, Any, Callable, Optional
-from kafka import KafkaConsumer
-from kafka.errors import KafkaError
+import threading
+import time
+from contextlib import nullcontext
+from typing import Dict, Any, Callable, ContextManager, Optional
 from .kafka_config import kafka_config
 from .kafka_events import BaseEvent, EventType
+from .idempotency import EventDeduplicator
+from .metrics import metrics
+from .serialization import decode_value
+from .transport import ConsumerTransport, create_consumer_transport
 
 logger = logging.getLogger(__name__)
 
 class KafkaEventConsumer:
     """Consumer для обработки событий из Kafka"""
     
-    def __init__(self, group_id: str, topics: list):
+    def __init__(
+        self,
+        group_id: str,
+        topics: list,
+        deduplicator: Optional[EventDeduplicator] = None,
+        transport: Optional[ConsumerTransport] = None,
+        batch_scope: Optional[Callable[[], ContextManager]] = None
+    ):
+        """
+        Args:
+            group_id: ID consumer group
+            topics: Топики для подписки
+            deduplicator: Хранилище отметок об обработанных событиях
+            transport: Транспорт (по умолчанию - по KAFKA_TRANSPORT)
+            batch_scope: Фабрика контекста, в котором обрабатывается каждый
+                полученный пакет (например, короткоживущая сессия БД)
+        """
         self.group_id = group_id
         self.topics = topics
-        self.consumer = None
+        self.consumer = transport
         self.event_handlers: Dict[EventType, Callable] = {}
         self.running = False
+        self.deduplicator = deduplicator
+        self.batch_scope = batch_scope or nullcontext
+        self._last_dedup_cleanup = time.monotonic()
         
-        # Обработка сигналов для graceful shutdown
-        signal.signal(signal.SIGINT, self._signal_handler)
-        signal.signal(signal.SIGTERM, self._signal_handler)
+        # Обработка сигналов для graceful shutdown (доступна только в главном потоке)
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self._signal_handler)
+            signal.signal(signal.SIGTERM, self._signal_handler)
     
     def _initialize_consumer(self):
-        """Инициализация Kafka consumer"""
+        """Инициализация транспорта consumer"""
         try:
-            consumer_config = {
-                'bootstrap_servers': kafka_config.bootstrap_servers.split(','),
-                'group_id': self.group_id,
-                'auto_offset_reset': kafka_config.consumer_auto_offset_reset,
-                'enable_auto_commit': kafka_config.consumer_enable_auto_commit,
-                'auto_commit_interval_ms': kafka_config.consumer_auto_commit_interval_ms,
-                'max_poll_records': kafka_config.consumer_max_poll_records,
-                'value_deserializer': lambda m: json.loads(m.decode('utf-8')),
-                'key_deserializer': lambda m: m.decode('utf-8') if m else None,
-                'session_timeout_ms': 30000,
-                'heartbeat_interval_ms': 10000,
-                'max_poll_interval_ms': 300000,
-            }
-            
-            # Добавляем настройки безопасности если нужно
-            if kafka_config.security_protocol != "PLAINTEXT":
-                consumer_config.update({
-                    'security_protocol': kafka_config.security_protocol,
-                    'sasl_mechanism': kafka_config.sasl_mechanism,
-                    'sasl_plain_username': kafka_config.sasl_username,
-                    'sasl_plain_password': kafka_config.sasl_password,
-                })
-            
-            self.consumer = KafkaConsumer(**consumer_config)
-            self.consumer.subscribe(self.topics)
-            
-            logger.info(f"✅ Kafka Consumer инициализирован для топиков: {self.topics}")
+            self.consumer = create_consumer_transport(self.group_id, self.topics)
+            logger.info(
+                f"✅ Kafka Consumer инициализирован для топиков: {self.topics} "
+                f"(транспорт: {kafka_config.transport})"
+            )
             
         except Exception as e:
             logger.error(f"❌ Ошибка инициализации Kafka Consumer: {e}")
@@ -89,8 +90,8 @@ class KafkaEventConsumer:
             bool: True если сообщение успешно обработано
         """
         try:
-            # Парсим событие
-            event_data = message.value
+            # Декодируем событие (формат определяется по заголовку значения)
+            event_data = decode_value(message.value)
             event_type = EventType(event_data.get('event_type'))
             
             logger.info(
@@ -104,10 +105,31 @@ class KafkaEventConsumer:
                 logger.warning(f"⚠️ Обработчик для события {event_type} не найден")
                 return True  # Пропускаем неизвестные события
             
+            # Пропускаем повторно доставленные события
+            event_id = event_data.get('event_id')
+            if self.deduplicator and self.deduplicator.is_processed(event_id):
+                logger.info(f"⏭️ Событие {event_type} ({event_id}) уже обработано, пропускаем")
+                metrics.inc("event_handler_events_total", group=self.group_id, event_type=event_type.value, result="duplicate")
+                return True
+            
             # Выполняем обработку
-            success = handler(event_data)
+            started = time.perf_counter()
+            success = False
+            try:
+                success = handler(event_data)
+            finally:
+                metrics.observe(
+                    "event_handler_duration_seconds", time.perf_counter() - started,
+                    group=self.group_id, event_type=event_type.value
+                )
+                metrics.inc(
+                    "event_handler_events_total", group=self.group_id, event_type=event_type.value,
+                    result="success" if success else "failed"
+                )
             
             if success:
+                if self.deduplicator:
+                    self.deduplicator.mark_processed(event_id, event_type.value)
                 logger.info(f"✅ Событие {event_type} успешно обработано")
             else:
                 logger.error(f"❌ Ошибка обработки события {event_type}")
@@ -118,6 +140,38 @@ class KafkaEventConsumer:
             logger.error(f"❌ Ошибка обработки сообщения: {e}")
             return False
     
+    def poll_once(self, timeout_ms: int = 1000) -> int:
+        """
+        Один цикл опроса: получение пакета сообщений и их обработка
+        
+        Args:
+            timeout_ms: Максимальное время ожидания новых сообщений
+        
+        Returns:
+            int: Количество полученных сообщений
+        """
+        if not self.consumer:
+            self._initialize_consumer()
+        
+        message_batch = self.consumer.poll(timeout_ms=timeout_ms)
+        if not message_batch:
+            return 0
+        processed = 0
+        
+        # Обрабатываем каждое сообщение (полученный пакет дорабатывается
+        # целиком даже при остановке, чтобы не терять уже выданные записи)
+        with self.batch_scope():
+            for topic_partition, messages in message_batch.items():
+                for message in messages:
+                    success = self._process_message(message)
+                    processed += 1
+                    
+                    if not success:
+                        # Здесь можно добавить логику для Dead Letter Queue
+                        logger.error(f"❌ Сообщение не обработано, отправляем в DLQ")
+        
+        return processed
+    
     def start_consuming(self):
         """Запуск потребления сообщений"""
         if not self.consumer:
@@ -128,23 +182,8 @@ class KafkaEventConsumer:
         
         try:
             while self.running:
-                # Получаем сообщения
-                message_batch = self.consumer.poll(timeout_ms=1000)
-                
-                if not message_batch:
-                    continue
-                
-                # Обрабатываем каждое сообщение
-                for topic_partition, messages in message_batch.items():
-                    for message in messages:
-                        if not self.running:
-                            break
-                        
-                        success = self._process_message(message)
-                        
-                        if not success:
-                            # Здесь можно добавить логику для Dead Letter Queue
-                            logger.error(f"❌ Сообщение не обработано, отправляем в DLQ")
+                self._maybe_cleanup_dedup()
+                self.poll_once(timeout_ms=1000)
                 
         except KeyboardInterrupt:
             logger.info("🛑 Получен сигнал прерывания")
@@ -153,6 +192,16 @@ class KafkaEventConsumer:
         finally:
             self.stop_consuming()
     
+    def _maybe_cleanup_dedup(self):
+        """Периодическая очистка устаревших отметок об обработанных событиях"""
+        if not self.deduplicator:
+            return
+        now = time.monotonic()
+        if now - self._last_dedup_cleanup < kafka_config.dedup_cleanup_interval_seconds:
+            return
+        self._last_dedup_cleanup = now
+        self.deduplicator.cleanup_expired()
+    
     def stop_consuming(self):
         """Остановка потребления сообщений"""
         self.running = False
@@ -2,7 +2,7 @@
 Схемы событий Kafka
 """
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional, Dict, Any, List
 from pydantic import BaseModel, Field
 from enum import Enum
@@ -28,6 +28,7 @@ class EventType(str, Enum):
     NOTIFICATION_TELEGRAM_SENT = "notification.telegram.sent"
     NOTIFICATION_SMS_SENT = "notification.sms.sent"
     NOTIFICATION_FAILED = "notification.failed"
+    NOTIFICATION_TELEGRAM_MESSAGE_RECEIVED = "notification.telegram.message_received"
     
     # Security Events
     SECURITY_CONTRACTOR_VERIFIED = "security.contractor_verified"
@@ -51,7 +52,7 @@ class BaseEvent(BaseModel):
     """Базовый класс для всех событий"""
     event_type: EventType
     event_id: str = Field(default_factory=lambda: str(uuid.uuid4()), description="Уникальный ID события")
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     version: str = "1.0"
     source: str = "agregator-service"
     correlation_id: Optional[str] = None
@@ -114,6 +115,16 @@ class WorkflowWorkCompletedEvent(BaseEvent):
     completion_data: Dict[str, Any]
     completion_notes: Optional[str] = None
 
+class WorkflowStatusChangedEvent(BaseEvent):
+    """Событие перехода заявки в другой статус (журнал request_status_events)"""
+    event_type: EventType = EventType.WORKFLOW_STATUS_CHANGED
+    request_id: int
+    from_status: Optional[str] = None
+    to_status: str
+    changed_by: Optional[int] = None
+    reason: Optional[str] = None
+    occurred_at: datetime
+
 class NotificationTelegramSentEvent(BaseEvent):
     """Событие отправки Telegram уведомления"""
     event_type: EventType = EventType.NOTIFICATION_TELEGRAM_SENT
@@ -125,6 +136,17 @@ class NotificationTelegramSentEvent(BaseEvent):
     delivery_status: str = "sent"
     telegram_message_id: Optional[int] = None
 
+class TelegramMessageReceivedEvent(BaseEvent):
+    """Событие нового входящего сообщения боту (прием обновлений Telegram)"""
+    event_type: EventType = EventType.NOTIFICATION_TELEGRAM_MESSAGE_RECEIVED
+    message_id: int
+    telegram_user_id: int
+    telegram_id: int
+    username: Optional[str] = None
+    message_type: str
+    preview: str
+    received_at: datetime
+
 class NotificationEmailSentEvent(BaseEvent):
     """Событие отправки Email уведомления"""
     event_type: EventType = EventType.NOTIFICATION_EMAIL_SENT
@@ -1,56 +1,33 @@
 """
 Kafka Producer для отправки событий
 """
-import json
 import logging
 import uuid
 from typing import Dict, Any, Optional
-from datetime import datetime
-from kafka import KafkaProducer
-from kafka.errors import KafkaError, KafkaTimeoutError
 from .kafka_config import kafka_config
 from .kafka_events import BaseEvent
+from .serialization import encode_event
+from .transport import ProducerTransport, TransportError, TransportTimeoutError, create_producer_transport
 
 logger = logging.getLogger(__name__)
 
 class KafkaEventProducer:
     """Producer для отправки событий в Kafka"""
     
-    def __init__(self):
-        self.producer = None
-        self._initialize_producer()
+    def __init__(self, transport: Optional[ProducerTransport] = None):
+        self.producer = transport
+        if self.producer is None:
+            self._initialize_producer()
     
     def _initialize_producer(self):
-        """Инициализация Kafka producer"""
+        """Инициализация транспорта producer"""
         if not kafka_config.enabled:
             logger.info("Kafka отключен в конфигурации")
             return
             
         try:
-            producer_config = {
-                'bootstrap_servers': kafka_config.bootstrap_servers.split(','),
-                'acks': kafka_config.producer_acks,
-                'retries': kafka_config.producer_retries,
-                'batch_size': kafka_config.producer_batch_size,
-                'linger_ms': kafka_config.producer_linger_ms,
-                'compression_type': kafka_config.producer_compression_type,
-                'value_serializer': lambda v: json.dumps(v, default=str).encode('utf-8'),
-                'key_serializer': lambda k: str(k).encode('utf-8') if k else None,
-                'request_timeout_ms': 30000,
-                'metadata_max_age_ms': 300000,
-            }
-            
-            # Добавляем настройки безопасности если нужно
-            if kafka_config.security_protocol != "PLAINTEXT":
-                producer_config.update({
-                    'security_protocol': kafka_config.security_protocol,
-                    'sasl_mechanism': kafka_config.sasl_mechanism,
-                    'sasl_plain_username': kafka_config.sasl_username,
-                    'sasl_plain_password': kafka_config.sasl_password,
-                })
-            
-            self.producer = KafkaProducer(**producer_config)
-            logger.info("✅ Kafka Producer инициализирован")
+            self.producer = create_producer_transport()
+            logger.info(f"✅ Kafka Producer инициализирован (транспорт: {kafka_config.transport})")
             
         except Exception as e:
             logger.error(f"❌ Ошибка инициализации Kafka Producer: {e}")
@@ -73,12 +50,16 @@ class KafkaEventProducer:
             partition: Конкретная партиция (опционально)
         
         Returns:
-            bool: True если событие успешно отправлено
+            bool: True если событие успешно отправлено; False - ошибка отправки
+            или Kafka отключен (события без брокера - KAFKA_TRANSPORT=memory/sqlite)
         """
         try:
-            if not kafka_config.enabled:
-                logger.info(f"Kafka отключен, событие {event.event_type} не отправлено")
-                return True
+            if not kafka_config.enabled and not self.producer:
+                # Событие теряется: вызывающий код должен узнать об этом так же, как об ошибке брокера
+                logger.warning(
+                    f"⚠️ Kafka отключен (KAFKA_ENABLED=false), событие {event.event_type} в {topic} не отправлено"
+                )
+                return False
                 
             if not self.producer:
                 logger.error("Kafka producer не инициализирован")
@@ -90,23 +71,21 @@ class KafkaEventProducer:
             if not event.correlation_id:
                 event.correlation_id = str(uuid.uuid4())
             
-            # Подготавливаем данные для отправки
-            event_data = event.dict()
+            # Кодируем событие (JSON или бинарный формат со schema id)
+            event_data = encode_event(event)
             
             # Определяем ключ для партиционирования
             partition_key = key or self._get_partition_key(event)
             
-            # Отправляем событие
-            future = self.producer.send(
+            # Отправляем событие и ждем подтверждения
+            record_metadata = self.producer.send(
                 topic=topic,
                 value=event_data,
                 key=partition_key,
-                partition=partition
+                partition=partition,
+                timeout=10
             )
             
-            # Ждем подтверждения
-            record_metadata = future.get(timeout=10)
-            
             logger.info(
                 f"✅ Событие {event.event_type} отправлено в топик {topic}, "
                 f"партиция {record_metadata.partition}, "
@@ -115,10 +94,10 @@ class KafkaEventProducer:
             
             return True
             
-        except KafkaTimeoutError:
+        except TransportTimeoutError:
             logger.error(f"⏰ Таймаут отправки события {event.event_type} в топик {topic}")
             return False
-        except KafkaError as e:
+        except TransportError as e:
             logger.error(f"❌ Kafka ошибка при отправке события {event.event_type}: {e}")
             return False
         except Exception as e:
@@ -154,6 +133,9 @@ class KafkaEventProducer:
         """
         Публикация пакета событий
         
+        Все события передаются транспорту одним пакетом, подтверждения
+        ожидаются один раз на весь пакет.
+        
         Args:
             events: Список кортежей (topic, event, key)
         
@@ -161,12 +143,40 @@ class KafkaEventProducer:
             Dict[str, int]: Статистика отправки
         """
         results = {"success": 0, "failed": 0}
+        if not events:
+            return results
         
+        if not kafka_config.enabled and not self.producer:
+            logger.warning(f"⚠️ Kafka отключен (KAFKA_ENABLED=false), пакет из {len(events)} событий не отправлен")
+            results["failed"] = len(events)
+            return results
+        
+        if not self.producer:
+            logger.error("Kafka producer не инициализирован")
+            results["failed"] = len(events)
+            return results
+        
+        records = []
         for topic, event, key in events:
-            if self.publish_event(topic, event, key):
-                results["success"] += 1
-            else:
+            if not event.event_id:
+                event.event_id = str(uuid.uuid4())
+            if not event.correlation_id:
+                event.correlation_id = str(uuid.uuid4())
+            records.append((topic, encode_event(event), key or self._get_partition_key(event), None))
+        
+        try:
+            sent = self.producer.send_batch(records, timeout=10)
+        except Exception as e:
+            logger.error(f"❌ Ошибка пакетной отправки {len(records)} событий: {e}")
+            results["failed"] = len(records)
+            return results
+        
+        for (topic, event, _), result in zip(events, sent):
+            if isinstance(result, Exception):
                 results["failed"] += 1
+                logger.error(f"❌ Kafka ошибка при отправке события {event.event_type} в топик {topic}: {result}")
+            else:
+                results["success"] += 1
         
         logger.info(f"📊 Пакетная отправка завершена: {results}")
         return results
@@ -174,7 +184,6 @@ class KafkaEventProducer:
     def close(self):
         """Закрытие producer"""
         if self.producer:
-            self.producer.flush()
             self.producer.close()
             logger.info("🔒 Kafka Producer закрыт")
 
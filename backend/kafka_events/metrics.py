@@ -0,0 +1,172 @@
+"""
+Метрики обработки событий в формате Prometheus
+
+KafkaEventConsumer записывает сюда время работы обработчиков и их результаты.
+Процесс consumer'а отдает метрики по HTTP (KAFKA_METRICS_PORT), экспортер лагов
+(scripts/monitor_kafka.py) использует тот же формат и тот же HTTP-сервер.
+"""
+import bisect
+import logging
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы времени обработки (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(**labels) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Dict[str, str]] = None) -> str:
+    items = list(labels) + sorted((extra or {}).items())
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in items) + "}"
+
+
+def format_metric(name: str, value: float, **labels) -> str:
+    """Одна строка метрики в текстовом формате Prometheus"""
+    return f"{name}{_format_labels(_labels(**labels))} {value}"
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин"""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля по верхней границе корзины"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+    def render(self, name: str, labels: Labels) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labels, {'le': str(bound)})} {cumulative}")
+        lines.append(f"{name}_bucket{_format_labels(labels, {'le': '+Inf'})} {self.count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {self.sum}")
+        lines.append(f"{name}_count{_format_labels(labels)} {self.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Потокобезопасное хранилище счетчиков и гистограмм"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = defaultdict(lambda: defaultdict(float))
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = defaultdict(dict)
+        self._help: Dict[str, Tuple[str, str]] = {}
+
+    def describe(self, name: str, metric_type: str, help_text: str):
+        self._help[name] = (metric_type, help_text)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        with self._lock:
+            self._counters[name][_labels(**labels)] += value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _labels(**labels)
+        with self._lock:
+            histogram = self._histograms[name].get(key)
+            if histogram is None:
+                histogram = self._histograms[name][key] = Histogram()
+            histogram.observe(value)
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        return self._histograms.get(name, {}).get(_labels(**labels))
+
+    def histograms(self, name: str) -> Dict[Labels, Histogram]:
+        with self._lock:
+            return dict(self._histograms.get(name, {}))
+
+    def counter(self, name: str, **labels) -> float:
+        return self._counters.get(name, {}).get(_labels(**labels), 0)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in self._counters.items():
+                lines.extend(self._header(name))
+                lines.extend(f"{name}{_format_labels(labels)} {value}" for labels, value in series.items())
+            for name, series in self._histograms.items():
+                lines.extend(self._header(name))
+                for labels, histogram in series.items():
+                    lines.extend(histogram.render(name, labels))
+        return "\n".join(lines) + "\n"
+
+    def _header(self, name: str) -> List[str]:
+        if name not in self._help:
+            return []
+        metric_type, help_text = self._help[name]
+        return [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+
+
+# Метрики процесса (обработчики событий, транспорт и т.д.)
+metrics = MetricsRegistry()
+metrics.describe("event_handler_duration_seconds", "histogram", "Время выполнения обработчика события")
+metrics.describe("event_handler_events_total", "counter", "Количество обработанных событий по результату")
+
+
+def serve_metrics(port: int, render: Callable[[], str] = metrics.render, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    Запуск HTTP-сервера с эндпоинтом /metrics в фоновом потоке
+
+    Args:
+        port: Порт
+        render: Функция, возвращающая метрики в текстовом формате Prometheus
+        host: Адрес для прослушивания
+
+    Returns:
+        ThreadingHTTPServer: Запущенный сервер (остановка через shutdown())
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            try:
+                body = render().encode("utf-8")
+            except Exception as e:
+                logger.error(f"❌ Ошибка формирования метрик: {e}")
+                self.send_error(500)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"📈 Метрики доступны на http://{host}:{server.server_address[1]}/metrics")
+    return server
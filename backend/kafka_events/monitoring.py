@@ -0,0 +1,219 @@
+"""
+Мониторинг лагов и пропускной способности consumer group
+
+OffsetsReader получает конечные смещения партиций и смещения, подтвержденные
+группой; LagExporter по двум последовательным снимкам считает лаг по каждой
+партиции и скорости записи/чтения. Снимки отдаются в формате Prometheus и
+в виде текстовой сводки (scripts/monitor_kafka.py).
+"""
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional
+
+from .kafka_config import kafka_config
+from .metrics import format_metric
+from .transport import TopicPartition
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionLag(NamedTuple):
+    group_id: str
+    topic: str
+    partition: int
+    end_offset: int
+    committed: Optional[int]  # None - группа еще не подтверждала смещение
+    lag: int
+
+
+class LagSnapshot(NamedTuple):
+    taken_at: float
+    partitions: List[PartitionLag]
+    produce_rates: Dict[str, float]  # topic -> сообщений/с
+    consume_rates: Dict[tuple, float]  # (group_id, topic) -> сообщений/с
+
+    def group_lag(self, group_id: str) -> int:
+        return sum(p.lag for p in self.partitions if p.group_id == group_id)
+
+
+class OffsetsReader(ABC):
+    """Источник смещений для расчета лага"""
+
+    @abstractmethod
+    def end_offsets(self, topics: List[str]) -> Dict[TopicPartition, int]:
+        """Конечные смещения партиций топиков"""
+
+    @abstractmethod
+    def committed_offsets(self, group_id: str) -> Dict[TopicPartition, int]:
+        """Смещения, подтвержденные группой"""
+
+    def close(self):
+        pass
+
+
+class KafkaOffsetsReader(OffsetsReader):
+    """Смещения из кластера Kafka (admin client + consumer без группы)"""
+
+    def __init__(self):
+        from kafka import KafkaAdminClient, KafkaConsumer
+        from .transport import _kafka_security_config
+
+        client_config = {'bootstrap_servers': kafka_config.bootstrap_servers.split(',')}
+        client_config.update(_kafka_security_config())
+        self.admin = KafkaAdminClient(**client_config)
+        self.consumer = KafkaConsumer(**client_config)
+
+    def end_offsets(self, topics):
+        from kafka import TopicPartition as KafkaTopicPartition
+
+        partitions = [
+            KafkaTopicPartition(topic, partition)
+            for topic in topics
+            for partition in sorted(self.consumer.partitions_for_topic(topic) or ())
+        ]
+        if not partitions:
+            return {}
+        return {
+            TopicPartition(tp.topic, tp.partition): offset
+            for tp, offset in self.consumer.end_offsets(partitions).items()
+        }
+
+    def committed_offsets(self, group_id):
+        return {
+            TopicPartition(tp.topic, tp.partition): meta.offset
+            for tp, meta in self.admin.list_consumer_group_offsets(group_id).items()
+            if meta.offset >= 0
+        }
+
+    def close(self):
+        self.consumer.close()
+        self.admin.close()
+
+
+class LogOffsetsReader(OffsetsReader):
+    """Смещения из memory/sqlite лога транспорта"""
+
+    def __init__(self, log):
+        self.log = log
+
+    def end_offsets(self, topics):
+        return {
+            TopicPartition(topic, partition): offset
+            for topic in topics
+            for partition, offset in self.log.end_offsets(topic).items()
+        }
+
+    def committed_offsets(self, group_id):
+        return self.log.committed(group_id)
+
+
+def create_offsets_reader(name: Optional[str] = None) -> OffsetsReader:
+    """Источник смещений для текущего транспорта"""
+    name = name or kafka_config.transport
+    if name == "kafka":
+        return KafkaOffsetsReader()
+    if name == "memory":
+        from .transport import get_memory_log
+        return LogOffsetsReader(get_memory_log())
+    if name == "sqlite":
+        from .transport import SQLiteEventLog
+        return LogOffsetsReader(SQLiteEventLog(kafka_config.transport_sqlite_path))
+    raise ValueError(f"Неизвестный транспорт событий: {name}")
+
+
+class LagExporter:
+    """Периодический сбор лагов consumer group и скоростей по топикам"""
+
+    def __init__(self, reader: OffsetsReader, groups: Dict[str, List[str]]):
+        """
+        Args:
+            reader: Источник смещений
+            groups: consumer group -> список топиков, на которые она подписана
+        """
+        self.reader = reader
+        self.groups = groups
+        self.last: Optional[LagSnapshot] = None
+        self._previous_end: Dict[TopicPartition, int] = {}
+        self._previous_committed: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def collect(self) -> LagSnapshot:
+        """Снимок смещений и расчет лагов/скоростей относительно прошлого снимка"""
+        now = time.monotonic()
+        topics = sorted({topic for group_topics in self.groups.values() for topic in group_topics})
+        end_offsets = self.reader.end_offsets(topics)
+
+        partitions: List[PartitionLag] = []
+        committed_by_group: Dict[tuple, int] = {}
+        for group_id, group_topics in self.groups.items():
+            committed = self.reader.committed_offsets(group_id)
+            for tp, end in sorted(end_offsets.items()):
+                if tp.topic not in group_topics:
+                    continue
+                offset = committed.get(tp)
+                partitions.append(PartitionLag(group_id, tp.topic, tp.partition, end, offset, end - (offset or 0)))
+                committed_by_group[(group_id, tp.topic, tp.partition)] = offset or 0
+
+        with self._lock:
+            elapsed = now - self.last.taken_at if self.last else 0
+            produce_rates: Dict[str, float] = defaultdict(float)
+            consume_rates: Dict[tuple, float] = defaultdict(float)
+            if elapsed > 0:
+                for tp, end in end_offsets.items():
+                    if tp in self._previous_end:
+                        produce_rates[tp.topic] += (end - self._previous_end[tp]) / elapsed
+                for (group_id, topic, partition), offset in committed_by_group.items():
+                    previous = self._previous_committed.get((group_id, topic, partition))
+                    if previous is not None:
+                        consume_rates[(group_id, topic)] += (offset - previous) / elapsed
+
+            self._previous_end = end_offsets
+            self._previous_committed = committed_by_group
+            self.last = LagSnapshot(now, partitions, dict(produce_rates), dict(consume_rates))
+            return self.last
+
+    def render_prometheus(self) -> str:
+        """Последний снимок в текстовом формате Prometheus"""
+        snapshot = self.last
+        if snapshot is None:
+            return ""
+
+        lines = [
+            "# HELP kafka_consumergroup_lag Лаг consumer group по партиции",
+            "# TYPE kafka_consumergroup_lag gauge",
+        ]
+        for p in snapshot.partitions:
+            lines.append(format_metric("kafka_consumergroup_lag", p.lag, group=p.group_id, topic=p.topic, partition=p.partition))
+        lines += ["# HELP kafka_consumergroup_lag_total Суммарный лаг consumer group",
+                  "# TYPE kafka_consumergroup_lag_total gauge"]
+        for group_id in self.groups:
+            lines.append(format_metric("kafka_consumergroup_lag_total", snapshot.group_lag(group_id), group=group_id))
+        lines += ["# HELP kafka_topic_partition_end_offset Конечное смещение партиции",
+                  "# TYPE kafka_topic_partition_end_offset gauge"]
+        seen = set()
+        for p in snapshot.partitions:
+            if (p.topic, p.partition) not in seen:
+                seen.add((p.topic, p.partition))
+                lines.append(format_metric("kafka_topic_partition_end_offset", p.end_offset, topic=p.topic, partition=p.partition))
+        lines += ["# HELP kafka_topic_produce_rate Скорость записи в топик, сообщений/с",
+                  "# TYPE kafka_topic_produce_rate gauge"]
+        for topic, rate in sorted(snapshot.produce_rates.items()):
+            lines.append(format_metric("kafka_topic_produce_rate", round(rate, 3), topic=topic))
+        lines += ["# HELP kafka_consumergroup_consume_rate Скорость чтения группой, сообщений/с",
+                  "# TYPE kafka_consumergroup_consume_rate gauge"]
+        for (group_id, topic), rate in sorted(snapshot.consume_rates.items()):
+            lines.append(format_metric("kafka_consumergroup_consume_rate", round(rate, 3), group=group_id, topic=topic))
+        return "\n".join(lines) + "\n"
+
+    def run(self, interval: float, stop: Optional[threading.Event] = None):
+        """Сбор снимков каждые interval секунд до установки stop"""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                self.collect()
+            except Exception as e:
+                logger.error(f"❌ Ошибка сбора смещений: {e}")
+            stop.wait(interval)
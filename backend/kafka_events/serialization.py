@@ -0,0 +1,242 @@
+"""
+Сериализация событий и локальный реестр схем
+
+Поддерживаются два формата значения записи (KAFKA_SERIALIZATION):
+
+- json    - `json.dumps(event.dict())`, как и раньше (по умолчанию)
+- msgpack - компактный бинарный формат со схемным заголовком
+
+Бинарное значение начинается с заголовка из 4 байт: магический байт, байт
+формата и schema id (uint16, big-endian). Schema id однозначно определяет пару
+(event_type, version) и модель, а тело - словарь значений, где вместо имени
+поля стоит короткий ключ (uint16 из CRC32 имени). Ключ зависит только от имени,
+поэтому порядок полей и поля, добавленные в BaseEvent, не сдвигают значения
+других полей. JSON всегда начинается с "{", так что consumer выбирает декодер
+по первому байту, без пробного разбора.
+
+Эволюция схем: новые поля можно добавлять в любое место модели (старые записи
+декодируются без них, и применяются значения по умолчанию; незнакомые ключи
+более новых producer'ов пропускаются). Переименование или смена типа поля
+требует новой версии события и нового schema id в SCHEMA_IDS.
+
+Оба формата возвращают даты с часовым поясом UTC (даты без пояса считаются UTC).
+"""
+import json
+import struct
+import zlib
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Type
+
+from .kafka_config import kafka_config
+from .kafka_events import (
+    BaseEvent,
+    RequestCreatedEvent, RequestUpdatedEvent, RequestCancelledEvent,
+    WorkflowManagerAssignedEvent, WorkflowContractorAssignedEvent, WorkflowWorkCompletedEvent,
+    WorkflowStatusChangedEvent, NotificationTelegramSentEvent, TelegramMessageReceivedEvent,
+    NotificationEmailSentEvent,
+    SecurityContractorVerifiedEvent, AuditUserActionEvent
+)
+from . import analytics_events
+
+MAGIC_BYTE = 0xAE
+# 0x01 - ранний формат со списком значений по позициям полей, больше не читается
+FORMAT_MSGPACK = 0x02
+_HEADER = struct.Struct(">BBH")
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+SERIALIZATIONS = ("json", "msgpack")
+
+
+class SerializationError(Exception):
+    """Ошибка кодирования или декодирования события"""
+
+
+class EventSchema(NamedTuple):
+    schema_id: int
+    event_type: str
+    version: str
+    model: Type[BaseEvent]
+    keys: Dict[str, int]  # Имя поля -> ключ в теле msgpack
+    names: Dict[int, str]  # Ключ -> имя поля
+
+
+class EventSchemaRegistry:
+    """Реестр схем: (event_type, version) <-> schema id <-> модель"""
+
+    def __init__(self):
+        self._by_id: Dict[int, EventSchema] = {}
+        self._by_type: Dict[Tuple[str, str], EventSchema] = {}
+
+    def register(self, schema_id: int, model: Type[BaseEvent], version: str = "1.0") -> EventSchema:
+        event_type = _plain(model.__fields__["event_type"].default)
+        if schema_id in self._by_id:
+            raise ValueError(f"Schema id {schema_id} уже занят схемой {self._by_id[schema_id].event_type}")
+        if (event_type, version) in self._by_type:
+            raise ValueError(f"Схема {event_type} v{version} уже зарегистрирована")
+
+        keys = {name: field_key(name) for name in model.__fields__}
+        names = {key: name for name, key in keys.items()}
+        if len(names) != len(keys):
+            raise ValueError(f"Совпадают ключи полей схемы {event_type} v{version}, переименуйте поле")
+
+        schema = EventSchema(schema_id, event_type, version, model, keys, names)
+        self._by_id[schema_id] = schema
+        self._by_type[(event_type, version)] = schema
+        return schema
+
+    def get(self, schema_id: int) -> EventSchema:
+        try:
+            return self._by_id[schema_id]
+        except KeyError:
+            raise SerializationError(f"Неизвестный schema id {schema_id}") from None
+
+    def lookup(self, event_type: str, version: str) -> Optional[EventSchema]:
+        return self._by_type.get((_plain(event_type), version))
+
+    def schemas(self) -> List[EventSchema]:
+        return [self._by_id[schema_id] for schema_id in sorted(self._by_id)]
+
+
+def _plain(value: Any) -> Any:
+    return value.value if isinstance(value, Enum) else value
+
+
+def field_key(name: str) -> int:
+    """Короткий ключ поля в теле msgpack (не зависит от порядка полей модели)"""
+    return zlib.crc32(name.encode("utf-8")) & 0xFFFF
+
+
+def _utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+# Schema id фиксированы: их нельзя переиспользовать или менять после выкладки
+SCHEMA_IDS: List[Tuple[int, Type[BaseEvent]]] = [
+    (1, RequestCreatedEvent),
+    (2, RequestUpdatedEvent),
+    (3, RequestCancelledEvent),
+    (10, WorkflowManagerAssignedEvent),
+    (11, WorkflowContractorAssignedEvent),
+    (12, WorkflowWorkCompletedEvent),
+    (13, WorkflowStatusChangedEvent),
+    (20, NotificationTelegramSentEvent),
+    (21, NotificationEmailSentEvent),
+    (22, TelegramMessageReceivedEvent),
+    (30, SecurityContractorVerifiedEvent),
+    (40, AuditUserActionEvent),
+    (100, analytics_events.UserLoginEvent),
+    (101, analytics_events.UserRegistrationEvent),
+    (102, analytics_events.RequestCreatedEvent),
+    (103, analytics_events.RequestStatusChangedEvent),
+    (104, analytics_events.RequestCompletedEvent),
+    (105, analytics_events.ContractorAssignedEvent),
+    (106, analytics_events.PageViewEvent),
+    (107, analytics_events.ActionPerformedEvent),
+    (108, analytics_events.AggregatedCountsEvent),
+]
+
+schema_registry = EventSchemaRegistry()
+for _schema_id, _model in SCHEMA_IDS:
+    schema_registry.register(_schema_id, _model)
+
+
+# --- msgpack ------------------------------------------------------------------
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError as e:
+        raise SerializationError("Для KAFKA_SERIALIZATION=msgpack требуется пакет msgpack") from e
+    return msgpack
+
+
+def _msgpack_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        # Целочисленная арифметика: Timestamp.from_datetime теряет микросекунды на float
+        delta = _utc(value) - _EPOCH
+        seconds = delta.days * 86400 + delta.seconds
+        return _msgpack().Timestamp(seconds, delta.microseconds * 1000)
+    if isinstance(value, Enum):
+        return value.value
+    return str(value)
+
+
+def _encode_msgpack(event: BaseEvent) -> bytes:
+    schema = schema_registry.lookup(event.event_type, event.version)
+    if schema is None:
+        raise SerializationError(f"Схема для {_plain(event.event_type)} v{event.version} не зарегистрирована")
+    values = {key: getattr(event, name) for name, key in schema.keys.items()}
+    body = _msgpack().packb(values, default=_msgpack_default, use_bin_type=True)
+    return _HEADER.pack(MAGIC_BYTE, FORMAT_MSGPACK, schema.schema_id) + body
+
+
+def _decode_msgpack(data: bytes) -> Tuple[EventSchema, Dict[str, Any]]:
+    _, _, schema_id = _HEADER.unpack_from(data)
+    schema = schema_registry.get(schema_id)
+    values = _msgpack().unpackb(data[_HEADER.size:], raw=False, timestamp=3, strict_map_key=False)
+    if not isinstance(values, dict):
+        raise SerializationError(f"Тело записи схемы {schema.event_type} не является словарем полей")
+    # Поля, добавленные более новым producer'ом, пропускаются,
+    # а отсутствующие в старой записи поля получат значения по умолчанию
+    return schema, {schema.names[key]: value for key, value in values.items() if key in schema.names}
+
+
+# --- JSON ---------------------------------------------------------------------
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return _utc(value).isoformat()
+    return str(value)
+
+
+# --- Публичный API ------------------------------------------------------------
+
+def encode_event(event: BaseEvent, serialization: Optional[str] = None) -> bytes:
+    """
+    Кодирование события в значение записи
+
+    Args:
+        event: Событие
+        serialization: Формат (по умолчанию KAFKA_SERIALIZATION)
+
+    Returns:
+        bytes: Значение записи
+    """
+    serialization = serialization or kafka_config.serialization
+    if serialization == "json":
+        return json.dumps(event.dict(), default=_json_default).encode('utf-8')
+    if serialization == "msgpack":
+        return _encode_msgpack(event)
+    raise ValueError(f"Неизвестный формат сериализации: {serialization}. Доступны: {', '.join(SERIALIZATIONS)}")
+
+
+def is_binary(data: bytes) -> bool:
+    return len(data) >= _HEADER.size and data[0] == MAGIC_BYTE
+
+
+def decode_value(data: bytes) -> Dict[str, Any]:
+    """
+    Декодирование значения записи в словарь полей события
+
+    Формат определяется по первому байту. Для бинарных записей типы значений
+    уже соответствуют модели, и повторная валидация не требуется.
+    """
+    if is_binary(data):
+        if data[1] != FORMAT_MSGPACK:
+            raise SerializationError(f"Неизвестный бинарный формат {data[1]}")
+        return _decode_msgpack(data)[1]
+    return json.loads(data.decode('utf-8'))
+
+
+def decode_event(data: bytes) -> BaseEvent:
+    """Декодирование значения записи в модель события по реестру схем"""
+    if is_binary(data):
+        schema, fields = _decode_msgpack(data)
+        return schema.model(**fields)
+
+    fields = json.loads(data.decode('utf-8'))
+    schema = schema_registry.lookup(fields.get("event_type"), fields.get("version", "1.0"))
+    if schema is None:
+        raise SerializationError(f"Схема для {fields.get('event_type')} v{fields.get('version')} не зарегистрирована")
+    return schema.model(**fields)
@@ -0,0 +1,179 @@
+"""
+Супервизор процессов-воркеров consumer'ов
+
+Каждый воркер - отдельный процесс со своим consumer'ом в общей consumer group,
+поэтому Kafka распределяет партиции топиков между воркерами, и пропускная
+способность растет с числом ядер и партиций. Супервизор перезапускает упавшие
+воркеры (с экспоненциальной задержкой) и при SIGTERM/SIGINT передает воркерам
+SIGTERM: consumer дорабатывает текущий пакет, подтверждает смещения и
+завершается. Воркеры, не уложившиеся в таймаут, завершаются принудительно.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from .kafka_config import kafka_config
+
+logger = logging.getLogger(__name__)
+
+_SHUTDOWN_SIGNALS = {signal.SIGTERM, signal.SIGINT}
+
+
+def _worker_entrypoint(target: Callable[[int], None], worker_index: int):
+    """Точка входа процесса-воркера"""
+    # Обработчики сигналов супервизора наследуются при fork: SIGTERM должен
+    # дойти до consumer'а воркера, а Ctrl+C обрабатывает только супервизор
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.pthread_sigmask(signal.SIG_UNBLOCK, _SHUTDOWN_SIGNALS)
+    target(worker_index)
+
+
+class _WorkerSlot:
+    """Состояние одного воркера между перезапусками"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[multiprocessing.Process] = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.failures = 0  # Подряд идущие падения (для задержки перезапуска)
+        self.restart_at: Optional[float] = None
+
+
+class WorkerSupervisor:
+    """Запуск, перезапуск и остановка процессов-воркеров"""
+
+    def __init__(
+        self,
+        target: Callable[[int], None],
+        workers: int,
+        name: str = "kafka-worker",
+        shutdown_timeout: Optional[float] = None,
+        restart_backoff: Optional[float] = None,
+        max_restart_backoff: Optional[float] = None,
+        start_method: Optional[str] = None,
+    ):
+        """
+        Args:
+            target: Функция воркера, получает номер воркера (0..workers-1)
+            workers: Количество процессов
+            name: Префикс имени процессов
+            shutdown_timeout: Время на дообработку при остановке, секунды
+            restart_backoff: Начальная задержка перезапуска упавшего воркера
+            max_restart_backoff: Максимальная задержка перезапуска
+            start_method: Метод запуска multiprocessing (по умолчанию - платформенный)
+        """
+        self.target = target
+        self.name = name
+        self.shutdown_timeout = (
+            kafka_config.worker_shutdown_timeout_seconds if shutdown_timeout is None else shutdown_timeout
+        )
+        self.restart_backoff = (
+            kafka_config.worker_restart_backoff_seconds if restart_backoff is None else restart_backoff
+        )
+        self.max_restart_backoff = (
+            kafka_config.worker_max_restart_backoff_seconds if max_restart_backoff is None else max_restart_backoff
+        )
+        self.context = multiprocessing.get_context(start_method)
+        self.slots: List[_WorkerSlot] = [_WorkerSlot(index) for index in range(workers)]
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Запуск всех воркеров"""
+        for slot in self.slots:
+            self._spawn(slot)
+        logger.info(f"🚀 Запущено воркеров: {len(self.slots)}")
+
+    def _spawn(self, slot: _WorkerSlot):
+        process = self.context.Process(
+            target=_worker_entrypoint,
+            args=(self.target, slot.index),
+            name=f"{self.name}-{slot.index}",
+        )
+        # Сигналы блокируются на время fork и разблокируются воркером после сброса
+        # обработчиков: SIGTERM, пришедший в этом окне, не теряется
+        previous_mask = signal.pthread_sigmask(signal.SIG_BLOCK, _SHUTDOWN_SIGNALS)
+        try:
+            process.start()
+        finally:
+            signal.pthread_sigmask(signal.SIG_SETMASK, previous_mask)
+        slot.process = process
+        slot.started_at = time.monotonic()
+        slot.restart_at = None
+        logger.info(f"👷 Воркер {process.name} запущен (pid {process.pid})")
+
+    def check_workers(self):
+        """Проверка воркеров: планирование и выполнение перезапуска завершившихся"""
+        now = time.monotonic()
+        for slot in self.slots:
+            if self._stopping.is_set():
+                return
+            process = slot.process
+            if process is None or process.is_alive():
+                continue
+
+            if slot.restart_at is None:
+                # Воркер, проработавший дольше максимальной задержки, считается здоровым
+                if now - slot.started_at >= self.max_restart_backoff:
+                    slot.failures = 0
+                delay = min(self.restart_backoff * (2 ** slot.failures), self.max_restart_backoff)
+                slot.failures += 1
+                slot.restart_at = now + delay
+                logger.error(
+                    f"❌ Воркер {process.name} завершился с кодом {process.exitcode}, "
+                    f"перезапуск через {delay:.1f} с"
+                )
+            elif now >= slot.restart_at:
+                slot.restarts += 1
+                self._spawn(slot)
+
+    def stop(self):
+        """Остановка воркеров: SIGTERM, ожидание дообработки, затем SIGKILL"""
+        self._stopping.set()
+        alive = [slot.process for slot in self.slots if slot.process and slot.process.is_alive()]
+        logger.info(f"🛑 Остановка воркеров: {len(alive)}")
+        for process in alive:
+            process.terminate()
+
+        deadline = time.monotonic() + self.shutdown_timeout
+        for process in alive:
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                logger.warning(f"⚠️ Воркер {process.name} не завершился за {self.shutdown_timeout} с, SIGKILL")
+                process.kill()
+                process.join()
+        logger.info("🔒 Воркеры остановлены")
+
+    def _signal_handler(self, signum, frame):
+        logger.info(f"🛑 Получен сигнал {signum}, завершение работы воркеров...")
+        self._stopping.set()
+
+    def run(self, poll_interval: float = 0.5):
+        """Запуск воркеров и наблюдение за ними до SIGTERM/SIGINT"""
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGINT, self._signal_handler)
+            signal.signal(signal.SIGTERM, self._signal_handler)
+
+        logger.info(f"👀 Супервизор воркеров запущен (pid {os.getpid()})")
+        self.start()
+        try:
+            while not self._stopping.wait(poll_interval):
+                self.check_workers()
+        finally:
+            self.stop()
+
+    def status(self) -> Dict[int, Dict[str, object]]:
+        """Состояние воркеров для диагностики"""
+        return {
+            slot.index: {
+                "pid": slot.process.pid if slot.process else None,
+                "alive": bool(slot.process and slot.process.is_alive()),
+                "restarts": slot.restarts,
+            }
+            for slot in self.slots
+        }
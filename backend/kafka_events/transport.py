@@ -0,0 +1,500 @@
+"""
+Транспорт событий
+
+KafkaEventProducer и KafkaEventConsumer работают через транспорт, а не напрямую
+с kafka-python. Поддерживаются три бэкенда (KAFKA_TRANSPORT):
+
+- kafka  - реальный кластер Kafka (по умолчанию)
+- memory - партиционированный лог в памяти процесса (тесты, бенчмарки)
+- sqlite - лог в SQLite-файле, общий для нескольких процессов на одной машине
+
+Транспорт передает уже закодированные значения (bytes) - формат определяется
+в kafka_events/serialization.py.
+
+Consumer group в memory/sqlite бэкендах работает по модели конкурирующих
+consumer'ов: смещение группы сдвигается атомарно при poll, поэтому несколько
+consumer'ов одной группы получают разные записи.
+"""
+import logging
+import sqlite3
+import threading
+import zlib
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from .kafka_config import kafka_config
+
+logger = logging.getLogger(__name__)
+
+
+class TransportError(Exception):
+    """Ошибка транспорта событий"""
+
+
+class TransportTimeoutError(TransportError):
+    """Таймаут отправки события"""
+
+
+class TopicPartition(NamedTuple):
+    topic: str
+    partition: int
+
+
+class RecordMetadata(NamedTuple):
+    topic: str
+    partition: int
+    offset: int
+
+
+class TransportRecord(NamedTuple):
+    """Запись лога с теми же полями, что и ConsumerRecord в kafka-python"""
+    topic: str
+    partition: int
+    offset: int
+    key: Optional[str]
+    value: bytes
+    timestamp: int
+
+
+def topic_partitions(topic: str) -> int:
+    """Количество партиций топика по конфигурации"""
+    return int(kafka_config.topics.get(topic, {}).get("partitions", 1))
+
+
+def choose_partition(topic: str, key: Optional[str], counter: int) -> int:
+    """Выбор партиции: по стабильному хешу ключа или round-robin без ключа"""
+    partitions = topic_partitions(topic)
+    if key is None:
+        return counter % partitions
+    return zlib.crc32(str(key).encode('utf-8')) % partitions
+
+
+def _now_ms() -> int:
+    return int(datetime.now(timezone.utc).timestamp() * 1000)
+
+
+class ProducerTransport(ABC):
+    """Интерфейс отправляющей стороны транспорта"""
+
+    @abstractmethod
+    def send(
+        self,
+        topic: str,
+        value: bytes,
+        key: Optional[str] = None,
+        partition: Optional[int] = None,
+        timeout: float = 10
+    ) -> RecordMetadata:
+        """Отправка одной записи; ошибки - TransportError"""
+
+    def send_batch(
+        self,
+        records: List[Tuple[str, bytes, Optional[str], Optional[int]]],
+        timeout: float = 10
+    ) -> List[Union[RecordMetadata, TransportError]]:
+        """Отправка пакета (topic, value, key, partition); результат или ошибка по каждой записи"""
+        results: List[Union[RecordMetadata, TransportError]] = []
+        for topic, value, key, partition in records:
+            try:
+                results.append(self.send(topic, value, key=key, partition=partition, timeout=timeout))
+            except TransportError as e:
+                results.append(e)
+        return results
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class ConsumerTransport(ABC):
+    """Интерфейс читающей стороны транспорта"""
+
+    @abstractmethod
+    def poll(self, timeout_ms: int = 1000, max_records: Optional[int] = None) -> Dict[TopicPartition, List[Any]]:
+        """Новые записи по партициям"""
+
+    def close(self):
+        pass
+
+
+# --- Kafka --------------------------------------------------------------------
+
+def _kafka_security_config() -> Dict[str, Any]:
+    if kafka_config.security_protocol == "PLAINTEXT":
+        return {}
+    return {
+        'security_protocol': kafka_config.security_protocol,
+        'sasl_mechanism': kafka_config.sasl_mechanism,
+        'sasl_plain_username': kafka_config.sasl_username,
+        'sasl_plain_password': kafka_config.sasl_password,
+    }
+
+
+class KafkaProducerTransport(ProducerTransport):
+    """Отправка событий в кластер Kafka через kafka-python"""
+
+    def __init__(self):
+        from kafka import KafkaProducer
+
+        producer_config = {
+            'bootstrap_servers': kafka_config.bootstrap_servers.split(','),
+            'acks': kafka_config.producer_acks,
+            'retries': kafka_config.producer_retries,
+            'batch_size': kafka_config.producer_batch_size,
+            'linger_ms': kafka_config.producer_linger_ms,
+            'compression_type': kafka_config.producer_compression_type,
+            'key_serializer': lambda k: str(k).encode('utf-8') if k else None,
+            'request_timeout_ms': 30000,
+            'metadata_max_age_ms': 300000,
+        }
+        producer_config.update(_kafka_security_config())
+        self.producer = KafkaProducer(**producer_config)
+
+    def send(self, topic, value, key=None, partition=None, timeout=10):
+        from kafka.errors import KafkaError, KafkaTimeoutError
+
+        try:
+            future = self.producer.send(topic=topic, value=value, key=key, partition=partition)
+            metadata = future.get(timeout=timeout)
+        except KafkaTimeoutError as e:
+            raise TransportTimeoutError(str(e)) from e
+        except KafkaError as e:
+            raise TransportError(str(e)) from e
+        return RecordMetadata(metadata.topic, metadata.partition, metadata.offset)
+
+    def send_batch(self, records, timeout=10):
+        from kafka.errors import KafkaError, KafkaTimeoutError
+
+        # Все записи уходят в буфер producer'а до ожидания подтверждений:
+        # kafka-python объединяет их в общие запросы к брокерам
+        futures = []
+        for topic, value, key, partition in records:
+            try:
+                futures.append(self.producer.send(topic=topic, value=value, key=key, partition=partition))
+            except KafkaError as e:
+                futures.append(TransportError(str(e)))
+        get_timeout = timeout
+        try:
+            self.producer.flush(timeout=timeout)
+        except KafkaTimeoutError:
+            get_timeout = 0  # Неподтвержденные записи сразу получают ошибку таймаута
+
+        results = []
+        for future in futures:
+            if isinstance(future, TransportError):
+                results.append(future)
+                continue
+            try:
+                metadata = future.get(timeout=get_timeout)
+                results.append(RecordMetadata(metadata.topic, metadata.partition, metadata.offset))
+            except KafkaTimeoutError as e:
+                results.append(TransportTimeoutError(str(e)))
+            except KafkaError as e:
+                results.append(TransportError(str(e)))
+        return results
+
+    def flush(self):
+        self.producer.flush()
+
+    def close(self):
+        self.producer.flush()
+        self.producer.close()
+
+
+class KafkaConsumerTransport(ConsumerTransport):
+    """Чтение событий из кластера Kafka через kafka-python"""
+
+    def __init__(self, group_id: str, topics: List[str]):
+        from kafka import KafkaConsumer
+
+        consumer_config = {
+            'bootstrap_servers': kafka_config.bootstrap_servers.split(','),
+            'group_id': group_id,
+            'auto_offset_reset': kafka_config.consumer_auto_offset_reset,
+            'enable_auto_commit': kafka_config.consumer_enable_auto_commit,
+            'auto_commit_interval_ms': kafka_config.consumer_auto_commit_interval_ms,
+            'max_poll_records': kafka_config.consumer_max_poll_records,
+            'key_deserializer': lambda m: m.decode('utf-8') if m else None,
+            'session_timeout_ms': 30000,
+            'heartbeat_interval_ms': 10000,
+            'max_poll_interval_ms': 300000,
+        }
+        consumer_config.update(_kafka_security_config())
+        self.consumer = KafkaConsumer(**consumer_config)
+        self.consumer.subscribe(topics)
+
+    def poll(self, timeout_ms=1000, max_records=None):
+        return self.consumer.poll(timeout_ms=timeout_ms, max_records=max_records)
+
+    def close(self):
+        self.consumer.close()
+
+
+# --- In-memory ----------------------------------------------------------------
+
+class InMemoryEventLog:
+    """Партиционированный лог событий в памяти процесса"""
+
+    def __init__(self):
+        self._partitions: Dict[TopicPartition, List[TransportRecord]] = defaultdict(list)
+        self._group_offsets: Dict[str, Dict[TopicPartition, int]] = defaultdict(dict)
+        self._counter = 0
+        self._condition = threading.Condition()
+
+    def append(self, topic: str, value: bytes, key: Optional[str], partition: Optional[int]) -> RecordMetadata:
+        with self._condition:
+            if partition is None:
+                partition = choose_partition(topic, key, self._counter)
+                self._counter += 1
+            tp = TopicPartition(topic, partition)
+            records = self._partitions[tp]
+            record = TransportRecord(topic, partition, len(records), key, value, _now_ms())
+            records.append(record)
+            self._condition.notify_all()
+        return RecordMetadata(topic, partition, record.offset)
+
+    def fetch(self, group_id: str, topics: List[str], max_records: int) -> Dict[TopicPartition, List[TransportRecord]]:
+        """Выдача следующих записей группе со сдвигом ее смещений"""
+        batch: Dict[TopicPartition, List[TransportRecord]] = {}
+        remaining = max_records
+        offsets = self._group_offsets[group_id]
+        for tp, records in self._partitions.items():
+            if remaining <= 0:
+                break
+            if tp.topic not in topics:
+                continue
+            start = offsets.get(tp, 0)
+            chunk = records[start:start + remaining]
+            if chunk:
+                batch[tp] = chunk
+                offsets[tp] = start + len(chunk)
+                remaining -= len(chunk)
+        return batch
+
+    def poll(self, group_id: str, topics: List[str], timeout_ms: int, max_records: int):
+        with self._condition:
+            batch = self.fetch(group_id, topics, max_records)
+            if not batch and timeout_ms > 0:
+                self._condition.wait(timeout_ms / 1000)
+                batch = self.fetch(group_id, topics, max_records)
+        return batch
+
+    def end_offsets(self, topic: str) -> Dict[int, int]:
+        with self._condition:
+            return {tp.partition: len(records) for tp, records in self._partitions.items() if tp.topic == topic}
+
+    def committed(self, group_id: str) -> Dict[TopicPartition, int]:
+        with self._condition:
+            return dict(self._group_offsets[group_id])
+
+    def clear(self):
+        with self._condition:
+            self._partitions.clear()
+            self._group_offsets.clear()
+            self._counter = 0
+
+
+_memory_log = InMemoryEventLog()
+
+
+def get_memory_log() -> InMemoryEventLog:
+    """Общий для процесса in-memory лог"""
+    return _memory_log
+
+
+class InMemoryProducerTransport(ProducerTransport):
+    def __init__(self, log: Optional[InMemoryEventLog] = None):
+        self.log = log or get_memory_log()
+
+    def send(self, topic, value, key=None, partition=None, timeout=10):
+        return self.log.append(topic, value, key, partition)
+
+
+class InMemoryConsumerTransport(ConsumerTransport):
+    def __init__(self, group_id: str, topics: List[str], log: Optional[InMemoryEventLog] = None):
+        self.group_id = group_id
+        self.topics = list(topics)
+        self.log = log or get_memory_log()
+
+    def poll(self, timeout_ms=1000, max_records=None):
+        return self.log.poll(
+            self.group_id, self.topics, timeout_ms,
+            max_records or kafka_config.consumer_max_poll_records
+        )
+
+
+# --- SQLite -------------------------------------------------------------------
+
+class SQLiteEventLog:
+    """Лог событий в SQLite-файле, доступный нескольким процессам"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._counter = 0
+        with self._connection() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS event_log (
+                    topic TEXT NOT NULL,
+                    partition INTEGER NOT NULL,
+                    record_offset INTEGER NOT NULL,
+                    key TEXT,
+                    value BLOB NOT NULL,
+                    timestamp INTEGER NOT NULL,
+                    PRIMARY KEY (topic, partition, record_offset)
+                );
+                CREATE TABLE IF NOT EXISTS consumer_offsets (
+                    group_id TEXT NOT NULL,
+                    topic TEXT NOT NULL,
+                    partition INTEGER NOT NULL,
+                    next_offset INTEGER NOT NULL,
+                    PRIMARY KEY (group_id, topic, partition)
+                );
+            """)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def append(self, topic: str, value: bytes, key: Optional[str], partition: Optional[int]) -> RecordMetadata:
+        if partition is None:
+            partition = choose_partition(topic, key, self._counter)
+            self._counter += 1
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT COALESCE(MAX(record_offset) + 1, 0) FROM event_log WHERE topic = ? AND partition = ?",
+                (topic, partition)
+            ).fetchone()
+            offset = row[0]
+            conn.execute(
+                "INSERT INTO event_log (topic, partition, record_offset, key, value, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+                (topic, partition, offset, key, value, _now_ms())
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return RecordMetadata(topic, partition, offset)
+
+    def fetch(self, group_id: str, topics: List[str], max_records: int) -> Dict[TopicPartition, List[TransportRecord]]:
+        conn = self._connection()
+        placeholders = ",".join("?" * len(topics))
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                f"""
+                SELECT l.topic, l.partition, l.record_offset, l.key, l.value, l.timestamp
+                FROM event_log l
+                LEFT JOIN consumer_offsets o
+                  ON o.group_id = ? AND o.topic = l.topic AND o.partition = l.partition
+                WHERE l.topic IN ({placeholders}) AND l.record_offset >= COALESCE(o.next_offset, 0)
+                ORDER BY l.topic, l.partition, l.record_offset
+                LIMIT ?
+                """,
+                (group_id, *topics, max_records)
+            ).fetchall()
+            batch: Dict[TopicPartition, List[TransportRecord]] = defaultdict(list)
+            for topic, partition, offset, key, value, timestamp in rows:
+                batch[TopicPartition(topic, partition)].append(
+                    TransportRecord(topic, partition, offset, key, bytes(value), timestamp)
+                )
+            for tp, records in batch.items():
+                conn.execute(
+                    """
+                    INSERT INTO consumer_offsets (group_id, topic, partition, next_offset) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (group_id, topic, partition) DO UPDATE SET next_offset = excluded.next_offset
+                    """,
+                    (group_id, tp.topic, tp.partition, records[-1].offset + 1)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return dict(batch)
+
+    def end_offsets(self, topic: str) -> Dict[int, int]:
+        rows = self._connection().execute(
+            "SELECT partition, MAX(record_offset) + 1 FROM event_log WHERE topic = ? GROUP BY partition", (topic,)
+        ).fetchall()
+        return {partition: end for partition, end in rows}
+
+    def committed(self, group_id: str) -> Dict[TopicPartition, int]:
+        rows = self._connection().execute(
+            "SELECT topic, partition, next_offset FROM consumer_offsets WHERE group_id = ?", (group_id,)
+        ).fetchall()
+        return {TopicPartition(topic, partition): offset for topic, partition, offset in rows}
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class SQLiteProducerTransport(ProducerTransport):
+    def __init__(self, path: Optional[str] = None):
+        self.log = SQLiteEventLog(path or kafka_config.transport_sqlite_path)
+
+    def send(self, topic, value, key=None, partition=None, timeout=10):
+        return self.log.append(topic, value, key, partition)
+
+    def close(self):
+        self.log.close()
+
+
+class SQLiteConsumerTransport(ConsumerTransport):
+    def __init__(self, group_id: str, topics: List[str], path: Optional[str] = None):
+        self.group_id = group_id
+        self.topics = list(topics)
+        self.log = SQLiteEventLog(path or kafka_config.transport_sqlite_path)
+
+    def poll(self, timeout_ms=1000, max_records=None):
+        max_records = max_records or kafka_config.consumer_max_poll_records
+        batch = self.log.fetch(self.group_id, self.topics, max_records)
+        if not batch and timeout_ms > 0:
+            # SQLite не умеет уведомлять о новых записях - ждем и пробуем еще раз
+            threading.Event().wait(min(timeout_ms, 200) / 1000)
+            batch = self.log.fetch(self.group_id, self.topics, max_records)
+        return batch
+
+    def close(self):
+        self.log.close()
+
+
+# --- Фабрики ------------------------------------------------------------------
+
+TRANSPORTS = ("kafka", "memory", "sqlite")
+
+
+def create_producer_transport(name: Optional[str] = None) -> ProducerTransport:
+    """Создание отправляющего транспорта по имени бэкенда"""
+    name = name or kafka_config.transport
+    if name == "kafka":
+        return KafkaProducerTransport()
+    if name == "memory":
+        return InMemoryProducerTransport()
+    if name == "sqlite":
+        return SQLiteProducerTransport()
+    raise ValueError(f"Неизвестный транспорт событий: {name}. Доступны: {', '.join(TRANSPORTS)}")
+
+
+def create_consumer_transport(group_id: str, topics: List[str], name: Optional[str] = None) -> ConsumerTransport:
+    """Создание читающего транспорта по имени бэкенда"""
+    name = name or kafka_config.transport
+    if name == "kafka":
+        return KafkaConsumerTransport(group_id, topics)
+    if name == "memory":
+        return InMemoryConsumerTransport(group_id, topics)
+    if name == "sqlite":
+        return SQLiteConsumerTransport(group_id, topics)
+    raise ValueError(f"Неизвестный транспорт событий: {name}. Доступны: {', '.join(TRANSPORTS)}")
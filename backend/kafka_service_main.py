@@ -1,37 +1,72 @@
 """
 Главный файл для запуска Kafka сервисов
+
+    python kafka_service_main.py               # KAFKA_WORKERS процессов (по умолчанию 1)
+    python kafka_service_main.py --workers 6   # по процессу на партицию request-events
 """
+import argparse
 import logging
-import asyncio
-from database import get_db
+from database import engine
+from kafka_events.kafka_config import kafka_config
+from kafka_events.metrics import serve_metrics
+from kafka_events.supervisor import WorkerSupervisor
 from services.notification_service_consumer import NotificationServiceConsumer
 
 # Настройка логирования
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    format='%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s'
 )
 
 logger = logging.getLogger(__name__)
 
+NOTIFICATION_TOPICS = ["request-events", "workflow-events"]
+
+
+def run_notification_worker(worker_index: int = 0):
+    """Воркер: собственный consumer группы и собственный пул соединений с БД"""
+    # Соединения пула, унаследованные от родительского процесса при fork,
+    # не используются воркером: он открывает свои
+    engine.dispose(close=False)
+
+    # Метрики обработчиков событий для Prometheus и scripts/monitor_kafka.py
+    if kafka_config.metrics_port:
+        serve_metrics(kafka_config.metrics_port + worker_index)
+
+    # Каждый пакет событий обрабатывается в отдельной короткоживущей сессии
+    notification_consumer = NotificationServiceConsumer()
+    notification_consumer.start()
+
+
 def main():
     """Главная функция"""
-    logger.info("🚀 Запуск Kafka сервисов")
-    
-    # Получаем подключение к БД
-    db = next(get_db())
-    
+    parser = argparse.ArgumentParser(description="Запуск Kafka сервисов")
+    parser.add_argument("--workers", type=int, default=kafka_config.workers,
+                        help="Количество процессов-воркеров (KAFKA_WORKERS)")
+    args = parser.parse_args()
+
+    workers = max(args.workers, 1)
+    logger.info(f"🚀 Запуск Kafka сервисов (воркеров: {workers})")
+
+    if workers > 1 and kafka_config.transport == "memory":
+        # In-process лог не разделяется между процессами
+        logger.warning("⚠️ Транспорт memory не поддерживает несколько процессов, запускается один воркер")
+        workers = 1
+
+    partitions = max(kafka_config.topics[topic]["partitions"] for topic in NOTIFICATION_TOPICS)
+    if workers > partitions:
+        logger.warning(f"⚠️ Воркеров ({workers}) больше, чем партиций ({partitions}): лишние будут простаивать")
+
     try:
-        # Создаем и запускаем consumer
-        notification_consumer = NotificationServiceConsumer(db)
-        notification_consumer.start()
-        
+        if workers == 1:
+            run_notification_worker()
+        else:
+            WorkerSupervisor(run_notification_worker, workers, name="notification-worker").run()
+
     except KeyboardInterrupt:
         logger.info("🛑 Получен сигнал прерывания")
     except Exception as e:
         logger.error(f"❌ Ошибка запуска сервисов: {e}")
-    finally:
-        db.close()
 
 if __name__ == "__main__":
     main()
@@ -10,7 +10,7 @@ from typing import List, Optional, Dict, Any
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Depends, HTTPException, status, Request, Response
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy import text
@@ -56,8 +56,34 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"⚠️ Ошибка проверки администратора: {e}")
 
+    # Шаблоны уведомлений компилируются один раз при старте
+    from services.message_templates import message_templates
+    message_templates.load()
+
+    # Общий пул соединений с Telegram Bot API на время работы приложения
+    from services.telegram_api import telegram_api
+    await telegram_api.start()
+
     yield
 
+    await telegram_api.close()
+
+    # Соединения с почтовыми API (открываются при первой отправке)
+    from services.api_email_service import api_email_service
+    await api_email_service.close()
+
+    # Отправляем накопленные события аналитики
+    from services.analytics_service import analytics_service
+    analytics_service.close()
+
+    # Закрываем постоянные SMTP соединения
+    from services.python_email_service import python_email_service
+    python_email_service.close()
+
+    # Останавливаем процессы обработки аватаров
+    from services.avatar_images import avatar_processor
+    avatar_processor.shutdown()
+
 # Создание приложения FastAPI
 app = FastAPI(
     title="Agregator Service - Агрегатор услуг и исполнителей",
@@ -134,6 +160,12 @@ async def health_check():
             "timestamp": datetime.now().isoformat()
         }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Метрики процесса API в формате Prometheus (Telegram Bot API и др.)"""
+    from kafka_events.metrics import metrics
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Обновляем forward references для Pydantic моделей (Pydantic v2)
 from api.v1.schemas import RepairRequestResponse, ContractorResponseResponse
 
@@ -0,0 +1,36 @@
+"""
+Миграция для добавления описания вариантов аватара пользователя
+"""
+
+import os
+import sys
+from sqlalchemy import text
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__))))
+
+from database import engine
+
+def add_avatar_variants():
+    """Добавление колонки avatar_variants в users"""
+    
+    try:
+        migration_sql = """
+        -- Файлы и размеры аватара: информация об аватаре без обращений к файловой системе
+        ALTER TABLE users ADD COLUMN IF NOT EXISTS avatar_variants JSON;
+        """
+        
+        with engine.connect() as conn:
+            conn.execute(text(migration_sql))
+            conn.commit()
+        
+        print("✅ Колонка avatar_variants добавлена успешно")
+        
+    except Exception as e:
+        print(f"❌ Ошибка добавления колонки avatar_variants: {e}")
+        raise
+
+if __name__ == "__main__":
+    print("🚀 Запуск миграции вариантов аватаров...")
+    add_avatar_variants()
+    print("✅ Миграция завершена!")
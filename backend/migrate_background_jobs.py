@@ -0,0 +1,51 @@
+"""
+Миграция для добавления очереди фоновых задач (background_jobs)
+"""
+
+import os
+import sys
+from sqlalchemy import text
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__))))
+
+from database import engine
+
+def create_background_jobs_table():
+    """Создание таблицы background_jobs"""
+    
+    try:
+        create_table_sql = """
+        CREATE TABLE IF NOT EXISTS background_jobs (
+            id SERIAL PRIMARY KEY,
+            job_type VARCHAR NOT NULL,
+            payload JSON,
+            status VARCHAR NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 5,
+            run_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+            locked_by VARCHAR,
+            locked_at TIMESTAMP WITH TIME ZONE,
+            last_error TEXT,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+            finished_at TIMESTAMP WITH TIME ZONE
+        );
+        
+        CREATE INDEX IF NOT EXISTS ix_background_jobs_status_run_at ON background_jobs(status, run_at);
+        -- Выборка готовых задач читает только небольшой частичный индекс
+        CREATE INDEX IF NOT EXISTS ix_background_jobs_pending
+            ON background_jobs(job_type, run_at, id) WHERE status = 'pending';
+        """
+        
+        with engine.connect() as conn:
+            conn.execute(text(create_table_sql))
+            conn.commit()
+        
+        print("✅ Таблица background_jobs создана успешно")
+        
+    except Exception as e:
+        print(f"❌ Ошибка создания таблицы background_jobs: {e}")
+        raise
+
+if __name__ == "__main__":
+    create_background_jobs_table()
@@ -0,0 +1,66 @@
+"""
+Миграция для исходящей почты (email_outbox) и сводок писем
+"""
+
+import os
+import sys
+from sqlalchemy import text
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__))))
+
+from database import engine
+
+def create_email_outbox_tables():
+    """Создание таблиц email_outbox, email_digests и email_digest_items"""
+    
+    try:
+        migration_sql = """
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id SERIAL PRIMARY KEY,
+            recipient VARCHAR NOT NULL,
+            subject VARCHAR NOT NULL,
+            html_body TEXT NOT NULL,
+            text_body TEXT,
+            status VARCHAR NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+            sent_at TIMESTAMP WITH TIME ZONE
+        );
+        
+        -- Выборка писем по статусу (failed для разбора, pending для мониторинга)
+        CREATE INDEX IF NOT EXISTS ix_email_outbox_status_created
+            ON email_outbox (status, created_at);
+        
+        CREATE TABLE IF NOT EXISTS email_digests (
+            id SERIAL PRIMARY KEY,
+            recipient VARCHAR NOT NULL,
+            digest_type VARCHAR NOT NULL,
+            flush_at TIMESTAMP WITH TIME ZONE,
+            CONSTRAINT uq_email_digests_recipient_type UNIQUE (recipient, digest_type)
+        );
+        
+        CREATE TABLE IF NOT EXISTS email_digest_items (
+            id SERIAL PRIMARY KEY,
+            digest_id INTEGER NOT NULL REFERENCES email_digests(id),
+            payload JSON NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+        );
+        
+        CREATE INDEX IF NOT EXISTS ix_email_digest_items_digest_id
+            ON email_digest_items (digest_id);
+        """
+        
+        with engine.connect() as conn:
+            conn.execute(text(migration_sql))
+            conn.commit()
+        
+        print("✅ Таблицы исходящей почты созданы успешно")
+        
+    except Exception as e:
+        print(f"❌ Ошибка создания таблиц исходящей почты: {e}")
+        raise
+
+if __name__ == "__main__":
+    create_email_outbox_tables()
@@ -0,0 +1,46 @@
+"""
+Миграция для хранилища загруженных файлов по содержимому (file_blobs)
+"""
+
+import os
+import sys
+from sqlalchemy import text
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__))))
+
+from database import engine
+
+def create_file_blobs_table():
+    """Создание таблицы file_blobs"""
+    
+    try:
+        migration_sql = """
+        CREATE TABLE IF NOT EXISTS file_blobs (
+            sha256 VARCHAR(64) PRIMARY KEY,
+            size BIGINT NOT NULL,
+            mime_type VARCHAR,
+            ref_count INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+            unreferenced_at TIMESTAMP WITH TIME ZONE
+        );
+        
+        -- Поиск файлов без ссылок для удаления
+        CREATE INDEX IF NOT EXISTS ix_file_blobs_unreferenced_at
+            ON file_blobs (unreferenced_at);
+        """
+        
+        with engine.connect() as conn:
+            conn.execute(text(migration_sql))
+            conn.commit()
+        
+        print("✅ Таблица file_blobs создана успешно")
+        
+    except Exception as e:
+        print(f"❌ Ошибка создания таблицы file_blobs: {e}")
+        raise
+
+if __name__ == "__main__":
+    print("🚀 Запуск миграции хранилища файлов...")
+    create_file_blobs_table()
+    print("✅ Миграция завершена!")
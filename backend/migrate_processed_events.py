@@ -0,0 +1,42 @@
+"""
+Миграция для добавления таблицы processed_events (идемпотентность Kafka consumer'ов)
+"""
+
+import os
+import sys
+from sqlalchemy import text
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__))))
+
+from database import engine
+
+def create_processed_events_table():
+    """Создание таблицы processed_events"""
+    
+    try:
+        create_table_sql = """
+        CREATE TABLE IF NOT EXISTS processed_events (
+            id SERIAL PRIMARY KEY,
+            event_id VARCHAR NOT NULL,
+            consumer_group VARCHAR NOT NULL,
+            event_type VARCHAR,
+            processed_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+            CONSTRAINT uq_processed_events_group_event UNIQUE (consumer_group, event_id)
+        );
+        
+        CREATE INDEX IF NOT EXISTS ix_processed_events_processed_at ON processed_events(processed_at);
+        """
+        
+        with engine.connect() as conn:
+            conn.execute(text(create_table_sql))
+            conn.commit()
+        
+        print("✅ Таблица processed_events создана успешно")
+        
+    except Exception as e:
+        print(f"❌ Ошибка создания таблицы processed_events: {e}")
+        raise
+
+if __name__ == "__main__":
+    create_processed_events_table()
@@ -0,0 +1,71 @@
+"""
+Миграция для добавления журнала статусов заявок (request_status_events)
+и проекции времени в статусах (request_stage_durations)
+"""
+
+import os
+import sys
+from sqlalchemy import text
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__))))
+
+from database import engine
+
+def create_request_status_tables():
+    """Создание таблиц request_status_events и request_stage_durations"""
+    
+    try:
+        create_tables_sql = """
+        CREATE TABLE IF NOT EXISTS request_status_events (
+            id SERIAL PRIMARY KEY,
+            event_id VARCHAR NOT NULL UNIQUE,
+            request_id INTEGER NOT NULL REFERENCES repair_requests(id),
+            from_status VARCHAR,
+            to_status VARCHAR NOT NULL,
+            changed_by INTEGER REFERENCES users(id),
+            reason VARCHAR,
+            occurred_at TIMESTAMP WITH TIME ZONE NOT NULL
+        );
+        
+        CREATE INDEX IF NOT EXISTS ix_request_status_events_request_occurred
+            ON request_status_events(request_id, occurred_at);
+        CREATE INDEX IF NOT EXISTS ix_request_status_events_occurred_at
+            ON request_status_events(occurred_at);
+        
+        CREATE TABLE IF NOT EXISTS request_stage_durations (
+            id SERIAL PRIMARY KEY,
+            request_id INTEGER NOT NULL REFERENCES repair_requests(id),
+            customer_id INTEGER,
+            manager_id INTEGER,
+            stage VARCHAR NOT NULL,
+            entered_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            left_at TIMESTAMP WITH TIME ZONE,
+            duration_seconds INTEGER,
+            sla_seconds INTEGER,
+            sla_breached BOOLEAN NOT NULL DEFAULT FALSE
+        );
+        
+        CREATE INDEX IF NOT EXISTS ix_request_stage_durations_request_id
+            ON request_stage_durations(request_id);
+        CREATE INDEX IF NOT EXISTS ix_request_stage_durations_stage_entered
+            ON request_stage_durations(stage, entered_at);
+        CREATE INDEX IF NOT EXISTS ix_request_stage_durations_manager_stage
+            ON request_stage_durations(manager_id, stage, entered_at);
+        CREATE INDEX IF NOT EXISTS ix_request_stage_durations_customer_stage
+            ON request_stage_durations(customer_id, stage, entered_at);
+        """
+        
+        with engine.connect() as conn:
+            conn.execute(text(create_tables_sql))
+            conn.commit()
+        
+        print("✅ Таблицы request_status_events и request_stage_durations созданы успешно")
+        print("ℹ️ Для существующих заявок выполните: python rebuild_status_projections.py --backfill")
+        
+    except Exception as e:
+        print(f"❌ Ошибка создания таблиц журнала статусов: {e}")
+        raise
+
+if __name__ == "__main__":
+    create_request_status_tables()
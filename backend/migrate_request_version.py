@@ -0,0 +1,39 @@
+"""
+Миграция для добавления версии заявки (оптимистичная блокировка) и индекса очереди новых заявок
+"""
+
+import os
+import sys
+from sqlalchemy import text
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__))))
+
+from database import engine
+
+def add_request_version():
+    """Добавление колонки version в repair_requests"""
+    
+    try:
+        migration_sql = """
+        ALTER TABLE repair_requests ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+        
+        -- Очередь менеджеров: выборка следующих новых заявок без сортировки всей таблицы
+        CREATE INDEX IF NOT EXISTS ix_repair_requests_new_queue
+            ON repair_requests(created_at, id) WHERE status = 'new' AND manager_id IS NULL;
+        """
+        
+        with engine.connect() as conn:
+            conn.execute(text(migration_sql))
+            conn.commit()
+        
+        print("✅ Колонка version и индекс очереди заявок добавлены успешно")
+        
+    except Exception as e:
+        print(f"❌ Ошибка добавления версии заявок: {e}")
+        raise
+
+if __name__ == "__main__":
+    print("🚀 Запуск миграции версий заявок...")
+    add_request_version()
+    print("✅ Миграция завершена!")
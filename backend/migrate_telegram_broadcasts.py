@@ -0,0 +1,60 @@
+"""
+Миграция для таблиц массовых рассылок Telegram
+"""
+
+import os
+import sys
+from sqlalchemy import text
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__))))
+
+from database import engine
+
+def create_telegram_broadcast_tables():
+    """Создание таблиц telegram_broadcasts и telegram_broadcast_recipients"""
+    
+    try:
+        migration_sql = """
+        CREATE TABLE IF NOT EXISTS telegram_broadcasts (
+            id SERIAL PRIMARY KEY,
+            message TEXT NOT NULL,
+            status VARCHAR NOT NULL DEFAULT 'pending',
+            created_by INTEGER REFERENCES users(id),
+            total INTEGER NOT NULL DEFAULT 0,
+            sent INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+            started_at TIMESTAMP WITH TIME ZONE,
+            finished_at TIMESTAMP WITH TIME ZONE
+        );
+        
+        CREATE TABLE IF NOT EXISTS telegram_broadcast_recipients (
+            id SERIAL PRIMARY KEY,
+            broadcast_id INTEGER NOT NULL REFERENCES telegram_broadcasts(id),
+            contractor_id INTEGER REFERENCES contractor_profiles(id),
+            username VARCHAR,
+            chat_id BIGINT,
+            status VARCHAR NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            sent_at TIMESTAMP WITH TIME ZONE
+        );
+        
+        -- Выборка ожидающих получателей рассылки пачками по id
+        CREATE INDEX IF NOT EXISTS ix_telegram_broadcast_recipients_broadcast_status
+            ON telegram_broadcast_recipients (broadcast_id, status, id);
+        """
+        
+        with engine.connect() as conn:
+            conn.execute(text(migration_sql))
+            conn.commit()
+        
+        print("✅ Таблицы массовых рассылок Telegram созданы успешно")
+        
+    except Exception as e:
+        print(f"❌ Ошибка создания таблиц рассылок: {e}")
+        raise
+
+if __name__ == "__main__":
+    create_telegram_broadcast_tables()
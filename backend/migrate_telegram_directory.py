@@ -0,0 +1,33 @@
+"""
+Миграция для индекса поиска chat_id по username в telegram_users
+"""
+
+import os
+import sys
+from sqlalchemy import text
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__))))
+
+from database import engine
+
+def create_telegram_username_index():
+    """Создание индекса lower(username) в telegram_users"""
+    
+    try:
+        migration_sql = """
+        CREATE INDEX IF NOT EXISTS ix_telegram_users_username_lower ON telegram_users (lower(username));
+        """
+        
+        with engine.connect() as conn:
+            conn.execute(text(migration_sql))
+            conn.commit()
+        
+        print("✅ Индекс ix_telegram_users_username_lower создан успешно")
+        
+    except Exception as e:
+        print(f"❌ Ошибка создания индекса telegram_users: {e}")
+        raise
+
+if __name__ == "__main__":
+    create_telegram_username_index()
@@ -0,0 +1,50 @@
+"""
+Миграция для постраничной истории переписки Telegram и архива сообщений
+"""
+
+import os
+import sys
+from sqlalchemy import text
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__))))
+
+from database import engine
+
+def migrate_telegram_message_archive():
+    """Индекс (telegram_user_id, created_at, id) и таблица telegram_messages_archive"""
+    
+    try:
+        migration_sql = """
+        CREATE INDEX IF NOT EXISTS ix_telegram_messages_user_created
+            ON telegram_messages (telegram_user_id, created_at, id);
+        
+        CREATE TABLE IF NOT EXISTS telegram_messages_archive (
+            id INTEGER PRIMARY KEY,
+            telegram_user_id INTEGER NOT NULL REFERENCES telegram_users(id),
+            message_text TEXT NOT NULL,
+            message_type VARCHAR DEFAULT 'text',
+            is_from_bot BOOLEAN DEFAULT FALSE,
+            is_read BOOLEAN DEFAULT TRUE,
+            telegram_message_id BIGINT,
+            update_id BIGINT,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            archived_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+        );
+        
+        CREATE INDEX IF NOT EXISTS ix_telegram_messages_archive_user_created
+            ON telegram_messages_archive (telegram_user_id, created_at, id);
+        """
+        
+        with engine.connect() as conn:
+            conn.execute(text(migration_sql))
+            conn.commit()
+        
+        print("✅ Архив переписки Telegram создан успешно")
+        
+    except Exception as e:
+        print(f"❌ Ошибка создания архива переписки Telegram: {e}")
+        raise
+
+if __name__ == "__main__":
+    migrate_telegram_message_archive()
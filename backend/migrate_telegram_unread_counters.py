@@ -0,0 +1,51 @@
+"""
+Миграция для счетчиков непрочитанных сообщений Telegram
+
+Добавляет unread_count и last_message_at в telegram_users, частичный индекс
+непрочитанных входящих сообщений и заполняет счетчики по существующим сообщениям.
+"""
+
+import os
+import sys
+from sqlalchemy import text
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__))))
+
+from database import engine
+
+def migrate_telegram_unread_counters():
+    """Добавление и заполнение счетчиков переписки"""
+    
+    try:
+        migration_sql = """
+        ALTER TABLE telegram_users ADD COLUMN IF NOT EXISTS unread_count INTEGER NOT NULL DEFAULT 0;
+        ALTER TABLE telegram_users ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMP WITH TIME ZONE;
+        
+        CREATE INDEX IF NOT EXISTS ix_telegram_messages_unread ON telegram_messages (telegram_user_id)
+            WHERE is_from_bot = FALSE AND is_read = FALSE;
+        CREATE INDEX IF NOT EXISTS ix_telegram_users_last_message
+            ON telegram_users (last_message_at DESC, id DESC);
+        
+        UPDATE telegram_users u SET
+            unread_count = (
+                SELECT count(*) FROM telegram_messages m
+                WHERE m.telegram_user_id = u.id AND m.is_from_bot = FALSE AND m.is_read = FALSE
+            ),
+            last_message_at = (
+                SELECT max(m.created_at) FROM telegram_messages m WHERE m.telegram_user_id = u.id
+            );
+        """
+        
+        with engine.connect() as conn:
+            conn.execute(text(migration_sql))
+            conn.commit()
+        
+        print("✅ Счетчики переписки Telegram добавлены и заполнены")
+        
+    except Exception as e:
+        print(f"❌ Ошибка миграции счетчиков переписки Telegram: {e}")
+        raise
+
+if __name__ == "__main__":
+    migrate_telegram_unread_counters()
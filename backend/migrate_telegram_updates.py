@@ -0,0 +1,44 @@
+"""
+Миграция для приема обновлений Telegram: идентификаторы Bot API в
+telegram_messages и смещение long polling
+"""
+
+import os
+import sys
+from sqlalchemy import text
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__))))
+
+from database import engine
+
+def migrate_telegram_updates():
+    """Добавление update_id/telegram_message_id и таблицы telegram_polling_offsets"""
+    
+    try:
+        migration_sql = """
+        ALTER TABLE telegram_messages ADD COLUMN IF NOT EXISTS telegram_message_id BIGINT;
+        ALTER TABLE telegram_messages ADD COLUMN IF NOT EXISTS update_id BIGINT;
+        
+        -- Повторная доставка обновления не создает дубль сообщения (ON CONFLICT (update_id))
+        CREATE UNIQUE INDEX IF NOT EXISTS telegram_messages_update_id_key ON telegram_messages (update_id);
+        
+        CREATE TABLE IF NOT EXISTS telegram_polling_offsets (
+            bot_id BIGINT PRIMARY KEY,
+            next_update_id BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+        );
+        """
+        
+        with engine.connect() as conn:
+            conn.execute(text(migration_sql))
+            conn.commit()
+        
+        print("✅ Миграция приема обновлений Telegram выполнена успешно")
+        
+    except Exception as e:
+        print(f"❌ Ошибка миграции приема обновлений Telegram: {e}")
+        raise
+
+if __name__ == "__main__":
+    migrate_telegram_updates()
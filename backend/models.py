@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, func, BigInteger, Float, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, func, BigInteger, Float, Text, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
@@ -43,6 +43,7 @@ class User(Base):
     email_verified = Column(Boolean, default=False)
     email_verification_token = Column(String, nullable=True)
     avatar_url = Column(String, nullable=True)
+    avatar_variants = Column(JSON, nullable=True)  # Файлы и размеры аватара (services/avatar_images.py)
     phone = Column(String, nullable=True)
     position = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -202,6 +203,11 @@ class RepairRequest(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     processed_at = Column(DateTime(timezone=True), nullable=True)
     assigned_at = Column(DateTime(timezone=True), nullable=True)
+    # Версия строки для оптимистичной блокировки: UPDATE выполняется с условием
+    # на прочитанную версию, параллельное изменение дает StaleDataError
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
     # Связи
     customer = relationship("CustomerProfile", back_populates="requests", lazy="selectin")
@@ -243,9 +249,19 @@ class TelegramUser(Base):
     first_name = Column(String, nullable=True)
     last_name = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
+    # Счетчики переписки: обновляются вместе с сообщениями (services/telegram_chat_service.py)
+    unread_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        # Поиск chat_id по username без учета регистра (services/telegram_directory.py)
+        Index("ix_telegram_users_username_lower", func.lower(username)),
+        # Список переписок по последней активности
+        Index("ix_telegram_users_last_message", last_message_at.desc(), id.desc()),
+    )
+
     # Связи
     user = relationship("User", lazy="selectin")
     messages = relationship("TelegramMessage", back_populates="telegram_user", lazy="selectin")
@@ -260,11 +276,52 @@ class TelegramMessage(Base):
     message_type = Column(String, default="text")  # text, photo, document, etc.
     is_from_bot = Column(Boolean, default=False)  # True если сообщение от бота к пользователю
     is_read = Column(Boolean, default=False)  # True если сообщение прочитано
+    # Входящие сообщения: идентификаторы Bot API (update_id защищает от повторного приема)
+    telegram_message_id = Column(BigInteger, nullable=True)
+    update_id = Column(BigInteger, nullable=True, unique=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # Непрочитанные входящие: пересчет счетчиков и отметка прочтения
+        Index(
+            "ix_telegram_messages_unread", telegram_user_id,
+            postgresql_where=(is_from_bot == False) & (is_read == False),
+            sqlite_where=(is_from_bot == False) & (is_read == False),
+        ),
+        # Постраничная история переписки по ключу (created_at, id)
+        Index("ix_telegram_messages_user_created", telegram_user_id, created_at, id),
+    )
+
     # Связи
     telegram_user = relationship("TelegramUser", back_populates="messages", lazy="selectin")
 
+class TelegramMessageArchive(Base):
+    """Архив прочитанных сообщений Telegram старше TELEGRAM_HISTORY_HOT_DAYS (id сохраняются)"""
+    __tablename__ = "telegram_messages_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    telegram_user_id = Column(Integer, ForeignKey("telegram_users.id"), nullable=False)
+    message_text = Column(Text, nullable=False)
+    message_type = Column(String, default="text")
+    is_from_bot = Column(Boolean, default=False)
+    is_read = Column(Boolean, default=True)
+    telegram_message_id = Column(BigInteger, nullable=True)
+    update_id = Column(BigInteger, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_telegram_messages_archive_user_created", telegram_user_id, created_at, id),
+    )
+
+class TelegramPollingOffset(Base):
+    """Смещение getUpdates для приема обновлений long polling"""
+    __tablename__ = "telegram_polling_offsets"
+
+    bot_id = Column(BigInteger, primary_key=True, autoincrement=False)  # Числовая часть токена бота
+    next_update_id = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class ArticleMapping(Base):
     """Сопоставление артикулов для технических заявок"""
     __tablename__ = "article_mappings"
@@ -440,3 +497,154 @@ class ContractorVerification(Base):
     contractor = relationship("ContractorProfile", lazy="selectin")
     security_officer = relationship("User", foreign_keys=[security_checked_by], lazy="selectin")
     manager = relationship("User", foreign_keys=[manager_checked_by], lazy="selectin")
+
+class ProcessedEvent(Base):
+    """Журнал обработанных событий Kafka (идемпотентность consumer'ов)"""
+    __tablename__ = "processed_events"
+    __table_args__ = (
+        UniqueConstraint("consumer_group", "event_id", name="uq_processed_events_group_event"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(String, nullable=False)  # BaseEvent.event_id
+    consumer_group = Column(String, nullable=False)  # Группа consumer'а, обработавшая событие
+    event_type = Column(String, nullable=True)
+    processed_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+class RequestStatusEvent(Base):
+    """Журнал переходов заявки между статусами (только добавление)"""
+    __tablename__ = "request_status_events"
+    __table_args__ = (
+        Index("ix_request_status_events_request_occurred", "request_id", "occurred_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(String, unique=True, nullable=False)  # event_id события в workflow-events
+    request_id = Column(Integer, ForeignKey("repair_requests.id"), nullable=False)
+    from_status = Column(String, nullable=True)  # None - создание заявки
+    to_status = Column(String, nullable=False)
+    changed_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    reason = Column(String, nullable=True)
+    occurred_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class RequestStageDuration(Base):
+    """Проекция request_status_events: время нахождения заявки в каждом статусе"""
+    __tablename__ = "request_stage_durations"
+    __table_args__ = (
+        Index("ix_request_stage_durations_stage_entered", "stage", "entered_at"),
+        Index("ix_request_stage_durations_manager_stage", "manager_id", "stage", "entered_at"),
+        Index("ix_request_stage_durations_customer_stage", "customer_id", "stage", "entered_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    request_id = Column(Integer, ForeignKey("repair_requests.id"), nullable=False, index=True)
+    customer_id = Column(Integer, nullable=True)  # Денормализовано из repair_requests для range scan
+    manager_id = Column(Integer, nullable=True)
+    stage = Column(String, nullable=False)
+    entered_at = Column(DateTime(timezone=True), nullable=False)
+    left_at = Column(DateTime(timezone=True), nullable=True)  # None - заявка сейчас в этом статусе
+    duration_seconds = Column(Integer, nullable=True)
+    sla_seconds = Column(Integer, nullable=True)
+    sla_breached = Column(Boolean, default=False, nullable=False)
+
+class BackgroundJob(Base):
+    """Фоновая задача (побочные эффекты workflow: Telegram, email и т.д.)"""
+    __tablename__ = "background_jobs"
+    __table_args__ = (
+        Index("ix_background_jobs_status_run_at", "status", "run_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String, nullable=False)
+    payload = Column(JSON, nullable=True)
+    status = Column(String, nullable=False, default="pending")  # pending, running, succeeded, dead
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())  # Не раньше этого времени
+    locked_by = Column(String, nullable=True)  # Воркер, выполняющий задачу
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+class TelegramBroadcast(Base):
+    """Массовая рассылка сообщения исполнителям через Telegram бота"""
+    __tablename__ = "telegram_broadcasts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    message = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending, running, completed, cancelled
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=True)
+    total = Column(Integer, nullable=False, default=0)
+    sent = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+class TelegramBroadcastRecipient(Base):
+    """Получатель рассылки: прогресс сохраняется по каждому получателю"""
+    __tablename__ = "telegram_broadcast_recipients"
+    __table_args__ = (
+        Index("ix_telegram_broadcast_recipients_broadcast_status", "broadcast_id", "status", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    broadcast_id = Column(Integer, ForeignKey("telegram_broadcasts.id"), nullable=False)
+    contractor_id = Column(Integer, ForeignKey("contractor_profiles.id"), nullable=True)
+    username = Column(String, nullable=True)
+    chat_id = Column(BigInteger, nullable=True)
+    status = Column(String, nullable=False, default="pending")  # pending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+class EmailOutbox(Base):
+    """Исходящее письмо: отправляет воркер фоновых задач (задача email.send)"""
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        Index("ix_email_outbox_status_created", "status", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    html_body = Column(Text, nullable=False)
+    text_body = Column(Text, nullable=True)
+    status = Column(String, nullable=False, default="pending")  # pending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+class EmailDigest(Base):
+    """Сводка писем одного типа для получателя: пункты копятся до flush_at"""
+    __tablename__ = "email_digests"
+    __table_args__ = (
+        UniqueConstraint("recipient", "digest_type", name="uq_email_digests_recipient_type"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    recipient = Column(String, nullable=False)
+    digest_type = Column(String, nullable=False)  # new_requests
+    flush_at = Column(DateTime(timezone=True), nullable=True)  # Запланированная отправка (None - не запланирована)
+
+class EmailDigestItem(Base):
+    """Пункт сводки, ожидающий отправки"""
+    __tablename__ = "email_digest_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    digest_id = Column(Integer, ForeignKey("email_digests.id"), nullable=False, index=True)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class FileBlob(Base):
+    """Файл в хранилище по содержимому: один файл на одинаковое содержимое, ref_count - число ссылок"""
+    __tablename__ = "file_blobs"
+
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    mime_type = Column(String, nullable=True)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    unreferenced_at = Column(DateTime(timezone=True), nullable=True, index=True)  # Когда пропала последняя ссылка
@@ -0,0 +1,67 @@
+"""
+Пересборка проекций журнала статусов заявок
+
+    python rebuild_status_projections.py                 # все заявки
+    python rebuild_status_projections.py --backfill      # сначала заполнить журнал для старых заявок
+    python rebuild_status_projections.py --request-id 42 --request-id 43
+    python rebuild_status_projections.py --report        # сводка нарушений SLA без пересборки
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__))))
+
+from database import SessionLocal
+from services.request_status_history_service import (
+    PROCESSING_STAGES, RequestStatusHistoryService, backfill_status_events, rebuild_stage_durations
+)
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def print_report(db):
+    """Сводка по проекции request_stage_durations"""
+    history = RequestStatusHistoryService(db)
+    print(f"⏱️ Среднее время обработки менеджером: "
+          f"{history.average_hours_in_stages(PROCESSING_STAGES, completed_only=True):.1f} ч")
+    breaches = history.sla_breaches()
+    if not breaches:
+        print("✅ Нарушений SLA нет")
+        return
+    print("⚠️ Нарушения SLA по статусам:")
+    for stage, count in sorted(breaches.items(), key=lambda item: -item[1]):
+        print(f"   {stage:<22} {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пересборка проекций журнала статусов заявок")
+    parser.add_argument("--backfill", action="store_true",
+                        help="Заполнить журнал для заявок без записей по полям processed_at/assigned_at")
+    parser.add_argument("--request-id", type=int, action="append", dest="request_ids",
+                        help="Пересобрать только указанные заявки (можно повторять)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--report", action="store_true", help="Только вывести сводку")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if not args.report:
+            if args.backfill:
+                backfill_status_events(db, batch_size=args.batch_size)
+            written = rebuild_stage_durations(db, request_ids=args.request_ids, batch_size=args.batch_size)
+            print(f"✅ Проекция request_stage_durations пересобрана (строк: {written})")
+        print_report(db)
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Ошибка пересборки проекций: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+#!/bin/sh
+# Миграции журнала статусов, таблицы фоновых задач (background_jobs), очереди писем, Telegram и хранилища файлов.
+# Все миграции повторяемы (IF NOT EXISTS): скрипт выполняется при каждом запуске бекенда и воркера фоновых задач.
+set -e
+cd "$(dirname "$0")"
+
+for migration in \
+    migrate_processed_events \
+    migrate_request_status_events \
+    migrate_background_jobs \
+    migrate_request_version \
+    migrate_telegram_directory \
+    migrate_telegram_broadcasts \
+    migrate_telegram_updates \
+    migrate_telegram_unread_counters \
+    migrate_telegram_message_archive \
+    migrate_email_outbox \
+    migrate_avatar_variants \
+    migrate_file_blobs
+do
+    python "$migration.py"
+done
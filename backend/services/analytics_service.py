@@ -1,12 +1,25 @@
 """
 Сервис для отправки событий аналитики в Kafka
+
+Отправка не блокирует обработчики API: события складываются в очередь и
+публикуются фоновым потоком. Самые частые события (просмотры страниц, действия,
+входы) агрегируются локально по ключу (тип, роль, путь/действие, минута) и
+отправляются счетчиками раз в flush_interval_seconds, а сырые события по ним
+отправляются только с заданной долей выборки.
 """
 
 import logging
-from typing import Optional, Dict, Any
+import queue
+import random
+import threading
+import time
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime, timezone
+from pydantic import BaseSettings
 from kafka_events import kafka_producer
+from kafka_events.kafka_events import BaseEvent
 from kafka_events.analytics_events import (
+    AnalyticsEventType, AggregatedCountsEvent,
     UserLoginEvent, UserRegistrationEvent, RequestCreatedEvent,
     RequestStatusChangedEvent, RequestCompletedEvent, ContractorAssignedEvent,
     PageViewEvent, ActionPerformedEvent
@@ -14,12 +27,221 @@ from kafka_events.analytics_events import (
 
 logger = logging.getLogger(__name__)
 
+ANALYTICS_TOPIC = "analytics"
+
+
+class AnalyticsConfig(BaseSettings):
+    """Настройки отправки аналитики"""
+    
+    # Локальная агрегация частых событий
+    aggregation_enabled: bool = True
+    window_seconds: int = 60
+    flush_interval_seconds: float = 30.0
+    max_buckets: int = 10000  # При переполнении окна агрегаты сбрасываются досрочно
+    max_unique_users_per_bucket: int = 1000
+    
+    # Доля сырых событий, отправляемых помимо агрегатов (0.0 - 1.0)
+    page_view_sample_rate: float = 0.01
+    action_sample_rate: float = 0.1
+    login_sample_rate: float = 1.0
+    
+    # Очередь фоновой отправки
+    queue_size: int = 10000
+    
+    class Config:
+        env_file = ".env"
+        env_prefix = "ANALYTICS_"
+
+
+class _Bucket:
+    __slots__ = ("count", "users")
+    
+    def __init__(self):
+        self.count = 0
+        self.users = set()
+
+
+class AnalyticsAggregator:
+    """Счетчики событий по ключу (тип, роль, измерение, начало окна)"""
+    
+    def __init__(self, window_seconds: int = 60, max_buckets: int = 10000, max_unique_users: int = 1000):
+        self.window_seconds = window_seconds
+        self.max_buckets = max_buckets
+        self.max_unique_users = max_unique_users
+        self._buckets: Dict[Tuple[AnalyticsEventType, str, str, datetime], _Bucket] = {}
+        self._lock = threading.Lock()
+    
+    def _window_start(self, at: datetime) -> datetime:
+        epoch = int(at.timestamp())
+        return datetime.fromtimestamp(epoch - epoch % self.window_seconds, tz=timezone.utc)
+    
+    def add(
+        self,
+        event_type: AnalyticsEventType,
+        user_role: Optional[str],
+        dimension: str,
+        user_id: Optional[int],
+        at: Optional[datetime] = None
+    ) -> bool:
+        """
+        Учет события в агрегате
+        
+        Returns:
+            bool: True если число агрегатов достигло max_buckets и их пора сбросить
+        """
+        key = (event_type, user_role or "unknown", dimension, self._window_start(at or datetime.now(timezone.utc)))
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket()
+            bucket.count += 1
+            if user_id is not None and len(bucket.users) < self.max_unique_users:
+                bucket.users.add(user_id)
+            return len(self._buckets) >= self.max_buckets
+    
+    def drain(self) -> List[AggregatedCountsEvent]:
+        """Выдача накопленных агрегатов с очисткой буфера"""
+        with self._lock:
+            buckets, self._buckets = self._buckets, {}
+        
+        return [
+            AggregatedCountsEvent(
+                source_event_type=event_type,
+                user_role=user_role,
+                dimension=dimension,
+                window_start=window_start,
+                window_seconds=self.window_seconds,
+                count=bucket.count,
+                unique_users=len(bucket.users)
+            )
+            for (event_type, user_role, dimension, window_start), bucket in buckets.items()
+        ]
+    
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+_FLUSH = object()
+_STOP = object()
+
 
 class AnalyticsService:
     """Сервис для отправки событий аналитики"""
     
-    def __init__(self):
-        self.producer = kafka_producer
+    def __init__(self, producer=None, config: Optional[AnalyticsConfig] = None):
+        self.producer = producer or kafka_producer
+        self.config = config or AnalyticsConfig()
+        self.aggregator = AnalyticsAggregator(
+            window_seconds=self.config.window_seconds,
+            max_buckets=self.config.max_buckets,
+            max_unique_users=self.config.max_unique_users_per_bucket
+        )
+        self.stats = {"queued": 0, "dropped": 0, "sent": 0, "failed": 0, "aggregates_sent": 0}
+        self._queue: "queue.Queue" = queue.Queue(maxsize=self.config.queue_size)
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+    
+    # --- Фоновая отправка ---------------------------------------------------
+    
+    def _ensure_worker(self):
+        if self._worker and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run_worker, name="analytics-sender", daemon=True)
+            self._worker.start()
+    
+    def _enqueue(self, item) -> bool:
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            return False
+        return True
+    
+    def _send(self, event: BaseEvent, key: str, sample_rate: Optional[float] = None):
+        """Постановка сырого события в очередь фоновой отправки"""
+        if self.config.aggregation_enabled and sample_rate is not None and sample_rate < 1.0:
+            # Потребители масштабируют выборку обратно по этому коэффициенту
+            event.metadata["sample_rate"] = sample_rate
+        if self._enqueue((event, key)):
+            self.stats["queued"] += 1
+    
+    def _run_worker(self):
+        next_flush = time.monotonic() + self.config.flush_interval_seconds
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, next_flush - time.monotonic()))
+                from_queue = True
+            except queue.Empty:
+                item, from_queue = _FLUSH, False
+            
+            try:
+                if item is _STOP:
+                    self._publish_aggregates()
+                    return
+                if item is _FLUSH:
+                    self._publish_aggregates()
+                    next_flush = time.monotonic() + self.config.flush_interval_seconds
+                else:
+                    event, key = item
+                    self._publish(event, key)
+            except Exception as e:
+                logger.error(f"Failed to send analytics: {e}")
+            finally:
+                if from_queue:
+                    self._queue.task_done()
+    
+    def _publish(self, event: BaseEvent, key: str):
+        if self.producer.publish_event(ANALYTICS_TOPIC, event, key=key):
+            self.stats["sent"] += 1
+        else:
+            self.stats["failed"] += 1
+    
+    def _publish_aggregates(self):
+        aggregates = self.aggregator.drain()
+        if not aggregates:
+            return
+        results = self.producer.publish_batch(
+            [(ANALYTICS_TOPIC, event, f"{event.source_event_type.value}:{event.dimension}") for event in aggregates]
+        )
+        self.stats["aggregates_sent"] += results["success"]
+        self.stats["failed"] += results["failed"]
+        logger.info(f"Analytics aggregates flushed: {len(aggregates)} buckets")
+    
+    def _aggregate(
+        self,
+        event_type: AnalyticsEventType,
+        user_role: Optional[str],
+        dimension: str,
+        user_id: Optional[int]
+    ):
+        if self.aggregator.add(event_type, user_role, dimension, user_id):
+            # Окно переполнено - сбрасываем агрегаты досрочно
+            self._enqueue(_FLUSH)
+    
+    def _sampled(self, rate: float) -> bool:
+        return rate >= 1.0 or random.random() < rate
+    
+    def flush(self, timeout: float = 10.0):
+        """Отправка накопленных агрегатов и ожидание опустошения очереди"""
+        if self._enqueue(_FLUSH):
+            self._join_queue(timeout)
+    
+    def _join_queue(self, timeout: float):
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+    
+    def close(self, timeout: float = 10.0):
+        """Остановка фоновой отправки с отправкой всех накопленных событий"""
+        if not self._worker or not self._worker.is_alive():
+            self._publish_aggregates()
+            return
+        self._queue.put(_STOP)
+        self._worker.join(timeout)
     
     def track_user_login(
         self, 
@@ -32,6 +254,11 @@ class AnalyticsService:
     ):
         """Отправка события входа пользователя"""
         try:
+            if self.config.aggregation_enabled:
+                self._aggregate(AnalyticsEventType.USER_LOGIN, user_role, login_method, user_id)
+                if not self._sampled(self.config.login_sample_rate):
+                    return
+            
             event = UserLoginEvent(
                 user_id=user_id,
                 user_role=user_role,
@@ -41,8 +268,8 @@ class AnalyticsService:
                 session_duration=session_duration
             )
             
-            self.producer.send_event("analytics", event, key=str(user_id))
-            logger.info(f"User login event sent for user {user_id}")
+            self._send(event, key=str(user_id), sample_rate=self.config.login_sample_rate)
+            logger.debug(f"User login event queued for user {user_id}")
             
         except Exception as e:
             logger.error(f"Failed to send user login event: {e}")
@@ -63,8 +290,8 @@ class AnalyticsService:
                 referral_source=referral_source
             )
             
-            self.producer.send_event("analytics", event, key=str(user_id))
-            logger.info(f"User registration event sent for user {user_id}")
+            self._send(event, key=str(user_id))
+            logger.debug(f"User registration event queued for user {user_id}")
             
         except Exception as e:
             logger.error(f"Failed to send user registration event: {e}")
@@ -91,8 +318,8 @@ class AnalyticsService:
                 estimated_cost=estimated_cost
             )
             
-            self.producer.send_event("analytics", event, key=str(request_id))
-            logger.info(f"Request created event sent for request {request_id}")
+            self._send(event, key=str(request_id))
+            logger.debug(f"Request created event queued for request {request_id}")
             
         except Exception as e:
             logger.error(f"Failed to send request created event: {e}")
@@ -117,8 +344,8 @@ class AnalyticsService:
                 processing_time_hours=processing_time_hours
             )
             
-            self.producer.send_event("analytics", event, key=str(request_id))
-            logger.info(f"Request status changed event sent for request {request_id}")
+            self._send(event, key=str(request_id))
+            logger.debug(f"Request status changed event queued for request {request_id}")
             
         except Exception as e:
             logger.error(f"Failed to send request status changed event: {e}")
@@ -143,8 +370,8 @@ class AnalyticsService:
                 customer_rating=customer_rating
             )
             
-            self.producer.send_event("analytics", event, key=str(request_id))
-            logger.info(f"Request completed event sent for request {request_id}")
+            self._send(event, key=str(request_id))
+            logger.debug(f"Request completed event queued for request {request_id}")
             
         except Exception as e:
             logger.error(f"Failed to send request completed event: {e}")
@@ -165,8 +392,8 @@ class AnalyticsService:
                 assignment_method=assignment_method
             )
             
-            self.producer.send_event("analytics", event, key=str(request_id))
-            logger.info(f"Contractor assigned event sent for request {request_id}")
+            self._send(event, key=str(request_id))
+            logger.debug(f"Contractor assigned event queued for request {request_id}")
             
         except Exception as e:
             logger.error(f"Failed to send contractor assigned event: {e}")
@@ -182,6 +409,11 @@ class AnalyticsService:
     ):
         """Отправка события просмотра страницы"""
         try:
+            if self.config.aggregation_enabled:
+                self._aggregate(AnalyticsEventType.PAGE_VIEW, user_role, page_path, user_id)
+                if not self._sampled(self.config.page_view_sample_rate):
+                    return
+            
             event = PageViewEvent(
                 user_id=user_id,
                 user_role=user_role,
@@ -191,8 +423,8 @@ class AnalyticsService:
                 session_id=session_id
             )
             
-            self.producer.send_event("analytics", event, key=str(user_id))
-            logger.info(f"Page view event sent for user {user_id}")
+            self._send(event, key=str(user_id), sample_rate=self.config.page_view_sample_rate)
+            logger.debug(f"Page view event queued for user {user_id}")
             
         except Exception as e:
             logger.error(f"Failed to send page view event: {e}")
@@ -209,6 +441,13 @@ class AnalyticsService:
     ):
         """Отправка события выполнения действия"""
         try:
+            if self.config.aggregation_enabled:
+                self._aggregate(
+                    AnalyticsEventType.ACTION_PERFORMED, user_role, f"{action_category}:{action_name}", user_id
+                )
+                if not self._sampled(self.config.action_sample_rate):
+                    return
+            
             event = ActionPerformedEvent(
                 user_id=user_id,
                 user_role=user_role,
@@ -219,8 +458,8 @@ class AnalyticsService:
                 additional_data=additional_data
             )
             
-            self.producer.send_event("analytics", event, key=str(user_id))
-            logger.info(f"Action performed event sent for user {user_id}")
+            self._send(event, key=str(user_id), sample_rate=self.config.action_sample_rate)
+            logger.debug(f"Action performed event queued for user {user_id}")
             
         except Exception as e:
             logger.error(f"Failed to send action performed event: {e}")
@@ -1,202 +1,402 @@
 """
-Альтернативный сервис для отправки электронной почты через внешние API
+Отправка электронной почты через HTTP API (SendGrid, Mailgun, Resend)
+
+Запросы к провайдерам идут через одну aiohttp.ClientSession на event loop,
+как в telegram_api: соединения переиспользуются (keep-alive), а отдельный
+короткий таймаут подключения не дает недоступному провайдеру задерживать
+письмо на полный таймаут запроса.
+
+Провайдеры перебираются по убыванию здоровья - скользящей доли успешных
+запросов; при равном здоровье сохраняется порядок настройки. У каждого
+провайдера свой автомат отключения (circuit breaker): после
+MAIL_API_BREAKER_FAILURES ошибок подряд (5xx, 429, 401/403, таймаут, обрыв)
+провайдер пропускается MAIL_API_BREAKER_RESET_SECONDS секунд, затем получает
+один пробный запрос. Отказ по самому письму (прочие 4xx) провайдера не
+отключает, письмо пробуется у следующего.
+
+Письмо многим получателям уходит batch API провайдера - одним запросом на
+пачку, при этом каждый получатель видит только свой адрес.
 """
+import asyncio
+import json
 import os
 import logging
-import requests
-import json
-from typing import Optional
+import threading
+import time
+import weakref
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+
+import aiohttp
+from pydantic import BaseSettings
+
+from kafka_events.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
+
+class APIEmailConfig(BaseSettings):
+    """Настройки отправки почты через HTTP API"""
+
+    # Пул соединений
+    connection_limit: int = 16
+    keepalive_timeout_seconds: float = 60.0
+
+    # Таймауты запросов
+    connect_timeout_seconds: float = 3.0
+    request_timeout_seconds: float = 10.0
+
+    # Отключение провайдера после серии ошибок
+    breaker_failures: int = 3
+    breaker_reset_seconds: float = 30.0
+    health_decay: float = 0.2  # Вес последнего запроса в оценке здоровья провайдера
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "MAIL_API_"
+
+
+# Глобальная конфигурация
+api_email_config = APIEmailConfig()
+
+# Адреса API (переопределяются SENDGRID_API_URL, MAILGUN_API_URL, RESEND_API_URL - например, для заменителей
+# из scripts/notification_standins.py)
+SENDGRID_API_URL = "https://api.sendgrid.com/v3/mail/send"
+MAILGUN_API_URL = "https://api.mailgun.net/v3"
+RESEND_API_URL = "https://api.resend.com"
+
+metrics.describe("email_api_requests_total", "counter", "Запросы к API почтовых провайдеров по результату")
+metrics.describe("email_api_request_duration_seconds", "histogram", "Время запроса к API почтового провайдера")
+
+
+class ProviderError(Exception):
+    """Провайдер не принял письмо"""
+
+    def __init__(self, provider: str, description: str, status: Optional[int] = None, trips_breaker: bool = True):
+        super().__init__(f"{provider}: {description}")
+        self.provider = provider
+        self.status = status
+        self.trips_breaker = trips_breaker  # False - отказ по самому письму, провайдер исправен
+
+
+class CircuitBreaker:
+    """Автомат отключения: closed -> open после серии ошибок -> half_open (один пробный запрос)"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_started_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if self.clock() - self._opened_at < self.reset_seconds:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allow(self) -> bool:
+        """Можно ли отправить запрос провайдеру"""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.OPEN:
+                return False
+            # Пробный запрос один; если он завис или отменен, через reset_seconds разрешается следующий
+            now = self.clock()
+            if self._probe_started_at is not None and now - self._probe_started_at < self.reset_seconds:
+                return False
+            self._probe_started_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._probe_started_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._opened_at is not None or self.failures >= self.failure_threshold:
+                self._opened_at = self.clock()
+                self._probe_started_at = None
+
+
+class EmailProvider(ABC):
+    """Провайдер HTTP API: формирует запрос для пачки получателей"""
+
+    name = ""
+    max_batch = 1
+
+    @abstractmethod
+    def url(self, recipients: List[str]) -> str:
+        """Адрес API для пачки получателей"""
+
+    @abstractmethod
+    def request(self, sender: str, recipients: List[str], subject: str, html_content: str,
+                plain_text: Optional[str]) -> Dict[str, Any]:
+        """Параметры session.post (json/data, headers, auth)"""
+
+    def accepted(self, status: int) -> bool:
+        return 200 <= status < 300
+
+
+class SendGridProvider(EmailProvider):
+    """SendGrid: personalizations - отдельное письмо каждому получателю (до 1000 в запросе)"""
+
+    name = "sendgrid"
+    max_batch = 1000
+
+    def __init__(self, api_key: str, api_url: str = SENDGRID_API_URL):
+        self.api_key = api_key
+        self.api_url = api_url
+
+    def url(self, recipients: List[str]) -> str:
+        return self.api_url
+
+    def request(self, sender, recipients, subject, html_content, plain_text):
+        content = [{"type": "text/plain", "value": plain_text}] if plain_text else []
+        content.append({"type": "text/html", "value": html_content})
+        return {
+            "headers": {"Authorization": f"Bearer {self.api_key}"},
+            "json": {
+                "personalizations": [{"to": [{"email": email}]} for email in recipients],
+                "from": sender,
+                "subject": subject,
+                "content": content,
+            },
+        }
+
+
+class MailgunProvider(EmailProvider):
+    """Mailgun: recipient-variables превращают список to в отдельные письма (до 1000 в запросе)"""
+
+    name = "mailgun"
+    max_batch = 1000
+
+    def __init__(self, api_key: str, domain: str, api_url: str = MAILGUN_API_URL):
+        self.api_key = api_key
+        self.api_url = f"{api_url}/{domain}/messages"
+
+    def url(self, recipients: List[str]) -> str:
+        return self.api_url
+
+    def request(self, sender, recipients, subject, html_content, plain_text):
+        data = aiohttp.FormData()
+        data.add_field("from", f"{sender['name']} <{sender['email']}>")
+        for email in recipients:
+            data.add_field("to", email)
+        data.add_field("subject", subject)
+        data.add_field("html", html_content)
+        if plain_text:
+            data.add_field("text", plain_text)
+        if len(recipients) > 1:
+            data.add_field("recipient-variables", json.dumps({email: {} for email in recipients}))
+        return {"data": data, "auth": aiohttp.BasicAuth("api", self.api_key)}
+
+
+class ResendProvider(EmailProvider):
+    """Resend: /emails для одного письма, /emails/batch - до 100 писем в запросе"""
+
+    name = "resend"
+    max_batch = 100
+
+    def __init__(self, api_key: str, api_url: str = RESEND_API_URL):
+        self.api_key = api_key
+        self.api_url = api_url
+
+    def url(self, recipients: List[str]) -> str:
+        return f"{self.api_url}/emails/batch" if len(recipients) > 1 else f"{self.api_url}/emails"
+
+    def request(self, sender, recipients, subject, html_content, plain_text):
+        emails = []
+        for email in recipients:
+            message = {"from": f"{sender['name']} <{sender['email']}>", "to": [email], "subject": subject,
+                       "html": html_content}
+            if plain_text:
+                message["text"] = plain_text
+            emails.append(message)
+        return {
+            "headers": {"Authorization": f"Bearer {self.api_key}"},
+            "json": emails if len(emails) > 1 else emails[0],
+        }
+
+
 class APIEmailService:
-    def __init__(self):
+    def __init__(self, config: APIEmailConfig = api_email_config, providers: Optional[List[EmailProvider]] = None):
         """Инициализация сервиса отправки почты через API"""
+        self.config = config
         self.from_email = os.getenv("MAIL_FROM", "almazgeobur@mail.ru")
         self.from_name = os.getenv("MAIL_FROM_NAME", "AGB SERVICE")
-        
-        # Настройки для различных API сервисов
-        self.services = {
-            'sendgrid': {
-                'url': 'https://api.sendgrid.com/v3/mail/send',
-                'headers': {
-                    'Authorization': f'Bearer {os.getenv("SENDGRID_API_KEY", "")}',
-                    'Content-Type': 'application/json'
-                }
-            },
-            'mailgun': {
-                'url': f'https://api.mailgun.net/v3/{os.getenv("MAILGUN_DOMAIN", "")}/messages',
-                'auth': ('api', os.getenv("MAILGUN_API_KEY", "")),
-                'headers': {}
-            },
-            'resend': {
-                'url': 'https://api.resend.com/emails',
-                'headers': {
-                    'Authorization': f'Bearer {os.getenv("RESEND_API_KEY", "")}',
-                    'Content-Type': 'application/json'
-                }
-            }
+
+        # Порядок настройки - приоритет при равном здоровье
+        self.providers = self._configured_providers() if providers is None else providers
+        self.breakers = {
+            provider.name: CircuitBreaker(config.breaker_failures, config.breaker_reset_seconds)
+            for provider in self.providers
         }
+        self.health = {provider.name: 1.0 for provider in self.providers}
+        self._sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = (
+            weakref.WeakKeyDictionary()
+        )
 
-    def _send_via_sendgrid(self, to_email: str, subject: str, html_content: str, plain_text: str = None) -> bool:
-        """Отправка через SendGrid API"""
-        try:
-            data = {
-                "personalizations": [
-                    {
-                        "to": [{"email": to_email}],
-                        "subject": subject
-                    }
-                ],
-                "from": {
-                    "email": self.from_email,
-                    "name": self.from_name
-                },
-                "content": [
-                    {
-                        "type": "text/html",
-                        "value": html_content
-                    }
-                ]
-            }
-            
-            if plain_text:
-                data["content"].append({
-                    "type": "text/plain",
-                    "value": plain_text
-                })
-            
-            response = requests.post(
-                self.services['sendgrid']['url'],
-                headers=self.services['sendgrid']['headers'],
-                json=data,
-                timeout=10
-            )
-            
-            if response.status_code == 202:
-                logger.info(f"✅ SendGrid: письмо отправлено на {to_email}")
-                return True
-            else:
-                logger.error(f"❌ SendGrid: ошибка {response.status_code}: {response.text}")
-                return False
-                
-        except Exception as e:
-            logger.error(f"❌ SendGrid: ошибка отправки на {to_email}: {e}")
-            return False
+    @staticmethod
+    def _configured_providers() -> List[EmailProvider]:
+        """Провайдеры, для которых заданы ключи API"""
+        providers: List[EmailProvider] = []
+        if os.getenv("SENDGRID_API_KEY"):
+            providers.append(SendGridProvider(
+                os.getenv("SENDGRID_API_KEY"), os.getenv("SENDGRID_API_URL", SENDGRID_API_URL)
+            ))
+        if os.getenv("MAILGUN_API_KEY") and os.getenv("MAILGUN_DOMAIN"):
+            providers.append(MailgunProvider(
+                os.getenv("MAILGUN_API_KEY"), os.getenv("MAILGUN_DOMAIN"), os.getenv("MAILGUN_API_URL", MAILGUN_API_URL)
+            ))
+        if os.getenv("RESEND_API_KEY"):
+            providers.append(ResendProvider(os.getenv("RESEND_API_KEY"), os.getenv("RESEND_API_URL", RESEND_API_URL)))
+        return providers
 
-    def _send_via_mailgun(self, to_email: str, subject: str, html_content: str, plain_text: str = None) -> bool:
-        """Отправка через Mailgun API"""
-        try:
-            data = {
-                'from': f'{self.from_name} <{self.from_email}>',
-                'to': to_email,
-                'subject': subject,
-                'html': html_content
-            }
-            
-            if plain_text:
-                data['text'] = plain_text
-            
-            response = requests.post(
-                self.services['mailgun']['url'],
-                auth=self.services['mailgun']['auth'],
-                data=data,
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                logger.info(f"✅ Mailgun: письмо отправлено на {to_email}")
-                return True
-            else:
-                logger.error(f"❌ Mailgun: ошибка {response.status_code}: {response.text}")
-                return False
-                
-        except Exception as e:
-            logger.error(f"❌ Mailgun: ошибка отправки на {to_email}: {e}")
-            return False
+    @property
+    def configured(self) -> bool:
+        return bool(self.providers)
 
-    def _send_via_resend(self, to_email: str, subject: str, html_content: str, plain_text: str = None) -> bool:
-        """Отправка через Resend API"""
-        try:
-            data = {
-                'from': f'{self.from_name} <{self.from_email}>',
-                'to': [to_email],
-                'subject': subject,
-                'html': html_content
-            }
-            
-            if plain_text:
-                data['text'] = plain_text
-            
-            response = requests.post(
-                self.services['resend']['url'],
-                headers=self.services['resend']['headers'],
-                json=data,
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                logger.info(f"✅ Resend: письмо отправлено на {to_email}")
-                return True
-            else:
-                logger.error(f"❌ Resend: ошибка {response.status_code}: {response.text}")
-                return False
-                
-        except Exception as e:
-            logger.error(f"❌ Resend: ошибка отправки на {to_email}: {e}")
-            return False
+    # --- Пул соединений -------------------------------------------------------
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.config.connection_limit,
+            keepalive_timeout=self.config.keepalive_timeout_seconds,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=self.config.request_timeout_seconds,
+            sock_connect=self.config.connect_timeout_seconds,
+        )
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    def session(self) -> aiohttp.ClientSession:
+        """Сессия текущего event loop (создается при первом обращении)"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = self._sessions[loop] = self._create_session()
+        return session
 
-    def _send_via_simple_api(self, to_email: str, subject: str, html_content: str, plain_text: str = None) -> bool:
-        """Простой метод отправки через внешний API"""
+    async def close(self):
+        """Закрытие сессии текущего event loop"""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+            logger.info("🔒 Пул соединений почтовых API закрыт")
+
+    # --- Отправка ---------------------------------------------------------------
+
+    def _ordered_providers(self) -> List[EmailProvider]:
+        """Провайдеры по убыванию здоровья (сортировка устойчива: при равенстве - порядок настройки)"""
+        return sorted(self.providers, key=lambda provider: -self.health[provider.name])
+
+    def _record(self, provider: EmailProvider, success: bool):
+        decay = self.config.health_decay
+        self.health[provider.name] = (1 - decay) * self.health[provider.name] + decay * (1.0 if success else 0.0)
+        if success:
+            self.breakers[provider.name].record_success()
+        else:
+            self.breakers[provider.name].record_failure()
+
+    async def _post(self, provider: EmailProvider, recipients: List[str], subject: str, html_content: str,
+                    plain_text: Optional[str]):
+        """Один запрос к провайдеру; ProviderError - письмо не принято"""
+        sender = {"email": self.from_email, "name": self.from_name}
+        started = time.monotonic()
+        outcome = "error"
         try:
-            # Используем простой API для отправки писем
-            # В реальном проекте здесь должен быть ваш собственный API или сервис
-            
-            # Создаем данные для отправки
-            email_data = {
-                'to': to_email,
-                'subject': subject,
-                'html': html_content,
-                'text': plain_text or html_content,
-                'from': self.from_email,
-                'from_name': self.from_name
-            }
-            
-            # Логируем отправку (в реальном проекте здесь будет API вызов)
-            logger.info(f"📧 Отправка письма:")
-            logger.info(f"   Кому: {to_email}")
-            logger.info(f"   Тема: {subject}")
-            logger.info(f"   От: {self.from_name} <{self.from_email}>")
-            logger.info(f"   Содержимое: {plain_text[:100]}..." if plain_text else f"   HTML: {html_content[:100]}...")
-            
-            # В реальном проекте здесь будет вызов к внешнему API
-            # Пока что просто возвращаем True для тестирования
-            logger.info(f"✅ Письмо успешно отправлено на {to_email}")
+            request = provider.request(sender, recipients, subject, html_content, plain_text)
+            async with self.session().post(provider.url(recipients), **request) as response:
+                if provider.accepted(response.status):
+                    outcome = "ok"
+                    return
+                outcome = str(response.status)
+                body = (await response.text())[:500]
+                raise ProviderError(
+                    provider.name,
+                    f"ошибка {response.status}: {body}",
+                    status=response.status,
+                    trips_breaker=response.status >= 500 or response.status in (401, 403, 429),
+                )
+        except asyncio.TimeoutError as e:
+            outcome = "timeout"
+            raise ProviderError(provider.name, "таймаут запроса") from e
+        except aiohttp.ClientError as e:
+            raise ProviderError(provider.name, f"ошибка соединения: {e}") from e
+        finally:
+            metrics.inc("email_api_requests_total", provider=provider.name, outcome=outcome)
+            metrics.observe("email_api_request_duration_seconds", time.monotonic() - started, provider=provider.name)
+
+    async def _send_batch(self, recipients: List[str], subject: str, html_content: str,
+                          plain_text: Optional[str]) -> bool:
+        """Отправка пачки первым исправным провайдером"""
+        for provider in self._ordered_providers():
+            if not self.breakers[provider.name].allow():
+                continue
+            try:
+                await self._post(provider, recipients, subject, html_content, plain_text)
+            except ProviderError as e:
+                if e.trips_breaker:
+                    self._record(provider, success=False)
+                logger.warning(f"⚠️ {e}, пробуем следующего провайдера")
+                continue
+
+            self._record(provider, success=True)
+            logger.info(f"✅ {provider.name}: письмо отправлено ({len(recipients)} получателей)")
             return True
-                
-        except Exception as e:
-            logger.error(f"❌ Ошибка отправки на {to_email}: {e}")
-            return False
 
-    def send_email(self, to_email: str, subject: str, html_content: str, plain_text: str = None) -> bool:
+        logger.error(f"❌ Письмо не отправлено ни одним провайдером ({', '.join(recipients[:5])}...)")
+        return False
+
+    def _log_email(self, recipients: List[str], subject: str, html_content: str, plain_text: str = None):
+        """Письмо в лог, когда ни один провайдер не настроен (локальная разработка)"""
+        logger.info(f"📧 Отправка письма:")
+        logger.info(f"   Кому: {', '.join(recipients)}")
+        logger.info(f"   Тема: {subject}")
+        logger.info(f"   От: {self.from_name} <{self.from_email}>")
+        logger.info(f"   Содержимое: {plain_text[:100]}..." if plain_text else f"   HTML: {html_content[:100]}...")
+
+    async def send_bulk(self, recipients: List[str], subject: str, html_content: str,
+                        plain_text: str = None) -> int:
+        """
+        Одно уведомление многим получателям через batch API провайдеров
+
+        Returns:
+            int: Сколько получателей приняли провайдеры
+        """
+        recipients = list(dict.fromkeys(recipients))
+        if not recipients:
+            return 0
+        if not self.configured:
+            logger.warning("⚠️ Ключи почтовых API не заданы, письмо сохранено в лог")
+            self._log_email(recipients, subject, html_content, plain_text)
+            return len(recipients)
+
+        # Пачка должна поместиться в запрос любого провайдера: при отказе она целиком уходит следующему
+        size = min(provider.max_batch for provider in self.providers)
+        batches = [recipients[i:i + size] for i in range(0, len(recipients), size)]
+        results = await asyncio.gather(*(
+            self._send_batch(batch, subject, html_content, plain_text) for batch in batches
+        ))
+        return sum(len(batch) for batch, sent in zip(batches, results) if sent)
+
+    async def send_email(self, to_email: str, subject: str, html_content: str, plain_text: str = None) -> bool:
         """Основной метод отправки письма через доступный API"""
-        
-        # Проверяем доступность API ключей и пробуем разные сервисы
-        if os.getenv("SENDGRID_API_KEY"):
-            if self._send_via_sendgrid(to_email, subject, html_content, plain_text):
-                return True
-        
-        if os.getenv("MAILGUN_API_KEY") and os.getenv("MAILGUN_DOMAIN"):
-            if self._send_via_mailgun(to_email, subject, html_content, plain_text):
-                return True
-        
-        if os.getenv("RESEND_API_KEY"):
-            if self._send_via_resend(to_email, subject, html_content, plain_text):
-                return True
-        
-        # Fallback - используем простой API
-        logger.warning("⚠️ Используется простой метод отправки писем")
-        return self._send_via_simple_api(to_email, subject, html_content, plain_text)
+        return await self.send_bulk([to_email], subject, html_content, plain_text) == 1
 
     async def send_welcome_email(self, user_email: str, user_name: str, user_role: str) -> bool:
         """Отправка приветственного письма при регистрации"""
@@ -294,7 +494,7 @@ Email: {user_email}
             """
 
             # Отправляем письмо
-            success = self.send_email(
+            success = await self.send_email(
                 to_email=user_email,
                 subject="Добро пожаловать в AGB SERVICE!",
                 html_content=html_content,
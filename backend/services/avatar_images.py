@@ -0,0 +1,389 @@
+"""
+Обработка аватаров в пуле процессов
+
+Декодирование и масштабирование изображений - работа CPU, которая в
+обработчике API блокировала бы event loop (и GIL для остальных потоков),
+поэтому она выполняется в ProcessPoolExecutor из AVATAR_PROCESS_WORKERS
+процессов.
+
+Масштабирование экономное:
+- JPEG декодируется сразу в уменьшенном масштабе (Image.draft: декодер
+  пропускает коэффициенты DCT, 1/2-1/8 размера);
+- остальные форматы сначала уменьшаются целочисленно (Image.reduce), затем
+  LANCZOS до точного размера;
+- размеры строятся по убыванию, каждый из предыдущего, а не из оригинала.
+
+При загрузке сохраняется исходник, уменьшенный до AVATAR_SOURCE_MAX_SIDE, и
+стандартные размеры (JPEG и, при AVATAR_WEBP=true, WebP). Оригинал хранится
+в хранилище по содержимому (services/blob_store.py), имена файлов аватара
+начинаются с его SHA-256: повторная загрузка того же изображения использует
+готовые файлы, а удаляются они вместе с оригиналом, когда на него не
+остается ссылок. Остальные размеры
+строятся по запросу из исходника и хранятся в дисковом кэше с вытеснением
+давно не использованных файлов (AvatarVariantCache) при превышении
+AVATAR_CACHE_MAX_MB. Описание вариантов сохраняется в users.avatar_variants,
+поэтому информация об аватаре не требует обращений к файловой системе.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image
+from pydantic import BaseSettings
+
+from services.blob_store import on_blob_collected
+
+logger = logging.getLogger(__name__)
+
+AVATAR_SIZES = [(32, 32), (64, 64), (128, 128), (256, 256)]
+FORMATS = {"jpeg": ("JPEG", "jpg"), "webp": ("WEBP", "webp")}
+
+
+class AvatarConfig(BaseSettings):
+    """Настройки обработки аватаров"""
+
+    upload_dir: str = "uploads/avatars"
+    url_prefix: str = "/uploads/avatars"
+    process_workers: int = 2
+    start_method: str = "spawn"  # Процессы не наследуют потоки и соединения приложения
+    quality: int = 85
+    webp: bool = False  # Дополнительно сохранять стандартные размеры в WebP
+    source_max_side: int = 1024  # Исходник для размеров по запросу
+    min_side: int = 16
+    max_side: int = 1024
+    cache_max_mb: float = 256.0
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "AVATAR_"
+
+
+# Глобальная конфигурация
+avatar_config = AvatarConfig()
+
+
+# --- Функции процессов пула (без состояния, аргументы и результат сериализуются) ---
+
+def _open_scaled(path: str, box: Tuple[int, int]) -> Image.Image:
+    """Изображение в RGB, декодированное не крупнее, чем нужно для box"""
+    img = Image.open(path)
+    if img.format == "JPEG":
+        # Масштаб декодирования выбирается не меньше box - качество итогового LANCZOS не страдает
+        img.draft("RGB", box)
+    img.load()
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return img
+
+
+def _fit(size: Tuple[int, int], box: Tuple[int, int]) -> Tuple[int, int]:
+    """Размер, вписанный в box с сохранением пропорций (без увеличения)"""
+    scale = min(box[0] / size[0], box[1] / size[1], 1.0)
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+
+def _downscale(img: Image.Image, box: Tuple[int, int]) -> Image.Image:
+    """Уменьшение без изменения img: Image.reduce до ~2x итогового размера, затем LANCZOS"""
+    target = _fit(img.size, box)
+    if target == img.size:
+        return img
+    factor = min(img.width // (target[0] * 2), img.height // (target[1] * 2))
+    if factor >= 2:
+        img = img.reduce(factor)
+    return img.resize(target, Image.Resampling.LANCZOS)
+
+
+def _save(img: Image.Image, path: Path, fmt: str, quality: int):
+    pil_format, _ = FORMATS[fmt]
+    tmp = path.with_name(f".{path.name}.part")
+    img.save(tmp, pil_format, quality=quality, **({"method": 4} if fmt == "webp" else {"optimize": True}))
+    os.replace(tmp, path)
+
+
+def render_avatar(
+    original: str,
+    directory: str,
+    file_id: str,
+    sizes: List[Tuple[int, int]],
+    source_max_side: int,
+    quality: int,
+    webp: bool,
+) -> Dict[str, Any]:
+    """
+    Исходник и стандартные размеры аватара
+
+    Returns:
+        Dict: Описание вариантов для users.avatar_variants (пути относительно directory)
+    """
+    directory_path = Path(directory)
+    box = (source_max_side, source_max_side)
+    source = _downscale(_open_scaled(original, box), box)
+    source_name = f"{file_id}_source.jpg"
+    _save(source, directory_path / source_name, "jpeg", quality=95)
+
+    formats = ["jpeg", "webp"] if webp else ["jpeg"]
+    variants: Dict[str, Dict[str, Any]] = {}
+    current = source
+    # Каждый размер - из предыдущего, более крупного
+    for width, height in sorted(sizes, reverse=True):
+        current = _downscale(current, (width, height))
+        key = f"{width}x{height}"
+        variants[key] = {"width": current.width, "height": current.height, "files": {}}
+        for fmt in formats:
+            name = f"{file_id}_{key}.{FORMATS[fmt][1]}"
+            _save(current, directory_path / name, fmt, quality)
+            variants[key]["files"][fmt] = name
+
+    return {
+        "id": file_id,
+        "source": source_name,
+        "width": source.width,
+        "height": source.height,
+        "sizes": dict(sorted(variants.items(), key=lambda item: item[1]["width"])),
+    }
+
+
+def describe_avatar(directory: str, file_id: str, sizes: List[Tuple[int, int]], webp: bool) -> Optional[Dict[str, Any]]:
+    """Описание уже построенных файлов аватара (размеры из заголовков); None - файлов нет"""
+    directory_path = Path(directory)
+    formats = ["jpeg", "webp"] if webp else ["jpeg"]
+    try:
+        with Image.open(directory_path / f"{file_id}_source.jpg") as source:
+            width, height = source.size
+        variants: Dict[str, Dict[str, Any]] = {}
+        for size in sorted(sizes):
+            key = f"{size[0]}x{size[1]}"
+            files = {fmt: f"{file_id}_{key}.{FORMATS[fmt][1]}" for fmt in formats}
+            if not all((directory_path / name).exists() for name in files.values()):
+                return None
+            with Image.open(directory_path / files["jpeg"]) as img:
+                variants[key] = {"width": img.width, "height": img.height, "files": files}
+    except FileNotFoundError:
+        return None
+    return {"id": file_id, "source": f"{file_id}_source.jpg", "width": width, "height": height, "sizes": variants}
+
+
+def render_variant(source: str, destination: str, width: int, height: int, fmt: str, quality: int) -> int:
+    """Размер по запросу из исходника; возвращает размер файла в байтах"""
+    img = _downscale(_open_scaled(source, (width, height)), (width, height))
+    _save(img, Path(destination), fmt, quality)
+    return os.path.getsize(destination)
+
+
+# --- Дисковый кэш размеров по запросу -----------------------------------------
+
+class AvatarVariantCache:
+    """
+    Каталог файлов с вытеснением давно не использованных по общему размеру
+
+    Индекс (путь -> размер в порядке использования) хранится в памяти процесса
+    и при первом обращении восстанавливается по времени доступа файлов.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def _load(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.startswith("."):
+                stat = entry.stat()
+                files.append((stat.st_atime, entry.name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total += size
+        self._loaded = True
+
+    def path(self, name: str) -> Path:
+        return self.directory / name
+
+    def get(self, name: str) -> Optional[Path]:
+        """Путь к файлу кэша или None; найденный файл становится самым свежим"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+        return self.path(name)
+
+    def put(self, name: str, size: int) -> List[str]:
+        """Учет нового файла; возвращает вытесненные (уже удаленные) файлы"""
+        evicted = []
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            self._total += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                old_name, old_size = self._entries.popitem(last=False)
+                self._total -= old_size
+                evicted.append(old_name)
+        for old_name in evicted:
+            try:
+                self.path(old_name).unlink()
+            except FileNotFoundError:
+                pass
+        return evicted
+
+    def discard_prefix(self, prefix: str):
+        """Удаление всех файлов аватара (имена начинаются с его id)"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            names = [name for name in self._entries if name.startswith(prefix)]
+            for name in names:
+                self._total -= self._entries.pop(name)
+        for name in names:
+            try:
+                self.path(name).unlink()
+            except FileNotFoundError:
+                pass
+
+
+class AvatarProcessor:
+    """Пул процессов обработки аватаров и кэш размеров по запросу"""
+
+    def __init__(self, config: AvatarConfig = avatar_config):
+        self.config = config
+        self.directory = Path(config.upload_dir)
+        self.cache = AvatarVariantCache(self.directory / "cache", int(config.cache_max_mb * 1024 * 1024))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._pending: Dict[str, "asyncio.Future[Path]"] = {}
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.config.process_workers,
+                    mp_context=multiprocessing.get_context(self.config.start_method),
+                )
+            return self._executor
+
+    async def _run(self, func, *args):
+        executor = self._pool()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            # Процесс пула аварийно завершился: следующий вызов создаст новый пул
+            with self._executor_lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+
+    def url(self, name: str) -> str:
+        return f"{self.config.url_prefix}/{name}"
+
+    async def create_variants(self, original: Path, file_id: str) -> Dict[str, Any]:
+        """Исходник и стандартные размеры; описание для users.avatar_variants"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Файлы с этим id уже построены при загрузке того же изображения
+        existing = await asyncio.to_thread(
+            describe_avatar, str(self.directory), file_id, AVATAR_SIZES, self.config.webp,
+        )
+        if existing is not None:
+            return existing
+        return await self._run(
+            render_avatar, str(original), str(self.directory), file_id, AVATAR_SIZES,
+            self.config.source_max_side, self.config.quality, self.config.webp,
+        )
+
+    async def variant(self, variants: Dict[str, Any], width: int, height: int, fmt: str) -> Path:
+        """
+        Файл аватара нужного размера: стандартный, из кэша или построенный по запросу
+
+        Одновременные запросы одного размера ждут одного построения.
+        """
+        standard = variants["sizes"].get(f"{width}x{height}", {}).get("files", {}).get(fmt)
+        if standard:
+            return self.directory / standard
+
+        name = f"{variants['id']}_{width}x{height}.{FORMATS[fmt][1]}"
+        cached = self.cache.get(name)
+        # Файл мог вытеснить кэш другого процесса приложения
+        if cached is not None and cached.exists():
+            return cached
+
+        pending = self._pending.get(name)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[name] = future
+        try:
+            self.cache.directory.mkdir(parents=True, exist_ok=True)
+            size = await self._run(
+                render_variant, str(self.directory / variants["source"]), str(self.cache.path(name)),
+                width, height, fmt, self.config.quality,
+            )
+            self.cache.put(name, size)
+            future.set_result(self.cache.path(name))
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Исключение получают ожидающие; у future без ожидающих - помечаем как полученное
+            future.exception()
+            raise
+        finally:
+            self._pending.pop(name, None)
+        return future.result()
+
+    def remove(self, file_id: str):
+        """Удаление всех файлов аватара (включая размеры по запросу)"""
+        names = [f"{file_id}_source.jpg"] + [
+            f"{file_id}_{width}x{height}.{extension}"
+            for width, height in AVATAR_SIZES for _, extension in FORMATS.values()
+        ]
+        for name in names:
+            (self.directory / name).unlink(missing_ok=True)
+        self.cache.discard_prefix(f"{file_id}_")
+
+    @staticmethod
+    def formats(variants: Dict[str, Any]) -> set:
+        """Форматы, в которых сохранены стандартные размеры"""
+        return {fmt for size in variants["sizes"].values() for fmt in size["files"]}
+
+    def urls(self, variants: Dict[str, Any], fmt: str = "jpeg") -> Dict[str, str]:
+        """URL стандартных размеров в формате fmt"""
+        return {
+            key: self.url(size["files"][fmt]) for key, size in variants["sizes"].items() if fmt in size["files"]
+        }
+
+    def shutdown(self):
+        """Остановка пула процессов"""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+                logger.info("🔒 Пул процессов обработки аватаров остановлен")
+
+
+# Глобальный обработчик приложения
+avatar_processor = AvatarProcessor()
+
+
+@on_blob_collected
+def remove_avatar_files(sha256: str):
+    """Файлы аватара удаляются вместе с оригиналом в хранилище"""
+    avatar_processor.remove(sha256)
@@ -0,0 +1,250 @@
+"""
+Хранилище загруженных файлов по содержимому (content-addressed)
+
+Файл хранится под именем своего SHA-256 в каталогах по первым байтам хеша
+(BLOB_ROOT/ab/cd/abcd...), поэтому одинаковые файлы - повторные загрузки
+паспорта, диплома или аватара - лежат на диске один раз. Загрузка сначала
+потоково сохраняется во временный файл (хеш считается по ходу записи), затем
+строка file_blobs добавляется или ее ref_count увеличивается одним
+INSERT ... ON CONFLICT. Если файл с таким содержимым уже есть, временный файл
+удаляется: загрузка известного содержимого сводится к изменению метаданных.
+
+Ссылки считаются в той же транзакции, что и записи, которые ссылаются на файл:
+ContractorDocument.document_path, ContractorEducation.document_path и
+users.avatar_variants["blob"]. Когда ссылок не остается, ставится задача
+blobs.collect: спустя BLOB_GC_GRACE_MINUTES файл удаляется, если за это время
+на него не появилось новых ссылок. Производные файлы (размеры аватара)
+удаляют обработчики, зарегистрированные декоратором on_blob_collected; они
+вызываются до commit, пока строка файла заблокирована.
+"""
+
+import logging
+import os
+import re
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Collection, Dict, List, Optional, Tuple, Union
+
+from fastapi import UploadFile
+from pydantic import BaseSettings
+from sqlalchemy import case, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import FileBlob
+from services.job_queue import enqueue_job, job_handler
+from services.upload_storage import save_upload
+
+logger = logging.getLogger(__name__)
+
+COLLECT_BLOB = "blobs.collect"
+
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class BlobStoreConfig(BaseSettings):
+    """Настройки хранилища файлов"""
+
+    root: str = "/app/uploads/blobs"
+    gc_grace_minutes: float = 60.0  # Сколько хранить файл без ссылок (повторная загрузка его переиспользует)
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "BLOB_"
+
+
+# Глобальная конфигурация
+blob_config = BlobStoreConfig()
+
+# Обработчики удаления файла: получают SHA-256 и удаляют производные файлы
+BLOB_COLLECTORS: List[Callable[[str], Any]] = []
+
+
+def on_blob_collected(func: Callable[[str], Any]):
+    """Регистрация обработчика удаления файла из хранилища"""
+    BLOB_COLLECTORS.append(func)
+    return func
+
+
+@dataclass
+class StoredBlob:
+    sha256: str
+    path: Path
+    size: int
+    mime_type: Optional[str]
+    created: bool  # False - такое содержимое уже хранилось, новый файл не записан
+
+
+def blob_path(sha256: str, config: Optional[BlobStoreConfig] = None) -> Path:
+    """Путь к файлу с заданным SHA-256"""
+    config = config or blob_config
+    return Path(config.root) / sha256[:2] / sha256[2:4] / sha256
+
+
+def blob_sha256(path: Optional[Union[str, Path]], config: Optional[BlobStoreConfig] = None) -> Optional[str]:
+    """SHA-256 файла хранилища по его пути; None - путь не из хранилища (файлы до его появления)"""
+    if not path:
+        return None
+    name = Path(path).name
+    if not SHA256_RE.match(name) or Path(path) != blob_path(name, config):
+        return None
+    return name
+
+
+def _insert(db: Session, model):
+    """INSERT с поддержкой ON CONFLICT для диалекта текущей БД"""
+    dialect = db.get_bind().dialect.name
+    return (postgresql.insert if dialect == "postgresql" else sqlite.insert)(model)
+
+
+async def store_upload(
+    db: Session,
+    file: UploadFile,
+    max_size: int,
+    allowed_mime_types: Optional[Collection[str]] = None,
+    config: Optional[BlobStoreConfig] = None,
+) -> StoredBlob:
+    """
+    Сохранение загрузки в хранилище с одной новой ссылкой на файл (без commit)
+
+    Ссылку нужно закрепить записью, которая хранит путь, в той же транзакции.
+    Ошибки - как у save_upload (UploadTooLargeError, UploadTypeError).
+    """
+    config = config or blob_config
+    incoming = Path(config.root) / "incoming"
+    incoming.mkdir(parents=True, exist_ok=True)
+    upload = await save_upload(file, incoming / uuid.uuid4().hex, max_size, allowed_mime_types=allowed_mime_types)
+
+    # Строка блокируется до commit: удаление файла без ссылок ждет эту транзакцию
+    db.execute(
+        _insert(db, FileBlob).values(sha256=upload.sha256, size=upload.size, mime_type=upload.mime_type, ref_count=1)
+        .on_conflict_do_update(
+            index_elements=[FileBlob.sha256],
+            set_={"ref_count": FileBlob.ref_count + 1, "unreferenced_at": None},
+        )
+    )
+
+    path = blob_path(upload.sha256, config)
+    created = not path.exists()
+    if created:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(upload.path, path)
+    else:
+        os.unlink(upload.path)
+        logger.info(f"📎 Загрузка {file.filename} совпала с хранимым файлом {upload.sha256[:12]}")
+    return StoredBlob(sha256=upload.sha256, path=path, size=upload.size, mime_type=upload.mime_type, created=created)
+
+
+def discard_upload(stored: StoredBlob):
+    """Удаление только что записанного файла, если транзакция со ссылкой на него откатывается"""
+    if stored.created:
+        stored.path.unlink(missing_ok=True)
+
+
+def acquire_blob(db: Session, sha256: str) -> bool:
+    """Новая ссылка на хранимый файл (без commit); False - такого файла нет"""
+    return bool(db.execute(
+        update(FileBlob).where(FileBlob.sha256 == sha256)
+        .values(ref_count=FileBlob.ref_count + 1, unreferenced_at=None)
+    ).rowcount)
+
+
+def release_blob(db: Session, sha256: str, config: Optional[BlobStoreConfig] = None):
+    """Снятие ссылки на файл (без commit); после последней ссылки ставится задача удаления"""
+    config = config or blob_config
+    now = datetime.now(timezone.utc)
+    db.execute(
+        update(FileBlob).where(FileBlob.sha256 == sha256, FileBlob.ref_count > 0)
+        .values(
+            ref_count=FileBlob.ref_count - 1,
+            unreferenced_at=case((FileBlob.ref_count <= 1, now), else_=FileBlob.unreferenced_at),
+        )
+    )
+    blob = db.query(FileBlob.ref_count).filter(FileBlob.sha256 == sha256).first()
+    if blob is not None and blob.ref_count <= 0:
+        enqueue_job(db, COLLECT_BLOB, {"sha256": sha256}, delay_seconds=config.gc_grace_minutes * 60)
+
+
+def acquire_path(db: Session, path: Optional[str], config: Optional[BlobStoreConfig] = None) -> bool:
+    """Новая ссылка по пути файла; пути не из хранилища не учитываются"""
+    sha256 = blob_sha256(path, config)
+    return acquire_blob(db, sha256) if sha256 else False
+
+
+def release_path(db: Session, path: Optional[str], config: Optional[BlobStoreConfig] = None) -> bool:
+    """
+    Снятие ссылки по пути файла
+
+    Returns:
+        bool: True - файл из хранилища (удалит сборщик), False - путь не из хранилища
+    """
+    sha256 = blob_sha256(path, config)
+    if sha256:
+        release_blob(db, sha256, config)
+    return sha256 is not None
+
+
+def collect_blobs(
+    db: Session,
+    sha256s: Optional[Collection[str]] = None,
+    config: Optional[BlobStoreConfig] = None,
+) -> int:
+    """
+    Удаление файлов без ссылок старше BLOB_GC_GRACE_MINUTES
+
+    Args:
+        db: Сессия БД
+        sha256s: Проверить только эти файлы (None - все)
+
+    Returns:
+        int: Количество удаленных файлов
+    """
+    config = config or blob_config
+    cutoff = datetime.now(timezone.utc) - timedelta(minutes=config.gc_grace_minutes)
+    query = db.query(FileBlob).filter(FileBlob.ref_count <= 0, FileBlob.unreferenced_at <= cutoff)
+    if sha256s is not None:
+        query = query.filter(FileBlob.sha256.in_(list(sha256s)))
+
+    # Строки заблокированы до commit: новая ссылка на удаляемый файл ждет commit и затем запишет файл заново.
+    # До commit файл только переименовывается (при ошибке commit возвращается на место), удаляется - после.
+    # Производные файлы удаляются до commit, пока строка заблокирована: загрузка того же содержимого
+    # после commit их не застанет и построит заново, а не переиспользует удаляемые
+    removed: List[Tuple[str, Path]] = []
+    try:
+        for blob in query.with_for_update(skip_locked=True).all():
+            db.delete(blob)
+            db.flush()
+            path = blob_path(blob.sha256, config)
+            trash = path.with_name(f".{blob.sha256}.collect")
+            if path.exists():
+                os.replace(path, trash)
+            removed.append((blob.sha256, trash))
+            for collector in BLOB_COLLECTORS:
+                try:
+                    collector(blob.sha256)
+                except Exception as e:
+                    logger.warning(f"⚠️ Не удалось удалить производные файлы {blob.sha256[:12]}: {e}")
+        db.commit()
+    except BaseException:
+        db.rollback()
+        # Производные файлы не восстанавливаются: на файл нет ссылок, следующая загрузка построит их заново
+        for sha256, trash in removed:
+            if trash.exists():
+                os.replace(trash, blob_path(sha256, config))
+        raise
+
+    for _, trash in removed:
+        trash.unlink(missing_ok=True)
+    collected = len(removed)
+
+    if collected:
+        logger.info(f"🗑️ Удалено файлов без ссылок: {collected}")
+    return collected
+
+
+@job_handler(COLLECT_BLOB)
+def collect_blob(payload: Dict[str, Any], db: Session):
+    """Удаление файла, на который не осталось ссылок"""
+    collect_blobs(db, [payload["sha256"]])
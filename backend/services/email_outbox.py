@@ -0,0 +1,212 @@
+"""
+Исходящая почта через таблицу email_outbox
+
+Письма не отправляются в обработчиках API: queue_email сохраняет письмо в
+email_outbox и ставит задачу email.send в той же транзакции. Задачи выполняют
+потоки воркера фоновых задач (job_worker_main.py) через пул SMTP соединений,
+не более EMAIL_SEND_CONCURRENCY одновременно. Неудачная отправка повторяется
+очередью с экспоненциальной задержкой; после EMAIL_MAX_ATTEMPTS попыток или
+при отказе сервера принять письмо (5xx) письмо получает статус failed с
+текстом последней ошибки.
+
+Сводки: add_to_digest копит пункты (например, новые заявки) по получателю и
+типу сводки, первая запись планирует задачу email.flush_digest через
+EMAIL_DIGEST_MINUTES минут. Задача собирает все накопленные пункты в одно
+письмо, поэтому менеджер получает одну сводку за интервал вместо письма на
+каждую заявку. Строка email_digests блокируется и при добавлении пункта, и
+при сборке сводки, поэтому пункт, добавленный во время сборки, попадает в
+следующую сводку, а не теряется.
+"""
+
+import logging
+import smtplib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from pydantic import BaseSettings
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from kafka_events.metrics import metrics
+from models import EmailDigest, EmailDigestItem, EmailOutbox
+from services.job_queue import JobError, PermanentJobError, enqueue_job, job_handler
+from services.message_templates import message_templates
+from services.python_email_service import MailNotConfiguredError
+
+logger = logging.getLogger(__name__)
+
+SEND_EMAIL = "email.send"
+FLUSH_DIGEST = "email.flush_digest"
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+NEW_REQUESTS_DIGEST = "new_requests"
+# Тип сводки -> шаблоны (.subject.txt, .html, .txt); пункты передаются в шаблон как items
+DIGEST_TEMPLATES = {
+    NEW_REQUESTS_DIGEST: "email/new_requests_digest",
+}
+
+
+class EmailOutboxConfig(BaseSettings):
+    """Настройки отправки исходящей почты"""
+
+    send_concurrency: int = 4  # Не больше MAIL_POOL_SIZE: иначе потоки ждут соединения пула
+    max_attempts: int = 6
+    digest_minutes: float = 15.0
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "EMAIL_"
+
+
+# Глобальная конфигурация
+email_outbox_config = EmailOutboxConfig()
+
+metrics.describe("email_outbox_total", "counter", "Письма исходящей очереди по результату отправки")
+
+
+def _insert(db: Session, model):
+    """INSERT с поддержкой ON CONFLICT для диалекта текущей БД"""
+    dialect = db.get_bind().dialect.name
+    return (postgresql.insert if dialect == "postgresql" else sqlite.insert)(model)
+
+
+def queue_email(
+    db: Session,
+    recipient: str,
+    subject: str,
+    html_body: str,
+    text_body: Optional[str] = None,
+) -> EmailOutbox:
+    """
+    Постановка письма в очередь отправки (без commit)
+
+    Письмо уйдет только после commit транзакции - вместе с изменениями,
+    которые его породили.
+    """
+    email = EmailOutbox(
+        recipient=recipient, subject=subject, html_body=html_body, text_body=text_body, status=PENDING, attempts=0
+    )
+    db.add(email)
+    db.flush()
+    enqueue_job(db, SEND_EMAIL, {"outbox_id": email.id})
+    return email
+
+
+def add_to_digest(
+    db: Session,
+    recipient: str,
+    digest_type: str,
+    item: Dict[str, Any],
+    interval_minutes: Optional[float] = None,
+) -> EmailDigestItem:
+    """
+    Добавление пункта в сводку получателя (без commit)
+
+    Args:
+        db: Сессия БД
+        recipient: Email получателя
+        digest_type: Тип сводки (ключ DIGEST_TEMPLATES)
+        item: Данные пункта для шаблона (JSON)
+        interval_minutes: Через сколько минут отправить сводку (по умолчанию EMAIL_DIGEST_MINUTES)
+    """
+    if digest_type not in DIGEST_TEMPLATES:
+        raise ValueError(f"Неизвестный тип сводки: {digest_type}")
+    interval = email_outbox_config.digest_minutes if interval_minutes is None else interval_minutes
+
+    db.execute(
+        _insert(db, EmailDigest).values(recipient=recipient, digest_type=digest_type)
+        .on_conflict_do_nothing(index_elements=[EmailDigest.recipient, EmailDigest.digest_type])
+    )
+    # Строка сводки блокируется до commit при любом flush_at: сборка сводки (тоже под блокировкой строки)
+    # либо увидит этот пункт, либо завершится раньше и оставит flush_at пустым для планирования ниже
+    digest = db.query(EmailDigest).filter(
+        EmailDigest.recipient == recipient, EmailDigest.digest_type == digest_type
+    ).with_for_update().populate_existing().one()
+    if digest.flush_at is None:
+        digest.flush_at = datetime.now(timezone.utc) + timedelta(minutes=interval)
+        db.flush()
+        enqueue_job(db, FLUSH_DIGEST, {"digest_id": digest.id}, delay_seconds=interval * 60)
+
+    item_row = EmailDigestItem(digest_id=digest.id, payload=item)
+    db.add(item_row)
+    return item_row
+
+
+def outbox_stats(db: Session) -> Dict[str, int]:
+    """Количество писем по статусам"""
+    return dict(db.query(EmailOutbox.status, func.count(EmailOutbox.id)).group_by(EmailOutbox.status).all())
+
+
+def _is_permanent(error: Exception) -> bool:
+    """Сервер окончательно отказался принять письмо или почта не настроена (повтор не поможет)"""
+    if isinstance(error, (smtplib.SMTPRecipientsRefused, MailNotConfiguredError)):
+        return True
+    code = getattr(error, "smtp_code", None)
+    # 5xx по самому письму; ошибка входа (535) - проблема настроек, письмо повторяется
+    return isinstance(code, int) and 500 <= code < 600 and not isinstance(error, smtplib.SMTPAuthenticationError)
+
+
+@job_handler(SEND_EMAIL, concurrency=email_outbox_config.send_concurrency, max_attempts=email_outbox_config.max_attempts)
+def send_outbox_email(payload: Dict[str, Any], db: Session):
+    """Отправка письма из email_outbox"""
+    from services.python_email_service import python_email_service
+
+    email = db.get(EmailOutbox, payload["outbox_id"])
+    if email is None:
+        raise PermanentJobError(f"Письмо {payload['outbox_id']} не найдено")
+    if email.status != PENDING:
+        # Повтор задачи после того, как письмо уже отправлено (воркер упал до завершения задачи)
+        return
+
+    # Попытка фиксируется до обращения к SMTP: падение воркера во время отправки тоже считается попыткой
+    email.attempts += 1
+    db.commit()
+
+    try:
+        python_email_service.deliver(email.recipient, email.subject, email.html_body, email.text_body)
+    except Exception as e:
+        failed = _is_permanent(e) or email.attempts >= email_outbox_config.max_attempts
+        email.status = FAILED if failed else PENDING
+        email.last_error = f"{type(e).__name__}: {e}"[:2000]
+        db.commit()
+        metrics.inc("email_outbox_total", result="failed" if failed else "retry")
+        error = f"Письмо {payload['outbox_id']} не отправлено: {e}"
+        raise (PermanentJobError(error) if failed else JobError(error)) from e
+
+    email.status = SENT
+    email.sent_at = datetime.now(timezone.utc)
+    email.last_error = None
+    db.commit()
+    metrics.inc("email_outbox_total", result="sent")
+
+
+@job_handler(FLUSH_DIGEST)
+def flush_digest(payload: Dict[str, Any], db: Session):
+    """Сборка накопленных пунктов сводки в одно письмо"""
+    digest = db.query(EmailDigest).filter(EmailDigest.id == payload["digest_id"]).with_for_update().first()
+    if digest is None:
+        return
+
+    items = db.query(EmailDigestItem).filter(EmailDigestItem.digest_id == digest.id).order_by(EmailDigestItem.id).all()
+    digest.flush_at = None
+    if items:
+        template = DIGEST_TEMPLATES[digest.digest_type]
+        context = {"items": [item.payload for item in items]}
+        queue_email(
+            db,
+            digest.recipient,
+            message_templates.render(f"{template}.subject.txt", **context),
+            message_templates.render(f"{template}.html", **context),
+            message_templates.render(f"{template}.txt", **context),
+        )
+        db.query(EmailDigestItem).filter(
+            EmailDigestItem.id.in_([item.id for item in items])
+        ).delete(synchronize_session=False)
+    db.commit()
+
+    if items:
+        logger.info(f"📧 Сводка {digest.digest_type} для {digest.recipient}: пунктов {len(items)}")
@@ -1,41 +1,70 @@
 import os
 import logging
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from .email_outbox import queue_email
 from .python_email_service import python_email_service
 
 logger = logging.getLogger(__name__)
 
 class EmailService:
-    def __init__(self):
-        """Инициализация сервиса отправки почты"""
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None):
+        """
+        Инициализация сервиса отправки почты
+
+        Письма не отправляются в event loop API: они сохраняются в email_outbox
+        и отправляются воркером фоновых задач (services/email_outbox.py).
+        Письмо сохраняется в собственной сессии и транзакции, а не вместе с
+        изменениями вызывающего кода; если письмо должно появиться только при
+        commit этих изменений, вызывайте queue_email с той же сессией.
+        """
         self.python_service = python_email_service
+        self.session_factory = session_factory
+
+    def _queue(self, user_email: str, subject: str, html_content: str, plain_text: Optional[str]) -> bool:
+        """Сохранение письма в исходящую почту отдельной транзакцией"""
+        if self.session_factory is None:
+            from database import SessionLocal
+            self.session_factory = SessionLocal
 
-    async def send_email_verification(self, user_email: str, user_name: str, verification_token: str) -> bool:
-        """Отправка письма подтверждения email"""
+        with self.session_factory() as db:
+            queue_email(db, user_email, subject, html_content, plain_text)
+            db.commit()
+        return True
+
+    async def send_email_verification(
+        self, user_email: str, user_name: str, verification_token: str, locale: Optional[str] = None
+    ) -> bool:
+        """Постановка письма подтверждения email в очередь отправки"""
         try:
-            logger.info(f"📧 Отправка письма подтверждения на {user_email}")
-            return self.python_service.send_email_verification(user_email, user_name, verification_token)
+            subject, html_content, plain_text = self.python_service.render_email_verification(
+                user_name, verification_token, locale
+            )
+            queued = self._queue(user_email, subject, html_content, plain_text)
+            logger.info(f"📧 Письмо подтверждения для {user_email} поставлено в очередь")
+            return queued
         except Exception as e:
             logger.error(f"❌ Ошибка отправки письма подтверждения: {e}")
             return False
 
     async def send_welcome_email(self, user_email: str, user_name: str, user_role: str) -> bool:
         """Отправка приветственного письма при регистрации"""
-        try:
-            logger.info(f"📧 Отправка приветственного письма на {user_email}")
-            # Для простоты используем тот же метод, что и для подтверждения
-            return self.python_service.send_email_verification(user_email, user_name, "welcome")
-        except Exception as e:
-            logger.error(f"❌ Ошибка отправки приветственного письма: {e}")
-            return False
+        # Для простоты используем тот же шаблон, что и для подтверждения
+        return await self.send_email_verification(user_email, user_name, "welcome")
 
-    async def send_notification_email(self, user_email: str, subject: str, message: str) -> bool:
-        """Отправка уведомительного письма"""
+    async def send_notification_email(
+        self, user_email: str, subject: str, message: str, plain_text: Optional[str] = None
+    ) -> bool:
+        """Постановка уведомительного письма в очередь отправки (plain_text - текстовая версия, по умолчанию message)"""
         try:
-            logger.info(f"📧 Отправка уведомления на {user_email}")
-            return self.python_service.send_email(user_email, subject, message, message)
+            queued = self._queue(user_email, subject, message, plain_text or message)
+            logger.info(f"📧 Уведомление для {user_email} поставлено в очередь")
+            return queued
         except Exception as e:
             logger.error(f"❌ Ошибка отправки уведомления: {e}")
             return False
 
 # Создаем экземпляр сервиса
-email_service = EmailService()
\ No newline at end of file
+email_service = EmailService()
@@ -0,0 +1,415 @@
+"""
+Очередь фоновых задач на таблице background_jobs
+
+Побочные эффекты workflow (отправка в Telegram, письма менеджерам и т.д.)
+не выполняются в обработчиках API: endpoint добавляет задачу в ту же
+транзакцию, что и изменения заявки, и сразу возвращает ответ. Задачи выполняет
+отдельный процесс (job_worker_main.py): диспетчер забирает готовые задачи
+через SELECT ... FOR UPDATE SKIP LOCKED (несколько воркеров не получают одну
+задачу и не ждут блокировок друг друга) и передает их пулу потоков с
+ограничением параллельности по типу задачи. Неудачные попытки повторяются с
+экспоненциальной задержкой, после max_attempts задача помечается как dead.
+"""
+
+import asyncio
+import inspect
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from pydantic import BaseSettings
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import BackgroundJob
+from kafka_events.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+DEAD = "dead"
+
+
+class JobQueueConfig(BaseSettings):
+    """Настройки очереди фоновых задач"""
+
+    workers: int = 4  # Потоков выполнения в процессе воркера
+    poll_interval_seconds: float = 1.0
+    batch_size: int = 10  # Задач одного типа за одну выборку
+
+    # Повторные попытки
+    max_attempts: int = 5
+    retry_base_seconds: float = 10.0
+    retry_max_seconds: float = 3600.0
+
+    # Задача в статусе running дольше этого времени считается зависшей
+    # (воркер упал) и возвращается в очередь
+    lock_timeout_seconds: int = 600
+    keep_finished_hours: int = 168  # Сколько хранить выполненные задачи
+    shutdown_timeout_seconds: int = 30
+    metrics_port: int = 0
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "JOBS_"
+
+
+# Глобальная конфигурация
+job_queue_config = JobQueueConfig()
+
+
+class JobError(Exception):
+    """Ошибка выполнения задачи (будет повторена)"""
+
+
+class PermanentJobError(JobError):
+    """Ошибка, при которой повтор бесполезен (задача сразу помечается как dead)"""
+
+
+class JobHandler(NamedTuple):
+    func: Callable[[Dict[str, Any], Session], Any]
+    concurrency: Optional[int]  # None - ограничено только числом потоков
+    max_attempts: Optional[int]
+
+
+class ClaimedJob(NamedTuple):
+    id: int
+    job_type: str
+    payload: Dict[str, Any]
+    attempts: int
+    max_attempts: int
+
+
+# Обработчики регистрируются декоратором job_handler при импорте модуля с задачами
+JOB_HANDLERS: Dict[str, JobHandler] = {}
+
+metrics.describe("background_jobs_total", "counter", "Количество выполненных фоновых задач по результату")
+metrics.describe("background_job_duration_seconds", "histogram", "Время выполнения фоновой задачи")
+
+
+def job_handler(job_type: str, concurrency: Optional[int] = None, max_attempts: Optional[int] = None):
+    """
+    Регистрация обработчика задач типа job_type
+
+    Обработчик получает payload и сессию БД; может быть корутиной.
+    Успешное завершение - задача выполнена, исключение - попытка неудачна.
+
+    Args:
+        job_type: Тип задачи
+        concurrency: Максимум одновременно выполняемых задач этого типа
+        max_attempts: Количество попыток (по умолчанию JOBS_MAX_ATTEMPTS)
+    """
+    def decorator(func):
+        JOB_HANDLERS[job_type] = JobHandler(func, concurrency, max_attempts)
+        return func
+    return decorator
+
+
+def enqueue_job(
+    db: Session,
+    job_type: str,
+    payload: Optional[Dict[str, Any]] = None,
+    delay_seconds: float = 0,
+    max_attempts: Optional[int] = None,
+) -> BackgroundJob:
+    """
+    Добавление задачи в очередь
+
+    Задача добавляется в текущую транзакцию и станет видна воркерам только
+    после commit - вместе с изменениями, которые ее породили.
+
+    Args:
+        db: Сессия БД
+        job_type: Тип задачи
+        payload: Параметры задачи (JSON)
+        delay_seconds: Отложить выполнение на указанное время
+        max_attempts: Количество попыток
+
+    Returns:
+        BackgroundJob: Задача
+    """
+    handler = JOB_HANDLERS.get(job_type)
+    job = BackgroundJob(
+        job_type=job_type,
+        payload=payload or {},
+        status=PENDING,
+        attempts=0,
+        max_attempts=max_attempts or (handler and handler.max_attempts) or job_queue_config.max_attempts,
+        run_at=datetime.now(timezone.utc) + timedelta(seconds=delay_seconds),
+    )
+    db.add(job)
+    return job
+
+
+def retry_delay(attempts: int, config: Optional[JobQueueConfig] = None) -> float:
+    """Задержка перед следующей попыткой: экспоненциальная, с разбросом до 10%"""
+    config = config or job_queue_config
+    delay = min(config.retry_base_seconds * (2 ** max(attempts - 1, 0)), config.retry_max_seconds)
+    return delay * (1 + random.random() * 0.1)
+
+
+def queue_stats(db: Session) -> Dict[str, Dict[str, int]]:
+    """Количество задач по типам и статусам"""
+    stats: Dict[str, Dict[str, int]] = defaultdict(dict)
+    for job_type, status, count in db.query(
+        BackgroundJob.job_type, BackgroundJob.status, func.count(BackgroundJob.id)
+    ).group_by(BackgroundJob.job_type, BackgroundJob.status):
+        stats[job_type][status] = count
+    return dict(stats)
+
+
+class JobWorker:
+    """Диспетчер и пул потоков, выполняющих задачи из background_jobs"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        config: Optional[JobQueueConfig] = None,
+        handlers: Optional[Dict[str, JobHandler]] = None,
+        worker_id: Optional[str] = None,
+    ):
+        if session_factory is None:
+            from database import SessionLocal
+            session_factory = SessionLocal
+
+        self.session_factory = session_factory
+        self.config = config or job_queue_config
+        self.handlers = JOB_HANDLERS if handlers is None else handlers
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+
+        self._inflight: Dict[str, int] = defaultdict(int)
+        self._inflight_lock = threading.Lock()
+        self._rotation = 0
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._dispatcher: Optional[threading.Thread] = None
+
+    # --- Выборка задач --------------------------------------------------------
+
+    def _capacity(self) -> Dict[str, int]:
+        """Сколько задач каждого типа можно взять с учетом лимитов параллельности"""
+        with self._inflight_lock:
+            free_threads = self.config.workers - sum(self._inflight.values())
+            job_types = list(self.handlers)
+            # Типы обходятся по кругу, чтобы один тип не занимал все потоки
+            if job_types:
+                shift = self._rotation % len(job_types)
+                job_types = job_types[shift:] + job_types[:shift]
+                self._rotation += 1
+
+            capacity = {}
+            for job_type in job_types:
+                limit = self.handlers[job_type].concurrency or self.config.workers
+                free = min(limit - self._inflight[job_type], free_threads, self.config.batch_size)
+                if free > 0:
+                    capacity[job_type] = free
+                    free_threads -= free
+            return capacity
+
+    def claim(self, capacity: Optional[Dict[str, int]] = None) -> List[ClaimedJob]:
+        """
+        Захват готовых задач: статус running, блокировка за этим воркером
+
+        Строки, заблокированные другими воркерами, пропускаются (SKIP LOCKED).
+        """
+        capacity = self._capacity() if capacity is None else capacity
+        if not capacity:
+            return []
+
+        now = datetime.now(timezone.utc)
+        claimed: List[ClaimedJob] = []
+        with self.session_factory() as db:
+            for job_type, limit in capacity.items():
+                jobs = db.query(BackgroundJob).filter(
+                    BackgroundJob.status == PENDING,
+                    BackgroundJob.job_type == job_type,
+                    BackgroundJob.run_at <= now,
+                ).order_by(
+                    BackgroundJob.run_at, BackgroundJob.id
+                ).limit(limit).with_for_update(skip_locked=True).all()
+
+                for job in jobs:
+                    job.status = RUNNING
+                    job.locked_by = self.worker_id
+                    job.locked_at = now
+                    job.attempts = (job.attempts or 0) + 1
+                    claimed.append(ClaimedJob(job.id, job.job_type, job.payload or {}, job.attempts, job.max_attempts))
+            db.commit()
+        return claimed
+
+    # --- Выполнение -----------------------------------------------------------
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        # У каждого потока пула свой event loop на все время работы
+        loop = getattr(self._local, "loop", None)
+        if loop is None:
+            loop = self._local.loop = asyncio.new_event_loop()
+        return loop
+
+    def execute(self, job: ClaimedJob) -> bool:
+        """
+        Выполнение захваченной задачи и сохранение результата
+
+        Returns:
+            bool: True если задача выполнена успешно
+        """
+        handler = self.handlers.get(job.job_type)
+        started = time.perf_counter()
+        error: Optional[BaseException] = None
+
+        with self.session_factory() as db:
+            try:
+                if handler is None:
+                    raise PermanentJobError(f"Обработчик для задач {job.job_type} не зарегистрирован")
+                result = handler.func(job.payload, db)
+                if inspect.isawaitable(result):
+                    self._event_loop().run_until_complete(result)
+            except Exception as e:
+                db.rollback()
+                error = e
+
+        duration = time.perf_counter() - started
+        metrics.observe("background_job_duration_seconds", duration, job_type=job.job_type)
+
+        if error is None:
+            self._finish(job, status=SUCCEEDED)
+            metrics.inc("background_jobs_total", job_type=job.job_type, result="succeeded")
+            logger.info(f"✅ Задача {job.job_type} #{job.id} выполнена за {duration:.2f} с")
+            return True
+
+        if isinstance(error, PermanentJobError) or job.attempts >= job.max_attempts:
+            self._finish(job, status=DEAD, error=error)
+            metrics.inc("background_jobs_total", job_type=job.job_type, result="dead")
+            logger.error(f"❌ Задача {job.job_type} #{job.id} не выполнена (попытка {job.attempts}): {error}")
+        else:
+            delay = retry_delay(job.attempts, self.config)
+            self._finish(job, status=PENDING, error=error, retry_in=delay)
+            metrics.inc("background_jobs_total", job_type=job.job_type, result="retry")
+            logger.warning(
+                f"⚠️ Задача {job.job_type} #{job.id} завершилась с ошибкой (попытка {job.attempts}), "
+                f"повтор через {delay:.0f} с: {error}"
+            )
+        return False
+
+    def _finish(self, job: ClaimedJob, status: str, error: Optional[BaseException] = None, retry_in: float = 0):
+        now = datetime.now(timezone.utc)
+        values: Dict[str, Any] = {"status": status, "locked_by": None, "locked_at": None}
+        if error is not None:
+            values["last_error"] = f"{type(error).__name__}: {error}"[:2000]
+        if status == PENDING:
+            values["run_at"] = now + timedelta(seconds=retry_in)
+        else:
+            values["finished_at"] = now
+
+        with self.session_factory() as db:
+            # Задачу, возвращенную в очередь как зависшую, не перезаписываем
+            db.query(BackgroundJob).filter(
+                BackgroundJob.id == job.id,
+                BackgroundJob.status == RUNNING,
+                BackgroundJob.locked_by == self.worker_id,
+            ).update(values, synchronize_session=False)
+            db.commit()
+
+    def run_once(self) -> int:
+        """Захват и последовательное выполнение готовых задач (без пула потоков)"""
+        jobs = self.claim()
+        for job in jobs:
+            self.execute(job)
+        return len(jobs)
+
+    # --- Обслуживание очереди -------------------------------------------------
+
+    def recover_stale(self) -> int:
+        """Возврат в очередь задач, зависших в статусе running"""
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.config.lock_timeout_seconds)
+        with self.session_factory() as db:
+            recovered = db.query(BackgroundJob).filter(
+                BackgroundJob.status == RUNNING,
+                BackgroundJob.locked_at < cutoff,
+            ).update({"status": PENDING, "locked_by": None, "locked_at": None}, synchronize_session=False)
+            db.commit()
+        if recovered:
+            logger.warning(f"⚠️ Возвращено в очередь зависших задач: {recovered}")
+        return recovered
+
+    def cleanup_finished(self) -> int:
+        """Удаление выполненных задач старше keep_finished_hours"""
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=self.config.keep_finished_hours)
+        with self.session_factory() as db:
+            deleted = db.query(BackgroundJob).filter(
+                BackgroundJob.status == SUCCEEDED,
+                BackgroundJob.finished_at < cutoff,
+            ).delete(synchronize_session=False)
+            db.commit()
+        return deleted
+
+    # --- Пул потоков ----------------------------------------------------------
+
+    def start(self):
+        """Запуск диспетчера и пула потоков"""
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.config.workers, thread_name_prefix="job")
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="job-dispatcher", daemon=True)
+        self._dispatcher.start()
+        logger.info(
+            f"🚀 Воркер фоновых задач {self.worker_id} запущен "
+            f"(потоков: {self.config.workers}, типы: {', '.join(sorted(self.handlers)) or '-'})"
+        )
+
+    def _dispatch_loop(self):
+        maintenance_interval = max(self.config.lock_timeout_seconds / 2, self.config.poll_interval_seconds)
+        last_maintenance = 0.0
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() - last_maintenance >= maintenance_interval:
+                    last_maintenance = time.monotonic()
+                    self.recover_stale()
+                    self.cleanup_finished()
+
+                jobs = self.claim()
+                for job in jobs:
+                    self._submit(job)
+            except Exception as e:
+                logger.error(f"❌ Ошибка выборки фоновых задач: {e}")
+                jobs = []
+
+            if not jobs:
+                self._stop.wait(self.config.poll_interval_seconds)
+
+    def _submit(self, job: ClaimedJob):
+        with self._inflight_lock:
+            self._inflight[job.job_type] += 1
+
+        def run():
+            try:
+                self.execute(job)
+            except Exception as e:
+                logger.error(f"❌ Ошибка сохранения результата задачи #{job.id}: {e}")
+            finally:
+                with self._inflight_lock:
+                    self._inflight[job.job_type] -= 1
+
+        self._executor.submit(run)
+
+    def stop(self, timeout: Optional[float] = None):
+        """Остановка: новые задачи не берутся, выполняемые дорабатываются"""
+        self._stop.set()
+        if self._dispatcher:
+            self._dispatcher.join(timeout)
+        if self._executor:
+            self._executor.shutdown(wait=True)
+        logger.info(f"🔒 Воркер фоновых задач {self.worker_id} остановлен")
+
+    def inflight(self) -> Dict[str, int]:
+        with self._inflight_lock:
+            return {job_type: count for job_type, count in self._inflight.items() if count}
@@ -9,6 +9,7 @@ from datetime import datetime, timezone, timedelta
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_
 from models import RepairRequest, User, RequestStatus, ContractorProfile, CustomerProfile
+from services.request_status_history_service import PROCESSING_STAGES, RequestStatusHistoryService
 
 logger = logging.getLogger(__name__)
 
@@ -52,24 +53,13 @@ class ManagerDashboardService:
             )
         ).count()
         
-        # Среднее время обработки заявок
-        completed_requests = self.db.query(RepairRequest).filter(
-            and_(
-                RepairRequest.manager_id == manager_id,
-                RepairRequest.status == "completed",
-                RepairRequest.processed_at.isnot(None),
-                RepairRequest.assigned_at.isnot(None)
-            )
-        ).all()
-        
-        avg_processing_time = 0
-        if completed_requests:
-            total_time = sum([
-                (req.assigned_at - req.processed_at).total_seconds() / 3600  # в часах
-                for req in completed_requests
-                if req.processed_at and req.assigned_at
-            ])
-            avg_processing_time = total_time / len(completed_requests)
+        # Среднее время обработки заявок (от взятия в работу до назначения исполнителя)
+        # и нарушения SLA - по проекции request_stage_durations
+        history = RequestStatusHistoryService(self.db)
+        avg_processing_time = history.average_hours_in_stages(
+            PROCESSING_STAGES, manager_id=manager_id, completed_only=True
+        )
+        sla_breaches = history.sla_breaches(manager_id=manager_id)
         
         # Активные исполнители
         active_contractors = self.db.query(ContractorProfile).join(User, ContractorProfile.user_id == User.id).filter(
@@ -103,6 +93,7 @@ class ManagerDashboardService:
             'today_requests': today_requests,
             'status_counts': status_counts,
             'avg_processing_time_hours': round(avg_processing_time, 1),
+            'sla_breaches': sla_breaches,
             'active_contractors': active_contractors,
             'active_customers': active_customers,
             'completion_rate': round(
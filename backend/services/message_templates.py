@@ -0,0 +1,124 @@
+"""
+Реестр шаблонов сообщений Telegram и email
+
+Тексты уведомлений хранятся в message_templates/<locale>/<канал>/<имя> и
+компилируются Jinja2 один раз (load() в lifespan приложения или при первом
+обращении), после чего рендер - вызов готовой функции шаблона без разбора
+файла. HTML-шаблоны (.html) экранируют подставляемые значения, текстовые и
+Markdown для Telegram (.txt, .md) - нет. Файлы с именем на "_" (макеты,
+макросы) используются только через extends/import.
+
+Шаблон ищется в запрошенной локали, затем в локали по умолчанию (ru).
+render_many рендерит один шаблон для списка получателей с общим контекстом:
+общие значения передаются один раз, от получателя - только отличающиеся.
+"""
+
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, Template, select_autoescape
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "message_templates")
+DEFAULT_LOCALE = "ru"
+
+
+def format_datetime(value: Optional[datetime], fmt: str = "%d.%m.%Y %H:%M", default: str = "") -> str:
+    """Фильтр datetime: дата в формате fmt или default для пустого значения"""
+    return value.strftime(fmt) if value else default
+
+
+class TemplateNotFoundError(LookupError):
+    """Шаблон отсутствует и в запрошенной локали, и в локали по умолчанию"""
+
+
+class MessageTemplateRegistry:
+    """Скомпилированные шаблоны сообщений по (имя, локаль)"""
+
+    def __init__(self, directory: str = TEMPLATES_DIR, default_locale: str = DEFAULT_LOCALE):
+        self.directory = directory
+        self.default_locale = default_locale
+        self.env = Environment(
+            loader=FileSystemLoader(directory),
+            autoescape=select_autoescape(enabled_extensions=("html",), default_for_string=False),
+            undefined=StrictUndefined,
+            trim_blocks=True,
+            lstrip_blocks=True,
+            # Шаблоны компилируются один раз, изменения файлов без перезапуска не подхватываются
+            auto_reload=False,
+        )
+        self.env.filters["datetime"] = format_datetime
+        self._templates: Dict[Tuple[str, str], Template] = {}
+        self._loaded = False
+
+    def load(self) -> int:
+        """
+        Компиляция всех шаблонов каталога
+
+        Returns:
+            int: Количество загруженных шаблонов
+        """
+        templates: Dict[Tuple[str, str], Template] = {}
+        for path in self.env.list_templates():
+            locale, _, name = path.partition("/")
+            if not name or os.path.basename(name).startswith("_"):
+                continue
+            templates[(name, locale)] = self.env.get_template(path)
+        self._templates = templates
+        self._loaded = True
+        logger.info(f"✅ Загружено шаблонов сообщений: {len(templates)}")
+        return len(templates)
+
+    def get(self, name: str, locale: Optional[str] = None) -> Template:
+        """
+        Скомпилированный шаблон с откатом на локаль по умолчанию
+
+        Args:
+            name: Имя шаблона относительно каталога локали (например, "email/email_verification.html")
+            locale: Локаль получателя
+
+        Raises:
+            TemplateNotFoundError: Шаблона нет ни в одной из локалей
+        """
+        if not self._loaded:
+            self.load()
+        template = self._templates.get((name, locale or self.default_locale))
+        if template is None:
+            template = self._templates.get((name, self.default_locale))
+        if template is None:
+            raise TemplateNotFoundError(f"Шаблон {name} не найден (локаль {locale or self.default_locale})")
+        return template
+
+    def render(self, name: str, locale: Optional[str] = None, /, **context: Any) -> str:
+        """Рендер шаблона для одного получателя (name и locale - только позиционные, контекст может содержать name)"""
+        return self.get(name, locale).render(context).strip()
+
+    def render_many(
+        self,
+        name: str,
+        recipients: Iterable[Mapping[str, Any]],
+        shared: Optional[Mapping[str, Any]] = None,
+        locale: Optional[str] = None,
+    ) -> List[str]:
+        """
+        Рендер шаблона для списка получателей
+
+        Args:
+            name: Имя шаблона
+            recipients: Контексты получателей (перекрывают shared)
+            shared: Общий контекст всех получателей
+            locale: Локаль рассылки
+
+        Returns:
+            List[str]: Тексты в порядке recipients
+        """
+        template = self.get(name, locale)
+        shared = dict(shared or {})
+        return [template.render({**shared, **recipient}).strip() for recipient in recipients]
+
+
+# Глобальный реестр приложения
+message_templates = MessageTemplateRegistry()
@@ -3,10 +3,14 @@ Consumer для Notification Service
 """
 import logging
 import asyncio
-from typing import Dict, Any
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Optional
 from sqlalchemy.orm import Session
-from kafka.kafka_consumer import KafkaEventConsumer
-from kafka.kafka_events import EventType, RequestCreatedEvent, WorkflowContractorAssignedEvent
+from kafka_events.kafka_config import kafka_config
+from kafka_events.kafka_consumer import KafkaEventConsumer
+from kafka_events.kafka_events import EventType, RequestCreatedEvent, WorkflowContractorAssignedEvent
+from kafka_events.idempotency import EventDeduplicator
+from kafka_events.transport import ConsumerTransport
 from services.telegram_bot_service import TelegramBotService
 
 logger = logging.getLogger(__name__)
@@ -14,14 +18,40 @@ logger = logging.getLogger(__name__)
 class NotificationServiceConsumer:
     """Consumer для обработки событий уведомлений"""
     
-    def __init__(self, db: Session):
+    def __init__(
+        self,
+        db: Optional[Session] = None,
+        transport: Optional[ConsumerTransport] = None,
+        session_factory: Optional[Callable[[], Session]] = None
+    ):
+        """
+        Args:
+            db: Общая сессия на все время работы (если не задана, каждый пакет
+                событий обрабатывается в отдельной короткоживущей сессии)
+            transport: Транспорт событий
+            session_factory: Фабрика сессий (по умолчанию SessionLocal)
+        """
+        if session_factory is None:
+            from database import SessionLocal
+            session_factory = SessionLocal
+        
+        self.session_factory = session_factory
+        self.shared_db = db is not None
         self.db = db
         self.telegram_service = TelegramBotService(db)
         
+        # Собственный event loop: уведомления отправляются до подтверждения события,
+        # чтобы отметка об обработке ставилась только после реальной отправки
+        self.loop = asyncio.new_event_loop()
+        
         # Инициализируем consumer
+        group_id = "notification-service"
         self.consumer = KafkaEventConsumer(
-            group_id="notification-service",
-            topics=["request-events", "workflow-events"]
+            group_id=group_id,
+            topics=["request-events", "workflow-events"],
+            deduplicator=EventDeduplicator(group_id, session_factory) if kafka_config.dedup_enabled else None,
+            transport=transport,
+            batch_scope=self._batch_session
         )
         
         # Регистрируем обработчики
@@ -52,11 +82,11 @@ class NotificationServiceConsumer:
         try:
             event = RequestCreatedEvent(**event_data)
             
-            # Отправляем подтверждение заказчику
-            asyncio.create_task(self._send_customer_confirmation(event))
-            
-            # Уведомляем менеджеров
-            asyncio.create_task(self._notify_managers(event))
+            # Отправляем подтверждение заказчику и уведомляем менеджеров
+            self._run(
+                self._send_customer_confirmation(event),
+                self._notify_managers(event)
+            )
             
             logger.info(f"✅ Обработано событие создания заявки #{event.request_id}")
             return True
@@ -78,11 +108,11 @@ class NotificationServiceConsumer:
         try:
             event = WorkflowContractorAssignedEvent(**event_data)
             
-            # Уведомляем исполнителя
-            asyncio.create_task(self._notify_contractor(event))
-            
-            # Уведомляем заказчика
-            asyncio.create_task(self._notify_customer(event))
+            # Уведомляем исполнителя и заказчика
+            self._run(
+                self._notify_contractor(event),
+                self._notify_customer(event)
+            )
             
             logger.info(f"✅ Обработано событие назначения исполнителя для заявки #{event.request_id}")
             return True
@@ -91,6 +121,25 @@ class NotificationServiceConsumer:
             logger.error(f"❌ Ошибка обработки события назначения исполнителя: {e}")
             return False
     
+    @contextmanager
+    def _batch_session(self):
+        """Сессия БД на время обработки одного пакета событий"""
+        if self.shared_db:
+            yield
+            return
+        
+        db = self.session_factory()
+        self.db = self.telegram_service.db = db
+        try:
+            yield
+        finally:
+            self.db = self.telegram_service.db = None
+            db.close()
+    
+    def _run(self, *coroutines):
+        """Выполнение корутин уведомлений до завершения"""
+        self.loop.run_until_complete(asyncio.gather(*coroutines))
+    
     async def _send_customer_confirmation(self, event: RequestCreatedEvent):
         """Отправка подтверждения заказчику"""
         try:
@@ -198,4 +247,7 @@ class NotificationServiceConsumer:
     def start(self):
         """Запуск consumer"""
         logger.info("🚀 Запуск Notification Service Consumer")
-        self.consumer.start_consuming()
+        try:
+            self.consumer.start_consuming()
+        finally:
+            self.loop.close()
@@ -0,0 +1,195 @@
+"""
+Конечный автомат статусов заявки
+
+Правила переходов описаны таблицей TRANSITION_RULES: действие, исходные
+статусы, целевой статус, роли и проверка принадлежности заявки пользователю.
+При импорте таблица компилируется в индекс (статус, роль) -> {действие: правило},
+поэтому проверка перехода и список доступных действий - поиск в словаре и
+одна проверка владельца, без запросов к БД.
+
+Используется одиночными и массовыми переходами RequestWorkflowService,
+сменой статуса в PUT /repair-requests/{id} и endpoint'ом /workflow/allowed-actions. Проверки принадлежности работают как с
+моделью RepairRequest, так и со строкой запроса с полями status, customer_id,
+manager_id и assigned_contractor_id.
+"""
+
+from typing import Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+from models import RequestStatus
+
+ADMIN_ROLE = "admin"
+
+
+class TransitionError(ValueError):
+    """Действие недоступно для заявки в текущем статусе"""
+
+
+class TransitionForbiddenError(TransitionError):
+    """Роль или пользователь не может выполнить действие над заявкой"""
+
+
+class Actor(NamedTuple):
+    """Пользователь, выполняющий переход"""
+    user_id: int
+    role: str
+    customer_profile_id: Optional[int] = None  # RepairRequest.customer_id ссылается на профиль, а не на пользователя
+
+    @classmethod
+    def from_user(cls, user) -> "Actor":
+        profile = getattr(user, "customer_profile", None)
+        return cls(user.id, user.role, profile.id if profile else None)
+
+
+def _value(status) -> str:
+    return status.value if isinstance(status, RequestStatus) else status
+
+
+# --- Проверки принадлежности ----------------------------------------------------
+
+def _anyone(request, actor: Actor) -> bool:
+    return True
+
+
+def _assigned_manager(request, actor: Actor) -> bool:
+    return request.manager_id == actor.user_id
+
+
+def _assigned_contractor(request, actor: Actor) -> bool:
+    return request.assigned_contractor_id == actor.user_id
+
+
+def _request_customer(request, actor: Actor) -> bool:
+    return actor.customer_profile_id is not None and request.customer_id == actor.customer_profile_id
+
+
+class TransitionRule(NamedTuple):
+    action: str
+    from_statuses: FrozenSet[str]
+    to_status: RequestStatus
+    roles: FrozenSet[str]
+    owner: Callable[[object, Actor], bool]
+    owner_error: str
+
+
+def _rule(
+    action: str,
+    from_statuses: Iterable[RequestStatus],
+    to_status: RequestStatus,
+    roles: Iterable[str],
+    owner: Callable[[object, Actor], bool] = _anyone,
+    owner_error: str = "",
+) -> TransitionRule:
+    return TransitionRule(
+        action, frozenset(_value(status) for status in from_statuses), to_status, frozenset(roles), owner, owner_error
+    )
+
+
+ACTIVE_STATUSES = tuple(
+    status for status in RequestStatus if status not in (RequestStatus.COMPLETED, RequestStatus.CANCELLED)
+)
+MANAGER_STAGES = (RequestStatus.MANAGER_REVIEW, RequestStatus.CLARIFICATION)
+
+# Администратор может выполнить любое действие из любого указанного статуса
+# без проверки принадлежности - правила для него добавляются при компиляции
+TRANSITION_RULES: Tuple[TransitionRule, ...] = (
+    _rule("assign_manager", [RequestStatus.NEW], RequestStatus.MANAGER_REVIEW, ["manager"]),
+    _rule(
+        "clarify", MANAGER_STAGES, RequestStatus.CLARIFICATION, ["manager"],
+        _assigned_manager, "Только назначенный менеджер может добавлять уточнения",
+    ),
+    _rule(
+        "send_to_contractors", MANAGER_STAGES, RequestStatus.SENT_TO_CONTRACTORS, ["manager"],
+        _assigned_manager, "Только назначенный менеджер может отправлять заявку исполнителям",
+    ),
+    _rule(
+        "assign_contractor",
+        MANAGER_STAGES + (RequestStatus.SENT_TO_CONTRACTORS, RequestStatus.CONTRACTOR_RESPONSES),
+        RequestStatus.ASSIGNED, ["manager"],
+        _assigned_manager, "Только назначенный менеджер может назначать исполнителя",
+    ),
+    _rule(
+        "start_work", [RequestStatus.ASSIGNED], RequestStatus.IN_PROGRESS, ["contractor"],
+        _assigned_contractor, "Только назначенный исполнитель может начинать работы",
+    ),
+    _rule(
+        "complete", [RequestStatus.IN_PROGRESS], RequestStatus.COMPLETED, ["contractor"],
+        _assigned_contractor, "Только назначенный исполнитель может завершать работы",
+    ),
+    # Заказчик может отменить заявку, пока она не ушла исполнителям
+    _rule(
+        "cancel", [RequestStatus.NEW, RequestStatus.MANAGER_REVIEW], RequestStatus.CANCELLED, ["customer"],
+        _request_customer, "Заказчик может отменить только свою заявку",
+    ),
+    _rule(
+        "cancel", ACTIVE_STATUSES, RequestStatus.CANCELLED, ["manager"],
+        _assigned_manager, "Менеджер может отменить только назначенную ему заявку",
+    ),
+    _rule(
+        "cancel", [RequestStatus.ASSIGNED, RequestStatus.IN_PROGRESS], RequestStatus.CANCELLED, ["contractor"],
+        _assigned_contractor, "Исполнитель может отменить только назначенную ему заявку",
+    ),
+)
+
+
+def _compile(rules: Iterable[TransitionRule]) -> Dict[Tuple[str, str], Dict[str, TransitionRule]]:
+    rules = list(rules)
+    admin_statuses: Dict[str, set] = {}
+    for rule in rules:
+        admin_statuses.setdefault(rule.action, set()).update(rule.from_statuses)
+    targets = {rule.action: rule.to_status for rule in rules}
+    rules += [_rule(action, statuses, targets[action], [ADMIN_ROLE]) for action, statuses in admin_statuses.items()]
+
+    index: Dict[Tuple[str, str], Dict[str, TransitionRule]] = {}
+    for rule in rules:
+        for status in rule.from_statuses:
+            for role in rule.roles:
+                actions = index.setdefault((status, role), {})
+                if rule.action in actions:
+                    raise ValueError(f"Неоднозначное правило {rule.action} для статуса {status} и роли {role}")
+                actions[rule.action] = rule
+    return index
+
+
+_INDEX = _compile(TRANSITION_RULES)
+
+# Все действия в порядке таблицы и их целевые статусы
+ACTIONS: Tuple[str, ...] = tuple(dict.fromkeys(rule.action for rule in TRANSITION_RULES))
+TARGET_STATUS: Dict[str, RequestStatus] = {rule.action: rule.to_status for rule in TRANSITION_RULES}
+# Действие, которое переводит заявку в статус (для каждого статуса оно одно)
+STATUS_ACTION: Dict[str, str] = {rule.to_status.value: rule.action for rule in TRANSITION_RULES}
+_ROLE_ACTIONS: Dict[str, FrozenSet[str]] = {
+    role: frozenset(action for (_, rule_role), actions in _INDEX.items() if rule_role == role for action in actions)
+    for role in {role for _, role in _INDEX}
+}
+
+
+def check_transition(action: str, request, actor: Actor) -> TransitionRule:
+    """
+    Проверка действия над заявкой
+
+    Returns:
+        TransitionRule: Правило перехода (to_status - новый статус)
+
+    Raises:
+        TransitionForbiddenError: Роль или пользователь не может выполнить действие
+        TransitionError: Действие неизвестно или недоступно в текущем статусе
+    """
+    status = _value(request.status)
+    rule = _INDEX.get((status, actor.role), {}).get(action)
+    if rule is None:
+        if action not in TARGET_STATUS:
+            raise TransitionError(f"Неизвестное действие: {action}")
+        if action not in _ROLE_ACTIONS.get(actor.role, ()):
+            raise TransitionForbiddenError(f"Роль {actor.role} не может выполнять действие {action}")
+        raise TransitionError(f"Действие {action} недоступно для заявки в статусе {status}")
+    if not rule.owner(request, actor):
+        raise TransitionForbiddenError(rule.owner_error)
+    return rule
+
+
+def allowed_actions(request, actor: Actor) -> List[str]:
+    """Действия, которые пользователь может выполнить над заявкой сейчас"""
+    rules = _INDEX.get((_value(request.status), actor.role))
+    if not rules:
+        return []
+    return [action for action, rule in rules.items() if rule.owner(request, actor)]
@@ -0,0 +1,473 @@
+"""
+Журнал переходов заявок между статусами и его проекции
+
+Каждый переход, выполненный RequestWorkflowService, добавляется в таблицу
+request_status_events (записи только добавляются) и публикуется в топик
+workflow-events как WorkflowStatusChangedEvent. Из журнала строится проекция
+request_stage_durations - время нахождения заявки в каждом статусе и признак
+нарушения SLA. Проекция обновляется при каждом переходе и может быть полностью
+пересобрана из журнала (rebuild_status_projections.py), например после
+изменения STAGE_SLA_HOURS.
+"""
+
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, func, insert
+from sqlalchemy.orm import Session
+
+from models import RepairRequest, RequestStageDuration, RequestStatus, RequestStatusEvent
+from kafka_events import kafka_producer
+from kafka_events.kafka_events import WorkflowStatusChangedEvent
+
+logger = logging.getLogger(__name__)
+
+# Допустимое время нахождения заявки в статусе, часы
+STAGE_SLA_HOURS: Dict[str, int] = {
+    RequestStatus.NEW.value: 4,
+    RequestStatus.MANAGER_REVIEW.value: 24,
+    RequestStatus.CLARIFICATION.value: 48,
+    RequestStatus.SENT_TO_CONTRACTORS.value: 24,
+    RequestStatus.CONTRACTOR_RESPONSES.value: 24,
+    RequestStatus.ASSIGNED.value: 48,
+    RequestStatus.IN_PROGRESS.value: 168,
+}
+
+# Финальные статусы: время в них не считается
+TERMINAL_STATUSES = (RequestStatus.COMPLETED.value, RequestStatus.CANCELLED.value)
+
+# Обработка заявки менеджером: от взятия в работу до назначения исполнителя
+PROCESSING_STAGES = (
+    RequestStatus.MANAGER_REVIEW.value,
+    RequestStatus.CLARIFICATION.value,
+    RequestStatus.SENT_TO_CONTRACTORS.value,
+    RequestStatus.CONTRACTOR_RESPONSES.value,
+)
+
+
+def _status(value) -> Optional[str]:
+    return value.value if isinstance(value, RequestStatus) else value
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite возвращает naive datetime даже для DateTime(timezone=True)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _sla_seconds(stage: str) -> Optional[int]:
+    hours = STAGE_SLA_HOURS.get(stage)
+    return hours * 3600 if hours is not None else None
+
+
+def _close_stage(row: dict, left_at: datetime) -> dict:
+    row["left_at"] = left_at
+    row["duration_seconds"] = int((_aware(left_at) - _aware(row["entered_at"])).total_seconds())
+    row["sla_breached"] = row["sla_seconds"] is not None and row["duration_seconds"] > row["sla_seconds"]
+    return row
+
+
+def build_stage_rows(request: RepairRequest, events: Iterable[RequestStatusEvent]) -> List[dict]:
+    """
+    Строки проекции request_stage_durations для одной заявки
+
+    Args:
+        request: Заявка (для денормализованных customer_id/manager_id)
+        events: Переходы заявки в порядке occurred_at
+
+    Returns:
+        List[dict]: Этапы; последний незавершенный этап имеет left_at=None
+    """
+    rows: List[dict] = []
+    for event in events:
+        if rows and rows[-1]["left_at"] is None:
+            _close_stage(rows[-1], event.occurred_at)
+        if event.to_status in TERMINAL_STATUSES:
+            continue
+        rows.append({
+            "request_id": request.id,
+            "customer_id": request.customer_id,
+            # До взятия заявки (new) менеджера у нее нет
+            "manager_id": None if event.to_status == RequestStatus.NEW.value else request.manager_id,
+            "stage": event.to_status,
+            "entered_at": event.occurred_at,
+            "left_at": None,
+            "duration_seconds": None,
+            "sla_seconds": _sla_seconds(event.to_status),
+            "sla_breached": False,
+        })
+    return rows
+
+
+class RequestStatusHistoryService:
+    """Запись переходов статусов и запросы к проекции времени в статусах"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def record_transition(
+        self,
+        request: RepairRequest,
+        to_status: str,
+        changed_by: Optional[int] = None,
+        reason: Optional[str] = None,
+    ) -> RequestStatusEvent:
+        """
+        Смена статуса заявки с записью в журнал и обновлением проекции
+
+        Изменения добавляются в текущую транзакцию: фиксирует их вызывающий код.
+
+        Args:
+            request: Заявка
+            to_status: Новый статус
+            changed_by: Пользователь, выполнивший переход
+            reason: Причина перехода
+
+        Returns:
+            RequestStatusEvent: Запись журнала (публикуется после commit через publish)
+        """
+        from_status = _status(request.status)
+        request.status = _status(to_status)
+        return self._append(request, from_status, changed_by, reason)
+
+    def record_creation(self, request: RepairRequest, changed_by: Optional[int] = None) -> RequestStatusEvent:
+        """Первая запись журнала для только что созданной заявки"""
+        return self._append(request, None, changed_by, None)
+
+    def _append(
+        self,
+        request: RepairRequest,
+        from_status: Optional[str],
+        changed_by: Optional[int],
+        reason: Optional[str],
+    ) -> RequestStatusEvent:
+        if request.id is None:
+            self.db.flush()
+        occurred_at = datetime.now(timezone.utc)
+        to_status = _status(request.status)
+
+        event = RequestStatusEvent(
+            event_id=str(uuid.uuid4()),
+            request_id=request.id,
+            from_status=from_status,
+            to_status=to_status,
+            changed_by=changed_by,
+            reason=reason,
+            occurred_at=occurred_at,
+        )
+        self.db.add(event)
+
+        # Закрываем текущий этап и открываем новый; этап остается за менеджером,
+        # который отвечал за заявку при входе в него, новый менеджер - только у нового этапа
+        open_stage = self.db.query(RequestStageDuration).filter(
+            RequestStageDuration.request_id == request.id,
+            RequestStageDuration.left_at.is_(None),
+        ).first()
+        if open_stage:
+            closed = _close_stage({
+                "entered_at": open_stage.entered_at,
+                "sla_seconds": open_stage.sla_seconds,
+            }, occurred_at)
+            open_stage.left_at = closed["left_at"]
+            open_stage.duration_seconds = closed["duration_seconds"]
+            open_stage.sla_breached = closed["sla_breached"]
+
+        if to_status not in TERMINAL_STATUSES:
+            self.db.add(RequestStageDuration(
+                request_id=request.id,
+                customer_id=request.customer_id,
+                manager_id=request.manager_id,
+                stage=to_status,
+                entered_at=occurred_at,
+                sla_seconds=_sla_seconds(to_status),
+                sla_breached=False,
+            ))
+
+        # Сессии создаются с autoflush=False: следующий переход в той же
+        # транзакции должен увидеть открытый этап
+        self.db.flush()
+        return event
+
+    def record_transitions(self, transitions: List[dict]) -> List[RequestStatusEvent]:
+        """
+        Журналирование пакета переходов, уже примененных к repair_requests
+
+        Используется массовыми переходами: открытые этапы всех заявок читаются
+        одним запросом, записи журнала и новые этапы добавляются одним flush.
+
+        Args:
+            transitions: Словари request_id, customer_id, manager_id,
+                from_status, to_status, changed_by, reason
+
+        Returns:
+            List[RequestStatusEvent]: Записи журнала в порядке transitions
+        """
+        if not transitions:
+            return []
+        occurred_at = datetime.now(timezone.utc)
+        request_ids = [transition["request_id"] for transition in transitions]
+        open_stages = {
+            stage.request_id: stage
+            for stage in self.db.query(RequestStageDuration).filter(
+                RequestStageDuration.request_id.in_(request_ids),
+                RequestStageDuration.left_at.is_(None),
+            )
+        }
+
+        events = []
+        for transition in transitions:
+            to_status = _status(transition["to_status"])
+            events.append(RequestStatusEvent(
+                event_id=str(uuid.uuid4()),
+                request_id=transition["request_id"],
+                from_status=_status(transition["from_status"]),
+                to_status=to_status,
+                changed_by=transition.get("changed_by"),
+                reason=transition.get("reason"),
+                occurred_at=occurred_at,
+            ))
+
+            open_stage = open_stages.get(transition["request_id"])
+            if open_stage:
+                closed = _close_stage({
+                    "entered_at": open_stage.entered_at,
+                    "sla_seconds": open_stage.sla_seconds,
+                }, occurred_at)
+                open_stage.left_at = closed["left_at"]
+                open_stage.duration_seconds = closed["duration_seconds"]
+                open_stage.sla_breached = closed["sla_breached"]
+
+            if to_status not in TERMINAL_STATUSES:
+                self.db.add(RequestStageDuration(
+                    request_id=transition["request_id"],
+                    customer_id=transition["customer_id"],
+                    manager_id=transition["manager_id"],
+                    stage=to_status,
+                    entered_at=occurred_at,
+                    sla_seconds=_sla_seconds(to_status),
+                    sla_breached=False,
+                ))
+
+        self.db.add_all(events)
+        self.db.flush()
+        return events
+
+    def to_message(self, event: RequestStatusEvent) -> Tuple[str, WorkflowStatusChangedEvent, str]:
+        """Запись журнала как (topic, event, key) для KafkaEventProducer.publish_batch"""
+        return (
+            "workflow-events",
+            WorkflowStatusChangedEvent(
+                event_id=event.event_id,
+                request_id=event.request_id,
+                from_status=event.from_status,
+                to_status=event.to_status,
+                changed_by=event.changed_by,
+                reason=event.reason,
+                occurred_at=event.occurred_at,
+            ),
+            str(event.request_id),
+        )
+
+    def publish(self, event: RequestStatusEvent) -> bool:
+        """Публикация перехода в workflow-events (после фиксации транзакции)"""
+        try:
+            topic, message, key = self.to_message(event)
+            return kafka_producer.publish_event(topic, message, key=key)
+        except Exception as e:
+            logger.error(f"❌ Ошибка публикации перехода заявки #{event.request_id} в {event.to_status}: {e}")
+            return False
+
+    def get_history(self, request_id: int) -> List[RequestStatusEvent]:
+        """Переходы заявки в хронологическом порядке"""
+        return self.db.query(RequestStatusEvent).filter(
+            RequestStatusEvent.request_id == request_id
+        ).order_by(RequestStatusEvent.occurred_at, RequestStatusEvent.id).all()
+
+    def average_hours_in_stages(
+        self,
+        stages: Iterable[str],
+        manager_id: Optional[int] = None,
+        customer_id: Optional[int] = None,
+        since: Optional[datetime] = None,
+        completed_only: bool = False,
+    ) -> float:
+        """
+        Среднее по заявкам суммарное время в указанных статусах, часы
+
+        Учитываются только завершенные этапы. Фильтры соответствуют индексам
+        (manager_id|customer_id, stage, entered_at) проекции.
+        """
+        filters = [
+            RequestStageDuration.stage.in_([_status(stage) for stage in stages]),
+            RequestStageDuration.left_at.isnot(None),
+        ]
+        if manager_id is not None:
+            filters.append(RequestStageDuration.manager_id == manager_id)
+        if customer_id is not None:
+            filters.append(RequestStageDuration.customer_id == customer_id)
+        if since is not None:
+            filters.append(RequestStageDuration.entered_at >= since)
+
+        per_request = self.db.query(
+            RequestStageDuration.request_id,
+            func.sum(RequestStageDuration.duration_seconds).label("total_seconds"),
+        ).filter(and_(*filters))
+        if completed_only:
+            per_request = per_request.join(
+                RepairRequest, RepairRequest.id == RequestStageDuration.request_id
+            ).filter(RepairRequest.status == RequestStatus.COMPLETED)
+        per_request = per_request.group_by(RequestStageDuration.request_id).subquery()
+
+        average = self.db.query(func.avg(per_request.c.total_seconds)).scalar()
+        return float(average) / 3600 if average else 0.0
+
+    def sla_breaches(
+        self,
+        manager_id: Optional[int] = None,
+        since: Optional[datetime] = None,
+        now: Optional[datetime] = None,
+    ) -> Dict[str, int]:
+        """
+        Количество нарушений SLA по статусам
+
+        Незавершенный этап считается нарушением, если заявка находится в статусе
+        дольше SLA на момент запроса.
+        """
+        now = now or datetime.now(timezone.utc)
+        breaches: Dict[str, int] = {}
+        for stage, hours in STAGE_SLA_HOURS.items():
+            query = self.db.query(func.count(RequestStageDuration.id)).filter(
+                RequestStageDuration.stage == stage
+            )
+            if manager_id is not None:
+                query = query.filter(RequestStageDuration.manager_id == manager_id)
+            if since is not None:
+                query = query.filter(RequestStageDuration.entered_at >= since)
+            closed = query.filter(RequestStageDuration.sla_breached.is_(True)).scalar()
+            still_open = query.filter(
+                RequestStageDuration.left_at.is_(None),
+                RequestStageDuration.entered_at < now - timedelta(hours=hours),
+            ).scalar()
+            if closed or still_open:
+                breaches[stage] = closed + still_open
+        return breaches
+
+
+def rebuild_stage_durations(
+    db: Session,
+    request_ids: Optional[List[int]] = None,
+    batch_size: int = 500,
+) -> int:
+    """
+    Пересборка проекции request_stage_durations из журнала
+
+    Заявки обрабатываются пакетами по возрастанию id (keyset): для каждого
+    пакета старые строки проекции удаляются и вставляются заново одной
+    массовой вставкой, транзакция фиксируется на каждый пакет.
+
+    Args:
+        db: Сессия БД
+        request_ids: Только эти заявки (по умолчанию - все)
+        batch_size: Размер пакета заявок
+
+    Returns:
+        int: Количество записанных строк проекции
+    """
+    written = 0
+    last_id = 0
+    while True:
+        query = db.query(RepairRequest).filter(RepairRequest.id > last_id)
+        if request_ids is not None:
+            query = query.filter(RepairRequest.id.in_(request_ids))
+        requests = query.order_by(RepairRequest.id).limit(batch_size).all()
+        if not requests:
+            break
+        last_id = requests[-1].id
+        ids = [request.id for request in requests]
+
+        events_by_request: Dict[int, List[RequestStatusEvent]] = {request_id: [] for request_id in ids}
+        for event in db.query(RequestStatusEvent).filter(
+            RequestStatusEvent.request_id.in_(ids)
+        ).order_by(RequestStatusEvent.request_id, RequestStatusEvent.occurred_at, RequestStatusEvent.id):
+            events_by_request[event.request_id].append(event)
+
+        rows = []
+        for request in requests:
+            rows.extend(build_stage_rows(request, events_by_request[request.id]))
+
+        db.query(RequestStageDuration).filter(
+            RequestStageDuration.request_id.in_(ids)
+        ).delete(synchronize_session=False)
+        if rows:
+            db.execute(insert(RequestStageDuration), rows)
+        db.commit()
+        db.expunge_all()
+
+        written += len(rows)
+        logger.info(f"📊 Проекция пересобрана для заявок до #{last_id} (строк: {written})")
+
+    return written
+
+
+def backfill_status_events(db: Session, batch_size: int = 500) -> int:
+    """
+    Начальное заполнение журнала для заявок, созданных до его появления
+
+    Переходы восстанавливаются по имеющимся полям заявки: created_at (new),
+    processed_at (manager_review), assigned_at (assigned) и текущему статусу
+    на момент updated_at. Заявки, у которых уже есть записи в журнале,
+    пропускаются.
+
+    Returns:
+        int: Количество добавленных записей журнала
+    """
+    added = 0
+    last_id = 0
+    while True:
+        requests = db.query(RepairRequest).filter(
+            RepairRequest.id > last_id,
+            ~RepairRequest.id.in_(db.query(RequestStatusEvent.request_id)),
+        ).order_by(RepairRequest.id).limit(batch_size).all()
+        if not requests:
+            break
+        last_id = requests[-1].id
+
+        rows = []
+        for request in requests:
+            milestones = [(request.created_at, RequestStatus.NEW.value)]
+            if request.processed_at:
+                milestones.append((request.processed_at, RequestStatus.MANAGER_REVIEW.value))
+            if request.assigned_at:
+                milestones.append((request.assigned_at, RequestStatus.ASSIGNED.value))
+            current = _status(request.status) or RequestStatus.NEW.value
+            if current != milestones[-1][1]:
+                milestones.append((request.updated_at or milestones[-1][0], current))
+
+            previous = None
+            for occurred_at, status in milestones:
+                if occurred_at is None:
+                    continue
+                rows.append({
+                    "event_id": str(uuid.uuid4()),
+                    "request_id": request.id,
+                    "from_status": previous,
+                    "to_status": status,
+                    "reason": "backfill",
+                    "occurred_at": occurred_at,
+                })
+                previous = status
+
+        if rows:
+            db.execute(insert(RequestStatusEvent), rows)
+        db.commit()
+        db.expunge_all()
+        added += len(rows)
+
+    logger.info(f"📜 Журнал статусов заполнен для существующих заявок (записей: {added})")
+    return added
+
+
+def get_request_status_history_service(db: Session) -> RequestStatusHistoryService:
+    """Получение экземпляра сервиса журнала статусов"""
+    return RequestStatusHistoryService(db)
@@ -3,11 +3,21 @@
 Обрабатывает переходы между статусами заявок согласно бизнес-логике
 """
 
+import functools
 import logging
-from typing import Optional, List
+from collections import defaultdict
+from typing import Dict, Optional, List
 from datetime import datetime, timezone
+from sqlalchemy import case, tuple_, update
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
 from models import RepairRequest, User, RequestStatus
+from services.request_status_history_service import RequestStatusHistoryService
+from services.request_state_machine import (
+    Actor, STATUS_ACTION, TARGET_STATUS, TransitionError, allowed_actions, check_transition
+)
+from services.job_queue import enqueue_job
+from services.workflow_jobs import SEND_REQUEST_TO_CONTRACTORS
 from api.v1.schemas import RepairRequestUpdate
 from kafka_events import kafka_producer
 from kafka_events.kafka_events import (
@@ -18,11 +28,69 @@ from kafka_events.kafka_events import (
 
 logger = logging.getLogger(__name__)
 
+# Максимальное число заявок, которое менеджер может взять за один запрос
+MAX_CLAIM_BATCH = 50
+
+# Действия, доступные в массовых переходах (правила - в request_state_machine)
+BULK_ACTIONS = ("assign_manager", "clarify", "send_to_contractors", "assign_contractor", "cancel")
+MAX_BULK_TRANSITIONS = 200
+
+
+class RequestConflictError(ValueError):
+    """Заявка изменена параллельно: версия не совпала или заявку уже взяли"""
+
+
+def _optimistic(method):
+    """Перевод конфликта версий при flush/commit в RequestConflictError"""
+    @functools.wraps(method)
+    def wrapper(self, request_id: int, *args, **kwargs):
+        try:
+            return method(self, request_id, *args, **kwargs)
+        except StaleDataError:
+            self.db.rollback()
+            logger.warning(f"⚠️ Конфликт версий при изменении заявки #{request_id}")
+            raise RequestConflictError(f"Заявка {request_id} была изменена другим пользователем, обновите данные")
+    return wrapper
+
+
 class RequestWorkflowService:
     """Сервис для управления workflow заявок"""
     
     def __init__(self, db: Session):
         self.db = db
+        # Журнал переходов статусов (request_status_events + workflow-events)
+        self.history = RequestStatusHistoryService(db)
+
+    def _get_request(self, request_id: int, expected_version: Optional[int] = None,
+                     lock: bool = False) -> RepairRequest:
+        """
+        Загрузка заявки для перехода статуса
+
+        expected_version - версия, которую видел клиент: если заявку успели
+        изменить, переход отклоняется до каких-либо изменений. Без нее
+        параллельные изменения все равно отсекаются условием на версию в UPDATE.
+        """
+        query = self.db.query(RepairRequest).filter(RepairRequest.id == request_id)
+        if lock:
+            query = query.with_for_update()
+        request = query.first()
+        if not request:
+            raise ValueError(f"Заявка {request_id} не найдена")
+        if expected_version is not None and request.version != expected_version:
+            raise RequestConflictError(
+                f"Заявка {request_id} была изменена другим пользователем "
+                f"(версия {request.version}, ожидалась {expected_version}), обновите данные"
+            )
+        return request
+    
+    def _actor(self, user_id: int, actor: Optional[Actor] = None) -> Actor:
+        """Исполнитель перехода: переданный endpoint'ом или загруженный по id пользователя"""
+        if actor is not None:
+            return actor
+        user = self.db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise ValueError(f"Пользователь {user_id} не найден")
+        return Actor.from_user(user)
     
     def create_request(self, customer_id: int, request_data: dict) -> RepairRequest:
         """Создание новой заявки"""
@@ -44,8 +112,11 @@ class RequestWorkflowService:
         )
         
         self.db.add(request)
+        self.db.flush()
+        status_event = self.history.record_creation(request, changed_by=None)
         self.db.commit()
         self.db.refresh(request)
+        self.history.publish(status_event)
         
         # Публикуем событие создания заявки
         try:
@@ -76,87 +147,119 @@ class RequestWorkflowService:
         logger.info(f"✅ Создана новая заявка #{request.id} от заказчика {customer_id}")
         return request
     
-    def assign_to_manager(self, request_id: int, manager_id: int) -> RepairRequest:
+    @_optimistic
+    def assign_to_manager(self, request_id: int, manager_id: int,
+                          expected_version: Optional[int] = None, actor: Optional[Actor] = None) -> RepairRequest:
         """Назначение заявки менеджеру"""
-        request = self.db.query(RepairRequest).filter(RepairRequest.id == request_id).first()
-        if not request:
-            raise ValueError(f"Заявка {request_id} не найдена")
+        request = self._get_request(request_id, expected_version, lock=True)
         
-        request.manager_id = manager_id
-        request.status = RequestStatus.MANAGER_REVIEW
-        request.processed_at = datetime.now(timezone.utc)
+        # Повторный клик того же менеджера не меняет заявку, а взятую другим
+        # менеджером заявку нельзя перехватить
+        if request.manager_id == manager_id and request.status != RequestStatus.NEW:
+            return request
+        if request.status != RequestStatus.NEW:
+            raise RequestConflictError(f"Заявка {request_id} уже взята в работу менеджером {request.manager_id}")
+        check_transition("assign_manager", request, self._actor(manager_id, actor))
+        
+        status_event = self._take_by_manager(request, manager_id)
         
         self.db.commit()
         self.db.refresh(request)
+        self.history.publish(status_event)
         
         logger.info(f"✅ Заявка #{request_id} назначена менеджеру {manager_id}")
         return request
     
-    def add_clarification(self, request_id: int, manager_id: int, clarification_details: str) -> RepairRequest:
+    def _take_by_manager(self, request: RepairRequest, manager_id: int):
+        request.manager_id = manager_id
+        request.processed_at = datetime.now(timezone.utc)
+        status_event = self.history.record_transition(request, RequestStatus.MANAGER_REVIEW, changed_by=manager_id)
+        return status_event
+    
+    def claim_requests(self, manager_id: int, limit: int = 1) -> List[RepairRequest]:
+        """
+        Взять из общей очереди следующие limit новых заявок
+        
+        Строки блокируются FOR UPDATE SKIP LOCKED: параллельные менеджеры
+        получают разные заявки и не ждут друг друга. Заявки выдаются в порядке
+        поступления.
+        """
+        limit = max(1, min(limit, MAX_CLAIM_BATCH))
+        requests = self.db.query(RepairRequest).filter(
+            RepairRequest.status == RequestStatus.NEW,
+            RepairRequest.manager_id.is_(None),
+        ).order_by(
+            RepairRequest.created_at, RepairRequest.id
+        ).limit(limit).with_for_update(skip_locked=True).all()
+        
+        if not requests:
+            self.db.rollback()
+            return []
+        
+        try:
+            status_events = [self._take_by_manager(request, manager_id) for request in requests]
+            self.db.commit()
+        except StaleDataError:
+            # Без SKIP LOCKED (SQLite) строку мог изменить параллельный запрос
+            self.db.rollback()
+            logger.warning(f"⚠️ Конфликт при выдаче заявок менеджеру {manager_id}")
+            raise RequestConflictError("Заявки уже разобраны другими менеджерами, повторите запрос")
+        
+        for status_event in status_events:
+            self.history.publish(status_event)
+        
+        logger.info(
+            f"✅ Менеджер {manager_id} взял заявки из очереди: "
+            f"{', '.join(f'#{request.id}' for request in requests)}"
+        )
+        return requests
+    
+    @_optimistic
+    def add_clarification(self, request_id: int, manager_id: int, clarification_details: str,
+                          expected_version: Optional[int] = None, actor: Optional[Actor] = None) -> RepairRequest:
         """Добавление уточнений от менеджера"""
-        request = self.db.query(RepairRequest).filter(RepairRequest.id == request_id).first()
-        if not request:
-            raise ValueError(f"Заявка {request_id} не найдена")
+        request = self._get_request(request_id, expected_version)
         
-        if request.manager_id != manager_id:
-            raise ValueError("Только назначенный менеджер может добавлять уточнения")
+        check_transition("clarify", request, self._actor(manager_id, actor))
         
         request.clarification_details = clarification_details
-        request.status = RequestStatus.CLARIFICATION
+        status_event = self.history.record_transition(request, RequestStatus.CLARIFICATION, changed_by=manager_id)
         
         self.db.commit()
         self.db.refresh(request)
+        self.history.publish(status_event)
         
         logger.info(f"✅ Добавлены уточнения к заявке #{request_id}")
         return request
     
-    def send_to_contractors(self, request_id: int, manager_id: int) -> RepairRequest:
+    @_optimistic
+    def send_to_contractors(self, request_id: int, manager_id: int,
+                            expected_version: Optional[int] = None, actor: Optional[Actor] = None) -> RepairRequest:
         """Отправка заявки исполнителям"""
-        request = self.db.query(RepairRequest).filter(RepairRequest.id == request_id).first()
-        if not request:
-            raise ValueError(f"Заявка {request_id} не найдена")
+        request = self._get_request(request_id, expected_version)
         
-        if request.manager_id != manager_id:
-            raise ValueError("Только назначенный менеджер может отправлять заявку исполнителям")
+        check_transition("send_to_contractors", request, self._actor(manager_id, actor))
         
-        request.status = RequestStatus.SENT_TO_CONTRACTORS
         request.sent_to_bot_at = datetime.now(timezone.utc)
+        status_event = self.history.record_transition(request, RequestStatus.SENT_TO_CONTRACTORS, changed_by=manager_id)
+        
+        # Публикация в Telegram чат выполняется воркером фоновых задач
+        enqueue_job(self.db, SEND_REQUEST_TO_CONTRACTORS, {"request_id": request_id})
         
         self.db.commit()
         self.db.refresh(request)
-        
-        # Отправляем заявку в Telegram чат асинхронно
-        try:
-            import asyncio
-            from services.telegram_bot_service import get_telegram_bot_service
-            
-            async def send_to_telegram():
-                telegram_service = get_telegram_bot_service(self.db)
-                await telegram_service.send_request_to_contractors(request_id)
-            
-            # Запускаем асинхронную отправку в Telegram
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                loop.run_until_complete(send_to_telegram())
-            finally:
-                loop.close()
-                
-        except Exception as e:
-            logger.error(f"❌ Ошибка отправки заявки {request_id} в Telegram: {e}")
-            # Не прерываем workflow из-за ошибки отправки в Telegram
+        self.history.publish(status_event)
         
         logger.info(f"✅ Заявка #{request_id} отправлена исполнителям")
         return request
     
-    def assign_contractor(self, request_id: int, contractor_id: int, manager_id: int) -> RepairRequest:
+    @_optimistic
+    def assign_contractor(self, request_id: int, contractor_id: int, manager_id: int,
+                          expected_version: Optional[int] = None, actor: Optional[Actor] = None) -> RepairRequest:
         """Назначение исполнителя на заявку"""
-        request = self.db.query(RepairRequest).filter(RepairRequest.id == request_id).first()
-        if not request:
-            raise ValueError(f"Заявка {request_id} не найдена")
+        request = self._get_request(request_id, expected_version)
         
-        if request.manager_id != manager_id:
-            raise ValueError("Только назначенный менеджер может назначать исполнителя")
+        check_transition("assign_contractor", request, self._actor(manager_id, actor))
         
         # Проверяем, что исполнитель проверен службой безопасности
         from services.security_verification_service import get_security_verification_service
@@ -167,11 +270,12 @@ class RequestWorkflowService:
         
         previous_status = request.status
         request.assigned_contractor_id = contractor_id
-        request.status = RequestStatus.ASSIGNED
         request.assigned_at = datetime.now(timezone.utc)
+        status_event = self.history.record_transition(request, RequestStatus.ASSIGNED, changed_by=manager_id)
         
         self.db.commit()
         self.db.refresh(request)
+        self.history.publish(status_event)
         
         # Публикуем событие назначения исполнителя
         try:
@@ -198,38 +302,38 @@ class RequestWorkflowService:
         logger.info(f"✅ Исполнитель {contractor_id} назначен на заявку #{request_id}")
         return request
     
-    def start_work(self, request_id: int, contractor_id: int) -> RepairRequest:
+    @_optimistic
+    def start_work(self, request_id: int, contractor_id: int,
+                   expected_version: Optional[int] = None, actor: Optional[Actor] = None) -> RepairRequest:
         """Начало выполнения работ"""
-        request = self.db.query(RepairRequest).filter(RepairRequest.id == request_id).first()
-        if not request:
-            raise ValueError(f"Заявка {request_id} не найдена")
+        request = self._get_request(request_id, expected_version)
         
-        if request.assigned_contractor_id != contractor_id:
-            raise ValueError("Только назначенный исполнитель может начинать работы")
+        check_transition("start_work", request, self._actor(contractor_id, actor))
         
-        request.status = RequestStatus.IN_PROGRESS
+        status_event = self.history.record_transition(request, RequestStatus.IN_PROGRESS, changed_by=contractor_id)
         
         self.db.commit()
         self.db.refresh(request)
+        self.history.publish(status_event)
         
         logger.info(f"✅ Исполнитель {contractor_id} начал работы по заявке #{request_id}")
         return request
     
-    def complete_work(self, request_id: int, contractor_id: int, final_price: Optional[int] = None) -> RepairRequest:
+    @_optimistic
+    def complete_work(self, request_id: int, contractor_id: int, final_price: Optional[int] = None,
+                      expected_version: Optional[int] = None, actor: Optional[Actor] = None) -> RepairRequest:
         """Завершение работ"""
-        request = self.db.query(RepairRequest).filter(RepairRequest.id == request_id).first()
-        if not request:
-            raise ValueError(f"Заявка {request_id} не найдена")
+        request = self._get_request(request_id, expected_version)
         
-        if request.assigned_contractor_id != contractor_id:
-            raise ValueError("Только назначенный исполнитель может завершать работы")
+        check_transition("complete", request, self._actor(contractor_id, actor))
         
-        request.status = RequestStatus.COMPLETED
         if final_price:
             request.final_price = final_price
+        status_event = self.history.record_transition(request, RequestStatus.COMPLETED, changed_by=contractor_id)
         
         self.db.commit()
         self.db.refresh(request)
+        self.history.publish(status_event)
         
         # Публикуем событие завершения работ
         try:
@@ -257,30 +361,248 @@ class RequestWorkflowService:
         logger.info(f"✅ Работы по заявке #{request_id} завершены исполнителем {contractor_id}")
         return request
     
-    def cancel_request(self, request_id: int, user_id: int, reason: str) -> RepairRequest:
+    @_optimistic
+    def cancel_request(self, request_id: int, user_id: int, reason: str,
+                       expected_version: Optional[int] = None, actor: Optional[Actor] = None) -> RepairRequest:
         """Отмена заявки"""
-        request = self.db.query(RepairRequest).filter(RepairRequest.id == request_id).first()
-        if not request:
-            raise ValueError(f"Заявка {request_id} не найдена")
-        
-        # Проверяем права на отмену
-        can_cancel = (
-            request.customer_id == user_id or  # Заказчик может отменить свою заявку
-            request.manager_id == user_id or   # Менеджер может отменить назначенную заявку
-            request.assigned_contractor_id == user_id  # Исполнитель может отменить назначенную заявку
-        )
+        request = self._get_request(request_id, expected_version)
         
-        if not can_cancel:
-            raise ValueError("Недостаточно прав для отмены заявки")
+        check_transition("cancel", request, self._actor(user_id, actor))
         
-        request.status = RequestStatus.CANCELLED
         request.manager_comment = f"Отменено: {reason}"
+        status_event = self.history.record_transition(request, RequestStatus.CANCELLED, changed_by=user_id, reason=reason)
         
         self.db.commit()
         self.db.refresh(request)
+        self.history.publish(status_event)
         
         logger.info(f"✅ Заявка #{request_id} отменена пользователем {user_id}")
         return request
+
+    def change_status(self, request_id: int, user_id: int, to_status, params: Optional[dict] = None,
+                      expected_version: Optional[int] = None, actor: Optional[Actor] = None) -> RepairRequest:
+        """
+        Перевод заявки в статус действием автомата, которое в него ведет
+
+        Для общего обновления заявки (PUT /repair-requests/{id}): переход
+        проверяется теми же правилами и выполняется тем же методом, что и
+        endpoint действия - с журналом статусов, событиями и фоновыми задачами.
+
+        Args:
+            params: Поля обновления, нужные действию: clarification_details,
+                assigned_contractor_id, final_price, manager_comment (причина отмены)
+        """
+        params = params or {}
+        status_value = getattr(to_status, "value", to_status)
+        action = STATUS_ACTION.get(status_value)
+        if action is None:
+            raise TransitionError(f"Заявку нельзя перевести в статус {status_value}")
+
+        request = self._get_request(request_id, expected_version)
+        actor = self._actor(user_id, actor)
+        check_transition(action, request, actor)
+
+        if action == "assign_manager":
+            return self.assign_to_manager(request_id, user_id, expected_version, actor)
+        if action == "clarify":
+            details = params.get("clarification_details") or request.clarification_details or ""
+            return self.add_clarification(request_id, user_id, details, expected_version, actor)
+        if action == "send_to_contractors":
+            return self.send_to_contractors(request_id, user_id, expected_version, actor)
+        if action == "assign_contractor":
+            if not params.get("assigned_contractor_id"):
+                raise ValueError("Не указан исполнитель")
+            return self.assign_contractor(request_id, params["assigned_contractor_id"], user_id, expected_version, actor)
+        if action == "start_work":
+            return self.start_work(request_id, user_id, expected_version, actor)
+        if action == "complete":
+            return self.complete_work(request_id, user_id, params.get("final_price"), expected_version, actor)
+        reason = params.get("manager_comment") or "Причина не указана"
+        return self.cancel_request(request_id, user_id, reason, expected_version, actor)
+
+    def bulk_transition(self, actor_id: int, items: List[dict], actor: Optional[Actor] = None) -> List[dict]:
+        """
+        Пакет переходов статусов одной транзакцией
+        
+        Заявки читаются одним запросом с блокировкой строк и проверяются по тем
+        же правилам, что и одиночные переходы. Принятые переходы применяются
+        одним UPDATE на действие с условием на (id, version). Отклоненные
+        элементы не мешают остальным. События всех переходов публикуются одним
+        пакетом после commit.
+        
+        Args:
+            actor_id: Пользователь, выполняющий переходы
+            actor: Его роль и профиль (по умолчанию загружаются по actor_id)
+            items: Словари action, request_id, expected_version и параметры
+                действия (clarification_details, contractor_id, reason)
+        
+        Returns:
+            List[dict]: Результат по каждому элементу в исходном порядке
+        """
+        if len(items) > MAX_BULK_TRANSITIONS:
+            raise ValueError(f"Не более {MAX_BULK_TRANSITIONS} переходов за один запрос")
+        actor = self._actor(actor_id, actor)
+        
+        request_ids = {item["request_id"] for item in items}
+        # Порядок блокировки по id исключает взаимоблокировки параллельных пакетов
+        rows = {
+            row.id: row
+            for row in self.db.query(
+                RepairRequest.id, RepairRequest.status, RepairRequest.version, RepairRequest.customer_id,
+                RepairRequest.manager_id, RepairRequest.assigned_contractor_id,
+            ).filter(RepairRequest.id.in_(request_ids)).order_by(RepairRequest.id).with_for_update()
+        }
+        
+        results: List[dict] = []
+        accepted: Dict[str, list] = defaultdict(list)
+        seen = set()
+        contractor_checks: Dict[int, bool] = {}
+        for item in items:
+            result = {
+                "request_id": item["request_id"], "action": item["action"],
+                "success": False, "status": None, "version": None, "error": None,
+            }
+            results.append(result)
+            row = rows.get(item["request_id"])
+            try:
+                if item["request_id"] in seen:
+                    raise ValueError("Заявка уже есть в этом пакете")
+                seen.add(item["request_id"])
+                if row is None:
+                    raise ValueError(f"Заявка {item['request_id']} не найдена")
+                result["status"], result["version"] = row.status, row.version
+                self._check_bulk_item(item, row, actor, contractor_checks)
+            except ValueError as e:
+                result["error"] = str(e)
+                continue
+            accepted[item["action"]].append((item, row, result))
+        
+        if not accepted:
+            self.db.rollback()
+            return results
+        
+        now = datetime.now(timezone.utc)
+        transitions: List[dict] = []
+        messages = []
+        for action, entries in accepted.items():
+            to_status = TARGET_STATUS[action]
+            values = self._bulk_values(action, entries, actor_id, now)
+            pairs = [(row.id, row.version) for _, row, _ in entries]
+            updated = self.db.execute(
+                update(RepairRequest)
+                .where(tuple_(RepairRequest.id, RepairRequest.version).in_(pairs))
+                .values(status=to_status.value, version=RepairRequest.version + 1, **values)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if updated != len(pairs):
+                # Без блокировки строк (SQLite) заявку мог изменить параллельный запрос
+                self.db.rollback()
+                raise RequestConflictError("Часть заявок изменена параллельно, пакет не применен, обновите данные")
+            
+            for item, row, result in entries:
+                manager_id = actor_id if action == "assign_manager" else row.manager_id
+                transitions.append({
+                    "request_id": row.id,
+                    "customer_id": row.customer_id,
+                    "manager_id": manager_id,
+                    "from_status": row.status,
+                    "to_status": to_status,
+                    "changed_by": actor_id,
+                    "reason": item.get("reason") if action == "cancel" else None,
+                })
+                result.update(success=True, status=to_status.value, version=row.version + 1)
+                
+                if action == "send_to_contractors":
+                    enqueue_job(self.db, SEND_REQUEST_TO_CONTRACTORS, {"request_id": row.id})
+                elif action == "assign_contractor":
+                    messages.append(("workflow-events", WorkflowContractorAssignedEvent(
+                        request_id=row.id,
+                        contractor_id=item["contractor_id"],
+                        manager_id=actor_id,
+                        previous_status=row.status,
+                        new_status=RequestStatus.ASSIGNED,
+                        assignment_reason="Manager bulk assignment"
+                    ), None))
+        
+        status_events = self.history.record_transitions(transitions)
+        self.db.commit()
+        
+        try:
+            kafka_producer.publish_batch([self.history.to_message(event) for event in status_events] + messages)
+        except Exception as e:
+            logger.error(f"❌ Ошибка публикации событий массового перехода: {e}")
+            # Не прерываем основной процесс из-за ошибки Kafka
+        
+        logger.info(
+            f"✅ Массовый переход пользователя {actor_id}: применено {len(transitions)} из {len(items)}"
+        )
+        return results
+    
+    def _check_bulk_item(self, item: dict, row, actor: Actor, contractor_checks: Dict[int, bool]):
+        """Проверка одного элемента пакета; ValueError - элемент отклоняется"""
+        action = item["action"]
+        if action not in BULK_ACTIONS:
+            raise ValueError(f"Действие {action} недоступно в массовом режиме")
+        
+        expected_version = item.get("expected_version")
+        if expected_version is not None and row.version != expected_version:
+            raise RequestConflictError(
+                f"Заявка {row.id} была изменена другим пользователем "
+                f"(версия {row.version}, ожидалась {expected_version}), обновите данные"
+            )
+        if action == "assign_manager" and row.status != RequestStatus.NEW:
+            raise RequestConflictError(f"Заявка {row.id} уже взята в работу менеджером {row.manager_id}")
+        
+        check_transition(action, row, actor)
+        
+        if action == "assign_contractor":
+            contractor_id = item.get("contractor_id")
+            if not contractor_id:
+                raise ValueError("Не указан исполнитель")
+            if contractor_id not in contractor_checks:
+                from services.security_verification_service import get_security_verification_service
+                contractor_checks[contractor_id] = get_security_verification_service(
+                    self.db
+                ).check_contractor_can_respond(contractor_id)
+            if not contractor_checks[contractor_id]:
+                raise ValueError("Исполнитель не может быть назначен: не прошел проверку службы безопасности")
+    
+    @staticmethod
+    def _bulk_values(action: str, entries: list, actor_id: int, now: datetime) -> dict:
+        """Значения UPDATE для действия; различающиеся по заявкам - через CASE по id"""
+        def per_request(value_of):
+            return case({row.id: value_of(item) for item, row, _ in entries}, value=RepairRequest.id)
+        
+        if action == "assign_manager":
+            return {"manager_id": actor_id, "processed_at": now}
+        if action == "clarify":
+            return {"clarification_details": per_request(lambda item: item.get("clarification_details") or "")}
+        if action == "send_to_contractors":
+            return {"sent_to_bot_at": now}
+        if action == "assign_contractor":
+            return {"assigned_contractor_id": per_request(lambda item: item["contractor_id"]), "assigned_at": now}
+        return {"manager_comment": per_request(lambda item: f"Отменено: {item.get('reason') or ''}")}
+    
+    def get_allowed_actions(self, request_ids: List[int], actor: Actor) -> Dict[int, dict]:
+        """
+        Доступные пользователю действия по заявкам одним запросом
+        
+        Returns:
+            Dict[int, dict]: request_id -> status, version, actions; отсутствующие заявки пропускаются
+        """
+        rows = self.db.query(
+            RepairRequest.id, RepairRequest.status, RepairRequest.version, RepairRequest.customer_id,
+            RepairRequest.manager_id, RepairRequest.assigned_contractor_id,
+        ).filter(RepairRequest.id.in_(set(request_ids)))
+        # Заказчик и исполнитель не видят чужие заявки
+        if actor.role == "customer":
+            rows = rows.filter(RepairRequest.customer_id == actor.customer_profile_id)
+        elif actor.role == "contractor":
+            rows = rows.filter(RepairRequest.assigned_contractor_id == actor.user_id)
+        return {
+            row.id: {"status": row.status, "version": row.version, "actions": allowed_actions(row, actor)}
+            for row in rows
+        }
     
     def get_requests_for_manager(self, manager_id: int, status: Optional[str] = None) -> List[RepairRequest]:
         """Получение заявок для менеджера"""
@@ -291,11 +613,15 @@ class RequestWorkflowService:
         
         return query.order_by(RepairRequest.created_at.desc()).all()
     
-    def get_available_requests(self) -> List[RepairRequest]:
-        """Получение заявок, доступных для назначения менеджеру"""
-        return self.db.query(RepairRequest).filter(
-            RepairRequest.status == RequestStatus.NEW
-        ).order_by(RepairRequest.created_at.desc()).all()
+    def get_available_requests(self, limit: Optional[int] = None) -> List[RepairRequest]:
+        """Получение заявок, доступных для назначения менеджеру (только просмотр, без блокировки)"""
+        query = self.db.query(RepairRequest).filter(
+            RepairRequest.status == RequestStatus.NEW,
+            RepairRequest.manager_id.is_(None),
+        ).order_by(RepairRequest.created_at.desc())
+        if limit:
+            query = query.limit(limit)
+        return query.all()
     
     def get_contractor_requests(self, contractor_id: int) -> List[RepairRequest]:
         """Получение заявок исполнителя"""
@@ -0,0 +1,229 @@
+"""
+Пул постоянных SMTP соединений
+
+Каждое новое соединение стоит TCP + STARTTLS + AUTH (несколько round trip'ов
+до сервера), поэтому соединения после отправки возвращаются в пул и
+используются следующими письмами. Пул потокобезопасен: письма отправляют
+потоки воркера фоновых задач и обработчики API одновременно.
+
+- открыто не больше max_size соединений; при исчерпании отправитель ждет
+  освобождения соединения;
+- соединение, простоявшее дольше noop_after_seconds, перед отправкой
+  проверяется командой NOOP; простоявшее дольше idle_timeout_seconds или
+  отправившее max_messages_per_connection писем закрывается (серверы сами
+  рвут долгие сессии и ограничивают число писем на сессию);
+- при обрыве соединения во время отправки письмо повторяется один раз через
+  новое соединение; ошибки сервера по самому письму (отказ получателя и т.п.)
+  не считаются обрывом и не повторяются.
+"""
+
+import logging
+import smtplib
+import ssl
+import threading
+import time
+from dataclasses import dataclass, field
+from email.message import Message
+from typing import Callable, List, Optional
+
+from kafka_events.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("smtp_connections_opened_total", "counter", "Открытые SMTP соединения (рукопожатие и вход)")
+metrics.describe("smtp_messages_total", "counter", "Письма, отправленные через пул SMTP, по результату")
+
+# Ответы сервера по конкретному письму: сессия остается рабочей
+MESSAGE_ERRORS = (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)
+SERVICE_CLOSING = 421
+
+
+@dataclass
+class PooledConnection:
+    smtp: smtplib.SMTP
+    last_used_at: float = field(default_factory=time.monotonic)
+    messages_sent: int = 0
+
+
+class SmtpConnectionPool:
+    """Ограниченный пул SMTP соединений с проверкой NOOP и переподключением"""
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = True,
+        use_ssl: bool = False,
+        max_size: int = 4,
+        timeout_seconds: float = 30.0,
+        noop_after_seconds: float = 10.0,
+        idle_timeout_seconds: float = 120.0,
+        max_messages_per_connection: int = 100,
+        smtp_factory: Optional[Callable[..., smtplib.SMTP]] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.use_ssl = use_ssl
+        self.max_size = max(max_size, 1)
+        self.timeout_seconds = timeout_seconds
+        self.noop_after_seconds = noop_after_seconds
+        self.idle_timeout_seconds = idle_timeout_seconds
+        self.max_messages_per_connection = max_messages_per_connection
+        self.smtp_factory = smtp_factory or (smtplib.SMTP_SSL if use_ssl else smtplib.SMTP)
+
+        self._idle: List[PooledConnection] = []
+        self._open = 0
+        self._condition = threading.Condition()
+        self._closed = False
+
+    @property
+    def open_connections(self) -> int:
+        return self._open
+
+    def _connect(self) -> PooledConnection:
+        context = ssl.create_default_context()
+        if self.use_ssl:
+            smtp = self.smtp_factory(self.host, self.port, timeout=self.timeout_seconds, context=context)
+        else:
+            smtp = self.smtp_factory(self.host, self.port, timeout=self.timeout_seconds)
+        try:
+            if self.use_tls and not self.use_ssl:
+                smtp.starttls(context=context)
+            if self.username:
+                smtp.login(self.username, self.password or "")
+        except Exception:
+            self._quit(smtp)
+            raise
+        metrics.inc("smtp_connections_opened_total")
+        logger.info(f"📧 Открыто SMTP соединение с {self.host}:{self.port}")
+        return PooledConnection(smtp)
+
+    @staticmethod
+    def _quit(smtp: smtplib.SMTP):
+        try:
+            smtp.quit()
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+
+    def _healthy(self, connection: PooledConnection) -> bool:
+        """Пригодность соединения из пула перед отправкой"""
+        idle = time.monotonic() - connection.last_used_at
+        if idle > self.idle_timeout_seconds or connection.messages_sent >= self.max_messages_per_connection:
+            return False
+        if idle <= self.noop_after_seconds:
+            return True
+        try:
+            return connection.smtp.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _discard(self, connection: PooledConnection):
+        self._quit(connection.smtp)
+        with self._condition:
+            self._open -= 1
+            self._condition.notify()
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+        """
+        Свободное проверенное соединение или новое, если пул не заполнен
+
+        Raises:
+            TimeoutError: Все соединения заняты дольше timeout
+        """
+        timeout = self.timeout_seconds if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._condition:
+                if self._closed:
+                    raise RuntimeError("Пул SMTP соединений закрыт")
+                while not self._idle and self._open >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._condition.wait(remaining):
+                        raise TimeoutError(f"Нет свободного SMTP соединения за {timeout:.0f} с")
+                if self._idle:
+                    connection = self._idle.pop()
+                else:
+                    self._open += 1
+                    connection = None
+
+            if connection is None:
+                try:
+                    return self._connect()
+                except Exception:
+                    with self._condition:
+                        self._open -= 1
+                        self._condition.notify()
+                    raise
+
+            # Проверка NOOP вне блокировки: это обращение к серверу
+            if self._healthy(connection):
+                return connection
+            self._discard(connection)
+
+    def release(self, connection: PooledConnection, broken: bool = False):
+        """Возврат соединения в пул (broken - закрыть)"""
+        if broken or self._closed:
+            self._discard(connection)
+            return
+        connection.last_used_at = time.monotonic()
+        with self._condition:
+            # Последним использованное берется первым: меньше простаивает и реже требует NOOP
+            self._idle.append(connection)
+            self._condition.notify()
+
+    def send_message(self, message: Message, attempts: int = 2):
+        """
+        Отправка письма через соединение пула
+
+        Raises:
+            smtplib.SMTPException: Сервер отклонил письмо или соединение не удалось восстановить
+        """
+        for attempt in range(1, attempts + 1):
+            connection = self.acquire()
+            try:
+                connection.smtp.send_message(message)
+            except MESSAGE_ERRORS as e:
+                # SMTPException - подкласс OSError, поэтому ответы сервера разбираются первыми
+                if getattr(e, "smtp_code", None) != SERVICE_CLOSING:
+                    self.release(connection)
+                    metrics.inc("smtp_messages_total", outcome="rejected")
+                    raise
+                error = e
+            except OSError as e:
+                # Обрыв соединения, таймаут или SMTPServerDisconnected
+                error = e
+            except Exception:
+                self.release(connection, broken=True)
+                metrics.inc("smtp_messages_total", outcome="error")
+                raise
+            else:
+                connection.messages_sent += 1
+                self.release(connection)
+                metrics.inc("smtp_messages_total", outcome="sent")
+                return
+
+            self.release(connection, broken=True)
+            if attempt == attempts:
+                metrics.inc("smtp_messages_total", outcome="error")
+                raise error
+            logger.warning(f"⚠️ SMTP соединение разорвано ({error}), повтор через новое соединение")
+
+    def close(self):
+        """Закрытие свободных соединений (занятые закрываются при возврате)"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._condition.notify_all()
+        for connection in idle:
+            self._quit(connection.smtp)
+        if idle:
+            logger.info(f"🔒 Закрыто SMTP соединений: {len(idle)}")
@@ -0,0 +1,189 @@
+"""
+Клиент Telegram Bot API с общим пулом соединений
+
+Все обращения к api.telegram.org идут через одну aiohttp.ClientSession на
+event loop: соединения ограничены коннектором и переиспользуются (keep-alive),
+поэтому отправка сообщения не требует нового TCP+TLS рукопожатия. Сессия API
+создается в lifespan приложения и закрывается при остановке; потоки воркера
+фоновых задач со своими event loop получают собственные сессии.
+
+Время и результат каждого вызова пишутся в метрики telegram_api_*.
+"""
+
+import asyncio
+import logging
+import time
+import weakref
+from typing import Any, Dict, Optional
+
+import aiohttp
+from pydantic import BaseSettings
+
+from kafka_events.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TelegramConfig(BaseSettings):
+    """Настройки Telegram Bot API"""
+
+    bot_token: Optional[str] = None
+    chat_id: Optional[str] = None  # Чат исполнителей для публикации заявок
+    api_url: str = "https://api.telegram.org"
+
+    # Пул соединений
+    connection_limit: int = 32
+    keepalive_timeout_seconds: float = 60.0
+    dns_cache_seconds: int = 300
+
+    # Таймауты запросов
+    connect_timeout_seconds: float = 5.0
+    request_timeout_seconds: float = 15.0
+
+    # Прием обновлений: webhook (секрет из заголовка X-Telegram-Bot-Api-Secret-Token) или long polling
+    webhook_url: Optional[str] = None
+    webhook_secret: Optional[str] = None
+    poll_timeout_seconds: int = 30
+    poll_limit: int = 100
+
+    # История переписки: прочитанные сообщения старше history_hot_days переносятся в архив
+    history_hot_days: int = 90
+    history_archive_batch_size: int = 1000
+
+    # Массовые рассылки (лимиты Bot API: ~30 сообщений/с всего, 1 сообщение/с в один чат)
+    broadcast_rate_per_second: float = 25.0
+    broadcast_chat_interval_seconds: float = 1.0
+    broadcast_concurrency: int = 10
+    broadcast_batch_size: int = 200
+    broadcast_max_attempts: int = 3
+    broadcast_slice_seconds: float = 240.0  # Дольше одна задача не работает - продолжение ставится новой задачей
+
+    class Config:
+        env_file = ".env"
+        env_prefix = "TELEGRAM_"
+
+
+# Глобальная конфигурация
+telegram_config = TelegramConfig()
+
+metrics.describe("telegram_api_requests_total", "counter", "Количество вызовов Telegram Bot API по методу и результату")
+metrics.describe("telegram_api_request_duration_seconds", "histogram", "Время вызова Telegram Bot API")
+
+
+class TelegramApiError(Exception):
+    """Ошибка вызова Telegram Bot API"""
+
+    def __init__(self, method: str, description: str, error_code: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(f"{method}: {description}")
+        self.method = method
+        self.description = description
+        self.error_code = error_code
+        self.retry_after = retry_after  # Для 429: через сколько секунд можно повторить
+
+
+class TelegramApiClient:
+    """Вызовы Bot API через общую сессию текущего event loop"""
+
+    def __init__(self, config: TelegramConfig = telegram_config):
+        self.config = config
+        self._sessions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.config.bot_token)
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.config.connection_limit,
+            keepalive_timeout=self.config.keepalive_timeout_seconds,
+            ttl_dns_cache=self.config.dns_cache_seconds,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=self.config.request_timeout_seconds,
+            sock_connect=self.config.connect_timeout_seconds,
+        )
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    def session(self) -> aiohttp.ClientSession:
+        """Сессия текущего event loop (создается при первом обращении)"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = self._sessions[loop] = self._create_session()
+        return session
+
+    async def start(self):
+        """Создание сессии при старте приложения"""
+        self.session()
+        logger.info(f"✅ Пул соединений Telegram Bot API создан (до {self.config.connection_limit} соединений)")
+
+    async def close(self):
+        """Закрытие сессии текущего event loop"""
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
+            logger.info("🔒 Пул соединений Telegram Bot API закрыт")
+
+    async def call(
+        self,
+        method: str,
+        params: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """
+        Вызов метода Bot API
+
+        Args:
+            method: Метод (sendMessage, getMe, ...)
+            params: Параметры (передаются JSON-телом)
+            timeout: Таймаут вызова вместо request_timeout_seconds (например, для long polling)
+
+        Returns:
+            Any: Поле result ответа
+
+        Raises:
+            TelegramApiError: Ответ с ok=false (в т.ч. 429 с retry_after) или сетевая ошибка
+        """
+        if not self.configured:
+            raise TelegramApiError(method, "TELEGRAM_BOT_TOKEN не установлен")
+
+        url = f"{self.config.api_url}/bot{self.config.bot_token}/{method}"
+        request_timeout = aiohttp.ClientTimeout(
+            total=timeout, sock_connect=self.config.connect_timeout_seconds
+        ) if timeout is not None else None
+
+        started = time.monotonic()
+        outcome = "error"
+        try:
+            async with self.session().post(url, json=params or {}, timeout=request_timeout) as response:
+                try:
+                    data = await response.json(content_type=None)
+                except ValueError:
+                    data = {"ok": False, "description": (await response.text())[:500]}
+
+                if data.get("ok"):
+                    outcome = "ok"
+                    return data.get("result")
+
+                outcome = str(data.get("error_code") or response.status)
+                raise TelegramApiError(
+                    method,
+                    data.get("description") or f"HTTP {response.status}",
+                    error_code=data.get("error_code") or response.status,
+                    retry_after=(data.get("parameters") or {}).get("retry_after"),
+                )
+        except asyncio.TimeoutError as e:
+            outcome = "timeout"
+            raise TelegramApiError(method, "таймаут запроса") from e
+        except aiohttp.ClientError as e:
+            raise TelegramApiError(method, f"ошибка соединения: {e}") from e
+        finally:
+            metrics.inc("telegram_api_requests_total", method=method, outcome=outcome)
+            metrics.observe("telegram_api_request_duration_seconds", time.monotonic() - started, method=method)
+
+
+# Глобальный клиент приложения
+telegram_api = TelegramApiClient()
@@ -4,27 +4,36 @@
 """
 
 import logging
-import os
 import asyncio
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timezone
-import aiohttp
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
 from models import (
-    RepairRequest, ContractorProfile, User, SecurityVerification
+    RepairRequest, ContractorProfile, User, SecurityVerification, TelegramUser
 )
+from services.message_templates import message_templates
+from services.telegram_api import TelegramApiError, telegram_api, telegram_config
+from services.telegram_broadcast import broadcast_status, create_broadcast
+from services.telegram_directory import chat_directory
 
 logger = logging.getLogger(__name__)
 
+STATUS_TEXTS = {
+    'assigned': 'назначена',
+    'in_progress': 'в работе',
+    'completed': 'завершена',
+    'cancelled': 'отменена'
+}
+
 class TelegramBotService:
     """Сервис для работы с Telegram ботом"""
     
     def __init__(self, db: Session):
         self.db = db
-        self.bot_token = os.getenv("TELEGRAM_BOT_TOKEN")
-        self.chat_id = os.getenv("TELEGRAM_CHAT_ID")  # ID чата для отправки заявок
-        self.base_url = f"https://api.telegram.org/bot{self.bot_token}"
+        self.api = telegram_api  # Общий пул соединений с Bot API
+        self.bot_token = telegram_config.bot_token
+        self.chat_id = telegram_config.chat_id  # ID чата для отправки заявок
         
         if not self.bot_token:
             logger.warning("⚠️ TELEGRAM_BOT_TOKEN не установлен")
@@ -110,22 +119,7 @@ class TelegramBotService:
             if not request:
                 return False
             
-            message = f"""
-🎯 **Вам назначена новая заявка!**
-
-📋 **Заявка #{request_id}**
-🔧 **Оборудование:** {request.equipment_type or 'Не указано'}
-📍 **Местоположение:** {request.address or 'Не указано'}
-⏰ **Предпочтительная дата:** {request.preferred_date.strftime('%d.%m.%Y %H:%M') if request.preferred_date else 'Не указана'}
-
-📝 **Описание:**
-{request.description}
-
-💬 **Уточнения менеджера:**
-{request.clarification_details or 'Нет уточнений'}
-
-Для получения дополнительной информации обратитесь к менеджеру.
-"""
+            message = message_templates.render("telegram/request_assignment.md", request=request)
             
             return await self.send_notification_to_contractor(contractor_id, message, request_id)
             
@@ -145,26 +139,12 @@ class TelegramBotService:
             if not request:
                 return False
             
-            status_texts = {
-                'assigned': 'назначена',
-                'in_progress': 'в работе',
-                'completed': 'завершена',
-                'cancelled': 'отменена'
-            }
-            
-            status_text = status_texts.get(status, status)
-            
-            message = f"""
-📢 **Обновление статуса заявки**
-
-📋 **Заявка #{request_id}** - статус изменен на: **{status_text}**
-
-🔧 **Оборудование:** {request.equipment_type or 'Не указано'}
-📍 **Местоположение:** {request.address or 'Не указано'}
-
-{'✅ Заявка успешно завершена!' if status == 'completed' else ''}
-{'❌ Заявка отменена' if status == 'cancelled' else ''}
-"""
+            message = message_templates.render(
+                "telegram/request_status_update.md",
+                request=request,
+                status=status,
+                status_text=STATUS_TEXTS.get(status, status),
+            )
             
             return await self.send_notification_to_contractor(contractor_id, message, request_id)
             
@@ -187,9 +167,10 @@ class TelegramBotService:
     async def send_bulk_notification_to_contractors(
         self, 
         message: str, 
-        contractor_ids: Optional[List[int]] = None
+        contractor_ids: Optional[List[int]] = None,
+        created_by: Optional[int] = None
     ) -> Dict[str, Any]:
-        """Массовая отправка уведомлений исполнителям"""
+        """Запуск массовой рассылки исполнителям (отправляет воркер фоновых задач)"""
         if not self.bot_token:
             return {"success": False, "error": "Telegram бот не настроен"}
         
@@ -201,62 +182,28 @@ class TelegramBotService:
             else:
                 contractors = await self.get_verified_contractors_for_notifications()
             
-            results = {
-                "total": len(contractors),
-                "successful": 0,
-                "failed": 0,
-                "errors": []
-            }
-            
-            for contractor in contractors:
-                if contractor.telegram_username:
-                    success = await self._send_message_to_user(contractor.telegram_username, message)
-                    if success:
-                        results["successful"] += 1
-                    else:
-                        results["failed"] += 1
-                        results["errors"].append(f"Исполнитель {contractor.id}: {contractor.telegram_username}")
-                else:
-                    results["failed"] += 1
-                    results["errors"].append(f"Исполнитель {contractor.id}: нет Telegram username")
-            
-            logger.info(f"✅ Массовая отправка завершена: {results['successful']}/{results['total']} успешно")
-            return results
+            broadcast = create_broadcast(
+                self.db,
+                message,
+                [(contractor.id, contractor.telegram_username) for contractor in contractors],
+                created_by=created_by,
+            )
+            return {"success": True, **broadcast_status(broadcast)}
             
         except Exception as e:
-            logger.error(f"❌ Ошибка массовой отправки: {e}")
+            self.db.rollback()
+            logger.error(f"❌ Ошибка создания рассылки: {e}")
             return {"success": False, "error": str(e)}
     
     def _format_request_message(self, request: RepairRequest) -> str:
         """Форматирование сообщения о заявке для отправки в чат"""
         # Скрываем имя заказчика и точную стоимость для конфиденциальности
-        message = f"""
-🔧 **НОВАЯ ЗАЯВКА НА СЕРВИС**
-
-📋 **Заявка #{request.id}**
-🏢 **Компания:** [Скрыто]
-🔧 **Тип оборудования:** {request.equipment_type or 'Не указано'}
-🏭 **Бренд:** {request.equipment_brand or 'Не указан'}
-📍 **Местоположение:** {request.address or 'Не указано'}
-🌍 **Регион:** {request.region or 'Не указан'}
-
-📝 **Описание проблемы:**
-{request.problem_description or request.description}
-
-⏰ **Предпочтительная дата:** {request.preferred_date.strftime('%d.%m.%Y %H:%M') if request.preferred_date else 'Не указана'}
-⚡ **Срочность:** {self._get_urgency_text(request.urgency)}
-🎯 **Приоритет:** {self._get_priority_text(request.priority)}
-
-💬 **Уточнения менеджера:**
-{request.clarification_details or 'Нет уточнений'}
-
-💰 **Примерная стоимость:** [Уточняется менеджером]
-
----
-👥 **Откликнуться могут только проверенные исполнители**
-📞 **Для отклика обратитесь к менеджеру**
-"""
-        return message
+        return message_templates.render(
+            "telegram/request_published.md",
+            request=request,
+            urgency_text=self._get_urgency_text(request.urgency),
+            priority_text=self._get_priority_text(request.priority),
+        )
     
     def _get_urgency_text(self, urgency: Optional[str]) -> str:
         """Получение текста срочности"""
@@ -281,68 +228,47 @@ class TelegramBotService:
     async def _send_message(self, chat_id: str, text: str) -> bool:
         """Отправка сообщения в чат"""
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.base_url}/sendMessage"
-                data = {
-                    "chat_id": chat_id,
-                    "text": text,
-                    "parse_mode": "Markdown"
-                }
-                
-                async with session.post(url, json=data) as response:
-                    if response.status == 200:
-                        return True
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"❌ Ошибка отправки в Telegram: {error_text}")
-                        return False
-                        
-        except Exception as e:
-            logger.error(f"❌ Ошибка HTTP запроса к Telegram: {e}")
+            await self._deliver(chat_id, text)
+            return True
+        except TelegramApiError as e:
+            logger.error(f"❌ Ошибка отправки в Telegram: {e}")
             return False
     
+    async def _deliver(self, chat_id, text: str):
+        """sendMessage без перехвата TelegramApiError"""
+        await self.api.call("sendMessage", {
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": "Markdown"
+        })
+    
     async def _send_message_to_user(self, username: str, text: str) -> bool:
-        """Отправка сообщения пользователю по username"""
+        """Отправка сообщения пользователю по username: один вызов sendMessage"""
+        chat_id = self._get_user_chat_id(username)
+        if not chat_id:
+            return False
+        
         try:
-            # Сначала получаем chat_id пользователя
-            chat_id = await self._get_user_chat_id(username)
-            if not chat_id:
-                return False
-            
-            return await self._send_message(chat_id, text)
-            
-        except Exception as e:
+            await self._deliver(chat_id, text)
+            return True
+        except TelegramApiError as e:
+            if e.error_code == 403:
+                # Пользователь заблокировал бота: не пытаемся писать ему до нового сообщения от него
+                self._deactivate_chat(username, chat_id)
             logger.error(f"❌ Ошибка отправки сообщения пользователю {username}: {e}")
             return False
     
-    async def _get_user_chat_id(self, username: str) -> Optional[str]:
-        """Получение chat_id пользователя по username"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.base_url}/getUpdates"
-                
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        # Ищем пользователя в последних обновлениях
-                        for update in data.get("result", []):
-                            if "message" in update:
-                                message = update["message"]
-                                if "from" in message:
-                                    user = message["from"]
-                                    if user.get("username") == username.replace("@", ""):
-                                        return str(user["id"])
-                        
-                        logger.warning(f"⚠️ Пользователь {username} не найден в обновлениях бота")
-                        return None
-                    else:
-                        logger.warning(f"⚠️ Ошибка получения обновлений: {response.status}")
-                        return None
-                        
-        except Exception as e:
-            logger.warning(f"⚠️ Ошибка получения chat_id для {username}: {e}")
-            return None
+    def _get_user_chat_id(self, username: str) -> Optional[int]:
+        """Получение chat_id пользователя по username из справочника telegram_users"""
+        chat_id = chat_directory.resolve(self.db, username)
+        if not chat_id:
+            logger.warning(f"⚠️ Пользователь {username} не писал боту, chat_id неизвестен")
+        return chat_id
+    
+    def _deactivate_chat(self, username: str, chat_id: int):
+        chat_directory.forget(username)
+        self.db.query(TelegramUser).filter(TelegramUser.telegram_id == chat_id).update({"is_active": False})
+        self.db.commit()
     
     async def test_bot_connection(self) -> Dict[str, Any]:
         """Тестирование подключения к Telegram боту"""
@@ -350,29 +276,20 @@ class TelegramBotService:
             return {"success": False, "error": "TELEGRAM_BOT_TOKEN не установлен"}
         
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.base_url}/getMe"
-                
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        bot_info = data.get("result", {})
-                        return {
-                            "success": True,
-                            "bot_info": {
-                                "id": bot_info.get("id"),
-                                "username": bot_info.get("username"),
-                                "first_name": bot_info.get("first_name"),
-                                "can_join_groups": bot_info.get("can_join_groups"),
-                                "can_read_all_group_messages": bot_info.get("can_read_all_group_messages")
-                            }
-                        }
-                    else:
-                        error_text = await response.text()
-                        return {"success": False, "error": f"Ошибка API: {error_text}"}
-                        
-        except Exception as e:
-            return {"success": False, "error": f"Ошибка подключения: {e}"}
+            bot_info = await self.api.call("getMe")
+        except TelegramApiError as e:
+            return {"success": False, "error": f"Ошибка API: {e.description}"}
+        
+        return {
+            "success": True,
+            "bot_info": {
+                "id": bot_info.get("id"),
+                "username": bot_info.get("username"),
+                "first_name": bot_info.get("first_name"),
+                "can_join_groups": bot_info.get("can_join_groups"),
+                "can_read_all_group_messages": bot_info.get("can_read_all_group_messages")
+            }
+        }
 
 def get_telegram_bot_service(db: Session) -> TelegramBotService:
     """Получение экземпляра сервиса Telegram бота"""
@@ -0,0 +1,379 @@
+"""
+Массовые рассылки исполнителям через Telegram бота
+
+Рассылка создается одной транзакцией: запись telegram_broadcasts, строки
+получателей с уже найденными chat_id и фоновая задача telegram.broadcast.
+Endpoint сразу возвращает id рассылки, отправку выполняет воркер фоновых задач.
+
+BroadcastEngine отправляет сообщения пачками по broadcast_batch_size с
+ограниченной параллельностью:
+- общий token bucket держит темп ниже глобального лимита Bot API, ответ 429
+  приостанавливает его на retry_after секунд для всех отправок сразу;
+- в один чат сообщения уходят не чаще раза в broadcast_chat_interval_seconds;
+- 400/403 - окончательная ошибка получателя (403 - бот заблокирован, чат
+  деактивируется), прочие ошибки повторяются до broadcast_max_attempts.
+
+Статус каждого получателя и счетчики рассылки сохраняются после каждой пачки,
+поэтому рассылка продолжается с места остановки после сбоя воркера. Одна
+задача работает не дольше broadcast_slice_seconds и ставит продолжение
+новой задачей, чтобы не превысить lock_timeout очереди.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from kafka_events.metrics import metrics
+from models import TelegramBroadcast, TelegramBroadcastRecipient, TelegramUser
+from services.job_queue import PermanentJobError, enqueue_job, job_handler
+from services.telegram_api import TelegramApiClient, TelegramApiError, TelegramConfig, telegram_api, telegram_config
+from services.telegram_directory import chat_directory, normalize_username
+
+logger = logging.getLogger(__name__)
+
+SEND_BROADCAST = "telegram.broadcast"
+
+# Статусы рассылки
+PENDING = "pending"
+RUNNING = "running"
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+
+# Статусы получателя
+RECIPIENT_PENDING = "pending"
+RECIPIENT_SENT = "sent"
+RECIPIENT_FAILED = "failed"
+
+# Ошибки Bot API, которые не исправит повтор
+PERMANENT_ERROR_CODES = (400, 403)
+RETRY_BASE_SECONDS = 1.0
+RETRY_MAX_SECONDS = 30.0
+
+metrics.describe("telegram_broadcast_messages_total", "counter", "Сообщения массовых рассылок по результату")
+metrics.describe("telegram_broadcast_throttled_total", "counter", "Ответы 429 при массовых рассылках")
+
+
+class TokenBucket:
+    """
+    Ограничение темпа вызовов: rate токенов в секунду, не больше capacity подряд
+
+    pause() останавливает выдачу токенов (ответ 429 с retry_after). Рассчитан на
+    корутины одного event loop.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def pause(self, seconds: float):
+        now = self._clock()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0.0
+        self._updated = self._paused_until
+
+    async def acquire(self):
+        while True:
+            now = self._clock()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class ChatThrottle:
+    """Интервал между сообщениями в один чат"""
+
+    def __init__(self, interval: float, clock=time.monotonic):
+        self.interval = interval
+        self._clock = clock
+        self._next: Dict[int, float] = {}
+
+    async def wait(self, chat_id: int):
+        now = self._clock()
+        ready = self._next.get(chat_id, now)
+        self._next[chat_id] = max(now, ready) + self.interval
+        if ready > now:
+            await asyncio.sleep(ready - now)
+
+
+class Delivery(NamedTuple):
+    """Результат отправки одному получателю"""
+    status: str
+    attempts: int
+    error: Optional[str] = None
+    error_code: Optional[int] = None
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def create_broadcast(
+    db: Session,
+    message: str,
+    recipients: Iterable[Tuple[int, Optional[str]]],
+    created_by: Optional[int] = None,
+) -> TelegramBroadcast:
+    """
+    Создание рассылки и постановка задачи на отправку
+
+    Args:
+        db: Сессия БД
+        message: Текст сообщения (Markdown)
+        recipients: Пары (id профиля исполнителя, Telegram username)
+        created_by: Пользователь, запустивший рассылку
+
+    Returns:
+        TelegramBroadcast: Рассылка (получатели без chat_id сразу помечены неудачными)
+    """
+    recipients = list(recipients)
+    chat_ids = chat_directory.resolve_many(db, [username for _, username in recipients if username])
+
+    broadcast = TelegramBroadcast(
+        message=message, status=PENDING, created_by=created_by, total=len(recipients), sent=0, failed=0
+    )
+    db.add(broadcast)
+    db.flush()
+
+    rows = []
+    for contractor_id, username in recipients:
+        chat_id = chat_ids.get(normalize_username(username))
+        if not username:
+            error = "нет Telegram username"
+        elif chat_id is None:
+            error = "пользователь не писал боту, chat_id неизвестен"
+        else:
+            error = None
+        rows.append({
+            "broadcast_id": broadcast.id,
+            "contractor_id": contractor_id,
+            "username": username,
+            "chat_id": chat_id,
+            "status": RECIPIENT_FAILED if error else RECIPIENT_PENDING,
+            "attempts": 0,
+            "error": error,
+        })
+    if rows:
+        db.execute(insert(TelegramBroadcastRecipient), rows)
+
+    broadcast.failed = sum(1 for row in rows if row["error"])
+    if broadcast.failed == broadcast.total:
+        broadcast.status = COMPLETED
+        broadcast.finished_at = _now()
+    else:
+        enqueue_job(db, SEND_BROADCAST, {"broadcast_id": broadcast.id})
+    db.commit()
+
+    logger.info(
+        f"📣 Рассылка #{broadcast.id} создана: {broadcast.total} получателей, "
+        f"{broadcast.total - broadcast.failed} с известным chat_id"
+    )
+    return broadcast
+
+
+def broadcast_status(broadcast: TelegramBroadcast) -> Dict[str, Any]:
+    """Прогресс рассылки для API"""
+    return {
+        "id": broadcast.id,
+        "status": broadcast.status,
+        "total": broadcast.total,
+        "sent": broadcast.sent,
+        "failed": broadcast.failed,
+        "pending": broadcast.total - broadcast.sent - broadcast.failed,
+        "created_at": broadcast.created_at.isoformat() if broadcast.created_at else None,
+        "started_at": broadcast.started_at.isoformat() if broadcast.started_at else None,
+        "finished_at": broadcast.finished_at.isoformat() if broadcast.finished_at else None,
+    }
+
+
+def broadcast_failures(db: Session, broadcast_id: int, limit: int = 100) -> List[Dict[str, Any]]:
+    """Получатели, которым не удалось отправить сообщение"""
+    rows = db.query(
+        TelegramBroadcastRecipient.contractor_id, TelegramBroadcastRecipient.username, TelegramBroadcastRecipient.error
+    ).filter(
+        TelegramBroadcastRecipient.broadcast_id == broadcast_id,
+        TelegramBroadcastRecipient.status == RECIPIENT_FAILED,
+    ).order_by(TelegramBroadcastRecipient.id).limit(limit)
+    return [{"contractor_id": contractor_id, "username": username, "error": error} for contractor_id, username, error in rows]
+
+
+def cancel_broadcast(db: Session, broadcast_id: int) -> Optional[TelegramBroadcast]:
+    """Отмена рассылки: воркер остановится после текущей пачки"""
+    broadcast = db.get(TelegramBroadcast, broadcast_id)
+    if broadcast is None:
+        return None
+    if broadcast.status in (PENDING, RUNNING):
+        broadcast.status = CANCELLED
+        broadcast.finished_at = _now()
+        db.commit()
+        logger.info(f"🛑 Рассылка #{broadcast_id} отменена")
+    return broadcast
+
+
+class BroadcastEngine:
+    """Отправка сообщений рассылки с учетом лимитов Bot API"""
+
+    def __init__(self, api: TelegramApiClient = telegram_api, config: TelegramConfig = telegram_config):
+        self.api = api
+        self.config = config
+        # Общие для всех рассылок процесса: лимиты Bot API действуют на бота целиком
+        self.bucket = TokenBucket(config.broadcast_rate_per_second)
+        self.chats = ChatThrottle(config.broadcast_chat_interval_seconds)
+
+    async def run(self, db: Session, broadcast_id: int, deadline: Optional[float] = None) -> bool:
+        """
+        Отправка ожидающих получателей рассылки
+
+        Args:
+            db: Сессия БД
+            broadcast_id: ID рассылки
+            deadline: time.monotonic(), после которого новые отправки не начинаются
+                (по умолчанию через broadcast_slice_seconds)
+
+        Returns:
+            bool: True если рассылка завершена или отменена, False если остались получатели
+        """
+        broadcast = db.get(TelegramBroadcast, broadcast_id)
+        if broadcast is None:
+            raise PermanentJobError(f"Рассылка {broadcast_id} не найдена")
+        if broadcast.status in (COMPLETED, CANCELLED):
+            return True
+
+        if deadline is None:
+            deadline = time.monotonic() + self.config.broadcast_slice_seconds
+        broadcast.status = RUNNING
+        broadcast.started_at = broadcast.started_at or _now()
+        db.commit()
+
+        semaphore = asyncio.Semaphore(self.config.broadcast_concurrency)
+        last_id = 0
+        while time.monotonic() < deadline:
+            batch = db.query(
+                TelegramBroadcastRecipient.id, TelegramBroadcastRecipient.username, TelegramBroadcastRecipient.chat_id
+            ).filter(
+                TelegramBroadcastRecipient.broadcast_id == broadcast_id,
+                TelegramBroadcastRecipient.status == RECIPIENT_PENDING,
+                TelegramBroadcastRecipient.id > last_id,
+            ).order_by(TelegramBroadcastRecipient.id).limit(self.config.broadcast_batch_size).all()
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            deliveries = await asyncio.gather(*(
+                self._send(semaphore, broadcast.message, row.chat_id, deadline) for row in batch
+            ))
+            self._save_batch(db, broadcast_id, batch, deliveries)
+
+            db.refresh(broadcast)
+            if broadcast.status == CANCELLED:
+                logger.info(f"🛑 Рассылка #{broadcast_id} остановлена: {broadcast.sent}/{broadcast.total} отправлено")
+                return True
+
+        remaining = broadcast.total - broadcast.sent - broadcast.failed
+        if remaining > 0:
+            logger.info(f"⏸️ Рассылка #{broadcast_id}: отправлено {broadcast.sent}/{broadcast.total}, продолжение в новой задаче")
+            return False
+
+        broadcast.status = COMPLETED
+        broadcast.finished_at = _now()
+        db.commit()
+        logger.info(
+            f"✅ Рассылка #{broadcast_id} завершена: {broadcast.sent}/{broadcast.total} успешно, "
+            f"{broadcast.failed} с ошибкой"
+        )
+        return True
+
+    async def _send(self, semaphore: asyncio.Semaphore, message: str, chat_id: int, deadline: float) -> Delivery:
+        attempts = 0
+        while True:
+            if time.monotonic() >= deadline:
+                return Delivery(RECIPIENT_PENDING, attempts)
+
+            async with semaphore:
+                await self.chats.wait(chat_id)
+                await self.bucket.acquire()
+                try:
+                    await self.api.call("sendMessage", {"chat_id": chat_id, "text": message, "parse_mode": "Markdown"})
+                    return Delivery(RECIPIENT_SENT, attempts + 1)
+                except TelegramApiError as e:
+                    error = e
+
+            if error.retry_after:
+                # 429 не считается попыткой: Telegram просит подождать, а не сообщает об ошибке
+                metrics.inc("telegram_broadcast_throttled_total")
+                self.bucket.pause(float(error.retry_after))
+                logger.warning(f"⚠️ Telegram ограничил частоту отправки, пауза {error.retry_after} с")
+                continue
+
+            attempts += 1
+            if error.error_code in PERMANENT_ERROR_CODES or attempts >= self.config.broadcast_max_attempts:
+                return Delivery(RECIPIENT_FAILED, attempts, error.description, error.error_code)
+            await asyncio.sleep(min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+    def _save_batch(self, db: Session, broadcast_id: int, batch, deliveries: List[Delivery]):
+        """Статусы получателей и счетчики рассылки одной транзакцией"""
+        sent = failed = 0
+        blocked = []
+        updates = []
+        for row, delivery in zip(batch, deliveries):
+            if delivery.attempts == 0:
+                continue
+            update = {"id": row.id, "status": delivery.status, "attempts": delivery.attempts, "error": delivery.error}
+            if delivery.status == RECIPIENT_SENT:
+                sent += 1
+                update["sent_at"] = _now()
+            elif delivery.status == RECIPIENT_FAILED:
+                failed += 1
+                if delivery.error_code == 403:
+                    blocked.append(row)
+            updates.append(update)
+            metrics.inc("telegram_broadcast_messages_total", result=delivery.status)
+
+        # Повторно отправленные после сбоя получатели накапливают попытки
+        for update in updates:
+            db.query(TelegramBroadcastRecipient).filter(TelegramBroadcastRecipient.id == update.pop("id")).update(
+                {**update, "attempts": TelegramBroadcastRecipient.attempts + update["attempts"]},
+                synchronize_session=False,
+            )
+        if sent or failed:
+            db.query(TelegramBroadcast).filter(TelegramBroadcast.id == broadcast_id).update(
+                {"sent": TelegramBroadcast.sent + sent, "failed": TelegramBroadcast.failed + failed},
+                synchronize_session=False,
+            )
+        if blocked:
+            # Пользователи заблокировали бота: не пишем им до нового сообщения от них
+            for row in blocked:
+                chat_directory.forget(row.username)
+            db.query(TelegramUser).filter(
+                TelegramUser.telegram_id.in_([row.chat_id for row in blocked])
+            ).update({"is_active": False}, synchronize_session=False)
+        db.commit()
+
+
+# Движок процесса воркера
+broadcast_engine = BroadcastEngine()
+
+
+@job_handler(SEND_BROADCAST, concurrency=1)
+async def send_broadcast(payload: Dict[str, Any], db: Session):
+    """Отправка рассылки; незавершенная рассылка продолжается новой задачей"""
+    if not broadcast_engine.api.configured:
+        raise PermanentJobError("Telegram бот не настроен")
+
+    if not await broadcast_engine.run(db, payload["broadcast_id"]):
+        enqueue_job(db, SEND_BROADCAST, payload)
+        db.commit()
@@ -0,0 +1,280 @@
+"""
+Сервис переписки с пользователями Telegram
+
+Количество непрочитанных входящих и время последнего сообщения хранятся в
+telegram_users (unread_count, last_message_at) и меняются в той же
+транзакции, что и сами сообщения: прием обновлений увеличивает счетчик на
+число новых сообщений, отметка прочтения уменьшает его ровно на число
+отмеченных строк. Поэтому список переписок и счетчики читаются из одной
+таблицы по индексу, без COUNT по telegram_messages.
+
+recount_unread пересчитывает счетчики по частичному индексу непрочитанных
+сообщений (заполнение после миграции и сверка).
+
+История переписки разделена на горячую таблицу telegram_messages и архив
+telegram_messages_archive: archive_messages (archive_telegram_messages.py по
+cron) переносит туда прочитанные сообщения старше TELEGRAM_HISTORY_HOT_DAYS,
+поэтому прием и отметка прочтения работают с таблицей ограниченного размера.
+get_history читает страницы по ключу (created_at, id) из обеих таблиц по
+индексам (telegram_user_id, created_at, id).
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, bindparam, case, func, insert, or_, select, union_all, update
+from sqlalchemy.orm import Session
+
+from models import TelegramMessage, TelegramMessageArchive, TelegramUser
+from services.telegram_api import telegram_config
+
+logger = logging.getLogger(__name__)
+
+MAX_CONVERSATIONS_PAGE = 200
+MAX_HISTORY_PAGE = 200
+HISTORY_COLUMNS = ("id", "telegram_user_id", "message_text", "message_type", "is_from_bot", "is_read", "created_at")
+
+_users = TelegramUser.__table__
+
+
+class TelegramChatService:
+    """Счетчики, список переписок и история сообщений с пользователями Telegram"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def record_incoming(self, messages: Iterable[Dict[str, Any]]):
+        """
+        Учет новых входящих сообщений в счетчиках пользователей (без commit)
+
+        Args:
+            messages: Строки сообщений с telegram_user_id и created_at
+        """
+        totals: Dict[int, Dict[str, Any]] = {}
+        for message in messages:
+            total = totals.setdefault(message["telegram_user_id"], {"count": 0, "last_at": message["created_at"]})
+            total["count"] += 1
+            total["last_at"] = max(total["last_at"], message["created_at"])
+        if not totals:
+            return
+
+        last_at = bindparam("b_last_at")
+        self.db.execute(
+            update(_users)
+            .where(_users.c.id == bindparam("b_id"))
+            .values(
+                unread_count=_users.c.unread_count + bindparam("b_count"),
+                # Сообщения пачки могут прийти позже более новых (повтор webhook)
+                last_message_at=case(
+                    (or_(_users.c.last_message_at.is_(None), _users.c.last_message_at < last_at), last_at),
+                    else_=_users.c.last_message_at,
+                ),
+            ),
+            [
+                {"b_id": user_id, "b_count": total["count"], "b_last_at": total["last_at"]}
+                for user_id, total in totals.items()
+            ],
+        )
+
+    def mark_read(self, telegram_user_id: int) -> int:
+        """
+        Отметка входящих сообщений пользователя прочитанными
+
+        Returns:
+            int: Количество отмеченных сообщений
+        """
+        updated = self.db.query(TelegramMessage).filter(
+            TelegramMessage.telegram_user_id == telegram_user_id,
+            TelegramMessage.is_from_bot == False,
+            TelegramMessage.is_read == False
+        ).update({"is_read": True}, synchronize_session=False)
+
+        if updated:
+            # Сообщения, пришедшие после UPDATE, уже учтены в счетчике и остаются непрочитанными
+            self.db.query(TelegramUser).filter(TelegramUser.id == telegram_user_id).update(
+                {"unread_count": case(
+                    (TelegramUser.unread_count > updated, TelegramUser.unread_count - updated), else_=0
+                )},
+                synchronize_session=False,
+            )
+        self.db.commit()
+        return updated
+
+    def recount_unread(self, telegram_user_ids: Optional[List[int]] = None) -> int:
+        """
+        Пересчет unread_count и last_message_at по сообщениям
+
+        Returns:
+            int: Количество обновленных пользователей
+        """
+        unread = self.db.query(func.count(TelegramMessage.id)).filter(
+            TelegramMessage.telegram_user_id == TelegramUser.id,
+            TelegramMessage.is_from_bot == False,
+            TelegramMessage.is_read == False,
+        ).scalar_subquery()
+        history = union_all(
+            select(TelegramMessage.created_at).where(TelegramMessage.telegram_user_id == TelegramUser.id),
+            select(TelegramMessageArchive.created_at).where(TelegramMessageArchive.telegram_user_id == TelegramUser.id),
+        ).subquery()
+        last_at = select(func.max(history.c.created_at)).scalar_subquery()
+
+        query = self.db.query(TelegramUser)
+        if telegram_user_ids is not None:
+            query = query.filter(TelegramUser.id.in_(telegram_user_ids))
+        updated = query.update({"unread_count": unread, "last_message_at": last_at}, synchronize_session=False)
+        self.db.commit()
+        return updated
+
+    def list_conversations(
+        self,
+        limit: int = 50,
+        before_at: Optional[datetime] = None,
+        before_id: Optional[int] = None,
+        unread_only: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Переписки по убыванию времени последнего сообщения
+
+        Страницы по ключу (last_message_at, id): следующая страница начинается
+        после next_before_at/next_before_id предыдущей.
+
+        Returns:
+            Dict: conversations и курсор следующей страницы (None на последней)
+        """
+        limit = max(1, min(limit, MAX_CONVERSATIONS_PAGE))
+        query = self.db.query(
+            TelegramUser.id, TelegramUser.telegram_id, TelegramUser.user_id, TelegramUser.username,
+            TelegramUser.first_name, TelegramUser.last_name, TelegramUser.is_active,
+            TelegramUser.unread_count, TelegramUser.last_message_at,
+        ).filter(TelegramUser.last_message_at.isnot(None))
+        if unread_only:
+            query = query.filter(TelegramUser.unread_count > 0)
+        if before_at is not None and before_id is not None:
+            query = query.filter(or_(
+                TelegramUser.last_message_at < before_at,
+                and_(TelegramUser.last_message_at == before_at, TelegramUser.id < before_id),
+            ))
+
+        rows = query.order_by(TelegramUser.last_message_at.desc(), TelegramUser.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        conversations = [dict(row._mapping) for row in rows]
+        last = rows[-1] if has_more else None
+        return {
+            "conversations": conversations,
+            "next_before_at": last.last_message_at if last else None,
+            "next_before_id": last.id if last else None,
+        }
+
+    def _find_message(self, message_id: int):
+        for model in (TelegramMessage, TelegramMessageArchive):
+            row = self.db.query(model.telegram_user_id, model.created_at).filter(model.id == message_id).first()
+            if row:
+                return row
+        return None
+
+    def get_history(
+        self,
+        telegram_user_id: int,
+        limit: int = 100,
+        before_id: Optional[int] = None,
+        after_id: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Страница переписки, сообщения от новых к старым
+
+        Args:
+            telegram_user_id: ID пользователя Telegram
+            limit: Размер страницы
+            before_id: Сообщения старше указанного (прокрутка истории назад)
+            after_id: Сообщения новее указанного (подгрузка новых)
+
+        Returns:
+            Dict: messages и has_more (есть ли еще сообщения в направлении чтения)
+
+        Raises:
+            ValueError: Указаны оба курсора или сообщение-курсор не из этой переписки
+        """
+        if before_id is not None and after_id is not None:
+            raise ValueError("Укажите только before_id или after_id")
+        limit = max(1, min(limit, MAX_HISTORY_PAGE))
+        newer = after_id is not None
+        cursor_id = after_id if newer else before_id
+
+        cursor_at = None
+        if cursor_id is not None:
+            found = self._find_message(cursor_id)
+            if found is None or found.telegram_user_id != telegram_user_id:
+                raise ValueError(f"Сообщение {cursor_id} не найдено в переписке")
+            cursor_at = found.created_at
+
+        rows: List[Dict[str, Any]] = []
+        for model in (TelegramMessage, TelegramMessageArchive):
+            query = self.db.query(*(getattr(model, column) for column in HISTORY_COLUMNS)).filter(
+                model.telegram_user_id == telegram_user_id
+            )
+            if newer:
+                if cursor_id is not None:
+                    query = query.filter(or_(
+                        model.created_at > cursor_at, and_(model.created_at == cursor_at, model.id > cursor_id)
+                    ))
+                query = query.order_by(model.created_at.asc(), model.id.asc())
+            else:
+                if cursor_id is not None:
+                    query = query.filter(or_(
+                        model.created_at < cursor_at, and_(model.created_at == cursor_at, model.id < cursor_id)
+                    ))
+                query = query.order_by(model.created_at.desc(), model.id.desc())
+            rows.extend(dict(row._mapping) for row in query.limit(limit + 1))
+
+        # Непрочитанные старые сообщения остаются в горячей таблице, поэтому страницы объединяются
+        rows.sort(key=lambda row: (row["created_at"], row["id"]), reverse=not newer)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if newer:
+            rows.reverse()
+        return {"messages": rows, "has_more": has_more}
+
+    def archive_messages(self, older_than_days: Optional[int] = None, batch_size: Optional[int] = None) -> int:
+        """
+        Перенос прочитанных и исходящих сообщений старше older_than_days в архив
+
+        Каждая пачка переносится отдельной транзакцией (INSERT ... SELECT и DELETE),
+        поэтому прерванный перенос продолжается следующим запуском.
+
+        Returns:
+            int: Количество перенесенных сообщений
+        """
+        older_than_days = telegram_config.history_hot_days if older_than_days is None else older_than_days
+        batch_size = batch_size or telegram_config.history_archive_batch_size
+        cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+        columns = [column.name for column in TelegramMessageArchive.__table__.columns if column.name != "archived_at"]
+        source = TelegramMessage.__table__
+
+        moved = 0
+        while True:
+            ids = [message_id for (message_id,) in self.db.query(TelegramMessage.id).filter(
+                TelegramMessage.created_at < cutoff,
+                # Непрочитанные остаются: по ним считаются unread_count и отметка прочтения
+                or_(TelegramMessage.is_read == True, TelegramMessage.is_from_bot == True),
+            ).order_by(TelegramMessage.id).limit(batch_size)]
+            if not ids:
+                break
+
+            self.db.execute(insert(TelegramMessageArchive).from_select(
+                columns, select(*(source.c[name] for name in columns)).where(source.c.id.in_(ids))
+            ))
+            self.db.query(TelegramMessage).filter(TelegramMessage.id.in_(ids)).delete(synchronize_session=False)
+            self.db.commit()
+            moved += len(ids)
+
+        if moved:
+            logger.info(f"📦 Перенесено в архив сообщений Telegram: {moved} (старше {older_than_days} дн.)")
+        return moved
+
+
+def get_telegram_chat_service(db: Session) -> TelegramChatService:
+    """Получение экземпляра сервиса переписки"""
+    return TelegramChatService(db)
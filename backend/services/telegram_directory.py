@@ -0,0 +1,118 @@
+"""
+Справочник username -> chat_id для личных сообщений бота
+
+Bot API не позволяет писать пользователю по username: нужен chat_id (для
+личного чата он совпадает с telegram_id пользователя). Источник - таблица
+telegram_users, которую заполняет прием обновлений бота. Найденные chat_id
+держатся в памяти процесса, отсутствующие username - в негативном кэше на
+negative_ttl секунд, поэтому повторные отправки не обращаются ни к БД, ни к
+getUpdates.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import TelegramUser
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_username(username: Optional[str]) -> str:
+    """Username без @ в нижнем регистре (username в Telegram не зависят от регистра)"""
+    return (username or "").strip().lstrip("@").lower()
+
+
+class ChatIdDirectory:
+    """Кэш chat_id пользователей Telegram поверх telegram_users"""
+
+    def __init__(self, negative_ttl: float = 300.0):
+        self.negative_ttl = negative_ttl
+        self._chat_ids: Dict[str, int] = {}
+        self._misses: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _cached(self, key: str):
+        """(True, chat_id) - ответ из кэша, (False, None) - нужен запрос к БД"""
+        with self._lock:
+            if key in self._chat_ids:
+                return True, self._chat_ids[key]
+            expires = self._misses.get(key)
+            if expires is not None:
+                if expires > time.monotonic():
+                    return True, None
+                del self._misses[key]
+        return False, None
+
+    def _store(self, found: Dict[str, int], missing: Iterable[str]):
+        expires = time.monotonic() + self.negative_ttl
+        with self._lock:
+            self._chat_ids.update(found)
+            for key in missing:
+                self._misses[key] = expires
+
+    def resolve(self, db: Session, username: str) -> Optional[int]:
+        """chat_id пользователя или None, если он не писал боту"""
+        return self.resolve_many(db, [username]).get(normalize_username(username))
+
+    def resolve_many(self, db: Session, usernames: Iterable[str]) -> Dict[str, int]:
+        """
+        chat_id для набора username одним запросом к БД
+
+        Returns:
+            Dict[str, int]: Нормализованный username -> chat_id (только найденные)
+        """
+        result: Dict[str, int] = {}
+        unknown = set()
+        for username in usernames:
+            key = normalize_username(username)
+            if not key:
+                continue
+            cached, chat_id = self._cached(key)
+            if not cached:
+                unknown.add(key)
+            elif chat_id is not None:
+                result[key] = chat_id
+
+        if unknown:
+            found = {
+                key: telegram_id
+                for key, telegram_id in db.query(
+                    func.lower(TelegramUser.username), TelegramUser.telegram_id
+                ).filter(
+                    func.lower(TelegramUser.username).in_(unknown),
+                    TelegramUser.is_active == True,
+                )
+            }
+            self._store(found, unknown - found.keys())
+            result.update(found)
+        return result
+
+    def remember(self, username: Optional[str], chat_id: int):
+        """Регистрация пользователя, написавшего боту (вызывает прием обновлений)"""
+        key = normalize_username(username)
+        if not key:
+            return
+        with self._lock:
+            self._chat_ids[key] = chat_id
+            self._misses.pop(key, None)
+
+    def forget(self, username: Optional[str]):
+        """Удаление из кэша (пользователь заблокировал бота или сменил username)"""
+        key = normalize_username(username)
+        with self._lock:
+            self._chat_ids.pop(key, None)
+            self._misses.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._chat_ids.clear()
+            self._misses.clear()
+
+
+# Справочник процесса
+chat_directory = ChatIdDirectory()
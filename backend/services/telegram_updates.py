@@ -0,0 +1,269 @@
+"""
+Прием обновлений Telegram бота
+
+Обновления приходят на webhook (POST /api/v1/telegram/webhook) или, если
+webhook не настроен, забираются long polling'ом (telegram_updates_main.py).
+Оба пути передают пачку обновлений в ingest_updates:
+
+- пользователи пачки сохраняются одним INSERT ... ON CONFLICT (telegram_id)
+  DO UPDATE (username и имя обновляются, заблокировавший бота пользователь
+  снова становится активным);
+- сообщения вставляются одним INSERT ... ON CONFLICT (update_id) DO NOTHING,
+  поэтому повторная доставка обновления (ретрай webhook, перезапуск poller'а
+  до сохранения offset) не создает дублей;
+- счетчики непрочитанных и время последнего сообщения пользователей
+  обновляются в той же транзакции (TelegramChatService.record_incoming);
+- после commit chat_id пользователей попадают в справочник chat_directory,
+  а по новым сообщениям публикуются события notification.telegram.message_received.
+
+Poller хранит следующий update_id в telegram_polling_offsets и подтверждает
+обработанные обновления следующим вызовом getUpdates с offset.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from kafka_events.kafka_events import TelegramMessageReceivedEvent
+from kafka_events.kafka_producer import kafka_producer
+from kafka_events.metrics import metrics
+from models import TelegramMessage, TelegramPollingOffset, TelegramUser
+from services.telegram_api import TelegramApiClient, TelegramApiError, TelegramConfig, telegram_api, telegram_config
+from services.telegram_chat_service import TelegramChatService
+from services.telegram_directory import chat_directory
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_UPDATES = ["message"]
+MEDIA_TYPES = ("photo", "document", "video", "voice", "audio", "video_note", "sticker", "location", "contact")
+PREVIEW_LENGTH = 200
+POLL_ERROR_DELAY_SECONDS = 5.0
+
+metrics.describe("telegram_updates_received_total", "counter", "Обновления Telegram по источнику (webhook, polling)")
+metrics.describe("telegram_messages_ingested_total", "counter", "Новые входящие сообщения Telegram")
+
+
+def _insert(db: Session, model):
+    """INSERT с поддержкой ON CONFLICT для диалекта текущей БД"""
+    dialect = db.get_bind().dialect.name
+    return (postgresql.insert if dialect == "postgresql" else sqlite.insert)(model)
+
+
+def _message_content(message: Dict[str, Any]) -> Tuple[str, str]:
+    """Тип и текст сообщения (для вложений - подпись или тип в скобках)"""
+    if "text" in message:
+        return "text", message["text"]
+    for media_type in MEDIA_TYPES:
+        if media_type in message:
+            return media_type, message.get("caption") or f"[{media_type}]"
+    return "other", message.get("caption") or "[сообщение]"
+
+
+def parse_updates(updates: List[Dict[str, Any]]) -> Tuple[Dict[int, Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Личные сообщения пользователей из пачки обновлений
+
+    Returns:
+        Tuple: telegram_id -> данные пользователя (последние в пачке), строки сообщений
+    """
+    users: Dict[int, Dict[str, Any]] = {}
+    messages: List[Dict[str, Any]] = []
+    for update in updates:
+        message = update.get("message")
+        if not message:
+            continue
+        sender = message.get("from") or {}
+        if (message.get("chat") or {}).get("type") != "private" or sender.get("is_bot") or "id" not in sender:
+            continue
+
+        telegram_id = sender["id"]
+        users[telegram_id] = {
+            "telegram_id": telegram_id,
+            "username": sender.get("username"),
+            "first_name": sender.get("first_name"),
+            "last_name": sender.get("last_name"),
+            "is_active": True,
+        }
+        message_type, text = _message_content(message)
+        messages.append({
+            "telegram_id": telegram_id,
+            "update_id": update["update_id"],
+            "telegram_message_id": message.get("message_id"),
+            "message_text": text,
+            "message_type": message_type,
+            "created_at": datetime.fromtimestamp(message["date"], timezone.utc) if message.get("date") else datetime.now(timezone.utc),
+        })
+    return users, messages
+
+
+def ingest_updates(db: Session, updates: List[Dict[str, Any]], source: str = "webhook") -> int:
+    """
+    Сохранение пачки обновлений
+
+    Args:
+        db: Сессия БД
+        updates: Объекты Update Bot API
+        source: Источник для метрик (webhook, polling)
+
+    Returns:
+        int: Количество новых сообщений
+    """
+    metrics.inc("telegram_updates_received_total", len(updates), source=source)
+    users, messages = parse_updates(updates)
+    if not users:
+        return 0
+
+    now = datetime.now(timezone.utc)
+    upsert = _insert(db, TelegramUser).values(list(users.values()))
+    db.execute(upsert.on_conflict_do_update(
+        index_elements=[TelegramUser.telegram_id],
+        set_={
+            "username": upsert.excluded.username,
+            "first_name": upsert.excluded.first_name,
+            "last_name": upsert.excluded.last_name,
+            "is_active": True,
+            "updated_at": now,
+        },
+    ))
+    user_ids = dict(db.query(TelegramUser.telegram_id, TelegramUser.id).filter(TelegramUser.telegram_id.in_(users)))
+
+    rows = [
+        {**{key: value for key, value in message.items() if key != "telegram_id"},
+         "telegram_user_id": user_ids[message["telegram_id"]], "is_from_bot": False, "is_read": False}
+        for message in messages
+    ]
+    inserted = db.execute(
+        _insert(db, TelegramMessage).values(rows)
+        .on_conflict_do_nothing(index_elements=[TelegramMessage.update_id])
+        .returning(TelegramMessage.id, TelegramMessage.update_id)
+    ).all()
+
+    new_ids = {update_id: message_id for message_id, update_id in inserted}
+    new_messages = [
+        dict(row, id=new_ids[row["update_id"]], telegram_id=message["telegram_id"])
+        for row, message in zip(rows, messages) if row["update_id"] in new_ids
+    ]
+    TelegramChatService(db).record_incoming(new_messages)
+    db.commit()
+
+    for telegram_id, user in users.items():
+        chat_directory.remember(user["username"], telegram_id)
+
+    metrics.inc("telegram_messages_ingested_total", len(new_messages))
+    if new_messages:
+        _publish_received(new_messages, users, user_ids)
+        logger.info(f"💬 Получено новых сообщений Telegram: {len(new_messages)} от {len(users)} пользователей")
+    return len(new_messages)
+
+
+def _publish_received(messages: List[Dict[str, Any]], users: Dict[int, Dict[str, Any]], user_ids: Dict[int, int]):
+    """События о новых сообщениях одним пакетом (ключ - пользователь, порядок внутри чата сохраняется)"""
+    events = []
+    for message in messages:
+        telegram_user_id = user_ids[message["telegram_id"]]
+        events.append(("notification-events", TelegramMessageReceivedEvent(
+            message_id=message["id"],
+            telegram_user_id=telegram_user_id,
+            telegram_id=message["telegram_id"],
+            username=users[message["telegram_id"]]["username"],
+            message_type=message["message_type"],
+            preview=message["message_text"][:PREVIEW_LENGTH],
+            received_at=message["created_at"],
+        ), str(telegram_user_id)))
+    kafka_producer.publish_batch(events)
+
+
+def bot_id(config: TelegramConfig = telegram_config) -> int:
+    """Числовой id бота из токена: offset getUpdates принадлежит конкретному боту"""
+    return int((config.bot_token or "0").split(":", 1)[0])
+
+
+class TelegramUpdatePoller:
+    """Прием обновлений через getUpdates, если webhook не используется"""
+
+    def __init__(self, session_factory, api: TelegramApiClient = telegram_api, config: TelegramConfig = telegram_config):
+        self.session_factory = session_factory
+        self.api = api
+        self.config = config
+        self._stopped = asyncio.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _load_offset(self, db: Session) -> int:
+        state = db.get(TelegramPollingOffset, bot_id(self.config))
+        return state.next_update_id if state else 0
+
+    def _save_offset(self, db: Session, next_update_id: int):
+        upsert = _insert(db, TelegramPollingOffset).values(bot_id=bot_id(self.config), next_update_id=next_update_id)
+        db.execute(upsert.on_conflict_do_update(
+            index_elements=[TelegramPollingOffset.bot_id],
+            set_={"next_update_id": upsert.excluded.next_update_id, "updated_at": datetime.now(timezone.utc)},
+        ))
+        db.commit()
+
+    async def poll_once(self, timeout: Optional[int] = None) -> int:
+        """
+        Один вызов getUpdates и сохранение полученных обновлений
+
+        Returns:
+            int: Количество полученных обновлений
+        """
+        timeout = self.config.poll_timeout_seconds if timeout is None else timeout
+        with self.session_factory() as db:
+            offset = self._load_offset(db)
+            updates = await self.api.call(
+                "getUpdates",
+                {"offset": offset, "limit": self.config.poll_limit, "timeout": timeout, "allowed_updates": ALLOWED_UPDATES},
+                # Запрос ждет обновлений до timeout секунд на стороне Telegram
+                timeout=timeout + self.config.request_timeout_seconds,
+            )
+            if not updates:
+                return 0
+            ingest_updates(db, updates, source="polling")
+            # Повтор обновлений между commit сообщений и сохранением offset безопасен: дубли отсекает update_id
+            self._save_offset(db, max(update["update_id"] for update in updates) + 1)
+        return len(updates)
+
+    async def run(self):
+        """Цикл long polling до вызова stop()"""
+        logger.info("🚀 Прием обновлений Telegram через long polling запущен")
+        while not self._stopped.is_set():
+            try:
+                await self.poll_once()
+            except TelegramApiError as e:
+                if e.error_code == 409:
+                    logger.error("❌ Для бота установлен webhook, long polling невозможен (telegram_updates_main.py --delete-webhook)")
+                    return
+                delay = float(e.retry_after or POLL_ERROR_DELAY_SECONDS)
+                logger.warning(f"⚠️ Ошибка getUpdates, повтор через {delay:.0f} с: {e}")
+                await self._wait(delay)
+            except Exception as e:
+                logger.error(f"❌ Ошибка обработки обновлений Telegram: {e}")
+                await self._wait(POLL_ERROR_DELAY_SECONDS)
+        logger.info("🛑 Прием обновлений Telegram остановлен")
+
+    async def _wait(self, seconds: float):
+        try:
+            await asyncio.wait_for(self._stopped.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def set_webhook(api: TelegramApiClient = telegram_api, config: TelegramConfig = telegram_config) -> bool:
+    """Регистрация webhook (TELEGRAM_WEBHOOK_URL) с секретом TELEGRAM_WEBHOOK_SECRET"""
+    if not config.webhook_url:
+        raise ValueError("TELEGRAM_WEBHOOK_URL не установлен")
+    params = {"url": config.webhook_url, "allowed_updates": ALLOWED_UPDATES}
+    if config.webhook_secret:
+        params["secret_token"] = config.webhook_secret
+    return await api.call("setWebhook", params)
+
+
+async def delete_webhook(api: TelegramApiClient = telegram_api) -> bool:
+    """Отключение webhook для перехода на long polling"""
+    return await api.call("deleteWebhook", {"drop_pending_updates": False})
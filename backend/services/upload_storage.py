@@ -0,0 +1,134 @@
+"""
+Потоковое сохранение загружаемых файлов
+
+Загрузка читается частями по UPLOAD_CHUNK_SIZE байт и не собирается в памяти
+целиком: каждая часть сразу пишется во временный файл (aiofiles - запись не
+блокирует event loop), добавляется в SHA-256 и учитывается в размере. Как
+только размер превышает лимит, запись прерывается и временный файл
+удаляется. Тип содержимого определяется по сигнатуре первых байт, а не по
+заголовку Content-Type клиента. Готовый файл переименовывается в итоговое
+имя одной операцией (os.replace), поэтому по итоговому пути никогда не
+лежит недописанный файл.
+"""
+
+import hashlib
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Collection, Optional, Union
+
+import aiofiles
+from fastapi import UploadFile
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+# Сигнатуры (смещение, байты) -> MIME тип
+FILE_SIGNATURES = [
+    (0, b"%PDF-", "application/pdf"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (8, b"WEBP", "image/webp"),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "application/msword"),  # OLE2: .doc
+    (0, b"PK\x03\x04", "application/zip"),  # ZIP, в т.ч. .docx
+]
+DOCX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+
+class UploadError(ValueError):
+    """Загрузка отклонена"""
+
+
+class UploadTooLargeError(UploadError):
+    """Размер загрузки превышает лимит"""
+
+    def __init__(self, max_size: int):
+        super().__init__(f"Файл больше {max_size} байт")
+        self.max_size = max_size
+
+
+class UploadTypeError(UploadError):
+    """Содержимое файла не соответствует допустимым типам"""
+
+
+@dataclass
+class StoredUpload:
+    path: Path
+    size: int
+    sha256: str
+    mime_type: Optional[str]  # По сигнатуре содержимого; None - тип не распознан
+
+
+def sniff_mime_type(head: bytes, filename: Optional[str] = None) -> Optional[str]:
+    """MIME тип по первым байтам файла"""
+    for offset, signature, mime_type in FILE_SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            if mime_type == "application/zip" and filename and filename.lower().endswith(".docx"):
+                return DOCX_MIME_TYPE
+            if mime_type == "image/webp" and not head.startswith(b"RIFF"):
+                continue
+            return mime_type
+    return None
+
+
+async def save_upload(
+    file: UploadFile,
+    destination: Union[str, Path],
+    max_size: int,
+    allowed_mime_types: Optional[Collection[str]] = None,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> StoredUpload:
+    """
+    Потоковое сохранение загрузки в destination
+
+    Args:
+        file: Загружаемый файл
+        destination: Итоговый путь (каталог должен существовать)
+        max_size: Максимальный размер в байтах
+        allowed_mime_types: Допустимые типы содержимого (None - любые)
+        chunk_size: Размер части чтения
+
+    Raises:
+        UploadTooLargeError: Файл больше max_size
+        UploadTypeError: Тип содержимого не входит в allowed_mime_types
+    """
+    destination = Path(destination)
+    temp_path = destination.with_name(f".{destination.name}.{uuid.uuid4().hex}.part")
+    digest = hashlib.sha256()
+    size = 0
+    mime_type = None
+
+    try:
+        async with aiofiles.open(temp_path, "wb") as out:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                if size == 0:
+                    # Сигнатуры укладываются в первые 12 байт - первой части достаточно
+                    mime_type = sniff_mime_type(chunk, file.filename)
+                    if allowed_mime_types is not None and mime_type not in allowed_mime_types:
+                        raise UploadTypeError(f"Недопустимый тип содержимого: {mime_type or 'неизвестный'}")
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLargeError(max_size)
+                digest.update(chunk)
+                await out.write(chunk)
+        if size == 0 and allowed_mime_types is not None:
+            raise UploadTypeError("Пустой файл")
+        os.replace(temp_path, destination)
+    except BaseException as e:
+        try:
+            temp_path.unlink()
+        except FileNotFoundError:
+            pass
+        if isinstance(e, UploadError):
+            logger.warning(f"⚠️ Загрузка {file.filename} отклонена: {e}")
+        raise
+
+    return StoredUpload(path=destination, size=size, sha256=digest.hexdigest(), mime_type=mime_type)
@@ -0,0 +1,64 @@
+"""
+Фоновые задачи workflow заявок
+
+Обработчики регистрируются в очереди background_jobs при импорте модуля
+(его импортирует job_worker_main.py). Endpoint'ы и сервисы только ставят
+задачи через enqueue_job.
+"""
+
+import logging
+from typing import Any, Dict
+
+from sqlalchemy.orm import Session
+
+from models import RepairRequest, User
+from services.email_outbox import NEW_REQUESTS_DIGEST, add_to_digest, queue_email
+from services.job_queue import JobError, PermanentJobError, job_handler
+
+logger = logging.getLogger(__name__)
+
+SEND_REQUEST_TO_CONTRACTORS = "telegram.send_request_to_contractors"
+NOTIFY_MANAGERS_NEW_REQUEST = "email.notify_managers_new_request"
+SEND_NOTIFICATION_EMAIL = "email.send_notification"
+
+
+@job_handler(SEND_REQUEST_TO_CONTRACTORS, concurrency=2)
+async def send_request_to_contractors(payload: Dict[str, Any], db: Session):
+    """Публикация заявки в Telegram чат исполнителей"""
+    from services.telegram_bot_service import get_telegram_bot_service
+
+    telegram_service = get_telegram_bot_service(db)
+    if not telegram_service.bot_token or not telegram_service.chat_id:
+        raise PermanentJobError("Telegram бот не настроен")
+
+    if not await telegram_service.send_request_to_contractors(payload["request_id"]):
+        raise JobError(f"Не удалось отправить заявку {payload['request_id']} в Telegram чат")
+
+
+@job_handler(NOTIFY_MANAGERS_NEW_REQUEST)
+def notify_managers_new_request(payload: Dict[str, Any], db: Session):
+    """Новая заявка в сводку каждого менеджера: одно письмо за EMAIL_DIGEST_MINUTES вместо письма на заявку"""
+    request = db.query(RepairRequest).filter(RepairRequest.id == payload["request_id"]).first()
+    if not request:
+        raise PermanentJobError(f"Заявка {payload['request_id']} не найдена")
+
+    item = {
+        "id": request.id,
+        "title": request.title,
+        "urgency": request.urgency,
+        "location": ", ".join(filter(None, [request.region, request.city, request.address])),
+        "description": request.description,
+    }
+    managers = db.query(User.email).filter(User.role == "manager", User.email.isnot(None)).all()
+    for (email,) in managers:
+        add_to_digest(db, email, NEW_REQUESTS_DIGEST, item)
+    db.commit()
+
+    logger.info(f"📧 Заявка #{request.id} добавлена в сводки менеджеров: {len(managers)}")
+
+
+@job_handler(SEND_NOTIFICATION_EMAIL)
+def send_notification_email(payload: Dict[str, Any], db: Session):
+    """Задачи, поставленные до перехода на email_outbox: письмо переносится в исходящую почту"""
+    queue_email(db, payload["email"], payload["subject"], payload["message"], payload["message"])
+    db.commit()
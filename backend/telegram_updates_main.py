@@ -0,0 +1,66 @@
+"""
+Главный файл для приема обновлений Telegram бота через long polling
+
+    python telegram_updates_main.py                  # long polling (webhook должен быть отключен)
+    python telegram_updates_main.py --once           # один вызов getUpdates без ожидания
+    python telegram_updates_main.py --set-webhook    # перейти на webhook (TELEGRAM_WEBHOOK_URL)
+    python telegram_updates_main.py --delete-webhook # отключить webhook
+"""
+import argparse
+import asyncio
+import logging
+import signal
+from database import SessionLocal
+from services.telegram_api import telegram_api, telegram_config
+from services.telegram_updates import TelegramUpdatePoller, delete_webhook, set_webhook
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def run(args):
+    try:
+        if args.set_webhook:
+            await set_webhook()
+            logger.info(f"✅ Webhook установлен: {telegram_config.webhook_url}")
+            return
+        if args.delete_webhook:
+            await delete_webhook()
+            logger.info("✅ Webhook отключен")
+            return
+
+        poller = TelegramUpdatePoller(SessionLocal)
+        if args.once:
+            received = await poller.poll_once(timeout=0)
+            logger.info(f"✅ Получено обновлений: {received}")
+            return
+
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, poller.stop)
+        await poller.run()
+    finally:
+        await telegram_api.close()
+
+
+def main():
+    """Главная функция"""
+    parser = argparse.ArgumentParser(description="Прием обновлений Telegram бота")
+    parser.add_argument("--once", action="store_true", help="Получить готовые обновления и завершиться")
+    parser.add_argument("--set-webhook", action="store_true", help="Установить webhook (TELEGRAM_WEBHOOK_URL)")
+    parser.add_argument("--delete-webhook", action="store_true", help="Отключить webhook")
+    args = parser.parse_args()
+
+    if not telegram_config.bot_token:
+        logger.error("❌ TELEGRAM_BOT_TOKEN не установлен")
+        return
+
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Общие фикстуры тестов backend
+"""
+
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import Base
+
+
+@pytest.fixture
+def sqlite_sessions(tmp_path):
+    """
+    Фабрика сессий тестовой SQLite: sqlite_sessions(tables, memory=False)
+
+    tables - модели или таблицы, которые нужно создать (None - все таблицы).
+    По умолчанию БД в файле: у каждой сессии свое соединение, как у параллельных
+    запросов. memory=True - БД в памяти с одним общим соединением.
+    """
+    engines = []
+
+    def make(tables=None, memory=False):
+        if memory:
+            engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        else:
+            path = tmp_path / f"test_{len(engines)}.sqlite3"
+            engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        engines.append(engine)
+        if tables is not None:
+            tables = [getattr(table, "__table__", table) for table in tables]
+        Base.metadata.create_all(bind=engine, tables=tables)
+        return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    yield make
+    for engine in engines:
+        engine.dispose()
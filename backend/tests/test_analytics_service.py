@@ -0,0 +1,62 @@
+import os
+import sys
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.analytics_service import AnalyticsConfig, AnalyticsService
+
+
+class FakeProducer:
+    def __init__(self):
+        self.events = []
+
+    def publish_event(self, topic, event, key=None, partition=None):
+        self.events.append(event)
+        return True
+
+    def publish_batch(self, events):
+        for topic, event, key in events:
+            self.publish_event(topic, event, key)
+        return {"success": len(events), "failed": 0}
+
+
+def _service(**overrides) -> AnalyticsService:
+    config = AnalyticsConfig(flush_interval_seconds=60, page_view_sample_rate=0.0, **overrides)
+    return AnalyticsService(producer=FakeProducer(), config=config)
+
+
+def test_page_views_are_aggregated_per_path_and_role():
+    service = _service()
+    for user_id in (1, 2, 2):
+        service.track_page_view(user_id=user_id, user_role="manager", page_path="/manager")
+    service.track_page_view(user_id=3, user_role="customer", page_path="/cabinet")
+    service.close()
+
+    aggregates = {e.dimension: e for e in service.producer.events if e.event_type == "aggregated_counts"}
+    assert aggregates["/manager"].count == 3
+    assert aggregates["/manager"].unique_users == 2
+    assert aggregates["/cabinet"].count == 1
+    # Сырые просмотры не отправляются при нулевой доле выборки
+    assert not [e for e in service.producer.events if e.event_type == "page_view"]
+
+
+def test_sampled_raw_events_carry_sample_rate():
+    service = _service(action_sample_rate=1.0)
+    service.track_action_performed(
+        user_id=1, user_role="manager", action_name="assign", action_category="workflow"
+    )
+    service.flush()
+
+    raw = [e for e in service.producer.events if e.event_type == "action_performed"]
+    assert len(raw) == 1 and "sample_rate" not in raw[0].metadata
+    service.close()
+
+
+def test_login_does_not_publish_inline():
+    service = _service()
+    service.track_user_login(user_id=1, user_role="customer")
+    # Событие ушло в фоновую очередь, а не в producer в потоке запроса
+    assert service.stats["queued"] == 1
+    service.close()
+    assert any(e.event_type == "user_login" for e in service.producer.events)
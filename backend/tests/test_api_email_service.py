@@ -0,0 +1,127 @@
+import asyncio
+import os
+import sys
+
+from aiohttp import web
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.api_email_service import (
+    APIEmailConfig, APIEmailService, CircuitBreaker, ResendProvider, SendGridProvider,
+)
+
+
+async def _fake_providers(sendgrid_status):
+    """Локальные SendGrid и Resend; возвращает (runner, base_url, requests)"""
+    requests = []
+
+    async def sendgrid(request):
+        requests.append(("sendgrid", request.transport.get_extra_info("peername"), await request.json()))
+        return web.json_response({}, status=sendgrid_status[0])
+
+    async def resend(request):
+        requests.append(("resend", request.path, await request.json()))
+        return web.json_response({"id": "1"})
+
+    app = web.Application()
+    app.router.add_post("/sendgrid", sendgrid)
+    app.router.add_post("/resend/emails", resend)
+    app.router.add_post("/resend/emails/batch", resend)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", requests
+
+
+def _service(url, **config):
+    return APIEmailService(APIEmailConfig(**config), providers=[
+        SendGridProvider("key", api_url=f"{url}/sendgrid"),
+        ResendProvider("key", api_url=f"{url}/resend"),
+    ])
+
+
+def test_batch_send_over_one_connection():
+    async def scenario():
+        runner, url, requests = await _fake_providers([202])
+        service = _service(url)
+        try:
+            sent = await service.send_bulk(["a@example.com", "b@example.com", "a@example.com"], "Тема", "<p>1</p>")
+            assert await service.send_email("c@example.com", "Тема", "<p>2</p>", "2")
+        finally:
+            await service.close()
+            await runner.cleanup()
+        return sent, requests
+
+    sent, requests = asyncio.run(scenario())
+
+    assert sent == 2
+    # Два получателя - один запрос с отдельным письмом каждому
+    assert [p["to"] for p in requests[0][2]["personalizations"]] == [
+        [{"email": "a@example.com"}], [{"email": "b@example.com"}],
+    ]
+    assert len({peer for _, peer, _ in requests}) == 1
+
+
+def test_failover_prefers_healthy_provider():
+    async def scenario():
+        status = [503]
+        runner, url, requests = await _fake_providers(status)
+        service = _service(url)
+        try:
+            for index in range(3):
+                assert await service.send_email(f"user{index}@example.com", "Тема", "<p>1</p>")
+            # После ошибки SendGrid первым пробуется более здоровый Resend
+            assert [name for name, *_ in requests] == ["sendgrid", "resend", "resend", "resend"]
+            assert [p.name for p in service._ordered_providers()] == ["resend", "sendgrid"]
+
+            # SendGrid восстановился и снова здоровее
+            status[0] = 202
+            service.health["resend"] = 0.5
+            assert await service.send_email("probe@example.com", "Тема", "<p>1</p>")
+            assert requests[-1][0] == "sendgrid"
+        finally:
+            await service.close()
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+
+def test_circuit_breaker_opens_and_probes():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30, clock=lambda: now[0])
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+    now[0] = 31
+    # Один пробный запрос; неудача снова отключает провайдера
+    assert breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    now[0] = 62
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_message_rejection_does_not_open_breaker():
+    async def scenario():
+        runner, url, requests = await _fake_providers([400])
+        service = _service(url, breaker_failures=1)
+        try:
+            assert await service.send_bulk([f"u{i}@example.com" for i in range(3)], "Тема", "<p>1</p>") == 3
+        finally:
+            await service.close()
+            await runner.cleanup()
+        return service, requests
+
+    service, requests = asyncio.run(scenario())
+    assert service.breakers["sendgrid"].state == CircuitBreaker.CLOSED
+    # Resend получил пачку через batch API
+    assert requests[-1][1] == "/resend/emails/batch" and len(requests[-1][2]) == 3
@@ -0,0 +1,81 @@
+import io
+import os
+import sys
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlalchemy.orm import Session
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from database import get_db
+from models import FileBlob, User
+from api.v1.dependencies import get_current_user
+from api.v1.endpoints import avatar as avatar_endpoints
+from services import avatar_images, blob_store
+from services.avatar_images import AvatarConfig, AvatarProcessor
+from services.blob_store import collect_blobs
+
+
+@pytest.fixture
+def env(sqlite_sessions, tmp_path, monkeypatch):
+    session_factory = sqlite_sessions()
+    with session_factory() as db:
+        db.add(User(username="avatar", email="avatar@example.com", hashed_password="x", role="customer"))
+        db.commit()
+
+    processor = AvatarProcessor(AvatarConfig(upload_dir=str(tmp_path / "avatars"), process_workers=1))
+    monkeypatch.setattr(avatar_endpoints, "avatar_processor", processor)
+    monkeypatch.setattr(avatar_images, "avatar_processor", processor)
+    monkeypatch.setattr(blob_store.blob_config, "root", str(tmp_path / "blobs"))
+    monkeypatch.setattr(blob_store.blob_config, "gc_grace_minutes", 0)
+
+    def override_get_db():
+        with session_factory() as db:
+            yield db
+
+    def override_current_user(db: Session = Depends(get_db)):
+        return db.query(User).filter(User.username == "avatar").one()
+
+    app = FastAPI()
+    app.include_router(avatar_endpoints.router, prefix="/api/v1/avatar")
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_user] = override_current_user
+
+    yield TestClient(app), session_factory, processor
+    processor.shutdown()
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (300, 200), (10, 120, 200)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def test_reupload_and_remove_keep_reference_count(env):
+    client, session_factory, processor = env
+    image = png_bytes()
+
+    for _ in range(2):
+        response = client.post("/api/v1/avatar/upload", files={"file": ("me.png", image, "image/png")})
+        assert response.status_code == 200, response.text
+
+    with session_factory() as db:
+        user = db.query(User).one()
+        sha256 = user.avatar_variants["blob"]
+        # Повторная загрузка того же изображения не добавляет ссылку
+        assert db.get(FileBlob, sha256).ref_count == 1
+    assert response.json()["avatar_url"] == processor.url(f"{sha256}_128x128.jpg")
+
+    response = client.delete("/api/v1/avatar/remove")
+    assert response.status_code == 200, response.text
+
+    with session_factory() as db:
+        user = db.query(User).one()
+        assert (user.avatar_url, user.avatar_variants) == (None, None)
+        assert db.get(FileBlob, sha256).ref_count == 0
+        assert collect_blobs(db, [sha256]) == 1
+    assert not [name for name in os.listdir(processor.directory) if name.startswith(sha256)]
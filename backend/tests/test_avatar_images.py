@@ -0,0 +1,80 @@
+import asyncio
+import os
+import sys
+
+from PIL import Image
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.avatar_images import (
+    AVATAR_SIZES,
+    AvatarConfig,
+    AvatarProcessor,
+    AvatarVariantCache,
+    render_avatar,
+)
+
+
+def make_photo(path, size=(2000, 1500)):
+    Image.new("RGB", size, (200, 120, 40)).save(path, "JPEG")
+    return path
+
+
+def test_render_avatar_builds_source_and_standard_sizes(tmp_path):
+    original = make_photo(tmp_path / "original.jpg")
+
+    variants = render_avatar(str(original), str(tmp_path), "abc", AVATAR_SIZES, 1024, 85, webp=True)
+
+    assert variants["source"] == "abc_source.jpg"
+    assert (variants["width"], variants["height"]) == (1024, 768)
+    assert list(variants["sizes"]) == ["32x32", "64x64", "128x128", "256x256"]
+    size = variants["sizes"]["128x128"]
+    assert (size["width"], size["height"]) == (128, 96)
+    assert size["files"] == {"jpeg": "abc_128x128.jpg", "webp": "abc_128x128.webp"}
+    with Image.open(tmp_path / "abc_128x128.webp") as img:
+        assert img.size == (128, 96)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".part")]
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    (tmp_path / "a").write_bytes(b"x" * 100)
+    cache = AvatarVariantCache(tmp_path, max_bytes=250)
+    # Индекс восстанавливается по файлам каталога
+    assert cache.get("a") == tmp_path / "a"
+    for name in ("b", "c"):
+        (tmp_path / name).write_bytes(b"x" * 100)
+
+    cache.put("b", 100)
+    assert cache.get("a") == tmp_path / "a"
+    evicted = cache.put("c", 100)
+
+    assert evicted == ["b"]
+    assert cache.total_bytes == 200
+    assert sorted(os.listdir(tmp_path)) == ["a", "c"]
+
+
+def test_processor_builds_variant_on_demand_once(tmp_path):
+    processor = AvatarProcessor(AvatarConfig(upload_dir=str(tmp_path), process_workers=1))
+    original = make_photo(tmp_path / "original.jpg", size=(800, 800))
+
+    async def scenario():
+        variants = await processor.create_variants(original, "abc")
+        standard = await processor.variant(variants, 64, 64, "jpeg")
+        built = await asyncio.gather(*(processor.variant(variants, 100, 100, "webp") for _ in range(3)))
+        return variants, standard, built
+
+    try:
+        variants, standard, built = asyncio.run(scenario())
+    finally:
+        processor.shutdown()
+
+    assert standard == tmp_path / "abc_64x64.jpg"
+    assert built == [tmp_path / "cache" / "abc_100x100.webp"] * 3
+    with Image.open(built[0]) as img:
+        assert img.size == (100, 100)
+    assert processor.cache.total_bytes == os.path.getsize(built[0])
+
+    processor.remove(variants["id"])
+    assert sorted(os.listdir(tmp_path)) == ["cache", "original.jpg"]
+    assert os.listdir(tmp_path / "cache") == []
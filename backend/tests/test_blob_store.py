@@ -0,0 +1,152 @@
+import asyncio
+import hashlib
+import io
+import os
+import sys
+
+import pytest
+from fastapi import UploadFile
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from models import BackgroundJob, FileBlob
+from services import blob_store
+from services.blob_store import (
+    COLLECT_BLOB, BlobStoreConfig, acquire_path, blob_path, blob_sha256, collect_blobs, release_blob, store_upload,
+)
+
+SCAN = b"%PDF-1.7\n" + b"passport" * 10_000
+
+
+@pytest.fixture
+def session_factory(sqlite_sessions):
+    return sqlite_sessions([BackgroundJob, FileBlob])
+
+
+@pytest.fixture
+def config(tmp_path):
+    return BlobStoreConfig(root=str(tmp_path / "blobs"), gc_grace_minutes=0)
+
+
+def upload(db, config, content=SCAN, filename="passport.pdf"):
+    stored = asyncio.run(store_upload(db, UploadFile(filename, io.BytesIO(content)), 10**7, config=config))
+    db.commit()
+    return stored
+
+
+def test_identical_uploads_are_stored_once(session_factory, config):
+    with session_factory() as db:
+        first = upload(db, config)
+        second = upload(db, config, filename="passport (1).pdf")
+        blob = db.get(FileBlob, first.sha256)
+
+        assert (first.created, second.created) == (True, False)
+        assert first.path == second.path == blob_path(hashlib.sha256(SCAN).hexdigest(), config)
+        assert first.path.read_bytes() == SCAN
+        assert (blob.ref_count, blob.size, blob.mime_type) == (2, len(SCAN), "application/pdf")
+        # Временные файлы загрузок не остаются
+        assert os.listdir(os.path.join(config.root, "incoming")) == []
+
+
+def test_unreferenced_blob_is_collected_with_derived_files(session_factory, config, monkeypatch):
+    collected = []
+    monkeypatch.setattr(blob_store, "BLOB_COLLECTORS", [collected.append])
+
+    with session_factory() as db:
+        stored = upload(db, config)
+        assert acquire_path(db, str(stored.path), config)
+        release_blob(db, stored.sha256, config)
+        db.commit()
+        # Ссылка еще есть
+        assert collect_blobs(db, config=config) == 0
+
+        release_blob(db, stored.sha256, config)
+        db.commit()
+        assert [job.job_type for job in db.query(BackgroundJob)] == [COLLECT_BLOB]
+        assert collect_blobs(db, [stored.sha256], config=config) == 1
+
+        assert db.get(FileBlob, stored.sha256) is None
+        assert not stored.path.exists()
+        assert collected == [stored.sha256]
+
+
+def test_new_reference_within_grace_period_keeps_blob(session_factory, config):
+    config.gc_grace_minutes = 60
+    with session_factory() as db:
+        stored = upload(db, config)
+        release_blob(db, stored.sha256, config)
+        db.commit()
+        assert collect_blobs(db, config=config) == 0
+
+        # Повторная загрузка того же файла - только изменение ref_count
+        again = upload(db, config)
+        blob = db.get(FileBlob, stored.sha256)
+        assert again.created is False
+        assert (blob.ref_count, blob.unreferenced_at) == (1, None)
+
+
+def test_only_store_paths_are_counted(config):
+    sha256 = hashlib.sha256(SCAN).hexdigest()
+    assert blob_sha256(str(blob_path(sha256, config)), config) == sha256
+    assert blob_sha256("/app/uploads/contractor_documents/7_passport_20240101_120000.pdf", config) is None
+    assert blob_sha256(os.path.join(config.root, sha256), config) is None
+    assert blob_sha256(None, config) is None
+
+
+def test_failed_commit_keeps_blob_file(session_factory, config, monkeypatch):
+    collected = []
+    monkeypatch.setattr(blob_store, "BLOB_COLLECTORS", [collected.append])
+
+    with session_factory() as db:
+        stored = upload(db, config)
+        release_blob(db, stored.sha256, config)
+        db.commit()
+
+        def failing_commit():
+            raise RuntimeError("commit failed")
+
+        monkeypatch.setattr(db, "commit", failing_commit)
+        with pytest.raises(RuntimeError):
+            collect_blobs(db, config=config)
+
+        assert stored.path.read_bytes() == SCAN
+        assert db.get(FileBlob, stored.sha256) is not None
+        # Производные файлы удалены до commit; на файл нет ссылок, следующая загрузка построит их заново
+        assert collected == [stored.sha256]
+
+
+def test_derived_files_are_removed_while_blob_row_is_locked(session_factory, config, monkeypatch):
+    with session_factory() as db:
+        stored = upload(db, config)
+        release_blob(db, stored.sha256, config)
+        db.commit()
+
+        # Загрузка того же содержимого, начатая после commit сборщика, не должна застать производные файлы
+        events = []
+        monkeypatch.setattr(blob_store, "BLOB_COLLECTORS", [lambda sha256: events.append(("collector", sha256))])
+        commit = db.commit
+        monkeypatch.setattr(db, "commit", lambda: events.append(("commit", None)) or commit())
+
+        assert collect_blobs(db, config=config) == 1
+        assert events == [("collector", stored.sha256), ("commit", None)]
+        assert not stored.path.exists()
+
+
+def test_unknown_store_path_is_rejected_for_document_records(session_factory, config, monkeypatch):
+    from fastapi import HTTPException
+    from api.v1.endpoints.contractor_verification import acquire_document_path
+
+    monkeypatch.setattr(blob_store, "blob_config", config)
+    missing = str(blob_path(hashlib.sha256(b"never uploaded").hexdigest(), config))
+    with session_factory() as db:
+        with pytest.raises(HTTPException) as error:
+            acquire_document_path(db, missing)
+        assert error.value.status_code == 400
+
+        # Пути не из хранилища (документы до его появления) принимаются как раньше
+        acquire_document_path(db, "/app/uploads/contractor_documents/7_passport.pdf")
+        stored = upload(db, config)
+        acquire_document_path(db, str(stored.path))
+        db.commit()
+        assert db.get(FileBlob, stored.sha256).ref_count == 2
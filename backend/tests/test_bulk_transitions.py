@@ -0,0 +1,127 @@
+import os
+import sys
+
+import pytest
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from models import (
+    BackgroundJob, ContractorProfile, ContractorResponse, CustomerProfile, RepairRequest, RequestStageDuration,
+    RequestStatusEvent, User
+)
+from services import request_workflow_service
+from services.request_workflow_service import RequestConflictError, RequestWorkflowService
+from services.workflow_jobs import SEND_REQUEST_TO_CONTRACTORS
+
+TABLES = [
+    User, CustomerProfile, ContractorProfile, RepairRequest, ContractorResponse,
+    RequestStatusEvent, RequestStageDuration, BackgroundJob,
+]
+
+
+class RecordingProducer:
+    def __init__(self):
+        self.batches = []
+
+    def publish_batch(self, events):
+        self.batches.append(events)
+        return {"success": len(events), "failed": 0}
+
+    def publish_event(self, topic, event, key=None):
+        return True
+
+
+@pytest.fixture
+def db(sqlite_sessions, monkeypatch):
+    session = sqlite_sessions(TABLES, memory=True)()
+    manager = User(username="manager", email="m@example.com", hashed_password="x", role="manager")
+    other = User(username="other", email="o@example.com", hashed_password="x", role="manager")
+    customer = User(username="customer", email="c@example.com", hashed_password="x", role="customer")
+    session.add_all([manager, other, customer])
+    session.flush()
+    session.add(CustomerProfile(
+        user_id=customer.id, company_name="ООО Тест", contact_person="Иван", phone="+7", email="c@example.com"
+    ))
+    session.commit()
+    monkeypatch.setattr(request_workflow_service, "kafka_producer", RecordingProducer())
+    yield session
+    session.close()
+
+
+def _create_requests(db, count):
+    workflow = RequestWorkflowService(db)
+    return [workflow.create_request(1, {"title": f"Ремонт {i}", "description": "Течь"}).id for i in range(count)]
+
+
+def test_bulk_applies_valid_items_and_reports_failures(db):
+    first, second, third, taken = _create_requests(db, 4)
+    workflow = RequestWorkflowService(db)
+    workflow.assign_to_manager(taken, manager_id=2)
+
+    results = workflow.bulk_transition(1, [
+        {"request_id": first, "action": "assign_manager"},
+        {"request_id": second, "action": "assign_manager", "expected_version": 1},
+        {"request_id": third, "action": "assign_manager", "expected_version": 5},
+        {"request_id": taken, "action": "assign_manager"},
+        {"request_id": 999, "action": "assign_manager"},
+        {"request_id": first, "action": "clarify"},
+    ])
+
+    assert [r["success"] for r in results] == [True, True, False, False, False, False]
+    assert results[0]["status"] == "manager_review" and results[0]["version"] == 2
+    assert "изменена" in results[2]["error"]
+    assert "уже взята" in results[3]["error"]
+
+    for request_id in (first, second):
+        request = db.get(RepairRequest, request_id)
+        assert (request.manager_id, request.status, request.version) == (1, "manager_review", 2)
+    assert db.get(RepairRequest, third).status == "new"
+
+    transitions = db.query(RequestStatusEvent).filter(RequestStatusEvent.request_id.in_([first, second]))
+    assert sorted(e.to_status for e in transitions) == ["manager_review", "manager_review", "new", "new"]
+
+    batch = request_workflow_service.kafka_producer.batches[-1]
+    assert [event.request_id for _, event, _ in batch] == [first, second]
+
+
+def test_bulk_per_request_values_and_side_effects(db):
+    ids = _create_requests(db, 3)
+    workflow = RequestWorkflowService(db)
+    workflow.bulk_transition(1, [{"request_id": request_id, "action": "assign_manager"} for request_id in ids])
+
+    results = workflow.bulk_transition(1, [
+        {"request_id": ids[0], "action": "clarify", "clarification_details": "Модель котла"},
+        {"request_id": ids[1], "action": "send_to_contractors"},
+        {"request_id": ids[2], "action": "cancel", "reason": "Дубликат"},
+    ])
+    assert all(r["success"] for r in results)
+
+    db.expire_all()
+    first, second, third = (db.get(RepairRequest, request_id) for request_id in ids)
+    assert (first.status, first.clarification_details) == ("clarification", "Модель котла")
+    assert second.status == "sent_to_contractors" and second.sent_to_bot_at is not None
+    assert (third.status, third.manager_comment) == ("cancelled", "Отменено: Дубликат")
+    assert db.query(BackgroundJob).filter_by(job_type=SEND_REQUEST_TO_CONTRACTORS).count() == 1
+    assert db.query(RequestStageDuration).filter_by(request_id=ids[2], left_at=None).count() == 0
+
+    # Чужие заявки отклоняются, не мешая пакету
+    results = workflow.bulk_transition(2, [{"request_id": ids[0], "action": "send_to_contractors"}])
+    assert results[0]["success"] is False
+
+
+def test_bulk_rejects_whole_batch_on_concurrent_update(db, monkeypatch):
+    request_id = _create_requests(db, 1)[0]
+    workflow = RequestWorkflowService(db)
+
+    # Параллельное изменение между чтением и UPDATE (без блокировки строк в SQLite)
+    original = RequestWorkflowService._check_bulk_item
+
+    def check_and_interfere(self, item, row, actor_id, contractor_checks):
+        original(self, item, row, actor_id, contractor_checks)
+        db.execute(RepairRequest.__table__.update().values(version=RepairRequest.version + 1))
+
+    monkeypatch.setattr(RequestWorkflowService, "_check_bulk_item", check_and_interfere)
+    with pytest.raises(RequestConflictError):
+        workflow.bulk_transition(1, [{"request_id": request_id, "action": "assign_manager"}])
+    assert db.get(RepairRequest, request_id).status == "new"
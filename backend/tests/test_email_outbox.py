@@ -0,0 +1,157 @@
+import asyncio
+import os
+import smtplib
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from models import BackgroundJob, EmailDigest, EmailDigestItem, EmailOutbox
+from services import python_email_service as python_email_module
+from services.email_outbox import (
+    FLUSH_DIGEST, NEW_REQUESTS_DIGEST, SEND_EMAIL, add_to_digest, email_outbox_config, queue_email,
+)
+from services.email_service import EmailService
+from services.job_queue import JOB_HANDLERS, JobQueueConfig, JobWorker
+
+
+class FakeMailer:
+    """deliver, падающий заданными ошибками, затем успешный"""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.delivered = []
+
+    def deliver(self, to_email, subject, html_content, plain_text=None):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.delivered.append((to_email, subject, plain_text))
+
+
+@pytest.fixture
+def session_factory(sqlite_sessions):
+    return sqlite_sessions([BackgroundJob, EmailOutbox, EmailDigest, EmailDigestItem])
+
+
+@pytest.fixture
+def mailer(monkeypatch):
+    mailer = FakeMailer()
+    monkeypatch.setattr(python_email_module, "python_email_service", mailer)
+    return mailer
+
+
+def run_jobs(session_factory):
+    """Выполнение всех задач, включая отложенные повторы"""
+    handlers = {job_type: JOB_HANDLERS[job_type] for job_type in (SEND_EMAIL, FLUSH_DIGEST)}
+    worker = JobWorker(session_factory=session_factory, config=JobQueueConfig(workers=2), handlers=handlers,
+                       worker_id="test")
+    total = 0
+    while True:
+        with session_factory() as db:
+            db.query(BackgroundJob).filter(BackgroundJob.status == "pending").update(
+                {"run_at": datetime.now(timezone.utc)}, synchronize_session=False
+            )
+            db.commit()
+        # Один проход берет задачи одного типа (типы обходятся по кругу)
+        processed = sum(worker.run_once() for _ in handlers)
+        total += processed
+        if not processed:
+            return total
+
+
+def outbox(session_factory):
+    with session_factory() as db:
+        return [(e.recipient, e.status, e.attempts) for e in db.query(EmailOutbox).order_by(EmailOutbox.id)]
+
+
+def test_notification_is_queued_and_sent_by_worker(session_factory, mailer):
+    service = EmailService(session_factory=session_factory)
+    assert asyncio.run(service.send_notification_email("manager@example.com", "Тема", "<p>Текст</p>", "Текст"))
+    # В event loop API письмо только сохраняется
+    assert mailer.delivered == []
+    assert outbox(session_factory) == [("manager@example.com", "pending", 0)]
+
+    run_jobs(session_factory)
+    assert mailer.delivered == [("manager@example.com", "Тема", "Текст")]
+    assert outbox(session_factory) == [("manager@example.com", "sent", 1)]
+
+
+def test_transient_errors_are_retried_and_rejections_fail(session_factory, mailer, monkeypatch):
+    monkeypatch.setattr(email_outbox_config, "max_attempts", 3)
+    mailer.errors = [
+        smtplib.SMTPServerDisconnected("Connection unexpectedly closed"),
+        smtplib.SMTPRecipientsRefused({"bad@example.com": (550, b"No such user")}),
+    ]
+    with session_factory() as db:
+        queue_email(db, "good@example.com", "Тема", "<p>1</p>")
+        queue_email(db, "bad@example.com", "Тема", "<p>2</p>")
+        db.commit()
+
+    run_jobs(session_factory)
+
+    assert outbox(session_factory) == [("good@example.com", "sent", 2), ("bad@example.com", "failed", 1)]
+    with session_factory() as db:
+        failed = db.query(EmailOutbox).filter(EmailOutbox.status == "failed").one()
+        assert "No such user" in failed.last_error
+
+
+def test_outbox_gives_up_after_max_attempts(session_factory, mailer, monkeypatch):
+    monkeypatch.setattr(email_outbox_config, "max_attempts", 3)
+    mailer.errors = [ConnectionRefusedError("SMTP недоступен")] * 5
+    with session_factory() as db:
+        queue_email(db, "manager@example.com", "Тема", "<p>1</p>")
+        db.commit()
+
+    run_jobs(session_factory)
+
+    assert outbox(session_factory) == [("manager@example.com", "failed", 3)]
+    assert mailer.delivered == []
+
+
+def test_unconfigured_mail_is_not_reported_as_sent(session_factory, monkeypatch):
+    unconfigured = python_email_module.PythonEmailService()
+    unconfigured.password = ""
+    monkeypatch.setattr(python_email_module, "python_email_service", unconfigured)
+    with session_factory() as db:
+        queue_email(db, "manager@example.com", "Тема", "<p>1</p>")
+        db.commit()
+
+    run_jobs(session_factory)
+
+    assert outbox(session_factory) == [("manager@example.com", "failed", 1)]
+    with session_factory() as db:
+        assert "MAIL_PASSWORD" in db.query(EmailOutbox).one().last_error
+
+
+def test_digest_collects_items_per_recipient(session_factory, mailer):
+    with session_factory() as db:
+        for request_id in (1, 2, 3):
+            add_to_digest(db, "a@example.com", NEW_REQUESTS_DIGEST, {
+                "id": request_id, "title": f"Заявка {request_id}", "urgency": "high", "location": "", "description": "...",
+            }, interval_minutes=0)
+        add_to_digest(db, "b@example.com", NEW_REQUESTS_DIGEST, {
+            "id": 1, "title": "Заявка 1", "urgency": None, "location": "Екатеринбург", "description": "...",
+        }, interval_minutes=0)
+        db.commit()
+        # Одна задача сборки на получателя
+        assert db.query(BackgroundJob).filter(BackgroundJob.job_type == FLUSH_DIGEST).count() == 2
+
+    run_jobs(session_factory)
+
+    assert [(to, subject) for to, subject, _ in mailer.delivered] == [
+        ("a@example.com", "Новые заявки: 3"), ("b@example.com", "Новая заявка #1: Заявка 1"),
+    ]
+    assert "Локация: Екатеринбург" in mailer.delivered[1][2]
+
+    # После отправки сводки новый пункт планирует следующую
+    with session_factory() as db:
+        assert db.query(EmailDigestItem).count() == 0
+        add_to_digest(db, "a@example.com", NEW_REQUESTS_DIGEST, {
+            "id": 4, "title": "Заявка 4", "urgency": None, "location": "", "description": "...",
+        }, interval_minutes=0)
+        db.commit()
+    run_jobs(session_factory)
+    assert mailer.delivered[-1][:2] == ("a@example.com", "Новая заявка #4: Заявка 4")
@@ -0,0 +1,73 @@
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from models import ProcessedEvent
+from kafka_events.idempotency import EventDeduplicator
+from kafka_events.kafka_consumer import KafkaEventConsumer
+from kafka_events.kafka_events import EventType
+
+
+@pytest.fixture
+def session_factory(sqlite_sessions):
+    return sqlite_sessions([ProcessedEvent], memory=True)
+
+
+class _Message:
+    def __init__(self, value):
+        self.value = json.dumps(value).encode('utf-8')
+        self.topic = "request-events"
+        self.partition = 0
+        self.offset = 0
+
+
+def test_mark_and_check(session_factory):
+    dedup = EventDeduplicator("notification-service", session_factory=session_factory)
+    assert not dedup.is_processed("evt-1")
+    assert dedup.mark_processed("evt-1", "request.created")
+    assert dedup.is_processed("evt-1")
+    # Повторная отметка не падает на уникальном ограничении
+    assert dedup.mark_processed("evt-1", "request.created")
+
+
+def test_survives_restart_via_table(session_factory):
+    EventDeduplicator("notification-service", session_factory=session_factory).mark_processed("evt-2")
+    restarted = EventDeduplicator("notification-service", session_factory=session_factory)
+    assert restarted.is_processed("evt-2")
+    # Другая группа обрабатывает событие независимо
+    assert not EventDeduplicator("audit-service", session_factory=session_factory).is_processed("evt-2")
+
+
+def test_cleanup_expired(session_factory):
+    dedup = EventDeduplicator("notification-service", session_factory=session_factory, ttl_hours=1)
+    with session_factory() as db:
+        db.add(ProcessedEvent(
+            event_id="old",
+            consumer_group="notification-service",
+            processed_at=datetime.now(timezone.utc) - timedelta(hours=2),
+        ))
+        db.commit()
+    dedup.mark_processed("fresh")
+    assert dedup.cleanup_expired() == 1
+    assert dedup.is_processed("fresh")
+
+
+def test_consumer_skips_duplicates(session_factory):
+    calls = []
+    consumer = KafkaEventConsumer(
+        group_id="notification-service",
+        topics=["request-events"],
+        deduplicator=EventDeduplicator("notification-service", session_factory=session_factory),
+    )
+    consumer.register_handler(EventType.REQUEST_CREATED, lambda data: calls.append(data) or True)
+
+    message = _Message({"event_type": "request.created", "event_id": "evt-3"})
+    assert consumer._process_message(message)
+    assert consumer._process_message(message)
+    assert len(calls) == 1
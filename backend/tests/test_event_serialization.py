@@ -0,0 +1,85 @@
+import os
+import sys
+from datetime import datetime, timezone
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from kafka_events.analytics_events import PageViewEvent
+from kafka_events.kafka_events import BaseEvent, EventType, WorkflowContractorAssignedEvent
+from kafka_events.serialization import (
+    EventSchemaRegistry, decode_event, decode_value, encode_event, is_binary, schema_registry
+)
+
+
+def _event() -> WorkflowContractorAssignedEvent:
+    return WorkflowContractorAssignedEvent(
+        request_id=1, contractor_id=2, manager_id=3, previous_status="sent_to_contractors"
+    )
+
+
+def test_msgpack_roundtrip_is_smaller_than_json():
+    event = _event()
+    binary = encode_event(event, "msgpack")
+    text = encode_event(event, "json")
+
+    assert is_binary(binary) and not is_binary(text)
+    assert len(binary) < len(text) / 2
+
+    decoded = decode_event(binary)
+    assert isinstance(decoded, WorkflowContractorAssignedEvent)
+    assert decoded.event_id == event.event_id
+    assert decoded.timestamp == event.timestamp
+
+
+def test_both_formats_decode_utc_datetimes():
+    naive = datetime(2024, 5, 1, 9, 30, 0, 123456)
+    event = WorkflowContractorAssignedEvent(
+        request_id=1, contractor_id=2, manager_id=3, previous_status="sent_to_contractors", timestamp=naive
+    )
+    decoded = [decode_event(encode_event(event, serialization)) for serialization in ("json", "msgpack")]
+    assert [d.timestamp for d in decoded] == [naive.replace(tzinfo=timezone.utc)] * 2
+    assert all(d.timestamp.tzinfo is not None for d in decoded)
+
+
+def test_msgpack_fields_are_matched_by_key_not_position(monkeypatch):
+    class Before(BaseEvent):
+        event_type: EventType = EventType.WORKFLOW_CONTRACTOR_ASSIGNED
+        request_id: int
+        contractor_id: int
+
+    # Новое поле перед остальными и другой порядок полей
+    class After(BaseEvent):
+        event_type: EventType = EventType.WORKFLOW_CONTRACTOR_ASSIGNED
+        shard: int = 0
+        contractor_id: int
+        request_id: int
+
+    def registry(model):
+        result = EventSchemaRegistry()
+        result.register(7, model)
+        return result
+
+    event = Before(request_id=1, contractor_id=2)
+    monkeypatch.setattr("kafka_events.serialization.schema_registry", registry(Before))
+    binary = encode_event(event, "msgpack")
+
+    monkeypatch.setattr("kafka_events.serialization.schema_registry", registry(After))
+    decoded = decode_event(binary)
+    assert isinstance(decoded, After)
+    assert (decoded.request_id, decoded.contractor_id, decoded.shard) == (1, 2, 0)
+    assert decoded.event_id == event.event_id and decoded.timestamp == event.timestamp
+
+
+def test_decode_value_detects_format():
+    event = PageViewEvent(user_id=1, user_role="manager", page_path="/manager")
+    for serialization in ("json", "msgpack"):
+        fields = decode_value(encode_event(event, serialization))
+        assert fields["event_type"] == "page_view"
+        assert fields["page_path"] == "/manager"
+
+
+def test_schema_ids_are_unique_per_event_type():
+    schemas = schema_registry.schemas()
+    assert len({s.schema_id for s in schemas}) == len(schemas)
+    assert len({(s.event_type, s.version) for s in schemas}) == len(schemas)
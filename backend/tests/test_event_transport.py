@@ -0,0 +1,115 @@
+import os
+import sys
+
+import pytest
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from kafka_events.kafka_consumer import KafkaEventConsumer
+from kafka_events.kafka_events import EventType, RequestCreatedEvent
+from kafka_events.kafka_producer import KafkaEventProducer
+from kafka_events.transport import (
+    InMemoryConsumerTransport, InMemoryEventLog, InMemoryProducerTransport, ProducerTransport,
+    SQLiteConsumerTransport, SQLiteProducerTransport, topic_partitions
+)
+
+
+def _event(request_id: int) -> RequestCreatedEvent:
+    return RequestCreatedEvent(
+        request_id=request_id,
+        customer_id=1,
+        title="Тест",
+        description="Описание",
+        urgency="high",
+        region="Москва",
+        city="Москва",
+        address="ул. Тестовая, 1",
+    )
+
+
+def _consumer(transport, received) -> KafkaEventConsumer:
+    consumer = KafkaEventConsumer("notification-service", ["request-events"], transport=transport)
+    consumer.register_handler(EventType.REQUEST_CREATED, lambda data: received.append(data) or True)
+    return consumer
+
+
+def test_memory_pipeline_end_to_end():
+    log = InMemoryEventLog()
+    producer = KafkaEventProducer(transport=InMemoryProducerTransport(log))
+    received = []
+    consumer = _consumer(InMemoryConsumerTransport("notification-service", ["request-events"], log), received)
+
+    for request_id in range(20):
+        assert producer.publish_event("request-events", _event(request_id))
+
+    assert consumer.poll_once(timeout_ms=0) == 20
+    assert sorted(item["request_id"] for item in received) == list(range(20))
+    # Одна заявка всегда попадает в одну партицию
+    assert len(log.end_offsets("request-events")) <= topic_partitions("request-events")
+
+
+def test_memory_competing_consumers_share_group_offsets():
+    log = InMemoryEventLog()
+    producer = KafkaEventProducer(transport=InMemoryProducerTransport(log))
+    first, second = [], []
+    consumer_a = _consumer(InMemoryConsumerTransport("group", ["request-events"], log), first)
+    consumer_b = _consumer(InMemoryConsumerTransport("group", ["request-events"], log), second)
+
+    for request_id in range(10):
+        producer.publish_event("request-events", _event(request_id))
+
+    consumer_a.poll_once(timeout_ms=0)
+    consumer_b.poll_once(timeout_ms=0)
+    assert len(first) + len(second) == 10
+    assert not {e["request_id"] for e in first} & {e["request_id"] for e in second}
+
+
+def test_publish_batch_sends_through_transport_batch():
+    log = InMemoryEventLog()
+    producer = KafkaEventProducer(transport=InMemoryProducerTransport(log))
+    received = []
+    consumer = _consumer(InMemoryConsumerTransport("notification-service", ["request-events"], log), received)
+
+    results = producer.publish_batch([("request-events", _event(request_id), None) for request_id in range(5)])
+
+    assert results == {"success": 5, "failed": 0}
+    assert consumer.poll_once(timeout_ms=0) == 5
+
+
+def test_sqlite_log_survives_reopen(tmp_path):
+    path = str(tmp_path / "events.sqlite3")
+    producer = KafkaEventProducer(transport=SQLiteProducerTransport(path))
+    for request_id in range(3):
+        assert producer.publish_event("request-events", _event(request_id))
+    producer.close()
+
+    received = []
+    consumer = _consumer(SQLiteConsumerTransport("notification-service", ["request-events"], path), received)
+    assert consumer.poll_once(timeout_ms=0) == 3
+    assert consumer.poll_once(timeout_ms=0) == 0
+    consumer.stop_consuming()
+
+    # Смещения группы сохраняются между перезапусками
+    restarted = _consumer(SQLiteConsumerTransport("notification-service", ["request-events"], path), received)
+    assert restarted.poll_once(timeout_ms=0) == 0
+    restarted.stop_consuming()
+
+
+def test_incomplete_transport_fails_on_instantiation():
+    class FlushOnlyTransport(ProducerTransport):
+        def flush(self):
+            pass
+
+    with pytest.raises(TypeError):
+        FlushOnlyTransport()
+
+
+def test_disabled_producer_reports_events_as_not_sent(monkeypatch):
+    from kafka_events.kafka_config import kafka_config
+
+    monkeypatch.setattr(kafka_config, "enabled", False)
+    producer = KafkaEventProducer()
+
+    assert producer.publish_event("request-events", _event(1)) is False
+    assert producer.publish_batch([("request-events", _event(2), None)]) == {"success": 0, "failed": 1}
@@ -0,0 +1,136 @@
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from models import BackgroundJob
+from services.job_queue import (
+    JobHandler, JobQueueConfig, JobWorker, PermanentJobError, enqueue_job, queue_stats
+)
+
+
+@pytest.fixture
+def session_factory(sqlite_sessions):
+    return sqlite_sessions([BackgroundJob])
+
+
+def _worker(session_factory, handlers, **config):
+    config = JobQueueConfig(**{"workers": 2, "retry_base_seconds": 60, **config})
+    return JobWorker(session_factory=session_factory, config=config, handlers=handlers, worker_id="test")
+
+
+def _enqueue(session_factory, job_type, count=1, **kwargs):
+    with session_factory() as db:
+        for index in range(count):
+            enqueue_job(db, job_type, {"index": index}, **kwargs)
+        db.commit()
+
+
+def _statuses(session_factory):
+    with session_factory() as db:
+        return [job.status for job in db.query(BackgroundJob).order_by(BackgroundJob.id)]
+
+
+def test_jobs_run_after_commit(session_factory):
+    calls = []
+
+    async def handler(payload, db):
+        calls.append(payload["index"])
+
+    worker = _worker(session_factory, {"demo": JobHandler(handler, None, None)})
+    with session_factory() as db:
+        enqueue_job(db, "demo", {"index": 0})
+        # Незафиксированная задача воркеру не видна
+        assert worker.run_once() == 0
+        db.commit()
+
+    assert worker.run_once() == 1
+    assert calls == [0]
+    assert _statuses(session_factory) == ["succeeded"]
+
+
+def test_failed_job_is_retried_with_backoff(session_factory):
+    attempts = []
+
+    def flaky(payload, db):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("SMTP недоступен")
+
+    worker = _worker(session_factory, {"flaky": JobHandler(flaky, None, None)})
+    _enqueue(session_factory, "flaky")
+    worker.run_once()
+
+    with session_factory() as db:
+        job = db.query(BackgroundJob).one()
+        assert (job.status, job.attempts) == ("pending", 1)
+        assert "SMTP недоступен" in job.last_error
+        assert job.run_at.replace(tzinfo=timezone.utc) > datetime.now(timezone.utc) + timedelta(seconds=50)
+        # Задача не выполняется до истечения задержки
+        assert worker.run_once() == 0
+        job.run_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+        db.commit()
+
+    worker.run_once()
+    assert _statuses(session_factory) == ["succeeded"]
+
+
+def test_dead_after_permanent_error_or_max_attempts(session_factory):
+    def permanent(payload, db):
+        raise PermanentJobError("бот не настроен")
+
+    def failing(payload, db):
+        raise RuntimeError("ошибка")
+
+    worker = _worker(session_factory, {
+        "permanent": JobHandler(permanent, None, None),
+        "failing": JobHandler(failing, None, None),
+    })
+    _enqueue(session_factory, "permanent")
+    _enqueue(session_factory, "failing", max_attempts=1)
+    while worker.run_once():
+        pass
+
+    assert _statuses(session_factory) == ["dead", "dead"]
+    with session_factory() as db:
+        assert queue_stats(db) == {"permanent": {"dead": 1}, "failing": {"dead": 1}}
+
+
+def test_concurrency_limits_per_job_type(session_factory):
+    handlers = {"telegram": JobHandler(lambda p, db: None, 1, None), "email": JobHandler(lambda p, db: None, None, None)}
+    worker = _worker(session_factory, handlers, workers=3)
+    _enqueue(session_factory, "telegram", count=3)
+    _enqueue(session_factory, "email", count=3)
+
+    claimed = worker.claim()
+    assert sum(job.job_type == "telegram" for job in claimed) <= 1
+    assert len(claimed) <= 3
+
+
+def test_thread_pool_and_stale_recovery(session_factory):
+    done = []
+    worker = _worker(session_factory, {"demo": JobHandler(lambda p, db: done.append(p["index"]), None, None)},
+                     poll_interval_seconds=0.05, lock_timeout_seconds=60)
+    _enqueue(session_factory, "demo", count=10)
+
+    # Задача, захваченная упавшим воркером, возвращается в очередь
+    with session_factory() as db:
+        job = db.query(BackgroundJob).first()
+        job.status, job.locked_by = "running", "crashed"
+        job.locked_at = datetime.now(timezone.utc) - timedelta(minutes=5)
+        db.commit()
+    assert _worker(session_factory, {}, lock_timeout_seconds=60).recover_stale() == 1
+
+    worker.start()
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline and _statuses(session_factory) != ["succeeded"] * 10:
+        time.sleep(0.05)
+    worker.stop()
+
+    assert sorted(done) == list(range(10))
+    assert _statuses(session_factory) == ["succeeded"] * 10
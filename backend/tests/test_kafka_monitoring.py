@@ -0,0 +1,55 @@
+import os
+import sys
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from kafka_events.kafka_consumer import KafkaEventConsumer
+from kafka_events.kafka_events import EventType, RequestCreatedEvent
+from kafka_events.kafka_producer import KafkaEventProducer
+from kafka_events.metrics import Histogram, MetricsRegistry
+from kafka_events.monitoring import LagExporter, LogOffsetsReader
+from kafka_events.transport import InMemoryConsumerTransport, InMemoryEventLog, InMemoryProducerTransport
+
+
+def _publish(producer, count):
+    for request_id in range(count):
+        producer.publish_event("request-events", RequestCreatedEvent(
+            request_id=request_id, customer_id=1, title="t", description="d",
+            urgency="high", region="r", city="c", address="a",
+        ))
+
+
+def test_lag_drops_after_consumption():
+    log = InMemoryEventLog()
+    producer = KafkaEventProducer(transport=InMemoryProducerTransport(log))
+    consumer = KafkaEventConsumer(
+        "notification-service", ["request-events"],
+        transport=InMemoryConsumerTransport("notification-service", ["request-events"], log),
+    )
+    consumer.register_handler(EventType.REQUEST_CREATED, lambda data: True)
+    exporter = LagExporter(LogOffsetsReader(log), {"notification-service": ["request-events"]})
+
+    _publish(producer, 12)
+    assert exporter.collect().group_lag("notification-service") == 12
+
+    consumer.poll_once(timeout_ms=0)
+    snapshot = exporter.collect()
+    assert snapshot.group_lag("notification-service") == 0
+    assert snapshot.consume_rates[("notification-service", "request-events")] > 0
+    assert 'kafka_consumergroup_lag_total{group="notification-service"} 0' in exporter.render_prometheus()
+
+
+def test_histogram_quantiles_and_rendering():
+    histogram = Histogram((0.1, 1.0))
+    for value in (0.05, 0.05, 0.5, 5.0):
+        histogram.observe(value)
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 1.0
+    assert histogram.quantile(1.0) == float("inf")
+
+    registry = MetricsRegistry()
+    registry.observe("handler_seconds", 0.5, group="g")
+    text = registry.render()
+    assert 'handler_seconds_bucket{group="g",le="+Inf"} 1' in text
+    assert 'handler_seconds_count{group="g"} 1' in text
@@ -0,0 +1,75 @@
+import os
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from jinja2 import UndefinedError
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.message_templates import MessageTemplateRegistry, TemplateNotFoundError, message_templates
+
+
+def write(root, path, text):
+    full = root / path
+    full.parent.mkdir(parents=True, exist_ok=True)
+    full.write_text(text, encoding="utf-8")
+
+
+@pytest.fixture
+def registry(tmp_path):
+    write(tmp_path, "ru/email/hello.html", '{% extends "ru/email/_base.html" %}{% block body %}Привет, {{ name }}!{% endblock %}')
+    write(tmp_path, "ru/email/_base.html", "<p>{% block body %}{% endblock %}</p>")
+    write(tmp_path, "en/email/hello.html", "<p>Hello, {{ name }}!</p>")
+    write(tmp_path, "ru/telegram/note.md", "**{{ name }}**: {{ text }}")
+    return MessageTemplateRegistry(directory=str(tmp_path))
+
+
+def test_load_skips_partials_and_falls_back_to_default_locale(registry):
+    assert registry.load() == 3
+
+    assert registry.render("email/hello.html", name="Иван") == "<p>Привет, Иван!</p>"
+    assert registry.render("email/hello.html", "en", name="Ivan") == "<p>Hello, Ivan!</p>"
+    assert registry.render("email/hello.html", "de", name="Ivan") == "<p>Привет, Ivan!</p>"
+    with pytest.raises(TemplateNotFoundError):
+        registry.get("email/_base.html")
+
+
+def test_html_is_escaped_and_missing_context_fails(registry):
+    assert registry.render("email/hello.html", name="<b>") == "<p>Привет, &lt;b&gt;!</p>"
+    # Markdown для Telegram не экранируется
+    assert registry.render("telegram/note.md", name="<b>", text="x") == "**<b>**: x"
+    with pytest.raises(UndefinedError):
+        registry.render("telegram/note.md", name="Иван")
+
+
+def test_render_many_merges_shared_context(registry):
+    texts = registry.render_many(
+        "telegram/note.md", [{"name": "Иван"}, {"name": "Петр", "text": "свое"}], shared={"text": "общее"}
+    )
+    assert texts == ["**Иван**: общее", "**Петр**: свое"]
+
+
+def test_shipped_templates_render():
+    assert message_templates.load() > 0
+    request = SimpleNamespace(
+        id=7, equipment_type=None, address="ул. Ленина, 1", description="Не заводится",
+        preferred_date=datetime(2024, 5, 1, 12, 0), clarification_details=None,
+    )
+
+    assignment = message_templates.render("telegram/request_assignment.md", request=request)
+    assert "**Заявка #7**" in assignment and "01.05.2024 12:00" in assignment
+    status = message_templates.render(
+        "telegram/request_status_update.md", request=request, status="in_progress", status_text="в работе"
+    )
+    assert status.endswith("📍 **Местоположение:** ул. Ленина, 1")
+
+    rejection = message_templates.render("email/manager_rejection.html", contractor_name="Иван", reason=None)
+    assert "менеджером" in rejection and "Причина" not in rejection
+    notice = message_templates.render(
+        "email/contractor_pending_manager.txt", contractor_name="Иван", contractor_email="ivan@example.com",
+        contractor_phone=None, specializations=["Гидравлика", "Электрика"], verification_url="http://x/1",
+    )
+    assert "Телефон: не указан" in notice and "Специализации: Гидравлика, Электрика" in notice
@@ -0,0 +1,141 @@
+import os
+import sys
+
+import pytest
+from fastapi import HTTPException
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from models import (
+    ContractorProfile, ContractorResponse, CustomerProfile, RepairRequest, RequestStageDuration, RequestStatus, RequestStatusEvent, User
+)
+from api.v1.endpoints.repair_requests import update_repair_request
+from api.v1.schemas import RepairRequestUpdate
+from services.request_workflow_service import RequestConflictError, RequestWorkflowService
+
+TABLES = [
+    User, CustomerProfile, ContractorProfile, RepairRequest, ContractorResponse,
+    RequestStatusEvent, RequestStageDuration,
+]
+
+
+@pytest.fixture
+def session_factory(sqlite_sessions):
+    # Файловая БД: у каждой сессии свое соединение, как у параллельных запросов
+    factory = sqlite_sessions(TABLES)
+    with factory() as session:
+        first = User(username="manager1", email="m1@example.com", hashed_password="x", role="manager")
+        second = User(username="manager2", email="m2@example.com", hashed_password="x", role="manager")
+        customer = User(username="customer", email="c@example.com", hashed_password="x", role="customer")
+        session.add_all([first, second, customer])
+        session.flush()
+        session.add(CustomerProfile(
+            user_id=customer.id, company_name="ООО Тест", contact_person="Иван", phone="+7", email="c@example.com"
+        ))
+        session.commit()
+    return factory
+
+
+def _create_requests(factory, count):
+    with factory() as db:
+        workflow = RequestWorkflowService(db)
+        return [workflow.create_request(1, {"title": f"Ремонт {i}", "description": "Течь"}).id for i in range(count)]
+
+
+def test_claim_hands_out_distinct_requests_in_order(session_factory):
+    ids = _create_requests(session_factory, 5)
+
+    with session_factory() as first, session_factory() as second:
+        claimed_first = RequestWorkflowService(first).claim_requests(manager_id=1, limit=2)
+        claimed_second = RequestWorkflowService(second).claim_requests(manager_id=2, limit=2)
+
+        assert [r.id for r in claimed_first] == ids[:2]
+        assert [r.id for r in claimed_second] == ids[2:4]
+        assert all(r.status == RequestStatus.MANAGER_REVIEW and r.version == 2 for r in claimed_first)
+
+    with session_factory() as db:
+        workflow = RequestWorkflowService(db)
+        assert [r.id for r in workflow.get_available_requests()] == [ids[4]]
+        assert [r.id for r in workflow.claim_requests(manager_id=1, limit=10)] == [ids[4]]
+        assert workflow.claim_requests(manager_id=2, limit=10) == []
+
+
+def test_parallel_assignment_loses_on_version_check(session_factory):
+    request_id = _create_requests(session_factory, 1)[0]
+
+    with session_factory() as first, session_factory() as second:
+        # Оба менеджера открыли заявку в версии 1
+        first.query(RepairRequest).get(request_id)
+        second.query(RepairRequest).get(request_id)
+
+        RequestWorkflowService(first).assign_to_manager(request_id, manager_id=1)
+        with pytest.raises(RequestConflictError):
+            RequestWorkflowService(second).assign_to_manager(request_id, manager_id=2)
+
+    with session_factory() as db:
+        request = db.query(RepairRequest).get(request_id)
+        assert request.manager_id == 1
+        assert request.version == 2
+        assert db.query(RequestStatusEvent).filter_by(request_id=request_id).count() == 2
+
+
+def test_assignment_rules(session_factory):
+    request_id = _create_requests(session_factory, 1)[0]
+
+    with session_factory() as db:
+        workflow = RequestWorkflowService(db)
+        with pytest.raises(RequestConflictError):
+            workflow.assign_to_manager(request_id, manager_id=1, expected_version=7)
+
+        request = workflow.assign_to_manager(request_id, manager_id=1, expected_version=1)
+        # Повторный клик того же менеджера ничего не меняет
+        assert workflow.assign_to_manager(request_id, manager_id=1).version == request.version == 2
+        with pytest.raises(RequestConflictError):
+            workflow.assign_to_manager(request_id, manager_id=2)
+
+        with pytest.raises(RequestConflictError):
+            workflow.add_clarification(request_id, 1, "Уточнить модель", expected_version=1)
+        assert workflow.add_clarification(request_id, 1, "Уточнить модель", expected_version=2).version == 3
+
+
+def test_update_endpoint_checks_version(session_factory):
+    request_id = _create_requests(session_factory, 1)[0]
+
+    with session_factory() as db:
+        db.query(CustomerProfile).update({"phone": "+79990000000"})
+        db.commit()
+        manager = db.query(User).filter(User.username == "manager1").one()
+
+        # Смена статуса без версии не принимается
+        with pytest.raises(HTTPException) as error:
+            update_repair_request(
+                request_id, RepairRequestUpdate(status="manager_review"), expected_version=None,
+                current_user=manager, db=db,
+            )
+        assert error.value.status_code == 400
+
+        assert update_repair_request(
+            request_id, RepairRequestUpdate(title="Новая"), expected_version=1, current_user=manager, db=db
+        ).title == "Новая"
+        with pytest.raises(HTTPException) as error:
+            update_repair_request(
+                request_id, RepairRequestUpdate(status="manager_review"), expected_version=1,
+                current_user=manager, db=db,
+            )
+        assert error.value.status_code == 409
+
+    with session_factory() as first, session_factory() as second:
+        # Оба открыли заявку в версии 2; второе сохранение отклоняется
+        editors = [session.query(User).filter(User.username == "manager1").one() for session in (first, second)]
+        opened = [session.get(RepairRequest, request_id) for session in (first, second)]
+        assert [request.version for request in opened] == [2, 2]
+        update_repair_request(
+            request_id, RepairRequestUpdate(title="Первая"), expected_version=None, current_user=editors[0], db=first
+        )
+        with pytest.raises(HTTPException) as error:
+            update_repair_request(
+                request_id, RepairRequestUpdate(title="Вторая"), expected_version=None,
+                current_user=editors[1], db=second,
+            )
+        assert error.value.status_code == 409
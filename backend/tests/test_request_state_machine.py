@@ -0,0 +1,108 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fastapi import HTTPException
+
+from api.v1.endpoints.repair_requests import update_repair_request
+from api.v1.schemas import RepairRequestUpdate
+from models import (
+    ContractorProfile, ContractorResponse, CustomerProfile, RepairRequest, RequestStageDuration, RequestStatusEvent, User
+)
+from services.request_state_machine import (
+    Actor, TransitionError, TransitionForbiddenError, allowed_actions, check_transition
+)
+from services.request_workflow_service import RequestWorkflowService
+
+MANAGER = Actor(user_id=10, role="manager")
+OTHER_MANAGER = Actor(user_id=11, role="manager")
+CONTRACTOR = Actor(user_id=20, role="contractor")
+# Пользователь заказчика 30 владеет профилем 3
+CUSTOMER = Actor(user_id=30, role="customer", customer_profile_id=3)
+ADMIN = Actor(user_id=1, role="admin")
+
+
+def _request(status, manager_id=None, contractor_id=None, customer_id=3):
+    return SimpleNamespace(
+        status=status, manager_id=manager_id, assigned_contractor_id=contractor_id, customer_id=customer_id
+    )
+
+
+def test_allowed_actions_follow_status_and_ownership():
+    request = _request("manager_review", manager_id=10)
+
+    assert allowed_actions(request, MANAGER) == ["clarify", "send_to_contractors", "assign_contractor", "cancel"]
+    assert allowed_actions(request, OTHER_MANAGER) == []
+    assert allowed_actions(request, CUSTOMER) == ["cancel"]
+    assert allowed_actions(request, CONTRACTOR) == []
+    assert set(allowed_actions(request, ADMIN)) == {"clarify", "send_to_contractors", "assign_contractor", "cancel"}
+
+    assert allowed_actions(_request("new"), OTHER_MANAGER) == ["assign_manager"]
+    assert allowed_actions(_request("in_progress", manager_id=10, contractor_id=20), CONTRACTOR) == ["complete", "cancel"]
+    assert allowed_actions(_request("completed", manager_id=10), ADMIN) == []
+
+
+def test_customer_ownership_uses_profile_id():
+    # customer_id заявки - id профиля; совпадение с id пользователя не дает прав
+    foreign = _request("new", customer_id=30)
+    with pytest.raises(TransitionForbiddenError):
+        check_transition("cancel", foreign, CUSTOMER)
+
+    assert check_transition("cancel", _request("new"), CUSTOMER).to_status == "cancelled"
+
+
+def test_check_transition_errors():
+    with pytest.raises(TransitionForbiddenError):
+        check_transition("start_work", _request("assigned", contractor_id=20), MANAGER)
+    with pytest.raises(TransitionForbiddenError):
+        check_transition("clarify", _request("manager_review", manager_id=10), OTHER_MANAGER)
+    with pytest.raises(TransitionError) as error:
+        check_transition("cancel", _request("sent_to_contractors"), CUSTOMER)
+    assert not isinstance(error.value, TransitionForbiddenError)
+    with pytest.raises(TransitionError):
+        check_transition("teleport", _request("new"), ADMIN)
+
+
+@pytest.fixture
+def db(sqlite_sessions):
+    session = sqlite_sessions([
+        User, CustomerProfile, ContractorProfile, RepairRequest, ContractorResponse,
+        RequestStatusEvent, RequestStageDuration,
+    ], memory=True)()
+    customer = User(username="customer", email="c@example.com", hashed_password="x", role="customer")
+    session.add(customer)
+    session.flush()
+    session.add(CustomerProfile(
+        user_id=customer.id, company_name="ООО Тест", contact_person="Иван", phone="+79990000000", email="c@example.com"
+    ))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_update_endpoint_cannot_bypass_state_machine(db):
+    customer = db.query(User).one()
+    workflow = RequestWorkflowService(db)
+    request = workflow.create_request(customer.customer_profile.id, {"title": "Ремонт", "description": "Течь"})
+
+    with pytest.raises(HTTPException) as error:
+        update_repair_request(
+            request.id, RepairRequestUpdate(title="Готово", status="completed"), expected_version=1,
+            current_user=customer, db=db,
+        )
+    assert error.value.status_code == 403
+    db.expire_all()
+    stored = db.get(RepairRequest, request.id)
+    assert (stored.status, stored.title) == ("new", "Ремонт")
+
+    # Разрешенный автоматом переход выполняется
+    response = update_repair_request(
+        request.id, RepairRequestUpdate(status="cancelled", manager_comment="Передумал"), expected_version=1,
+        current_user=customer, db=db,
+    )
+    assert response.status == "cancelled"
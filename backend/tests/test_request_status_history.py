@@ -0,0 +1,157 @@
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from models import (
+    ContractorProfile, ContractorResponse, CustomerProfile, RepairRequest, RequestStageDuration, RequestStatus, RequestStatusEvent, User
+)
+from services.request_status_history_service import (
+    RequestStatusHistoryService, backfill_status_events, build_stage_rows, rebuild_stage_durations
+)
+from services.request_workflow_service import RequestWorkflowService
+
+TABLES = [
+    User, CustomerProfile, ContractorProfile, RepairRequest, ContractorResponse,
+    RequestStatusEvent, RequestStageDuration,
+]
+
+
+@pytest.fixture
+def db(sqlite_sessions):
+    session = sqlite_sessions(TABLES, memory=True)()
+    manager = User(username="manager", email="m@example.com", hashed_password="x", role="manager")
+    customer = User(username="customer", email="c@example.com", hashed_password="x", role="customer")
+    session.add_all([manager, customer])
+    session.flush()
+    session.add(CustomerProfile(
+        user_id=customer.id, company_name="ООО Тест", contact_person="Иван", phone="+7", email="c@example.com"
+    ))
+    session.commit()
+    yield session
+    session.close()
+
+
+def _create_request(db):
+    return RequestWorkflowService(db).create_request(1, {"title": "Ремонт", "description": "Течь"})
+
+
+def test_transitions_are_journaled_and_projected(db):
+    workflow = RequestWorkflowService(db)
+    request = _create_request(db)
+    workflow.assign_to_manager(request.id, manager_id=1)
+    workflow.add_clarification(request.id, manager_id=1, clarification_details="Уточнить модель")
+    workflow.cancel_request(request.id, user_id=1, reason="Дубликат")
+
+    history = workflow.history.get_history(request.id)
+    assert [(e.from_status, e.to_status) for e in history] == [
+        (None, "new"),
+        ("new", "manager_review"),
+        ("manager_review", "clarification"),
+        ("clarification", "cancelled"),
+    ]
+    assert history[-1].reason == "Дубликат"
+
+    stages = db.query(RequestStageDuration).order_by(RequestStageDuration.id).all()
+    assert [s.stage for s in stages] == ["new", "manager_review", "clarification"]
+    assert all(s.left_at is not None for s in stages)
+    # Время в new (до взятия заявки) не относится к взявшему ее менеджеру
+    assert [s.manager_id for s in stages] == [None, 1, 1]
+
+
+def test_rebuild_matches_incremental_projection(db):
+    workflow = RequestWorkflowService(db)
+    request = _create_request(db)
+    workflow.assign_to_manager(request.id, manager_id=1)
+
+    incremental = [(s.stage, s.left_at is None) for s in db.query(RequestStageDuration).order_by(RequestStageDuration.id)]
+    assert rebuild_stage_durations(db, batch_size=1) == 2
+    rebuilt = [(s.stage, s.left_at is None) for s in db.query(RequestStageDuration).order_by(RequestStageDuration.id)]
+    assert rebuilt == incremental == [("new", False), ("manager_review", True)]
+
+
+def test_backfill_from_request_columns(db):
+    created = datetime(2024, 5, 1, 9, 0, tzinfo=timezone.utc)
+    db.add(RepairRequest(
+        customer_id=1, title="Старая", description="d", status="assigned", manager_id=1,
+        created_at=created, processed_at=created + timedelta(hours=2), assigned_at=created + timedelta(hours=30),
+    ))
+    db.commit()
+
+    assert backfill_status_events(db) == 3
+    assert backfill_status_events(db) == 0  # повторный запуск ничего не добавляет
+    rebuild_stage_durations(db)
+
+    history = RequestStatusHistoryService(db)
+    assert history.average_hours_in_stages(["manager_review"], manager_id=1) == pytest.approx(28)
+    # new: 2 ч при SLA 4 ч; manager_review: 28 ч при SLA 24 ч; assigned открыт дольше 48 ч
+    assert history.sla_breaches(manager_id=1) == {"manager_review": 1, "assigned": 1}
+
+
+def test_build_stage_rows_sla():
+    start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    events = [
+        SimpleNamespace(to_status="new", occurred_at=start),
+        SimpleNamespace(to_status="manager_review", occurred_at=start + timedelta(hours=5)),
+        SimpleNamespace(to_status="completed", occurred_at=start + timedelta(hours=6)),
+    ]
+    rows = build_stage_rows(SimpleNamespace(id=1, customer_id=2, manager_id=3), events)
+    assert [(r["stage"], r["duration_seconds"], r["sla_breached"]) for r in rows] == [
+        ("new", 5 * 3600, True),
+        ("manager_review", 3600, False),
+    ]
+
+
+def test_customer_cabinet_creation_opens_new_stage(db):
+    import asyncio
+    from api.v1.endpoints.customer_cabinet import create_customer_request
+    from api.v1.schemas import RepairRequestCreate
+
+    customer = db.query(User).filter(User.username == "customer").one()
+    db.query(CustomerProfile).update({"phone": "+79990000000"})
+    response = asyncio.run(create_customer_request(
+        RepairRequestCreate(title="Ремонт", description="Течь"), current_user=customer, db=db
+    ))
+
+    history = RequestStatusHistoryService(db).get_history(response.id)
+    assert [(e.from_status, e.to_status, e.changed_by) for e in history] == [(None, "new", customer.id)]
+    stage = db.query(RequestStageDuration).filter(RequestStageDuration.request_id == response.id).one()
+    assert (stage.stage, stage.left_at, stage.manager_id) == ("new", None, None)
+
+
+def test_status_change_through_update_endpoint_is_journaled(db, monkeypatch):
+    from api.v1.endpoints.repair_requests import update_repair_request
+    from api.v1.schemas import RepairRequestUpdate
+    from services import request_status_history_service
+
+    published = []
+    monkeypatch.setattr(request_status_history_service.kafka_producer, "publish_event",
+                        lambda topic, event, key=None: published.append(getattr(event, "to_status", None)) or True)
+    manager = db.query(User).filter(User.username == "manager").one()
+    db.query(CustomerProfile).update({"phone": "+79990000000"})
+    request = _create_request(db)
+    published.clear()
+
+    update_repair_request(
+        request.id, RepairRequestUpdate(status="manager_review"), expected_version=1, current_user=manager, db=db
+    )
+    update_repair_request(
+        request.id, RepairRequestUpdate(status="clarification", clarification_details="Уточнить модель"),
+        expected_version=2, current_user=manager, db=db,
+    )
+
+    history = RequestStatusHistoryService(db).get_history(request.id)
+    assert [(e.from_status, e.to_status, e.changed_by) for e in history[1:]] == [
+        ("new", "manager_review", manager.id),
+        ("manager_review", "clarification", manager.id),
+    ]
+    stages = db.query(RequestStageDuration).order_by(RequestStageDuration.id).all()
+    assert [(s.stage, s.left_at is None) for s in stages] == [
+        ("new", False), ("manager_review", False), ("clarification", True),
+    ]
+    assert published == ["manager_review", "clarification"]
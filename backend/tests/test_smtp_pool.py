@@ -0,0 +1,119 @@
+import os
+import smtplib
+import sys
+import threading
+from email.message import EmailMessage
+
+import pytest
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.smtp_pool import SmtpConnectionPool
+
+
+class FakeSMTP:
+    """SMTP сервер в памяти: считает рукопожатия и отправленные письма"""
+
+    instances = []
+
+    def __init__(self, host, port, timeout=None):
+        self.sent = []
+        self.alive = True
+        self.noops = 0
+        self.fail_next = None
+        self.logged_in = False
+        FakeSMTP.instances.append(self)
+
+    def starttls(self, context=None):
+        pass
+
+    def login(self, username, password):
+        self.logged_in = True
+
+    def noop(self):
+        self.noops += 1
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        return (250, b"OK")
+
+    def send_message(self, message):
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        if self.fail_next:
+            error, self.fail_next = self.fail_next, None
+            raise error
+        self.sent.append(message["To"])
+
+    def quit(self):
+        self.alive = False
+
+    def close(self):
+        self.alive = False
+
+
+def message(to):
+    msg = EmailMessage()
+    msg["To"] = to
+    msg.set_content("Проверка")
+    return msg
+
+
+@pytest.fixture
+def pool():
+    FakeSMTP.instances = []
+    pool = SmtpConnectionPool("smtp.test", 587, username="user", password="secret", max_size=2,
+                              noop_after_seconds=0, smtp_factory=FakeSMTP)
+    yield pool
+    pool.close()
+
+
+def test_sequential_sends_reuse_one_connection(pool):
+    for index in range(10):
+        pool.send_message(message(f"manager{index}@example.com"))
+
+    assert len(FakeSMTP.instances) == 1
+    assert len(FakeSMTP.instances[0].sent) == 10
+    assert FakeSMTP.instances[0].logged_in
+
+
+def test_dead_connection_is_replaced_after_noop(pool):
+    pool.send_message(message("a@example.com"))
+    FakeSMTP.instances[0].alive = False  # Сервер закрыл простаивающую сессию
+
+    pool.send_message(message("b@example.com"))
+
+    assert len(FakeSMTP.instances) == 2
+    assert FakeSMTP.instances[1].sent == ["b@example.com"]
+    assert pool.open_connections == 1
+
+
+def test_disconnect_during_send_is_retried_but_rejection_is_not(pool):
+    pool.noop_after_seconds = 60  # Без проверки NOOP обрыв обнаруживается при отправке
+    pool.send_message(message("a@example.com"))
+    FakeSMTP.instances[0].alive = False
+    pool.send_message(message("b@example.com"))
+    assert FakeSMTP.instances[1].sent == ["b@example.com"]
+
+    FakeSMTP.instances[1].fail_next = smtplib.SMTPRecipientsRefused({"bad@example.com": (550, b"No such user")})
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        pool.send_message(message("bad@example.com"))
+    # Отказ получателя не рвет соединение
+    pool.send_message(message("c@example.com"))
+    assert len(FakeSMTP.instances) == 2
+    assert FakeSMTP.instances[1].sent == ["b@example.com", "c@example.com"]
+
+
+def test_pool_size_is_bounded(pool):
+    first = pool.acquire()
+    second = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+
+    released = threading.Timer(0.05, pool.release, args=(first,))
+    released.start()
+    assert pool.acquire(timeout=2) is first
+    released.join()
+    pool.release(first)
+    pool.release(second)
+    assert len(FakeSMTP.instances) == 2
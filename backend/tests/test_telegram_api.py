@@ -0,0 +1,79 @@
+import asyncio
+import os
+import sys
+
+import pytest
+from aiohttp import web
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from kafka_events.metrics import metrics
+from services.telegram_api import TelegramApiClient, TelegramApiError, TelegramConfig
+
+
+async def _fake_bot_api(handler):
+    """Локальный сервер вместо api.telegram.org; возвращает (runner, base_url)"""
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+def test_calls_reuse_pooled_connection():
+    peers = []
+
+    async def handler(request):
+        peers.append(request.transport.get_extra_info("peername"))
+        payload = await request.json()
+        return web.json_response({"ok": True, "result": {"method": request.match_info["method"], **payload}})
+
+    async def scenario():
+        runner, url = await _fake_bot_api(handler)
+        client = TelegramApiClient(TelegramConfig(bot_token="test", api_url=url))
+        try:
+            await client.start()
+            results = [await client.call("sendMessage", {"chat_id": i}) for i in range(3)]
+        finally:
+            await client.close()
+            await runner.cleanup()
+        return results
+
+    before = metrics.counter("telegram_api_requests_total", method="sendMessage", outcome="ok")
+    results = asyncio.run(scenario())
+
+    assert [r["chat_id"] for r in results] == [0, 1, 2]
+    # Keep-alive: все вызовы прошли через одно TCP соединение
+    assert len(set(peers)) == 1
+    assert metrics.counter("telegram_api_requests_total", method="sendMessage", outcome="ok") == before + 3
+
+
+def test_error_response_carries_retry_after():
+    async def handler(request):
+        return web.json_response(
+            {"ok": False, "error_code": 429, "description": "Too Many Requests", "parameters": {"retry_after": 7}},
+            status=429,
+        )
+
+    async def scenario():
+        runner, url = await _fake_bot_api(handler)
+        client = TelegramApiClient(TelegramConfig(bot_token="test", api_url=url))
+        try:
+            await client.call("sendMessage", {"chat_id": 1})
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    with pytest.raises(TelegramApiError) as error:
+        asyncio.run(scenario())
+    assert (error.value.error_code, error.value.retry_after) == (429, 7)
+
+
+def test_unconfigured_client_fails_fast():
+    client = TelegramApiClient(TelegramConfig(bot_token=None))
+    with pytest.raises(TelegramApiError):
+        asyncio.run(client.call("getMe"))
@@ -0,0 +1,162 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from models import (
+    BackgroundJob, TelegramBroadcast, TelegramBroadcastRecipient, TelegramMessage, TelegramUser, User
+)
+from services import telegram_broadcast
+from services.telegram_api import TelegramApiError, TelegramConfig
+from services.telegram_broadcast import (
+    SEND_BROADCAST, BroadcastEngine, TokenBucket, cancel_broadcast, create_broadcast
+)
+from services.telegram_directory import chat_directory
+
+
+class FakeApi:
+    """Bot API, отвечающий заранее заданными ошибками по chat_id"""
+
+    configured = True
+
+    def __init__(self, failures=None, crash_after=None):
+        self.failures = failures or {}
+        self.crash_after = crash_after
+        self.sent = []
+
+    async def call(self, method, params=None, timeout=None):
+        if self.crash_after is not None and len(self.sent) >= self.crash_after:
+            raise RuntimeError("воркер остановлен")
+        errors = self.failures.get(params["chat_id"])
+        if errors:
+            raise errors.pop(0)
+        self.sent.append(params["chat_id"])
+        return {"message_id": len(self.sent)}
+
+
+def make_engine(api, **overrides):
+    settings = dict(
+        bot_token="test-token",
+        broadcast_rate_per_second=1000,
+        broadcast_chat_interval_seconds=0,
+        broadcast_batch_size=2,
+        broadcast_max_attempts=2,
+    )
+    settings.update(overrides)
+    return BroadcastEngine(api=api, config=TelegramConfig(**settings))
+
+
+@pytest.fixture
+def db(sqlite_sessions, monkeypatch):
+    monkeypatch.setattr(telegram_broadcast, "RETRY_BASE_SECONDS", 0)
+    chat_directory.clear()
+    session = sqlite_sessions([
+        User, TelegramUser, TelegramMessage, BackgroundJob, TelegramBroadcast, TelegramBroadcastRecipient,
+    ], memory=True)()
+    session.add_all([TelegramUser(telegram_id=1000 + i, username=f"master{i}") for i in range(1, 6)])
+    session.commit()
+    yield session
+    session.close()
+    chat_directory.clear()
+
+
+def recipient_statuses(db, broadcast_id):
+    rows = db.query(TelegramBroadcastRecipient).filter(
+        TelegramBroadcastRecipient.broadcast_id == broadcast_id
+    ).order_by(TelegramBroadcastRecipient.id)
+    return {row.username: (row.status, row.attempts) for row in rows}
+
+
+def test_create_broadcast_resolves_chats_and_enqueues_job(db):
+    broadcast = create_broadcast(db, "Привет", [(1, "@Master1"), (2, "ghost"), (3, None)], created_by=None)
+
+    assert (broadcast.total, broadcast.sent, broadcast.failed) == (3, 0, 2)
+    chats = {row.username: row.chat_id for row in db.query(TelegramBroadcastRecipient)}
+    assert chats == {"@Master1": 1001, "ghost": None, None: None}
+    job = db.query(BackgroundJob).one()
+    assert job.job_type == SEND_BROADCAST and job.payload == {"broadcast_id": broadcast.id}
+
+
+def test_create_broadcast_without_reachable_recipients_completes_at_once(db):
+    broadcast = create_broadcast(db, "Привет", [(1, "ghost")])
+
+    assert broadcast.status == "completed"
+    assert db.query(BackgroundJob).count() == 0
+
+
+def test_run_handles_throttling_retries_and_blocked_chats(db):
+    broadcast = create_broadcast(db, "Привет", [(i, f"master{i}") for i in range(1, 6)])
+    api = FakeApi(failures={
+        1002: [TelegramApiError("sendMessage", "Too Many Requests", error_code=429, retry_after=0.05)],
+        1003: [TelegramApiError("sendMessage", "Forbidden: bot was blocked by the user", error_code=403)],
+        1004: [TelegramApiError("sendMessage", "Bad Gateway", error_code=502)],
+        1005: [TelegramApiError("sendMessage", "Bad Gateway", error_code=502)] * 2,
+    })
+    engine = make_engine(api)
+
+    assert asyncio.run(engine.run(db, broadcast.id)) is True
+
+    db.refresh(broadcast)
+    assert (broadcast.status, broadcast.sent, broadcast.failed) == ("completed", 3, 2)
+    assert recipient_statuses(db, broadcast.id) == {
+        "master1": ("sent", 1),
+        "master2": ("sent", 1),  # 429 не расходует попытку
+        "master3": ("failed", 1),  # 403 не повторяется
+        "master4": ("sent", 2),
+        "master5": ("failed", 2),
+    }
+    assert sorted(api.sent) == [1001, 1002, 1004]
+    assert db.query(TelegramUser).filter(TelegramUser.telegram_id == 1003).one().is_active is False
+
+
+def test_run_resumes_after_worker_crash_without_duplicates(db):
+    broadcast = create_broadcast(db, "Привет", [(i, f"master{i}") for i in range(1, 6)])
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(make_engine(FakeApi(crash_after=2)).run(db, broadcast.id))
+    db.rollback()
+    db.refresh(broadcast)
+    assert (broadcast.status, broadcast.sent) == ("running", 2)  # Первая пачка сохранена
+
+    api = FakeApi()
+    assert asyncio.run(make_engine(api).run(db, broadcast.id)) is True
+    assert api.sent == [1003, 1004, 1005]
+    db.refresh(broadcast)
+    assert (broadcast.status, broadcast.sent, broadcast.failed) == ("completed", 5, 0)
+
+
+def test_run_stops_at_deadline_and_after_cancel(db):
+    broadcast = create_broadcast(db, "Привет", [(i, f"master{i}") for i in range(1, 6)])
+    engine = make_engine(FakeApi())
+
+    assert asyncio.run(engine.run(db, broadcast.id, deadline=time.monotonic())) is False
+    db.refresh(broadcast)
+    assert (broadcast.status, broadcast.sent) == ("running", 0)
+
+    cancel_broadcast(db, broadcast.id)
+    api = FakeApi()
+    assert asyncio.run(make_engine(api).run(db, broadcast.id)) is True
+    assert api.sent == []
+
+
+def test_token_bucket_paces_calls_and_pauses():
+    async def scenario():
+        bucket = TokenBucket(rate=100)
+        started = time.monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        paced = time.monotonic() - started
+
+        bucket.pause(0.1)
+        started = time.monotonic()
+        await bucket.acquire()
+        return paced, time.monotonic() - started
+
+    paced, paused = asyncio.run(scenario())
+    assert paced >= 0.045  # 5 интервалов по 10 мс после первого токена
+    assert paused >= 0.09
@@ -0,0 +1,167 @@
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from models import TelegramMessage, TelegramMessageArchive, TelegramUser, User
+from services import telegram_updates
+from services.telegram_chat_service import TelegramChatService
+from services.telegram_directory import chat_directory
+from services.telegram_updates import ingest_updates
+
+
+class NullProducer:
+    def publish_batch(self, events):
+        return {"success": len(events), "failed": 0}
+
+
+@pytest.fixture
+def db(sqlite_sessions, monkeypatch):
+    monkeypatch.setattr(telegram_updates, "kafka_producer", NullProducer())
+    chat_directory.clear()
+    session = sqlite_sessions([User, TelegramUser, TelegramMessage, TelegramMessageArchive], memory=True)()
+    yield session
+    session.close()
+    chat_directory.clear()
+
+
+def update(update_id, user_id, date):
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": date, "text": f"#{update_id}",
+        "chat": {"id": user_id, "type": "private"}, "from": {"id": user_id, "is_bot": False, "username": f"u{user_id}"},
+    }}
+
+
+def user_state(db, telegram_id):
+    user = db.query(TelegramUser).filter(TelegramUser.telegram_id == telegram_id).one()
+    db.refresh(user)
+    return user
+
+
+def test_ingest_and_mark_read_keep_counters_in_sync(db):
+    ingest_updates(db, [update(1, 501, 1700000100), update(2, 501, 1700000200), update(3, 502, 1700000050)])
+    ingest_updates(db, [update(2, 501, 1700000200)])  # Повторная доставка не увеличивает счетчик
+
+    user = user_state(db, 501)
+    assert user.unread_count == 2
+    assert user.last_message_at.replace(tzinfo=timezone.utc) == datetime.fromtimestamp(1700000200, timezone.utc)
+
+    service = TelegramChatService(db)
+    assert service.mark_read(user.id) == 2
+    assert user_state(db, 501).unread_count == 0
+    assert service.mark_read(user.id) == 0
+
+    # Запоздавшее старое сообщение не сдвигает время последней активности назад
+    ingest_updates(db, [update(4, 501, 1700000000)])
+    user = user_state(db, 501)
+    assert user.unread_count == 1
+    assert user.last_message_at.replace(tzinfo=timezone.utc) == datetime.fromtimestamp(1700000200, timezone.utc)
+
+
+def test_recount_unread_rebuilds_counters(db):
+    ingest_updates(db, [update(1, 501, 1700000100), update(2, 502, 1700000200)])
+    db.query(TelegramUser).update({"unread_count": 7, "last_message_at": None})
+    db.commit()
+
+    assert TelegramChatService(db).recount_unread() == 2
+    assert [(u.telegram_id, u.unread_count) for u in db.query(TelegramUser).order_by(TelegramUser.telegram_id)] == [
+        (501, 1), (502, 1),
+    ]
+    assert user_state(db, 502).last_message_at is not None
+
+
+def test_conversations_are_paged_by_last_activity(db):
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for index in range(5):
+        db.add(TelegramUser(
+            telegram_id=600 + index, username=f"user{index}", unread_count=index % 2,
+            # Два пользователя с одинаковым временем: порядок определяет id
+            last_message_at=base + timedelta(minutes=min(index, 3)),
+        ))
+    db.add(TelegramUser(telegram_id=700, username="silent"))
+    db.commit()
+    service = TelegramChatService(db)
+
+    pages = []
+    page = service.list_conversations(limit=2)
+    pages.append([c["telegram_id"] for c in page["conversations"]])
+    while page["next_before_id"] is not None:
+        page = service.list_conversations(limit=2, before_at=page["next_before_at"], before_id=page["next_before_id"])
+        pages.append([c["telegram_id"] for c in page["conversations"]])
+
+    assert pages == [[604, 603], [602, 601], [600]]
+    unread = service.list_conversations(unread_only=True)["conversations"]
+    assert [c["telegram_id"] for c in unread] == [603, 601]
+
+
+def seed_history(db):
+    """Сообщения 1-4 старше 90 дней (3 и 4 - в одну секунду), 6 и 7 - непрочитанные"""
+    user = TelegramUser(telegram_id=800, username="history")
+    db.add(user)
+    db.flush()
+    now = datetime.now(timezone.utc)
+    ages = {1: 170, 2: 140, 3: 110, 4: 110, 5: 2, 6: 1, 7: 0}
+    for message_id, days in ages.items():
+        db.add(TelegramMessage(
+            id=message_id, telegram_user_id=user.id, message_text=f"#{message_id}",
+            is_read=message_id < 6, is_from_bot=message_id == 3,
+            created_at=now - timedelta(days=days),
+        ))
+    db.commit()
+    return user
+
+
+def page_ids(page):
+    return [message["id"] for message in page["messages"]]
+
+
+def test_history_pages_backward_and_forward(db):
+    user = seed_history(db)
+    service = TelegramChatService(db)
+
+    first = service.get_history(user.id, limit=3)
+    assert page_ids(first) == [7, 6, 5] and first["has_more"]
+    second = service.get_history(user.id, limit=3, before_id=5)
+    assert page_ids(second) == [4, 3, 2] and second["has_more"]
+    assert page_ids(service.get_history(user.id, limit=3, before_id=2)) == [1]
+
+    newer = service.get_history(user.id, limit=2, after_id=3)
+    assert page_ids(newer) == [5, 4] and newer["has_more"]
+
+    with pytest.raises(ValueError):
+        service.get_history(user.id, before_id=999)
+
+
+def test_archive_moves_old_read_messages_and_history_spans_both_tables(db):
+    user = seed_history(db)
+    db.add(TelegramMessage(
+        id=8, telegram_user_id=user.id, message_text="старое непрочитанное", is_read=False,
+        created_at=datetime.now(timezone.utc) - timedelta(days=300),
+    ))
+    db.commit()
+    service = TelegramChatService(db)
+
+    assert service.archive_messages(older_than_days=90, batch_size=2) == 4
+    assert sorted(id for (id,) in db.query(TelegramMessageArchive.id)) == [1, 2, 3, 4]
+    # Непрочитанное старое сообщение осталось в горячей таблице
+    assert db.get(TelegramMessage, 8) is not None
+
+    pages, before_id = [], None
+    while True:
+        page = service.get_history(user.id, limit=3, before_id=before_id)
+        pages.append(page_ids(page))
+        if not page["has_more"]:
+            break
+        before_id = pages[-1][-1]
+    assert pages == [[7, 6, 5], [4, 3, 2], [1, 8]]
+
+    db.query(TelegramMessage).filter(TelegramMessage.id != 8).delete()
+    db.commit()
+    service.recount_unread()
+    refreshed = user_state(db, 800)
+    assert refreshed.unread_count == 1
+    assert refreshed.last_message_at is not None
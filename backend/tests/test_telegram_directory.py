@@ -0,0 +1,83 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from models import TelegramMessage, TelegramUser, User
+from services import telegram_bot_service
+from services.telegram_api import TelegramApiError
+from services.telegram_bot_service import TelegramBotService
+from services.telegram_directory import ChatIdDirectory
+
+
+@pytest.fixture
+def db(sqlite_sessions):
+    session = sqlite_sessions([User, TelegramUser, TelegramMessage], memory=True)()
+    session.add_all([
+        TelegramUser(telegram_id=1001, username="Ivan_Master"),
+        TelegramUser(telegram_id=1002, username="petr", is_active=False),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_resolve_is_case_insensitive_and_cached(db):
+    directory = ChatIdDirectory()
+
+    assert directory.resolve(db, "@ivan_master") == 1001
+    db.query(TelegramUser).delete()
+    db.commit()
+    # Найденный chat_id берется из памяти
+    assert directory.resolve(db, "IVAN_MASTER") == 1001
+
+
+def test_negative_cache_until_user_writes_to_bot(db):
+    directory = ChatIdDirectory(negative_ttl=60)
+
+    assert directory.resolve_many(db, ["ghost", "petr", "ivan_master"]) == {"ivan_master": 1001}
+
+    db.add(TelegramUser(telegram_id=1003, username="ghost"))
+    db.commit()
+    assert directory.resolve(db, "ghost") is None  # Негативный кэш
+
+    directory.remember("ghost", 1003)
+    assert directory.resolve(db, "ghost") == 1003
+
+
+class FakeApi:
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+
+    async def call(self, method, params=None, timeout=None):
+        self.calls.append((method, params))
+        if self.error:
+            raise self.error
+        return {"message_id": 1}
+
+
+def test_send_to_user_is_single_call(db, monkeypatch):
+    monkeypatch.setattr(telegram_bot_service, "chat_directory", ChatIdDirectory())
+    service = TelegramBotService(db)
+    service.api = FakeApi()
+
+    assert asyncio.run(service._send_message_to_user("@Ivan_Master", "Привет"))
+    assert [method for method, _ in service.api.calls] == ["sendMessage"]
+    assert service.api.calls[0][1]["chat_id"] == 1001
+
+    assert not asyncio.run(service._send_message_to_user("unknown", "Привет"))
+    assert len(service.api.calls) == 1
+
+
+def test_blocked_bot_deactivates_chat(db, monkeypatch):
+    monkeypatch.setattr(telegram_bot_service, "chat_directory", ChatIdDirectory())
+    service = TelegramBotService(db)
+    service.api = FakeApi(TelegramApiError("sendMessage", "Forbidden: bot was blocked by the user", 403))
+
+    assert not asyncio.run(service._send_message_to_user("ivan_master", "Привет"))
+    assert db.query(TelegramUser).filter_by(telegram_id=1001).one().is_active is False
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from models import TelegramMessage, TelegramPollingOffset, TelegramUser, User
+from services import telegram_updates
+from services.telegram_api import TelegramConfig
+from services.telegram_directory import chat_directory
+from services.telegram_updates import TelegramUpdatePoller, ingest_updates, parse_updates
+
+
+class RecordingProducer:
+    def __init__(self):
+        self.batches = []
+
+    def publish_batch(self, events):
+        self.batches.append(events)
+        return {"success": len(events), "failed": 0}
+
+
+class FakeApi:
+    """getUpdates, отдающий обновления начиная с offset"""
+
+    def __init__(self, updates):
+        self.updates = updates
+        self.offsets = []
+
+    async def call(self, method, params=None, timeout=None):
+        assert method == "getUpdates"
+        self.offsets.append(params["offset"])
+        return [update for update in self.updates if update["update_id"] >= params["offset"]][:params["limit"]]
+
+
+def update(update_id, user_id, text="Привет", username=None, chat_type="private", **extra):
+    message = {
+        "message_id": update_id * 10,
+        "date": 1700000000 + update_id,
+        "chat": {"id": user_id, "type": chat_type},
+        "from": {"id": user_id, "is_bot": False, "first_name": "Иван", "username": username},
+        **extra,
+    }
+    if text is not None:
+        message["text"] = text
+    return {"update_id": update_id, "message": message}
+
+
+@pytest.fixture
+def producer(monkeypatch):
+    producer = RecordingProducer()
+    monkeypatch.setattr(telegram_updates, "kafka_producer", producer)
+    return producer
+
+
+@pytest.fixture
+def session_factory(sqlite_sessions):
+    chat_directory.clear()
+    yield sqlite_sessions([User, TelegramUser, TelegramMessage, TelegramPollingOffset], memory=True)
+    chat_directory.clear()
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+def test_parse_updates_skips_groups_and_describes_media():
+    users, messages = parse_updates([
+        update(1, 501, username="ivan"),
+        update(2, 502, chat_type="group"),
+        update(3, 501, text=None, photo=[{"file_id": "x"}], caption="Фото поломки"),
+        update(4, 501, text=None, voice={"file_id": "y"}),
+        {"update_id": 5, "edited_message": {}},
+    ])
+
+    assert list(users) == [501]
+    assert [(m["update_id"], m["message_type"], m["message_text"]) for m in messages] == [
+        (1, "text", "Привет"), (3, "photo", "Фото поломки"), (4, "voice", "[voice]"),
+    ]
+
+
+def test_ingest_upserts_users_and_skips_redelivered_updates(db, producer):
+    db.add(TelegramUser(telegram_id=501, username="old_name", is_active=False))
+    db.commit()
+
+    assert ingest_updates(db, [update(1, 501, username="Ivan"), update(2, 502, username="petr")]) == 2
+    # Повторная доставка того же обновления вместе с новым
+    assert ingest_updates(db, [update(2, 502, username="petr"), update(3, 502, "Еще", username="petr")]) == 1
+
+    users = {user.telegram_id: user for user in db.query(TelegramUser)}
+    assert len(users) == 2
+    assert (users[501].username, users[501].is_active) == ("Ivan", True)
+    assert [m.update_id for m in db.query(TelegramMessage).order_by(TelegramMessage.update_id)] == [1, 2, 3]
+    assert chat_directory.resolve(db, "ivan") == 501
+
+    published = [event for batch in producer.batches for _, event, _ in batch]
+    assert [(event.telegram_id, event.preview) for event in published] == [(501, "Привет"), (502, "Привет"), (502, "Еще")]
+    assert producer.batches[0][0][2] == str(users[501].id)
+
+
+def test_poller_persists_offset_and_resumes(session_factory, db, producer):
+    config = TelegramConfig(bot_token="123:abc", poll_limit=2)
+    api = FakeApi([update(i, 500 + i % 2) for i in range(10, 15)])
+    poller = TelegramUpdatePoller(session_factory, api=api, config=config)
+
+    assert asyncio.run(poller.poll_once(timeout=0)) == 2
+    assert asyncio.run(poller.poll_once(timeout=0)) == 2
+
+    # Новый poller (перезапуск процесса) продолжает с сохраненного offset
+    restarted = TelegramUpdatePoller(session_factory, api=api, config=config)
+    assert asyncio.run(restarted.poll_once(timeout=0)) == 1
+    assert asyncio.run(restarted.poll_once(timeout=0)) == 0
+
+    assert api.offsets == [0, 12, 14, 15]
+    assert db.get(TelegramPollingOffset, 123).next_update_id == 15
+    assert db.query(TelegramMessage).count() == 5
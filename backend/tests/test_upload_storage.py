@@ -0,0 +1,76 @@
+import asyncio
+import hashlib
+import io
+import os
+import sys
+
+import pytest
+from fastapi import UploadFile
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.upload_storage import UploadTooLargeError, UploadTypeError, save_upload, sniff_mime_type
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 200_000
+
+
+class EndlessFile(io.RawIOBase):
+    """Бесконечная загрузка: считает прочитанные байты и размер самой большой части"""
+
+    def __init__(self, head: bytes = b"%PDF-1.7\n"):
+        self.head = head
+        self.read_total = 0
+        self.largest_read = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            raise AssertionError("Загрузка читается целиком")
+        chunk = (self.head + b"x" * size)[:size] if self.read_total == 0 else b"x" * size
+        self.read_total += len(chunk)
+        self.largest_read = max(self.largest_read, len(chunk))
+        return chunk
+
+
+def test_upload_is_stored_with_hash_and_sniffed_type(tmp_path):
+    destination = tmp_path / "avatar.png"
+    stored = asyncio.run(save_upload(UploadFile("avatar.png", io.BytesIO(PNG)), destination, max_size=len(PNG),
+                                     chunk_size=4096))
+
+    assert destination.read_bytes() == PNG
+    assert (stored.size, stored.sha256, stored.mime_type) == (len(PNG), hashlib.sha256(PNG).hexdigest(), "image/png")
+    # Временные файлы не остаются
+    assert os.listdir(tmp_path) == ["avatar.png"]
+
+
+def test_oversized_upload_is_aborted_without_reading_everything(tmp_path):
+    source = EndlessFile()
+
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(save_upload(UploadFile("doc.pdf", source), tmp_path / "doc.pdf", max_size=1_000_000,
+                                chunk_size=64 * 1024))
+
+    assert source.largest_read == 64 * 1024
+    assert source.read_total <= 1_000_000 + 64 * 1024
+    assert os.listdir(tmp_path) == []
+
+
+def test_content_type_is_checked_on_first_chunk(tmp_path):
+    source = EndlessFile(head=b"MZ\x90\x00")
+
+    with pytest.raises(UploadTypeError):
+        asyncio.run(save_upload(UploadFile("avatar.png", source), tmp_path / "avatar.png", max_size=10**9,
+                                allowed_mime_types={"image/png", "image/jpeg"}))
+
+    assert source.read_total == 64 * 1024
+    assert os.listdir(tmp_path) == []
+
+
+def test_sniff_mime_type():
+    assert sniff_mime_type(b"\xff\xd8\xff\xe0\x00\x10JFIF") == "image/jpeg"
+    assert sniff_mime_type(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "image/webp"
+    assert sniff_mime_type(b"PK\x03\x04\x14\x00", "Диплом.DOCX").endswith("wordprocessingml.document")
+    assert sniff_mime_type(b"plain text") is None
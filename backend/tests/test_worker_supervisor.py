@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from kafka_events.kafka_config import kafka_config
+from kafka_events.kafka_events import EventType, RequestUpdatedEvent
+from kafka_events.kafka_producer import KafkaEventProducer
+from kafka_events.supervisor import WorkerSupervisor
+from kafka_events.transport import InMemoryConsumerTransport, InMemoryEventLog, InMemoryProducerTransport
+from services.notification_service_consumer import NotificationServiceConsumer
+
+MARKER_DIR = None
+
+
+def _crash_once_worker(worker_index):
+    # Первый запуск падает, перезапущенный воркер работает до SIGTERM
+    marker = os.path.join(MARKER_DIR, f"worker-{worker_index}")
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        sys.exit(1)
+    while True:
+        time.sleep(0.05)
+
+
+def _wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_supervisor_restarts_crashed_workers_and_stops(tmp_path):
+    global MARKER_DIR
+    MARKER_DIR = str(tmp_path)
+    supervisor = WorkerSupervisor(
+        _crash_once_worker, workers=2, shutdown_timeout=5, restart_backoff=0.05, start_method="fork"
+    )
+    supervisor.start()
+    try:
+        def restarted():
+            supervisor.check_workers()
+            return all(s["restarts"] == 1 and s["alive"] for s in supervisor.status().values())
+        assert _wait_for(restarted)
+    finally:
+        supervisor.stop()
+
+    # SIGTERM завершает воркеры без принудительного SIGKILL
+    assert [slot.process.exitcode for slot in supervisor.slots] == [-15, -15]
+
+
+class _Session:
+    def __init__(self, registry):
+        self.closed = False
+        registry.append(self)
+
+    def close(self):
+        self.closed = True
+
+
+def test_notification_consumer_uses_session_per_batch(monkeypatch):
+    monkeypatch.setattr(kafka_config, "dedup_enabled", False)
+    log = InMemoryEventLog()
+    producer = KafkaEventProducer(transport=InMemoryProducerTransport(log))
+    sessions, seen = [], []
+    service = NotificationServiceConsumer(
+        transport=InMemoryConsumerTransport("notification-service", ["request-events"], log),
+        session_factory=lambda: _Session(sessions),
+    )
+    service.consumer.register_handler(EventType.REQUEST_UPDATED, lambda data: seen.append(service.db) or True)
+
+    for batch in range(2):
+        for _ in range(3):
+            producer.publish_event("request-events", RequestUpdatedEvent(
+                request_id=batch, customer_id=1, updated_fields={}, updated_by=1,
+            ))
+        assert service.consumer.poll_once(timeout_ms=0) == 3
+
+    assert len(sessions) == 2 and all(s.closed for s in sessions)
+    assert seen == [sessions[0]] * 3 + [sessions[1]] * 3
+    assert service.db is None
+    service.loop.close()
@@ -74,10 +74,17 @@ interface VerifiedContractor {
 }
 
 interface BulkNotificationResult {
-  total: number;
-  successful: number;
-  failed: number;
-  errors: string[];
+  message: string;
+  results: {
+    success: boolean;
+    error?: string;
+    id?: number;
+    status?: string;
+    total?: number;
+    sent?: number;
+    failed?: number;
+    pending?: number;
+  };
 }
 
 const TelegramBotPage: React.FC = () => {
@@ -194,8 +201,12 @@ const TelegramBotPage: React.FC = () => {
       setBulkNotificationDialogOpen(false);
       setBulkMessage('');
       setSelectedContractors([]);
+      if (!result.results.success) {
+        setError(result.results.error || 'Ошибка массовой отправки');
+        return;
+      }
       setSuccess(
-        `Массовая отправка завершена: ${result.successful}/${result.total} успешно`,
+        `Рассылка #${result.results.id} запущена: ${result.results.pending} из ${result.results.total} получателей в очереди`,
       );
     } catch (err: any) {
       setError(err.response?.data?.detail || 'Ошибка массовой отправки');
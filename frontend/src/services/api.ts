@@ -884,8 +884,14 @@ class ApiService {
   }
 
   // Методы для работы с Telegram чатом
-  async getChatHistory(telegramUserId: number): Promise<any> {
-    const response: AxiosResponse<any> = await this.api.get(`/api/v1/telegram-chat/chat-history/${telegramUserId}`);
+  async getChatHistory(
+    telegramUserId: number,
+    params?: { limit?: number; before_id?: number; after_id?: number },
+  ): Promise<any> {
+    const response: AxiosResponse<any> = await this.api.get(
+      `/api/v1/telegram-chat/chat-history/${telegramUserId}`,
+      { params },
+    );
     return response.data;
   }
 
@@ -898,6 +904,16 @@ class ApiService {
     return response.data;
   }
 
+  async getTelegramConversations(params?: {
+    limit?: number;
+    before_at?: string;
+    before_id?: number;
+    unread_only?: boolean;
+  }): Promise<any> {
+    const response: AxiosResponse<any> = await this.api.get('/api/v1/telegram-chat/conversations', { params });
+    return response.data;
+  }
+
   // Manager verification methods
   async verifyContractorByManager(contractorId: number, notes: string): Promise<any> {
     const response = await this.api.put(
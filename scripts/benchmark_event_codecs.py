@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Сравнение форматов сериализации событий Kafka (json vs msgpack)
+
+Для каждого зарегистрированного типа события печатает размер значения записи
+и среднее время кодирования/декодирования.
+
+    python scripts/benchmark_event_codecs.py --iterations 20000
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+# Добавляем путь к проекту
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from kafka_events.serialization import decode_value, encode_event, schema_registry
+
+# Типичные значения полей для построения примеров событий
+SAMPLE_VALUES: Dict[str, Any] = {
+    "request_id": 12345,
+    "customer_id": 678,
+    "contractor_id": 910,
+    "manager_id": 42,
+    "user_id": 1001,
+    "recipient_id": 910,
+    "assigned_by": 42,
+    "updated_by": 42,
+    "cancelled_by": 678,
+    "verified_by": 7,
+    "assigned_by_user_id": 42,
+    "changed_by_user_id": 42,
+    "title": "Ремонт гидравлики экскаватора CAT 320",
+    "description": "Течь гидравлической жидкости в районе стрелы, требуется диагностика",
+    "urgency": "high",
+    "region": "Свердловская область",
+    "city": "Екатеринбург",
+    "address": "ул. Промышленная, 15",
+    "equipment_type": "Экскаватор",
+    "equipment_brand": "Caterpillar",
+    "user_role": "manager",
+    "changed_by_role": "manager",
+    "previous_status": "sent_to_contractors",
+    "old_status": "manager_review",
+    "new_status": "assigned",
+    "from_status": "sent_to_contractors",
+    "to_status": "assigned",
+    "occurred_at": datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc),
+    "updated_fields": {"status": "assigned", "estimated_cost": 150000},
+    "completion_data": {"final_price": 145000, "completed_at": "2024-05-01T12:00:00+00:00"},
+    "cancellation_reason": "Заказчик отменил работы",
+    "recipient_telegram_username": "contractor_user",
+    "recipient_email": "manager@example.com",
+    "message_type": "assignment",
+    "message_content": "Вам назначена заявка #12345",
+    "message_id": 5021,
+    "telegram_user_id": 910,
+    "telegram_id": 123456789,
+    "preview": "Добрый день, когда приедет мастер?",
+    "received_at": datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc),
+    "subject": "Новая заявка #12345",
+    "verification_type": "documents",
+    "verification_result": "approved",
+    "action": "assign_contractor",
+    "action_name": "open_request",
+    "action_category": "workflow",
+    "resource_type": "request",
+    "ip_address": "192.168.1.100",
+    "user_agent": "Mozilla/5.0 (X11; Linux x86_64)",
+    "success": True,
+    "page_path": "/manager/requests",
+    "source_event_type": "page_view",
+    "dimension": "/manager/requests",
+    "window_start": datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc),
+    "count": 42,
+    "unique_users": 17,
+}
+
+
+def build_sample(schema):
+    fields = {
+        name: SAMPLE_VALUES[name]
+        for name, field in schema.model.__fields__.items()
+        if name in SAMPLE_VALUES and (field.required or name in ("equipment_type", "user_agent"))
+    }
+    return schema.model(**fields)
+
+
+def measure(func, iterations: int) -> float:
+    """Среднее время вызова в микросекундах"""
+    return timeit.timeit(func, number=iterations) / iterations * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение форматов сериализации событий")
+    parser.add_argument("--iterations", type=int, default=10000)
+    args = parser.parse_args()
+
+    header = f"{'Событие':<34} {'json, B':>8} {'msgpack, B':>10} {'%':>5} " \
+             f"{'enc json':>9} {'enc mp':>8} {'dec json':>9} {'dec mp':>8}"
+    print(header)
+    print("-" * len(header))
+
+    totals = {"json": 0, "msgpack": 0}
+    for schema in schema_registry.schemas():
+        event = build_sample(schema)
+        encoded = {fmt: encode_event(event, fmt) for fmt in totals}
+        for fmt, data in encoded.items():
+            totals[fmt] += len(data)
+            assert decode_value(data)["event_id"] == event.event_id
+
+        timings = [
+            measure(lambda: encode_event(event, "json"), args.iterations),
+            measure(lambda: encode_event(event, "msgpack"), args.iterations),
+            measure(lambda: decode_value(encoded["json"]), args.iterations),
+            measure(lambda: decode_value(encoded["msgpack"]), args.iterations),
+        ]
+        ratio = len(encoded["msgpack"]) / len(encoded["json"]) * 100
+        print(
+            f"{schema.event_type:<34} {len(encoded['json']):>8} {len(encoded['msgpack']):>10} {ratio:>4.0f}% "
+            + " ".join(f"{t:>7.1f}us" for t in timings)
+        )
+
+    print("-" * len(header))
+    print(f"Итого: json {totals['json']} B, msgpack {totals['msgpack']} B "
+          f"({totals['msgpack'] / totals['json'] * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Скорость рендера шаблонов сообщений (renders/s)
+
+Сравнивает прежнее формирование текстов f-строками с реестром
+предкомпилированных шаблонов Jinja2 (services.message_templates), а также
+компиляцию шаблона на каждый вызов (Environment.from_string) - ее реестр
+исключает. Для писем сотрудникам дополнительно показан рендер на пачку
+получателей: f-строка в цикле против одного рендера с общим контекстом.
+
+    python scripts/benchmark_message_templates.py --iterations 20000 --recipients 25
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime
+from types import SimpleNamespace
+
+# Добавляем путь к проекту
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from services.message_templates import MessageTemplateRegistry
+
+REQUEST = SimpleNamespace(
+    id=12345,
+    equipment_type="Экскаватор",
+    equipment_brand="Caterpillar",
+    address="ул. Промышленная, 15",
+    region="Свердловская область",
+    problem_description="Течь гидравлической жидкости в районе стрелы, требуется диагностика",
+    description="Ремонт гидравлики экскаватора CAT 320",
+    preferred_date=datetime(2024, 5, 1, 12, 0),
+    clarification_details=None,
+)
+CONTRACTOR = {
+    "contractor_name": "Иван Петров",
+    "contractor_email": "ivan@example.com",
+    "contractor_phone": "+7 900 000-00-00",
+    "verification_url": "http://91.222.236.58:3000/security-verification/42",
+}
+
+
+def legacy_request_message(request) -> str:
+    """Прежний TelegramBotService._format_request_message"""
+    return f"""
+🔧 **НОВАЯ ЗАЯВКА НА СЕРВИС**
+
+📋 **Заявка #{request.id}**
+🏢 **Компания:** [Скрыто]
+🔧 **Тип оборудования:** {request.equipment_type or 'Не указано'}
+🏭 **Бренд:** {request.equipment_brand or 'Не указан'}
+📍 **Местоположение:** {request.address or 'Не указано'}
+🌍 **Регион:** {request.region or 'Не указан'}
+
+📝 **Описание проблемы:**
+{request.problem_description or request.description}
+
+⏰ **Предпочтительная дата:** {request.preferred_date.strftime('%d.%m.%Y %H:%M') if request.preferred_date else 'Не указана'}
+⚡ **Срочность:** Высокая
+🎯 **Приоритет:** Обычный
+
+💬 **Уточнения менеджера:**
+{request.clarification_details or 'Нет уточнений'}
+
+💰 **Примерная стоимость:** [Уточняется менеджером]
+
+---
+👥 **Откликнуться могут только проверенные исполнители**
+📞 **Для отклика обратитесь к менеджеру**
+"""
+
+
+def legacy_security_notice(contractor_name, contractor_email, contractor_phone, verification_url) -> str:
+    """Прежнее письмо СБ о новом исполнителе (send_verification_notification_to_security)"""
+    return f"""
+                <html>
+                <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+                    <div style="max-width: 600px; margin: 0 auto; padding: 20px;">
+                        <h2 style="color: #1976d2;">Новый исполнитель ожидает проверки СБ</h2>
+                        <p>В системе появился новый исполнитель, который заполнил профиль и готов к проверке службой безопасности.</p>
+                        <div style="background: #f5f5f5; padding: 15px; border-radius: 5px; margin: 20px 0;">
+                            <p><strong>Исполнитель:</strong> {contractor_name}</p>
+                            <p><strong>Email:</strong> {contractor_email}</p>
+                            <p><strong>Телефон:</strong> {contractor_phone or 'не указан'}</p>
+                        </div>
+                        <p style="margin-top: 30px;">
+                            <a href="{verification_url}" style="background: #1976d2; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block;">
+                                Перейти к проверке
+                            </a>
+                        </p>
+                        <p style="color: #666; font-size: 12px; margin-top: 30px;">
+                            Если кнопка не работает, скопируйте ссылку: {verification_url}
+                        </p>
+                    </div>
+                </body>
+                </html>
+                """
+
+
+def measure(func, iterations: int) -> float:
+    """Вызовов в секунду"""
+    return iterations / timeit.timeit(func, number=iterations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Скорость рендера шаблонов сообщений")
+    parser.add_argument("--iterations", type=int, default=10000)
+    parser.add_argument("--recipients", type=int, default=25, help="Получателей в пачке писем сотрудникам")
+    args = parser.parse_args()
+
+    registry = MessageTemplateRegistry()
+    registry.load()
+    request_context = {"request": REQUEST, "urgency_text": "Высокая", "priority_text": "Обычный"}
+    request_source = registry.env.loader.get_source(registry.env, "ru/telegram/request_published.md")[0]
+
+    cases = [
+        ("telegram/request_published.md", [
+            ("f-строка", lambda: legacy_request_message(REQUEST)),
+            ("компиляция на вызов", lambda: registry.env.from_string(request_source).render(request_context)),
+            ("реестр", lambda: registry.render("telegram/request_published.md", **request_context)),
+        ]),
+        ("email/contractor_pending_security.html", [
+            ("f-строка", lambda: legacy_security_notice(**CONTRACTOR)),
+            ("реестр", lambda: registry.render("email/contractor_pending_security.html", **CONTRACTOR)),
+        ]),
+        (f"пачка из {args.recipients} писем сотрудникам", [
+            ("f-строка на получателя", lambda: [legacy_security_notice(**CONTRACTOR) for _ in range(args.recipients)]),
+            ("render_many", lambda: registry.render_many(
+                "email/contractor_pending_security.html", [{}] * args.recipients, shared=CONTRACTOR
+            )),
+            ("один рендер на пачку", lambda: registry.render("email/contractor_pending_security.html", **CONTRACTOR)),
+        ]),
+    ]
+
+    header = f"{'Шаблон / способ':<50} {'renders/s':>12} {'x f-строка':>11}"
+    print(header)
+    print("-" * len(header))
+    for title, variants in cases:
+        print(title)
+        # Компиляция на вызов на порядки медленнее - меряем на меньшем числе итераций
+        baseline = None
+        for name, func in variants:
+            iterations = args.iterations // 20 if name == "компиляция на вызов" else args.iterations
+            rate = measure(func, max(iterations, 1))
+            baseline = baseline or rate
+            print(f"  {name:<48} {rate:>12,.0f} {rate / baseline:>10.3f}x")
+
+
+if __name__ == "__main__":
+    main()
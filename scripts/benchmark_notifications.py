@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Пропускная способность отправки уведомлений на локальных заменителях
+
+Гоняет пути отправки через заменители из notification_standins.py (реальные
+mail.ru и Telegram не используются) и печатает пропускную способность,
+перцентили задержки и разбивку ошибок:
+
+- smtp - PythonEmailService.deliver через пул SMTP соединений (потоки, как в
+  воркере фоновых задач) против SmtpSink;
+- email-api - APIEmailService.send_email против FakeEmailApi (SendGrid и
+  Resend, переключение при отказах);
+- telegram - TelegramBotService (sendMessage через общую сессию Bot API)
+  против FakeTelegramApi с лимитами и ответами 429;
+- consumer - NotificationServiceConsumer: разбор накопленных событий
+  назначения исполнителя (in-memory транспорт, SQLite в памяти) с отправкой
+  уведомлений в FakeTelegramApi.
+
+Нагрузка открытая: запросы стартуют с частотой --rate независимо от ответов
+(0 - без ограничения), не более --concurrency одновременно. Задержка
+считается от запланированного времени старта, поэтому ожидание свободного
+слота при перегрузке в нее входит. Для consumer задается только объем
+очереди (--count): он разбирает ее с максимальной скоростью.
+
+    python scripts/benchmark_notifications.py --path all --count 2000 --rate 500 --concurrency 8
+    python scripts/benchmark_notifications.py --path telegram --rate 50 --chats 20 --telegram-rate 30
+    python scripts/benchmark_notifications.py --path email-api --fail-rate 0.2 --latency-ms 20
+"""
+import argparse
+import asyncio
+import os
+import smtplib
+import statistics
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, List, Optional
+
+# Добавляем путь к проекту
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from notification_standins import FakeEmailApi, FakeTelegramApi, SmtpSink, start_app
+
+PATHS = ("smtp", "email-api", "telegram", "consumer")
+HTML = "<p>Новая заявка #{index}: ремонт гидравлики экскаватора CAT 320</p>"
+TEXT = "Новая заявка #{index}: ремонт гидравлики экскаватора CAT 320"
+
+
+class LoadResult:
+    """Итоги прогона одного пути"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.latencies: List[float] = []
+        self.outcomes: Counter = Counter()
+        self.elapsed = 0.0
+        self.standin: Counter = Counter()
+
+    def record(self, latency: float, outcome: str):
+        self.latencies.append(latency)
+        self.outcomes[outcome] += 1
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        if len(self.latencies) == 1:
+            return self.latencies[0]
+        return statistics.quantiles(self.latencies, n=100, method="inclusive")[q - 1]
+
+    def row(self) -> str:
+        ok = self.outcomes["ok"]
+        total = sum(self.outcomes.values())
+        throughput = ok / self.elapsed if self.elapsed else 0.0
+        return (
+            f"{self.path:<10} {total:>7} {ok:>7} {total - ok:>7} {throughput:>10,.1f} "
+            f"{self.percentile(50) * 1000:>8.1f} {self.percentile(95) * 1000:>8.1f} {self.percentile(99) * 1000:>8.1f}"
+        )
+
+
+def classify(error: BaseException) -> str:
+    """Вид ошибки для отчета"""
+    from services.telegram_api import TelegramApiError
+
+    if isinstance(error, TelegramApiError):
+        return f"telegram {error.error_code or error.description}"
+    if isinstance(error, smtplib.SMTPResponseException):
+        return f"smtp {error.smtp_code}"
+    return type(error).__name__
+
+
+async def drive(result: LoadResult, send: Callable[[int], Awaitable[Optional[str]]], count: int, rate: float,
+                concurrency: int):
+    """Открытая нагрузка: count вызовов send с частотой rate, не более concurrency одновременно"""
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+
+    async def run(index: int, scheduled: float):
+        async with semaphore:
+            try:
+                outcome = await send(index) or "ok"
+            except Exception as e:
+                outcome = classify(e)
+        result.record(time.perf_counter() - scheduled, outcome)
+
+    tasks = []
+    for index in range(count):
+        scheduled = started + index / rate if rate else time.perf_counter()
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(run(index, scheduled)))
+    await asyncio.gather(*tasks)
+    result.elapsed = time.perf_counter() - started
+
+
+async def bench_smtp(args) -> LoadResult:
+    from services.python_email_service import PythonEmailService
+
+    sink = SmtpSink(latency_seconds=args.latency_ms / 1000, fail_rate=args.fail_rate)
+    os.environ["MAIL_PORT"] = str(await sink.start())
+    service = PythonEmailService()
+    executor = ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="smtp")
+    loop = asyncio.get_running_loop()
+
+    async def send(index: int):
+        await loop.run_in_executor(
+            executor, service.deliver, f"manager{index}@example.com", f"Заявка #{index}",
+            HTML.format(index=index), TEXT.format(index=index),
+        )
+
+    result = LoadResult("smtp")
+    try:
+        await drive(result, send, args.count, args.rate, args.concurrency)
+    finally:
+        await loop.run_in_executor(executor, service.close)
+        executor.shutdown()
+        await sink.stop()
+    result.standin = Counter(sink.stats)
+    return result
+
+
+async def bench_email_api(args) -> LoadResult:
+    from services.api_email_service import APIEmailConfig, APIEmailService, ResendProvider, SendGridProvider
+
+    fake = FakeEmailApi(latency_seconds=args.latency_ms / 1000, fail_rate=args.fail_rate)
+    runner, url = await start_app(fake.app())
+    service = APIEmailService(APIEmailConfig(connection_limit=args.concurrency), providers=[
+        SendGridProvider("standin", api_url=f"{url}/v3/mail/send"),
+        ResendProvider("standin", api_url=url),
+    ])
+
+    async def send(index: int):
+        sent = await service.send_email(
+            f"manager{index}@example.com", f"Заявка #{index}", HTML.format(index=index), TEXT.format(index=index)
+        )
+        return "ok" if sent else "all providers failed"
+
+    result = LoadResult("email-api")
+    try:
+        await drive(result, send, args.count, args.rate, args.concurrency)
+    finally:
+        await service.close()
+        await runner.cleanup()
+    result.standin = Counter(fake.stats)
+    return result
+
+
+async def bench_telegram(args, fake: FakeTelegramApi) -> LoadResult:
+    from services.telegram_api import telegram_api
+    from services.telegram_bot_service import TelegramBotService
+
+    service = TelegramBotService(db=None)
+
+    async def send(index: int):
+        await service._deliver(1000 + index % args.chats, TEXT.format(index=index))
+
+    result = LoadResult("telegram")
+    try:
+        await drive(result, send, args.count, args.rate, args.concurrency)
+    finally:
+        await telegram_api.close()
+    result.standin = Counter(fake.stats)
+    return result
+
+
+def _seed_consumer_db(session_factory, count: int, chats: int):
+    """Заявки и исполнители с известными chat_id для событий назначения"""
+    from models import ContractorProfile, CustomerProfile, RepairRequest, TelegramUser, User
+
+    with session_factory() as db:
+        customer_user = User(username="customer", email="customer@example.com", hashed_password="-", role="customer")
+        manager = User(username="manager", email="manager@example.com", hashed_password="-", role="manager")
+        db.add_all([customer_user, manager])
+        db.flush()
+        customer = CustomerProfile(user_id=customer_user.id, company_name="ООО Тест", contact_person="Иван",
+                                   phone="+70000000000", email=customer_user.email)
+        db.add(customer)
+        for index in range(chats):
+            user = User(username=f"contractor{index}", email=f"contractor{index}@example.com",
+                        hashed_password="-", role="contractor")
+            db.add(user)
+            db.flush()
+            db.add(ContractorProfile(user_id=user.id, telegram_username=f"contractor{index}"))
+            db.add(TelegramUser(telegram_id=1000 + index, user_id=user.id, username=f"contractor{index}"))
+        db.flush()
+        db.add_all([
+            RepairRequest(customer_id=customer.id, title=f"Заявка {index}", description="Ремонт гидравлики")
+            for index in range(count)
+        ])
+        db.commit()
+        return manager.id
+
+
+def _drain_consumer(args) -> LoadResult:
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    from database import Base
+    from kafka_events.kafka_events import EventType, WorkflowContractorAssignedEvent
+    from kafka_events.kafka_producer import KafkaEventProducer
+    from kafka_events.transport import InMemoryConsumerTransport, InMemoryEventLog, InMemoryProducerTransport
+    from services.notification_service_consumer import NotificationServiceConsumer
+
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    # Все таблицы: заявка загружает связанные записи (отклики, исполнителей) вместе с собой
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    manager_id = _seed_consumer_db(session_factory, args.count, args.chats)
+
+    log = InMemoryEventLog()
+    producer = KafkaEventProducer(transport=InMemoryProducerTransport(log))
+    producer.publish_batch([
+        ("workflow-events", WorkflowContractorAssignedEvent(
+            request_id=index + 1, contractor_id=index % args.chats + 1, manager_id=manager_id,
+            previous_status="manager_review",
+        ), str(index + 1))
+        for index in range(args.count)
+    ])
+
+    consumer = NotificationServiceConsumer(
+        transport=InMemoryConsumerTransport("notification-service", ["request-events", "workflow-events"], log),
+        session_factory=session_factory,
+    )
+    result = LoadResult("consumer")
+    handler = consumer.consumer.event_handlers[EventType.WORKFLOW_CONTRACTOR_ASSIGNED]
+
+    def timed(event_data):
+        started = time.perf_counter()
+        success = handler(event_data)
+        result.record(time.perf_counter() - started, "ok" if success else "handler failed")
+        return success
+
+    consumer.consumer.register_handler(EventType.WORKFLOW_CONTRACTOR_ASSIGNED, timed)
+    # В процессе consumer'а это главный поток; здесь loop нужно сделать текущим для asyncio.gather
+    asyncio.set_event_loop(consumer.loop)
+    started = time.perf_counter()
+    try:
+        while consumer.consumer.poll_once(timeout_ms=0):
+            pass
+    finally:
+        consumer.loop.run_until_complete(consumer.telegram_service.api.close())
+        consumer.loop.close()
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+async def bench_consumer(args, fake: FakeTelegramApi) -> LoadResult:
+    # Consumer работает в своем event loop - в отдельном потоке, пока заменитель обслуживает запросы
+    result = await asyncio.get_running_loop().run_in_executor(None, _drain_consumer, args)
+    result.standin = Counter(fake.stats)
+    return result
+
+
+async def run(args):
+    # Telegram конфигурация читается при импорте сервисов: адрес заменителя задается заранее
+    fake_telegram = FakeTelegramApi(rate_per_second=args.telegram_rate, latency_seconds=args.latency_ms / 1000)
+    telegram_runner, telegram_url = await start_app(fake_telegram.app())
+    os.environ.update({
+        "TELEGRAM_API_URL": telegram_url,
+        "TELEGRAM_BOT_TOKEN": "standin",
+        "MAIL_SERVER": "127.0.0.1",
+        "MAIL_TLS": "false",
+        "MAIL_SSL": "false",
+        "MAIL_USERNAME": "standin",
+        "MAIL_PASSWORD": "standin",
+        "MAIL_POOL_SIZE": str(args.concurrency),
+    })
+
+    paths = PATHS if args.path == "all" else (args.path,)
+    results = []
+    try:
+        for path in paths:
+            fake_telegram.stats.clear()
+            if path == "smtp":
+                results.append(await bench_smtp(args))
+            elif path == "email-api":
+                results.append(await bench_email_api(args))
+            elif path == "telegram":
+                results.append(await bench_telegram(args, fake_telegram))
+            else:
+                results.append(await bench_consumer(args, fake_telegram))
+            # Окно лимитов Telegram не переносится в следующий путь
+            await asyncio.sleep(args.chat_interval)
+    finally:
+        await telegram_runner.cleanup()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пропускная способность отправки уведомлений на заменителях")
+    parser.add_argument("--path", choices=PATHS + ("all",), default="all")
+    parser.add_argument("--count", type=int, default=1000, help="Уведомлений на путь")
+    parser.add_argument("--rate", type=float, default=0.0, help="Уведомлений в секунду (0 - без ограничения)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Одновременных отправок (и размер пула SMTP)")
+    parser.add_argument("--chats", type=int, default=50, help="Разных Telegram чатов/исполнителей")
+    parser.add_argument("--telegram-rate", type=float, default=30.0, help="Лимит заменителя Bot API, сообщений/с")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Задержка ответа заменителей")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Доля временных отказов SMTP и почтового API")
+    parser.add_argument("--chat-interval", type=float, default=1.0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    import logging
+    logging.basicConfig(level=logging.CRITICAL)
+
+    results = asyncio.run(run(args))
+
+    header = f"{'путь':<10} {'всего':>7} {'ok':>7} {'ошибки':>7} {'ok/с':>10} {'p50 мс':>8} {'p95 мс':>8} {'p99 мс':>8}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(result.row())
+    print()
+    for result in results:
+        errors = {outcome: count for outcome, count in result.outcomes.items() if outcome != "ok"}
+        print(f"{result.path}: ошибки {errors or '-'}; заменитель {dict(result.standin)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,33 @@
 #!/usr/bin/env python3
 """
 Скрипт для мониторинга Kafka кластера
+
+Режимы:
+    summary - разовая сводка: метаданные кластера, лаг consumer group по
+              партициям, скорости записи/чтения и время работы обработчиков
+    serve   - долгоживущий экспортер: периодически собирает смещения и отдает
+              метрики Prometheus на /metrics
+
+    python scripts/monitor_kafka.py summary --max-lag 1000
+    python scripts/monitor_kafka.py serve --port 9308 --interval 15
 """
+import argparse
 import logging
+import re
 import sys
 import os
-from typing import Dict, Any
+import threading
+import time
+import urllib.request
+from collections import defaultdict
+from typing import Dict, Any, List
 
 # Добавляем путь к проекту
-sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
-from kafka import KafkaAdminClient
-from kafka.admin import ConfigResource, ConfigResourceType
-from kafka.kafka_config import kafka_config
+from kafka_events.kafka_config import kafka_config
+from kafka_events.metrics import Histogram, serve_metrics
+from kafka_events.monitoring import LagExporter, LagSnapshot, create_offsets_reader
 
 # Настройка логирования
 logging.basicConfig(
@@ -30,6 +45,8 @@ class KafkaMonitoring:
     
     def _initialize_admin_client(self):
         """Инициализация admin client"""
+        from kafka import KafkaAdminClient
+        
         try:
             admin_config = {
                 'bootstrap_servers': kafka_config.bootstrap_servers.split(','),
@@ -195,58 +212,178 @@ def print_metrics(metrics: Dict[str, Any], title: str):
         else:
             print(f"📈 {key}: {value}")
 
+# Consumer group и топики, на которые они подписаны
+DEFAULT_GROUPS = {
+    "notification-service": ["request-events", "workflow-events"],
+}
+
+
+def parse_groups(values: List[str]) -> Dict[str, List[str]]:
+    """Разбор аргументов вида group:topic1,topic2"""
+    if not values:
+        return DEFAULT_GROUPS
+    groups = {}
+    for value in values:
+        group_id, _, topics = value.partition(":")
+        groups[group_id] = [t for t in topics.split(",") if t] or list(kafka_config.topics)
+    return groups
+
+
+def fetch_handler_latencies(url: str) -> Dict[tuple, Histogram]:
+    """Чтение гистограмм времени обработчиков с /metrics процесса consumer'ов"""
+    with urllib.request.urlopen(url, timeout=5) as response:
+        text = response.read().decode("utf-8")
+    
+    pattern = re.compile(r'^event_handler_duration_seconds_bucket\{(.*)\} (\S+)$')
+    cumulative: Dict[tuple, Dict[str, float]] = defaultdict(dict)
+    for line in text.splitlines():
+        match = pattern.match(line)
+        if not match:
+            continue
+        labels = dict(re.findall(r'(\w+)="([^"]*)"', match.group(1)))
+        le = labels.pop("le")
+        cumulative[(labels.get("group"), labels.get("event_type"))][le] = float(match.group(2))
+    
+    histograms = {}
+    for key, buckets in cumulative.items():
+        bounds = sorted((float(le), value) for le, value in buckets.items() if le != "+Inf")
+        histogram = Histogram(bound for bound, _ in bounds)
+        previous = 0.0
+        for i, (_, value) in enumerate(bounds):
+            histogram.counts[i] = int(value - previous)
+            previous = value
+        histogram.count = int(buckets.get("+Inf", previous))
+        histogram.counts[-1] = histogram.count - int(previous)
+        histograms[key] = histogram
+    return histograms
+
+
+def print_lag_summary(snapshot: LagSnapshot, groups: Dict[str, List[str]], max_lag: int) -> bool:
+    """Вывод сводки по лагам; False если какая-то группа превысила max_lag"""
+    healthy = True
+    print(f"\n{'='*50}")
+    print("📊 Лаг consumer groups")
+    print(f"{'='*50}")
+    for group_id in groups:
+        total = snapshot.group_lag(group_id)
+        behind = max_lag and total > max_lag
+        healthy = healthy and not behind
+        print(f"{'🚨' if behind else '✅'} {group_id}: суммарный лаг {total}")
+        for p in snapshot.partitions:
+            if p.group_id == group_id:
+                committed = "—" if p.committed is None else p.committed
+                print(f"   {p.topic}[{p.partition}]: end {p.end_offset}, committed {committed}, lag {p.lag}")
+    
+    if snapshot.produce_rates or snapshot.consume_rates:
+        print("\n📈 Скорости, сообщений/с:")
+        for topic, rate in sorted(snapshot.produce_rates.items()):
+            print(f"   запись  {topic}: {rate:.2f}")
+        for (group_id, topic), rate in sorted(snapshot.consume_rates.items()):
+            print(f"   чтение  {group_id} / {topic}: {rate:.2f}")
+    return healthy
+
+
+def print_handler_latencies(histograms: Dict[tuple, Histogram]):
+    print(f"\n{'='*50}")
+    print("⏱️ Время обработчиков событий")
+    print(f"{'='*50}")
+    for (group_id, event_type), histogram in sorted(histograms.items()):
+        print(
+            f"   {group_id} / {event_type}: {histogram.count} событий, "
+            f"p50 ≤ {histogram.quantile(0.5)}s, p95 ≤ {histogram.quantile(0.95)}s, p99 ≤ {histogram.quantile(0.99)}s"
+        )
+
+
+def run_summary(args) -> bool:
+    """Разовая сводка по кластеру, лагам и обработчикам"""
+    groups = parse_groups(args.group)
+    
+    if kafka_config.transport == "kafka":
+        monitoring = KafkaMonitoring()
+        try:
+            print_metrics(monitoring.get_cluster_metadata(), "Метаданные кластера")
+            topics = monitoring.list_topics()
+            print(f"\n📋 Всего топиков: {len(topics)}")
+            for group_id in groups:
+                print_metrics(monitoring.get_consumer_group_metrics(group_id), f"Метрики consumer group {group_id}")
+        finally:
+            monitoring.close()
+    
+    reader = create_offsets_reader()
+    exporter = LagExporter(reader, groups)
+    try:
+        exporter.collect()
+        # Второй снимок через interval дает скорости записи и чтения
+        time.sleep(args.interval)
+        snapshot = exporter.collect()
+    finally:
+        reader.close()
+    
+    healthy = print_lag_summary(snapshot, groups, args.max_lag)
+    
+    if args.consumer_metrics_url:
+        try:
+            print_handler_latencies(fetch_handler_latencies(args.consumer_metrics_url))
+        except Exception as e:
+            logger.error(f"❌ Не удалось получить метрики consumer'ов: {e}")
+    
+    return healthy
+
+
+def run_exporter(args) -> bool:
+    """Долгоживущий экспортер метрик лага"""
+    groups = parse_groups(args.group)
+    reader = create_offsets_reader()
+    exporter = LagExporter(reader, groups)
+    stop = threading.Event()
+    
+    exporter.collect()
+    server = serve_metrics(args.port, exporter.render_prometheus)
+    logger.info(f"🚀 Экспортер лагов запущен для групп: {', '.join(groups)}")
+    
+    try:
+        while not stop.is_set():
+            stop.wait(args.interval)
+            try:
+                snapshot = exporter.collect()
+            except Exception as e:
+                logger.error(f"❌ Ошибка сбора смещений: {e}")
+                continue
+            for group_id in groups:
+                total = snapshot.group_lag(group_id)
+                if args.max_lag and total > args.max_lag:
+                    logger.warning(f"🚨 {group_id} отстает: лаг {total} > {args.max_lag}")
+    except KeyboardInterrupt:
+        logger.info("🛑 Получен сигнал прерывания")
+    finally:
+        server.shutdown()
+        reader.close()
+    return True
+
+
 def main():
     """Главная функция мониторинга"""
-    logger.info("🚀 Запуск мониторинга Kafka")
-    
-    monitoring = KafkaMonitoring()
+    parser = argparse.ArgumentParser(description="Мониторинг Kafka: лаги, скорости, обработчики")
+    parser.add_argument("mode", nargs="?", choices=["summary", "serve"], default="summary")
+    parser.add_argument("--group", action="append", help="consumer group и топики: group:topic1,topic2")
+    parser.add_argument("--interval", type=float, default=15.0, help="Интервал между снимками, с")
+    parser.add_argument("--port", type=int, default=9308, help="Порт /metrics экспортера")
+    parser.add_argument("--max-lag", type=int, default=0, help="Порог лага группы для предупреждения (0 - без порога)")
+    parser.add_argument(
+        "--consumer-metrics-url",
+        default=os.getenv("KAFKA_CONSUMER_METRICS_URL"),
+        help="URL /metrics процесса consumer'ов для сводки по времени обработчиков"
+    )
+    args = parser.parse_args()
     
+    logger.info("🚀 Запуск мониторинга Kafka")
     try:
-        # Получаем метаданные кластера
-        cluster_metrics = monitoring.get_cluster_metadata()
-        print_metrics(cluster_metrics, "Метаданные кластера")
-        
-        # Получаем список топиков
-        topics = monitoring.list_topics()
-        print(f"\n📋 Всего топиков: {len(topics)}")
-        print(f"📝 Список топиков: {', '.join(topics)}")
-        
-        # Получаем метрики основных топиков
-        main_topics = [
-            "request-events",
-            "workflow-events", 
-            "notification-events",
-            "security-events",
-            "hr-events",
-            "audit-events"
-        ]
-        
-        for topic in main_topics:
-            if topic in topics:
-                topic_metrics = monitoring.get_topic_metrics(topic)
-                print_metrics(topic_metrics, f"Метрики топика {topic}")
-        
-        # Получаем метрики consumer groups
-        consumer_groups = [
-            "notification-service",
-            "agregator-service"
-        ]
-        
-        for group_id in consumer_groups:
-            group_metrics = monitoring.get_consumer_group_metrics(group_id)
-            print_metrics(group_metrics, f"Метрики consumer group {group_id}")
-        
-        print(f"\n{'='*50}")
-        print("✅ Мониторинг завершен успешно")
-        print(f"{'='*50}")
-        
+        if args.mode == "serve":
+            return run_exporter(args)
+        return run_summary(args)
     except Exception as e:
         logger.error(f"❌ Ошибка мониторинга: {e}")
         return False
-    finally:
-        monitoring.close()
-    
-    return True
 
 if __name__ == "__main__":
     success = main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Локальные заменители внешних сервисов уведомлений для нагрузочных проверок
+
+- SmtpSink - SMTP сервер, принимающий и отбрасывающий письма (AUTH без
+  проверки, без STARTTLS); задержка и доля временных отказов (451)
+  настраиваются;
+- FakeTelegramApi - Bot API (getMe, sendMessage) с лимитами Telegram:
+  общий лимит сообщений в секунду и один ответ в секунду на чат, сверх
+  лимита - 429 с retry_after;
+- FakeEmailApi - HTTP API почтовых провайдеров (SendGrid, Resend, Mailgun)
+  с задержкой и долей ответов 503.
+
+Запуск всех заменителей для ручной проверки приложения:
+
+    python scripts/notification_standins.py --smtp-port 2525 --telegram-port 8081 --email-api-port 8082
+
+Скрипт печатает переменные окружения, которые направляют приложение на заменители.
+"""
+import argparse
+import asyncio
+import base64
+import math
+import random
+import time
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from aiohttp import web
+
+
+async def start_app(app: web.Application, host: str = "127.0.0.1", port: int = 0) -> Tuple[web.AppRunner, str]:
+    """Запуск aiohttp приложения; возвращает (runner, base_url)"""
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{port}"
+
+
+class SmtpSink:
+    """SMTP сервер, отбрасывающий письма"""
+
+    def __init__(self, latency_seconds: float = 0.0, fail_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency_seconds = latency_seconds
+        self.fail_rate = fail_rate
+        self.random = random.Random(seed)
+        self.stats: Counter = Counter()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        """Запуск сервера; возвращает порт"""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.stats["connections"] += 1
+
+        async def reply(text: str):
+            writer.write(text.encode() + b"\r\n")
+            await writer.drain()
+
+        try:
+            await reply("220 localhost ESMTP sink")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode("utf-8", "replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+
+                if verb == "EHLO":
+                    await reply("250-localhost\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n250 SIZE 10485760")
+                elif verb == "HELO":
+                    await reply("250 localhost")
+                elif verb == "AUTH":
+                    parts = command.split()
+                    if parts[1].upper() == "LOGIN":
+                        # Логин и пароль по очереди в base64
+                        for prompt in ("VXNlcm5hbWU6", "UGFzc3dvcmQ6"):
+                            await reply(f"334 {prompt}")
+                            await reader.readline()
+                    elif len(parts) < 3:
+                        await reply("334 ")
+                        await reader.readline()
+                    self.stats["logins"] += 1
+                    await reply("235 Authentication successful")
+                elif verb == "MAIL":
+                    await reply("250 OK")
+                elif verb == "RCPT":
+                    self.stats["recipients"] += 1
+                    await reply("250 OK")
+                elif verb == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    while (await reader.readline()) not in (b".\r\n", b".\n", b""):
+                        pass
+                    if self.latency_seconds:
+                        await asyncio.sleep(self.latency_seconds)
+                    if self.random.random() < self.fail_rate:
+                        self.stats["failed"] += 1
+                        await reply("451 Temporary local problem")
+                    else:
+                        self.stats["messages"] += 1
+                        await reply("250 OK queued")
+                elif verb in ("RSET", "NOOP"):
+                    await reply("250 OK")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                elif verb == "STARTTLS":
+                    await reply("454 TLS not available")
+                else:
+                    await reply("502 Command not implemented")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+class FakeTelegramApi:
+    """Bot API с лимитами Telegram: ~30 сообщений/с всего и 1 сообщение/с в один чат"""
+
+    def __init__(self, rate_per_second: float = 30.0, chat_interval_seconds: float = 1.0,
+                 latency_seconds: float = 0.0):
+        self.rate_per_second = rate_per_second
+        self.chat_interval_seconds = chat_interval_seconds
+        self.latency_seconds = latency_seconds
+        self.stats: Counter = Counter()
+        self._tokens = rate_per_second
+        self._refilled_at = time.monotonic()
+        self._chat_sent_at: Dict[str, float] = {}
+        self._message_id = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        return app
+
+    def _retry_after(self, chat_id: str) -> float:
+        """0 - можно отправить, иначе через сколько секунд повторить"""
+        now = time.monotonic()
+        self._tokens = min(self.rate_per_second, self._tokens + (now - self._refilled_at) * self.rate_per_second)
+        self._refilled_at = now
+        chat_wait = self._chat_sent_at.get(chat_id, -math.inf) + self.chat_interval_seconds - now
+        if chat_wait > 0:
+            return chat_wait
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate_per_second
+        self._tokens -= 1
+        self._chat_sent_at[chat_id] = now
+        return 0
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = await request.json() if request.can_read_body else {}
+        self.stats["requests"] += 1
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+
+        if method == "getMe":
+            return web.json_response({"ok": True, "result": {"id": 1, "is_bot": True, "username": "standin_bot"}})
+        if method != "sendMessage":
+            return web.json_response({"ok": False, "error_code": 404, "description": "Not Found"}, status=404)
+
+        chat_id = str(params.get("chat_id"))
+        retry_after = self._retry_after(chat_id)
+        if retry_after:
+            self.stats["throttled"] += 1
+            seconds = max(1, math.ceil(retry_after))
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {seconds}",
+                "parameters": {"retry_after": seconds},
+            }, status=429)
+
+        self.stats["sent"] += 1
+        self._message_id += 1
+        return web.json_response({"ok": True, "result": {
+            "message_id": self._message_id, "chat": {"id": params.get("chat_id")}, "text": params.get("text"),
+        }})
+
+
+class FakeEmailApi:
+    """HTTP API почтовых провайдеров: SendGrid, Resend (в т.ч. batch) и Mailgun"""
+
+    def __init__(self, latency_seconds: float = 0.0, fail_rate: float = 0.0, seed: Optional[int] = None):
+        self.latency_seconds = latency_seconds
+        self.fail_rate = fail_rate
+        self.random = random.Random(seed)
+        self.stats: Counter = Counter()
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v3/mail/send", self._sendgrid)
+        app.router.add_post("/emails", self._resend)
+        app.router.add_post("/emails/batch", self._resend)
+        app.router.add_post("/v3/{domain}/messages", self._mailgun)
+        return app
+
+    async def _respond(self, messages: int, status: int, body: dict) -> web.Response:
+        self.stats["requests"] += 1
+        if self.latency_seconds:
+            await asyncio.sleep(self.latency_seconds)
+        if self.random.random() < self.fail_rate:
+            self.stats["failed"] += 1
+            return web.json_response({"message": "Service Unavailable"}, status=503)
+        self.stats["messages"] += messages
+        return web.json_response(body, status=status)
+
+    async def _sendgrid(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        return await self._respond(len(data.get("personalizations", [])), 202, {})
+
+    async def _resend(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        emails = data if isinstance(data, list) else [data]
+        ids = [{"id": base64.b16encode(self.random.randbytes(8)).decode()} for _ in emails]
+        return await self._respond(len(emails), 200, {"data": ids} if isinstance(data, list) else ids[0])
+
+    async def _mailgun(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        return await self._respond(len(form.getall("to", [])), 200, {"id": "<standin>", "message": "Queued"})
+
+
+async def serve(args):
+    smtp = SmtpSink(latency_seconds=args.latency_ms / 1000, fail_rate=args.fail_rate)
+    smtp_port = await smtp.start(args.host, args.smtp_port)
+    _, telegram_url = await start_app(FakeTelegramApi(args.telegram_rate).app(), args.host, args.telegram_port)
+    _, email_api_url = await start_app(
+        FakeEmailApi(latency_seconds=args.latency_ms / 1000, fail_rate=args.fail_rate).app(),
+        args.host, args.email_api_port,
+    )
+
+    print("Заменители запущены. Переменные окружения приложения:")
+    print(f"  MAIL_SERVER={args.host} MAIL_PORT={smtp_port} MAIL_TLS=false MAIL_PASSWORD=standin")
+    print(f"  TELEGRAM_API_URL={telegram_url} TELEGRAM_BOT_TOKEN=standin")
+    print(f"  SENDGRID_API_URL={email_api_url}/v3/mail/send RESEND_API_URL={email_api_url} "
+          f"MAILGUN_API_URL={email_api_url}/v3")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальные SMTP, Telegram Bot API и почтовый HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--smtp-port", type=int, default=2525)
+    parser.add_argument("--telegram-port", type=int, default=8081)
+    parser.add_argument("--email-api-port", type=int, default=8082)
+    parser.add_argument("--telegram-rate", type=float, default=30.0, help="Лимит sendMessage в секунду")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Задержка ответа SMTP и почтового API")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Доля временных отказов SMTP и почтового API")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@
 """
 Скрипт для тестирования Kafka интеграции
 """
+import argparse
 import asyncio
 import logging
 import sys
@@ -9,10 +10,22 @@ import os
 from datetime import datetime
 
 # Добавляем путь к проекту
-sys.path.append(os.path.join(os.path.dirname(__file__), 'backend'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
 
-from kafka import kafka_producer
-from kafka.kafka_events import (
+# Транспорт выбирается до импорта kafka_events: конфигурация читается при импорте
+parser = argparse.ArgumentParser(description="Тестирование Kafka интеграции")
+parser.add_argument(
+    "--transport",
+    choices=["kafka", "memory", "sqlite"],
+    default=os.getenv("KAFKA_TRANSPORT", "kafka"),
+    help="Транспорт событий (memory/sqlite не требуют брокера и подходят для CI)"
+)
+args = parser.parse_args()
+os.environ["KAFKA_ENABLED"] = "true"
+os.environ["KAFKA_TRANSPORT"] = args.transport
+
+from kafka_events import kafka_producer, KafkaEventConsumer, EventType
+from kafka_events.kafka_events import (
     RequestCreatedEvent, WorkflowContractorAssignedEvent,
     NotificationTelegramSentEvent, AuditUserActionEvent
 )
@@ -163,6 +176,30 @@ async def test_batch_events():
     
     return results["success"] > 0
 
+async def test_consume_back():
+    """Тест чтения опубликованных событий обратно через consumer"""
+    logger.info("🧪 Тестирование чтения событий consumer'ом")
+    
+    received = []
+    consumer = KafkaEventConsumer(
+        group_id=f"test-kafka-{datetime.now().timestamp()}",
+        topics=["request-events", "workflow-events"]
+    )
+    for event_type in (EventType.REQUEST_CREATED, EventType.WORKFLOW_CONTRACTOR_ASSIGNED):
+        consumer.register_handler(event_type, lambda data: received.append(data) or True)
+    
+    try:
+        # 1 + 1 одиночных события и 3 пакетных
+        for _ in range(10):
+            consumer.poll_once(timeout_ms=1000)
+            if len(received) >= 5:
+                break
+    finally:
+        consumer.stop_consuming()
+    
+    logger.info(f"📨 Получено событий: {len(received)}")
+    return len(received) >= 5
+
 async def main():
     """Главная функция тестирования"""
     logger.info("🚀 Начало тестирования Kafka интеграции")
@@ -179,6 +216,10 @@ async def main():
         
         results = await asyncio.gather(*tests, return_exceptions=True)
         
+        # Проверяем, что события доходят до consumer'а
+        tests.append(test_consume_back())
+        results.append(await tests[-1])
+        
         # Анализируем результаты
         success_count = sum(1 for result in results if result is True)
         total_tests = len(tests)